@@ -0,0 +1 @@
+uv run uvicorn --workers 4 --host 0.0.0.0 --port 8000 --app-dir src api:app
@@ -0,0 +1,91 @@
+"""
+Benchmark of loading a large glossary and matching its terms in source texts.
+
+A glossary of synthetic English to Spanish terms of one to three words is written to a CSV file, loaded
+into a terminology store, which builds its token-level Aho-Corasick matcher, and then matched against
+documents of growing length. For comparison, the same documents are also matched naively, by searching
+for each term in turn. Run it with `python benchmarks/glossary_matching.py`.
+"""
+
+import argparse
+import csv
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(
+    0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir, "src"))
+)
+
+from glossary import TerminologyStore  # noqa: E402
+
+SYLLABLES = ["ka", "lo", "mi", "ne", "ru", "sa", "to", "vi", "ze", "qu", "an", "or"]
+
+
+def random_word(rng: random.Random) -> str:
+    """Make up a word of two to four syllables."""
+    return "".join(rng.choices(SYLLABLES, k=rng.randint(2, 4)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--entries", type=int, default=100_000)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    terms = list(
+        dict.fromkeys(
+            " ".join(random_word(rng) for _ in range(rng.randint(1, 3)))
+            for _ in range(args.entries)
+        )
+    )
+    with tempfile.NamedTemporaryFile(
+        "w", suffix=".csv", newline="", delete=False, encoding="utf-8"
+    ) as file:
+        writer = csv.writer(file)
+        writer.writerow(
+            ["source_language", "target_language", "source_term", "target_term"]
+        )
+        for term in terms:
+            writer.writerow(["English", "Español", term, term.upper()])
+        path = file.name
+
+    tracemalloc.start()
+    started_at = time.perf_counter()
+    store = TerminologyStore.from_file(path)
+    load_seconds = time.perf_counter() - started_at
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    os.remove(path)
+    print(
+        f"Loaded {len(terms)} terms in {load_seconds:.2f} s, peak memory {peak / 2**20:.0f} MB"
+    )
+
+    vocabulary = [random_word(rng) for _ in range(2_000)]
+    for words in (100, 1_000, 10_000):
+        document = " ".join(
+            rng.choice(terms) if rng.random() < 0.05 else rng.choice(vocabulary)
+            for _ in range(words)
+        )
+        started_at = time.perf_counter()
+        matched = store.match(document, "English", "Español")
+        matching_seconds = time.perf_counter() - started_at
+        naive_terms = terms[: min(len(terms), 5_000)]
+        started_at = time.perf_counter()
+        for term in naive_terms:
+            re.search(rf"\b{re.escape(term)}\b", document, flags=re.IGNORECASE)
+        naive_seconds = (
+            (time.perf_counter() - started_at) * len(terms) / len(naive_terms)
+        )
+        print(
+            f"{words} words: {len(matched)} distinct terms matched in "
+            f"{matching_seconds * 1000:.1f} ms, naive search of every term about {naive_seconds * 1000:.0f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""
+Load test of the `/translate` API of the Gradio app, to tune its queue size and the concurrency of its
+priority lanes.
+
+The app is launched in-process with a stand-in language model that answers after a fixed delay, so the
+results reflect the queueing of the app rather than the speed of a provider. Concurrent clients send a
+mix of short and long texts, and the throughput, the latency percentiles of each lane and the number of
+rejected requests are reported, followed by the queue metrics of the app. Run it with
+`python benchmarks/gradio_load_test.py`, after setting the queue and lane environment variables to try.
+Set `LLM_REPLAY_PATH` to a log recorded with `LLM_RECORD_PATH` to replay real responses and latencies
+instead, sped up by `LLM_REPLAY_SPEED`.
+"""
+
+import argparse
+import importlib.util
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from gradio_client import Client
+from icecream import ic
+from llama_index.core.llms import CompletionResponse, CustomLLM, LLMMetadata
+from llama_index.core.llms.callbacks import llm_completion_callback
+
+SOURCE_DIRECTORY = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), os.pardir, "src")
+)
+sys.path.insert(0, SOURCE_DIRECTORY)
+
+import constants  # noqa: E402
+
+
+class DelayedLLM(CustomLLM):
+    """A stand-in language model that answers every prompt after a delay proportional to its length."""
+
+    seconds_per_thousand_characters: float = 0.5
+
+    @property
+    def metadata(self) -> LLMMetadata:
+        return LLMMetadata(model_name="delayed")
+
+    @llm_completion_callback()
+    def complete(self, prompt: str, formatted: bool = False, **kwargs):
+        time.sleep(self.seconds_per_thousand_characters * len(prompt) / 1000)
+        return CompletionResponse(text="Traducción.")
+
+    @llm_completion_callback()
+    def stream_complete(self, prompt: str, formatted: bool = False, **kwargs):
+        yield self.complete(prompt, formatted=formatted, **kwargs)
+
+
+def load_gradio_ui():
+    """Load the Gradio entry point by its file name, since it is not an importable module name."""
+    spec = importlib.util.spec_from_file_location(
+        "gradio_ui", os.path.join(SOURCE_DIRECTORY, "gradio-ui.py")
+    )
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def percentile(values: list, percentile: float) -> float:
+    """Get a percentile of a list of values."""
+    values = sorted(values)
+    return values[int(round(percentile / 100 * (len(values) - 1)))]
+
+
+def send(client: Client, text: str) -> tuple:
+    """
+    Send one translation request and report whether it succeeded and how long it took. Rejected, cancelled
+    and failed requests raise an error in the client, and a request only succeeds with a translated text.
+    """
+    started_at = time.perf_counter()
+    try:
+        translated_text = client.predict(
+            constants.LANGUAGES__SUPPORTED[0],
+            constants.LANGUAGES__SUPPORTED[1],
+            text,
+            constants.TRANSLATION_MODE__SIMPLE,
+            api_name="/translate",
+        )
+        succeeded = isinstance(translated_text, str) and bool(translated_text.strip())
+    except Exception:
+        succeeded = False
+    return succeeded, time.perf_counter() - started_at
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=128)
+    parser.add_argument("--long-fraction", type=float, default=0.25)
+    args = parser.parse_args()
+    ic.disable()
+
+    gradio_ui_module = load_gradio_ui()
+    gradio_ui = gradio_ui_module.GradioUI()
+    gradio_ui.initialise_settings()
+    if not gradio_ui_module.rc_settings__llm_replay_path.value:
+        gradio_ui_module.rc_global__llm.value = DelayedLLM()
+    gradio_ui_module.rc_global__caller.value = None
+    app = gradio_ui.construct_ui()
+    app.queue(max_size=gradio_ui_module.rc_settings__translate_queue_max_size.value)
+    _, url, _ = app.launch(prevent_thread_lock=True, quiet=True, max_threads=256)
+
+    short_text = "The quick brown fox jumps over the lazy dog."
+    long_text = short_text * 40
+    every_long = max(1, round(1 / args.long_fraction)) if args.long_fraction else 0
+    texts = [
+        long_text if every_long and i % every_long == 0 else short_text
+        for i in range(args.requests)
+    ]
+    clients = [Client(url, verbose=False) for _ in range(args.clients)]
+
+    started_at = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.clients) as executor:
+        results = list(
+            executor.map(
+                lambda item: (
+                    (item[1],) + send(clients[item[0] % len(clients)], item[1])
+                ),
+                enumerate(texts),
+            )
+        )
+    elapsed = time.perf_counter() - started_at
+
+    succeeded = [result for result in results if result[1]]
+    print(
+        f"{len(succeeded)} of {len(results)} requests succeeded in {elapsed:.2f} s "
+        f"({len(succeeded) / elapsed:.1f} requests per second), "
+        f"{len(results) - len(succeeded)} rejected or failed."
+    )
+    for lane, text in (("short", short_text), ("long", long_text)):
+        latencies = [result[2] for result in succeeded if result[0] == text]
+        if latencies:
+            print(
+                f"{lane} texts: p50 {percentile(latencies, 50):.2f} s, "
+                f"p95 {percentile(latencies, 95):.2f} s, max {max(latencies):.2f} s"
+            )
+
+    metrics = clients[0].predict(api_name="/metrics")
+    for name, summary in sorted(metrics["observations"].items()):
+        if name.startswith("queue."):
+            print(
+                f"{name}: mean {summary['mean']:.2f}, p95 {summary['p95']:.2f}, max {summary['max']:.2f}"
+            )
+    for name, value in sorted(metrics["counters"].items()):
+        if name.startswith("queue."):
+            print(f"{name}: {value:.0f}")
+    app.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+Accuracy and latency of the local source language detection.
+
+Short segments in each supported language are detected, both as they are and cut to their first few
+words (or characters, for the scripts written without spaces), and the accuracy for each language is reported with the mean and the 95th percentile detection
+time per segment. Run it with `python benchmarks/language_detection.py`.
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(
+    0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir, "src"))
+)
+
+from icecream import ic  # noqa: E402
+from language_detection import detect_language  # noqa: E402
+
+SEGMENTS = {
+    "English": [
+        "The weather has been unusually warm for this time of the year.",
+        "Please send me the report before the meeting on Friday.",
+        "They have been working on this project for more than two years.",
+    ],
+    "Español": [
+        "El tiempo ha sido inusualmente cálido para esta época del año.",
+        "Por favor, envíame el informe antes de la reunión del viernes.",
+        "Llevan más de dos años trabajando en este proyecto.",
+    ],
+    "Français": [
+        "Le temps a été exceptionnellement doux pour cette période de l'année.",
+        "Merci de m'envoyer le rapport avant la réunion de vendredi.",
+        "Ils travaillent sur ce projet depuis plus de deux ans.",
+    ],
+    "Italiano": [
+        "Il tempo è stato insolitamente caldo per questo periodo dell'anno.",
+        "Per favore, mandami la relazione prima della riunione di venerdì.",
+        "Lavorano a questo progetto da più di due anni.",
+    ],
+    "Deutsch": [
+        "Das Wetter war für diese Jahreszeit ungewöhnlich warm.",
+        "Bitte schicken Sie mir den Bericht vor der Besprechung am Freitag.",
+        "Sie arbeiten seit mehr als zwei Jahren an diesem Projekt.",
+    ],
+    "Português": [
+        "O tempo tem estado invulgarmente quente para esta época do ano.",
+        "Por favor, envie-me o relatório antes da reunião de sexta-feira.",
+        "Eles trabalham neste projeto há mais de dois anos.",
+    ],
+    "Suomi": [
+        "Sää on ollut tähän vuodenaikaan poikkeuksellisen lämmin.",
+        "Lähetä minulle raportti ennen perjantain kokousta.",
+        "He ovat työskennelleet tämän projektin parissa yli kaksi vuotta.",
+    ],
+    "Svenska": [
+        "Vädret har varit ovanligt varmt för den här tiden på året.",
+        "Skicka mig rapporten före mötet på fredag.",
+        "De har arbetat med det här projektet i mer än två år.",
+    ],
+    "Dansk": [
+        "Vejret har været usædvanligt varmt for denne tid af året.",
+        "Send mig venligst rapporten før mødet på fredag.",
+        "De har arbejdet på dette projekt i mere end to år.",
+    ],
+    "Norsk": [
+        "Været har vært uvanlig varmt for denne tiden av året.",
+        "Send meg rapporten før møtet på fredag.",
+        "De har jobbet med dette prosjektet i mer enn to år.",
+    ],
+    "Nederlands": [
+        "Het weer is voor deze tijd van het jaar ongewoon warm geweest.",
+        "Stuur me het rapport alsjeblieft voor de vergadering van vrijdag.",
+        "Ze werken al meer dan twee jaar aan dit project.",
+    ],
+    "Polski": [
+        "Pogoda jest niezwykle ciepła jak na tę porę roku.",
+        "Proszę przesłać mi raport przed piątkowym spotkaniem.",
+        "Pracują nad tym projektem od ponad dwóch lat.",
+    ],
+    "বাংলা": [
+        "বছরের এই সময়ের জন্য আবহাওয়া অস্বাভাবিক উষ্ণ ছিল।",
+        "শুক্রবারের সভার আগে আমাকে প্রতিবেদনটি পাঠান।",
+    ],
+    "日本語": [
+        "この時期にしては異常に暖かい天気が続いています。",
+        "金曜日の会議の前に報告書を送ってください。",
+    ],
+    "中文": [
+        "今年这个时候的天气异常温暖。",
+        "请在星期五开会之前把报告发给我。",
+    ],
+    "한국어": [
+        "올해 이맘때치고는 날씨가 유난히 따뜻했습니다.",
+        "금요일 회의 전에 보고서를 보내 주세요.",
+    ],
+}
+
+
+def first_words(segment: str, words: int = 5) -> str:
+    """Cut a segment to its first few words, or to its first few characters if it is written without spaces."""
+    split = segment.split()
+    return " ".join(split[:words]) if len(split) > 1 else segment[: 2 * words]
+
+
+def main():
+    ic.disable()
+    latencies = []
+    correct = total = 0
+    print("language     accuracy  (first five words)")
+    for language, segments in SEGMENTS.items():
+        full = short = 0
+        for segment in segments:
+            for is_short, variant in ((False, segment), (True, first_words(segment))):
+                started_at = time.perf_counter()
+                detected = detect_language(variant)
+                latencies.append(time.perf_counter() - started_at)
+                if is_short:
+                    short += detected == language
+                else:
+                    full += detected == language
+        correct += full + short
+        total += 2 * len(segments)
+        print(
+            f"{language:12} {full / len(segments):8.2f}  ({short / len(segments):.2f})"
+        )
+    latencies.sort()
+    print(f"Overall accuracy {correct / total:.2f}")
+    print(
+        f"Detection time per segment: mean {sum(latencies) / len(latencies) * 1e6:.0f} µs, "
+        f"p95 {latencies[int(0.95 * (len(latencies) - 1))] * 1e6:.0f} µs"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Memory profile of translating very large documents in many sessions, with and without spilling long texts
+to temporary files.
+
+Each simulated session uploads a large document, translates it with the reflective pipeline and keeps what
+the apps keep for a session: the text to translate and the translation, either in memory or spilled to a
+temporary file with only a preview in memory. A stand-in language model answers every prompt with a text
+as long as the document and a raw payload twice that size, like a verbose provider response. The memory
+retained by all the sessions and the peak memory, as traced by `tracemalloc`, are reported. Run it with
+`python benchmarks/memory_profile.py`.
+"""
+
+import argparse
+import io
+import os
+import sys
+import tracemalloc
+
+from llama_index.core.llms import CompletionResponse, CustomLLM, LLMMetadata
+from llama_index.core.llms.callbacks import llm_completion_callback
+
+sys.path.insert(
+    0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir, "src"))
+)
+
+import constants  # noqa: E402
+from icecream import ic  # noqa: E402
+from memory import keep_text, read_text_upload, text_of  # noqa: E402
+from translator import AgenticTranslator  # noqa: E402
+
+
+class EchoLLM(CustomLLM):
+    """A stand-in language model that answers with a text as long as the document, and a large raw payload."""
+
+    characters: int = 1_000_000
+
+    @property
+    def metadata(self) -> LLMMetadata:
+        return LLMMetadata(model_name="echo")
+
+    @llm_completion_callback()
+    def complete(self, prompt: str, formatted: bool = False, **kwargs):
+        text = "t" * self.characters
+        return CompletionResponse(text=text, raw={"choices": [{"text": text * 2}]})
+
+    @llm_completion_callback()
+    def stream_complete(self, prompt: str, formatted: bool = False, **kwargs):
+        yield self.complete(prompt, formatted=formatted, **kwargs)
+
+
+def profile(sessions: int, characters: int, spill_characters: int) -> tuple:
+    """Translate a document in each session and report the retained and the peak memory in MB."""
+    document = ("The quick brown fox jumps over the lazy dog. " * characters)[
+        :characters
+    ].encode(constants.CHAR_ENCODING__UTF8)
+    llm = EchoLLM(characters=characters)
+    kept = []
+    tracemalloc.start()
+    for _ in range(sessions):
+        source = read_text_upload(
+            io.BytesIO(document), spill_characters=spill_characters
+        )
+        translator = AgenticTranslator(
+            llm=llm,
+            source_language=constants.LANGUAGES__SUPPORTED[0],
+            target_language=constants.LANGUAGES__SUPPORTED[1],
+        )
+        translation = translator.reflective_translate(text_of(source))[-1].text
+        kept.append((source, keep_text(translation, spill_characters)))
+        del translator, translation
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return retained / 2**20, peak / 2**20
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=8)
+    parser.add_argument("--characters", type=int, default=1_000_000)
+    parser.add_argument("--spill-characters", type=int, default=20_000)
+    args = parser.parse_args()
+    ic.disable()
+
+    for label, spill_characters in (
+        ("in memory", 0),
+        (f"spilled beyond {args.spill_characters} characters", args.spill_characters),
+    ):
+        retained, peak = profile(args.sessions, args.characters, spill_characters)
+        print(
+            f"{args.sessions} sessions of {args.characters} characters, {label}: "
+            f"{retained:.1f} MB retained, {peak:.1f} MB peak"
+        )
+
+
+if __name__ == "__main__":
+    main()
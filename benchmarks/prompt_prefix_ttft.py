@@ -0,0 +1,267 @@
+"""
+Benchmark of the time to first token with the per language pair prompt prefix layout, compared with a
+layout that puts the variable content first.
+
+The benchmark runs a local stand-in for the Ollama chat API, which emulates a prompt (KV) cache: the
+time to the first streamed token grows with the number of prompt characters that do not share a prefix
+with a recently processed prompt. Its timings therefore only reflect the simulated cost and number of
+cache slots, not the gain on a real server. What does carry over is checked on the requests themselves:
+with the per language pair prefix layout, the bytes of every request of a language pair and a prompt,
+up to its variable suffix, must be identical, as a real prompt cache only reuses an exact prefix. Run it
+with `python benchmarks/prompt_prefix_ttft.py`, or with `--url` and `--model` to measure a real Ollama
+server instead of the stand-in.
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "src"))
+
+import constants  # noqa: E402
+from llama_index.llms.ollama import Ollama  # noqa: E402
+from prompts import format_prompt, pair_prefix  # noqa: E402
+
+# Simulated prompt processing cost per uncached character, and the number of cached prompts (slots).
+SECONDS_PER_UNCACHED_CHARACTER = 0.00005
+CACHE_SLOTS = 4
+
+
+class StandInOllamaHandler(BaseHTTPRequestHandler):
+    cached_prompts = []
+    lock = threading.Lock()
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        prompt = "".join(message["content"] for message in request["messages"])
+        with self.lock:
+            cached_characters = max(
+                (
+                    len(os.path.commonprefix([prompt, cached]))
+                    for cached in self.cached_prompts
+                ),
+                default=0,
+            )
+            self.cached_prompts.insert(0, prompt)
+            del self.cached_prompts[CACHE_SLOTS:]
+        time.sleep((len(prompt) - cached_characters) * SECONDS_PER_UNCACHED_CHARACTER)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.end_headers()
+        for token, done in (("Hallo", False), (" Welt", False), ("", True)):
+            chunk = {
+                "model": request["model"],
+                "created_at": "2024-01-01T00:00:00Z",
+                "message": {"role": "assistant", "content": token},
+                "done": done,
+            }
+            if done:
+                chunk.update({"prompt_eval_count": len(prompt), "eval_count": 2})
+            self.wfile.write(
+                (json.dumps(chunk) + "\n").encode(constants.CHAR_ENCODING__UTF8)
+            )
+            self.wfile.flush()
+
+
+def variable_first_prompt(
+    prefix_template, suffix_template, source_language, target_language, **variables
+):
+    """The layout without a stable prefix: the variable content comes before the instructions."""
+    return format_prompt(
+        constants.EMPTY_STRING,
+        suffix_template + prefix_template,
+        source_language,
+        target_language,
+        **variables,
+    )
+
+
+def stable_prefix(layout, prefix_template, source_language, target_language) -> str:
+    """The part of a prompt built with a layout that only depends on the language pair."""
+    if layout is format_prompt:
+        return pair_prefix(prefix_template, source_language, target_language)
+    return constants.EMPTY_STRING
+
+
+def record_requests(llm: Ollama) -> list:
+    """Record the body of every request that the language model sends, as the server receives it."""
+    bodies = []
+    llm.client._client.event_hooks["request"].append(
+        lambda request: bodies.append(request.read())
+    )
+    return bodies
+
+
+def suffix_offset(body: bytes, prefix: str) -> int | None:
+    """
+    Find where the variable suffix of a prompt starts in the body of its request, after the stable prefix
+    that opens the content of a message, whichever way the client escapes it in JSON.
+    """
+    messages_start = body.find(b'"messages"')
+    for ensure_ascii in (False, True):
+        prefix_bytes = json.dumps(prefix, ensure_ascii=ensure_ascii)[:-1].encode(
+            constants.CHAR_ENCODING__UTF8
+        )
+        prefix_start = body.find(prefix_bytes, messages_start)
+        if messages_start >= 0 and prefix_start >= 0:
+            return prefix_start + len(prefix_bytes)
+    return None
+
+
+def check_stable_prefixes(requests) -> list:
+    """
+    Check that the requests of each language pair and prompt are byte-identical up to their variable suffix.
+
+    Args:
+        requests: The language pair and prompt name, the stable prefix and the body of each request.
+
+    Returns:
+        list: The language pair and prompt name, the number of requests, the length of the stable prefix in bytes, and whether it was identical across the requests, of each group.
+    """
+    groups = {}
+    for key, prefix, body in requests:
+        groups.setdefault(key, []).append((prefix, body))
+    results = []
+    for key, group in groups.items():
+        bodies = [body for _, body in group]
+        offsets = [suffix_offset(body, prefix) for prefix, body in group]
+        identical = None not in offsets and len(set(offsets)) == 1
+        if identical:
+            identical = len(os.path.commonprefix(bodies)) >= offsets[0]
+        results.append((key, len(group), offsets[0], identical))
+    return results
+
+
+def time_to_first_token(llm: Ollama, prompt: str) -> float:
+    """Measure the time until the first chunk of a streamed completion arrives."""
+    started_at = time.perf_counter()
+    for _ in llm.stream_complete(prompt):
+        return time.perf_counter() - started_at
+
+
+def run(layout, llm: Ollama, bodies: list, sentences, language_pairs):
+    """
+    Send translation and assessment prompts built with a layout, starting with an empty cache on the
+    stand-in server.
+
+    Returns:
+        tuple: The times to first token, and the language pair and prompt name, the stable prefix and the body of each request.
+    """
+    StandInOllamaHandler.cached_prompts.clear()
+    timings = []
+    requests = []
+    for source_language, target_language in language_pairs:
+        llm.system_prompt = constants.PROMPT__SYSTEM_SIMPLE.format(
+            source_language=source_language, target_language=target_language
+        )
+        for sentence in sentences:
+            for name, prefix_template, suffix_template, variables in (
+                (
+                    "translate",
+                    constants.PROMPT__TRANSLATE_SIMPLE_PREFIX,
+                    constants.PROMPT__TRANSLATE_SIMPLE_SUFFIX,
+                    {"glossary": "", "source_text": sentence},
+                ),
+                (
+                    "assess",
+                    constants.PROMPT__KG_ASSESS_PREFIX,
+                    constants.PROMPT__KG_ASSESS_SUFFIX,
+                    {
+                        "source_text": sentence,
+                        "translated_text": sentence,
+                        "knowledge_triplets": "1. [subject]->[predicate]->[object]",
+                    },
+                ),
+            ):
+                prompt = layout(
+                    prefix_template,
+                    suffix_template,
+                    source_language,
+                    target_language,
+                    **variables,
+                )
+                timings.append(time_to_first_token(llm, prompt))
+                requests.append(
+                    (
+                        f"{source_language}>{target_language} {name}",
+                        stable_prefix(
+                            layout, prefix_template, source_language, target_language
+                        ),
+                        bodies[-1],
+                    )
+                )
+    return timings, requests
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--url", help="The URL of a real Ollama server, instead of the stand-in."
+    )
+    parser.add_argument("--model", default="stand-in", help="The model on the server.")
+    args = parser.parse_args()
+
+    server = None
+    url = args.url
+    if url is None:
+        server = ThreadingHTTPServer(("127.0.0.1", 0), StandInOllamaHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = f"http://127.0.0.1:{server.server_address[1]}"
+    llm = Ollama(base_url=url, model=args.model, context_window=4096)
+    bodies = record_requests(llm)
+    sentences = [
+        sentence.strip() + "."
+        for sentence in constants.SAMPLE_TEXT__ENGLISH_NEWS_ARTICLE.split(". ")
+        if sentence.strip()
+    ]
+    language_pairs = [("English", "Deutsch"), ("English", "日本語")]
+    unstable = []
+    for name, layout in (
+        ("variable content first", variable_first_prompt),
+        ("per language pair prefix", format_prompt),
+    ):
+        timings, requests = run(layout, llm, bodies, sentences, language_pairs)
+        timings.sort()
+        print(
+            f"{name}: {len(timings)} requests, "
+            f"mean TTFT {1000 * sum(timings) / len(timings):.1f} ms, "
+            f"p50 {1000 * timings[len(timings) // 2]:.1f} ms, "
+            f"p95 {1000 * timings[int(0.95 * (len(timings) - 1))]:.1f} ms"
+        )
+        if layout is format_prompt:
+            for key, count, length, identical in check_stable_prefixes(requests):
+                if length is None:
+                    print(f"  {key}: {count} requests, the stable prefix was not found")
+                else:
+                    print(
+                        f"  {key}: {count} requests, the first {length} bytes, up to the "
+                        f"variable suffix, are {'identical' if identical else 'NOT identical'}"
+                    )
+                if not identical:
+                    unstable.append(key)
+    if server is not None:
+        server.shutdown()
+        print(
+            "Note: these timings come from a stand-in server that simulates a prompt cache with "
+            f"{SECONDS_PER_UNCACHED_CHARACTER * 1e6:.0f} µs per uncached character and "
+            f"{CACHE_SLOTS} cache slots, so they only show the effect of those parameters. Only the "
+            "byte-identical prefixes carry over to a real server; run with --url and --model to measure one."
+        )
+    else:
+        print(
+            "Note: a real server keeps its prompt cache between the two layouts, so the second one may "
+            "benefit from the prompts cached by the first."
+        )
+    if unstable:
+        sys.exit(f"The requests of {', '.join(unstable)} do not share a stable prefix.")
+
+
+if __name__ == "__main__":
+    main()
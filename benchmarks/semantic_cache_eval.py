@@ -0,0 +1,232 @@
+"""
+Offline evaluation of the precision, the recall and the lookup latency of the semantic cache.
+
+The cache is filled with the stand-in translations of a set of sentences. It is then queried with
+near-duplicates of those sentences, which should hit: other whitespace, punctuation or case, and other
+numbers, whose translations must have the new numbers. It is also queried with texts that must miss: the
+sentences with one word changed in a way that changes their meaning, and unrelated sentences. Pairs of
+sentences that differ by a negation or an antonym, which are the most similar texts of different meanings,
+are cached and queried separately. For each similarity threshold, the precision (correct hits among all
+hits), the recall (correct hits among the near-duplicates) and the wrong hits of the negation and antonym
+pairs are reported, followed by the lookup latency for growing numbers of cached entries. Run it with
+`python benchmarks/semantic_cache_eval.py`.
+"""
+
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(
+    0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir, "src"))
+)
+
+from semantic_cache import SemanticCache  # noqa: E402
+
+SENTENCES = [
+    "The central bank raised interest rates by 25 basis points on Tuesday.",
+    "Heavy rain is expected across the northern region this weekend.",
+    "The museum will open its new wing to the public in 2026.",
+    "Our team shipped 14 features in the last quarter.",
+    "Please restart the server before applying the update.",
+    "The train to Kyoto departs from platform 7 at 9:15.",
+    "She finished the marathon in just under 3 hours.",
+    "The company reported a profit of 4.2 million euros.",
+    "Turn left at the second traffic light and continue straight.",
+    "The library is closed on public holidays.",
+    "Children under 12 travel free when accompanied by an adult.",
+    "The committee approved the budget after a long debate.",
+    "Add 200 grams of flour and mix until smooth.",
+    "The conference attracted more than 3,000 participants.",
+    "Our office is moving to a larger building next month.",
+    "The patient should take one tablet twice a day.",
+    "Temperatures will drop to minus 5 degrees overnight.",
+    "The software update fixes a security vulnerability.",
+    "The river flooded several villages after the storm.",
+    "He has lived in Berlin for 10 years.",
+    "The flight was delayed because of fog at the airport.",
+    "Sales increased by 8 percent compared with last year.",
+    "The new policy takes effect on the first of March.",
+    "Keep the medicine in a cool and dry place.",
+    "The orchestra will perform three symphonies tonight.",
+]
+
+# Replacements of one word that change the meaning of a sentence, which must not hit the cache.
+MEANING_CHANGES = {
+    "raised": "lowered",
+    "northern": "southern",
+    "open": "close",
+    "last": "next",
+    "before": "after",
+    "under": "over",
+    "profit": "loss",
+    "left": "right",
+    "closed": "open",
+    "free": "half price",
+    "approved": "rejected",
+    "more": "fewer",
+    "larger": "smaller",
+    "twice": "three times",
+    "drop": "rise",
+    "fixes": "introduces",
+    "lived": "worked",
+    "delayed": "cancelled",
+    "increased": "decreased",
+    "cool": "warm",
+}
+
+# Pairs of a cached sentence and the sentence with a negation added or removed, which must not hit the cache.
+NEGATION_PAIRS = [
+    (
+        "Please do close the door when you leave the room.",
+        "Please do not close the door when you leave the room.",
+    ),
+    ("The results are significant.", "The results are not significant."),
+    ("I can attend the meeting tomorrow.", "I cannot attend the meeting tomorrow."),
+    ("The payment was received on time.", "The payment was never received on time."),
+    (
+        "You should share your password with the support team.",
+        "You should never share your password with the support team.",
+    ),
+    ("The patient has a fever.", "The patient has no fever."),
+    (
+        "The feature is available in all regions.",
+        "The feature is unavailable in all regions.",
+    ),
+    ("The parking is legal on weekends.", "The parking is illegal on weekends."),
+    ("Do not turn off the power.", "Do turn off the power."),
+    ("The contract is valid until June.", "The contract is invalid until June."),
+]
+
+# Pairs of a cached sentence and the sentence with an antonym, which must not hit the cache.
+ANTONYM_PAIRS = [
+    ("The door is open.", "The door is closed."),
+    ("Turn the heating on.", "Turn the heating off."),
+    ("The test passed.", "The test failed."),
+    ("Prices rose sharply in March.", "Prices fell sharply in March."),
+    ("The answer is true.", "The answer is false."),
+    ("The store opens early on Sundays.", "The store opens late on Sundays."),
+    ("Always back up your files.", "Never back up your files."),
+    (
+        "The request was accepted by the board.",
+        "The request was rejected by the board.",
+    ),
+    ("Include the header in the report.", "Exclude the header in the report."),
+    (
+        "Enable the firewall before connecting.",
+        "Disable the firewall before connecting.",
+    ),
+]
+
+UNRELATED = [
+    "The cat sat quietly by the window watching the birds.",
+    "Quantum computers use qubits instead of classical bits.",
+    "Remember to water the plants every other day.",
+    "The referee blew the whistle to end the match.",
+    "Fresh bread smells wonderful in the morning.",
+]
+
+
+def stand_in_translation(sentence: str) -> str:
+    """A stand-in translation, which keeps the numbers of the sentence as they are."""
+    return f"[es] {sentence}"
+
+
+def near_duplicates(sentence: str, rng: random.Random) -> list:
+    """Get the near-duplicates of a sentence, with their expected translations."""
+    variants = [
+        ("  " + sentence.replace(" ", "   ", 2) + "\n", stand_in_translation(sentence)),
+        (sentence.rstrip(".") + "!", stand_in_translation(sentence)),
+        (sentence.upper(), stand_in_translation(sentence)),
+    ]
+    numbers = re.findall(r"\d+", sentence)
+    if numbers:
+        changed = sentence
+        for number in set(numbers):
+            changed = re.sub(
+                rf"(?<!\d){number}(?!\d)", str(int(number) + rng.randint(1, 9)), changed
+            )
+        variants.append((changed, stand_in_translation(changed)))
+    return variants
+
+
+def meaning_changes(sentence: str) -> list:
+    """Get the sentence with one word changed in a way that changes its meaning, if any."""
+    for word, replacement in MEANING_CHANGES.items():
+        if re.search(rf"\b{word}\b", sentence):
+            return [re.sub(rf"\b{word}\b", replacement, sentence, count=1)]
+    return []
+
+
+def wrong_hits(threshold: float, pairs: list) -> int:
+    """Get the number of pairs of sentences of different meanings, one of which hits the other in the cache."""
+    cache = SemanticCache(threshold=threshold)
+    for cached, _ in pairs:
+        cache.store(
+            "translate", cached, "English", "Español", stand_in_translation(cached)
+        )
+    return sum(
+        cache.lookup("translate", query, "English", "Español") is not None
+        for _, query in pairs
+    )
+
+
+def evaluate(threshold: float) -> tuple:
+    """Get the precision and the recall of the cache at a similarity threshold."""
+    rng = random.Random(0)
+    cache = SemanticCache(threshold=threshold)
+    for sentence in SENTENCES:
+        cache.store(
+            "translate", sentence, "English", "Español", stand_in_translation(sentence)
+        )
+    hits = correct_hits = positives = 0
+    for sentence in SENTENCES:
+        for variant, expected in near_duplicates(sentence, rng):
+            positives += 1
+            output = cache.lookup("translate", variant, "English", "Español")
+            hits += output is not None
+            correct_hits += output == expected
+        for variant in meaning_changes(sentence):
+            hits += cache.lookup("translate", variant, "English", "Español") is not None
+    for sentence in UNRELATED:
+        hits += cache.lookup("translate", sentence, "English", "Español") is not None
+    return (correct_hits / hits if hits else 1.0), correct_hits / positives
+
+
+def lookup_latency(entries: int, lookups: int = 200) -> tuple:
+    """Get the median and the 95th percentile lookup latency in milliseconds for a number of cached entries."""
+    rng = random.Random(0)
+    words = " ".join(SENTENCES).split()
+    cache = SemanticCache(max_entries_per_pair=entries)
+    for _ in range(entries):
+        text = " ".join(rng.choices(words, k=12))
+        cache.store("translate", text, "English", "Español", text)
+    latencies = []
+    for _ in range(lookups):
+        text = " ".join(rng.choices(words, k=12))
+        started_at = time.perf_counter()
+        cache.lookup("translate", text, "English", "Español")
+        latencies.append((time.perf_counter() - started_at) * 1000)
+    latencies.sort()
+    return latencies[len(latencies) // 2], latencies[int(0.95 * (len(latencies) - 1))]
+
+
+def main():
+    print("threshold  precision  recall  negation hits  antonym hits")
+    for threshold in (0.80, 0.85, 0.90, 0.92, 0.95, 0.98):
+        precision, recall = evaluate(threshold)
+        negation_hits = wrong_hits(threshold, NEGATION_PAIRS)
+        antonym_hits = wrong_hits(threshold, ANTONYM_PAIRS)
+        print(
+            f"{threshold:9.2f}  {precision:9.2f}  {recall:6.2f}"
+            f"  {negation_hits:6d}/{len(NEGATION_PAIRS):<6d}"
+            f"  {antonym_hits:5d}/{len(ANTONYM_PAIRS)}"
+        )
+    for entries in (1_000, 10_000, 50_000):
+        p50, p95 = lookup_latency(entries)
+        print(f"{entries} entries: lookup p50 {p50:.2f} ms, p95 {p95:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Render counts of the components of the Solara app.
+
+The page is rendered without a browser, and the number of times each component renders is counted for
+typical updates: typing in the text to translate, selecting the languages and the translation mode,
+receiving a translation, and showing a status message. Each component should only render for the updates
+of what it shows. Run it with `python benchmarks/solara_render_count.py`.
+"""
+
+import argparse
+import os
+import sys
+import time
+from collections import Counter
+
+SOURCE_DIRECTORY = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), os.pardir, "src")
+)
+sys.path.insert(0, SOURCE_DIRECTORY)
+
+import constants  # noqa: E402
+import solara  # noqa: E402
+import webapp  # noqa: E402
+from icecream import ic  # noqa: E402
+
+COMPONENTS = [
+    "Page",
+    "StatusMessage",
+    "LanguageSelects",
+    "TranslationModeSelect",
+    "TranslateButton",
+    "SourceTextInput",
+    "TranslatedOutput",
+]
+
+
+def count_renders(counts: Counter):
+    """Count the renders of the components of the page, by wrapping their render functions."""
+    for name in COMPONENTS:
+        component = getattr(webapp, name)
+        render = component.f
+
+        def counted(*args, _name=name, _render=render, **kwargs):
+            counts[_name] += 1
+            return _render(*args, **kwargs)
+
+        component.f = counted
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--keystrokes", type=int, default=100)
+    args = parser.parse_args()
+    ic.disable()
+
+    counts = Counter()
+    count_renders(counts)
+    started_at = time.perf_counter()
+    solara.render(webapp.Page(), handle_error=False)
+    print(f"First render in {1000 * (time.perf_counter() - started_at):.1f} ms.")
+
+    text = constants.SAMPLE_TEXT__ENGLISH_PLACEHOLDER
+    updates = [
+        (
+            f"{args.keystrokes} keystrokes",
+            lambda: [
+                webapp.set_text_to_translate(text[: i % len(text) + 1])
+                for i in range(args.keystrokes)
+            ],
+        ),
+        (
+            "Select the languages",
+            lambda: (
+                webapp.rc_language__translate_from.set(
+                    constants.LANGUAGES__SUPPORTED[0]
+                ),
+                webapp.rc_language__translate_to.set(constants.LANGUAGES__SUPPORTED[1]),
+            ),
+        ),
+        (
+            "Select the translation mode",
+            lambda: webapp.rc_settings__translation_mode.set(
+                constants.TRANSLATION_MODE__REFLECTIVE
+            ),
+        ),
+        (
+            "Receive a translation",
+            lambda: webapp.rc_text__translated.set(["Une traduction."]),
+        ),
+        (
+            "Show a status message",
+            lambda: webapp.show_status_message("Translation completed."),
+        ),
+    ]
+    print("| Update | " + " | ".join(COMPONENTS) + " | Time (ms) |")
+    print("|---|" + "---|" * (len(COMPONENTS) + 1))
+    for label, update in updates:
+        counts.clear()
+        started_at = time.perf_counter()
+        update()
+        elapsed = time.perf_counter() - started_at
+        print(
+            f"| {label} | "
+            + " | ".join(str(counts[name]) for name in COMPONENTS)
+            + f" | {1000 * elapsed:.1f} |"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Benchmark of the start-up time and the resident memory of the Solara and the Gradio entry points.
+
+Each entry point is loaded in a fresh Python process, the way a uvicorn worker would load it, and the
+time to import it and the peak resident set size of the process are reported. Run it with
+`python benchmarks/startup.py`.
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+SOURCE_DIRECTORY = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), os.pardir, "src")
+)
+
+# Loads an entry point by its file name, since the Gradio entry point is not an importable module name.
+LOADER = """
+import importlib.util, json, resource, sys, time
+started_at = time.perf_counter()
+spec = importlib.util.spec_from_file_location("entry_point", sys.argv[1])
+module = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(module)
+elapsed = time.perf_counter() - started_at
+print(json.dumps({
+    "seconds": elapsed,
+    "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "provider_modules": sorted(m for m in sys.modules if m.startswith("llama_index.llms.") and m.count(".") == 2),
+}))
+"""
+
+
+def measure(entry_point: str, repeat: int = 3) -> dict:
+    """Load an entry point in fresh processes and keep the fastest run."""
+    runs = []
+    for _ in range(repeat):
+        completed = subprocess.run(
+            [sys.executable, "-c", LOADER, os.path.join(SOURCE_DIRECTORY, entry_point)],
+            cwd=SOURCE_DIRECTORY,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        runs.append(json.loads(completed.stdout.strip().splitlines()[-1]))
+    return min(runs, key=lambda run: run["seconds"])
+
+
+def main():
+    for entry_point in ("webapp.py", "gradio-ui.py"):
+        result = measure(entry_point)
+        print(
+            f"{entry_point}: {result['seconds']:.2f} s, "
+            f"peak RSS {result['max_rss_mb']:.0f} MB, "
+            f"provider modules loaded: {', '.join(result['provider_modules']) or 'none'}"
+        )
+
+
+if __name__ == "__main__":
+    main()
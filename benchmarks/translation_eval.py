@@ -0,0 +1,198 @@
+"""
+Offline evaluation of the translation quality per unit of latency and cost.
+
+Every segment of a parallel corpus is translated with each system and translation mode in parallel, and the
+chrF and BLEU scores, the latency, and the language model calls and estimated tokens per segment are
+reported for each system, mode and language pair. A system is a language model provider configured by the
+environment variables, such as `Ollama`, or `replay:<log>` to serve the responses recorded in a log without
+any network access. Pass `--record <log>` to record the calls of the provider systems for later replay.
+
+Results are cached with `--cache <file>`, keyed by the system, the mode, the segment and the prompts, so that
+a rerun only translates what changed. By default, the bundled corpus is evaluated offline from the bundled
+log, which was recorded with the scripted stand-in system `scripted`: it answers from the reference
+translations, with a degraded single-call translation, so that the report shows the trade-off between the
+modes without a provider. Run it with `python benchmarks/translation_eval.py --help` for the options.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+from llama_index.core.llms import CompletionResponse, CustomLLM, LLMMetadata
+from llama_index.core.llms.callbacks import llm_completion_callback
+
+SOURCE_DIRECTORY = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), os.pardir, "src")
+)
+sys.path.insert(0, SOURCE_DIRECTORY)
+
+import constants  # noqa: E402
+from evaluation import (  # noqa: E402
+    evaluation_report,
+    format_report,
+    load_parallel_corpus,
+    run_evaluation,
+)
+from icecream import ic  # noqa: E402
+from providers import build_llm_from_environment  # noqa: E402
+from recording import RecordingLLM, ReplayLLM  # noqa: E402
+
+DATA_DIRECTORY = os.path.join(os.path.dirname(__file__), "data")
+DEFAULT_CORPUS = os.path.join(DATA_DIRECTORY, "parallel_corpus.jsonl")
+DEFAULT_LOG = os.path.join(DATA_DIRECTORY, "translation_eval_calls.jsonl.gz")
+
+
+class ScriptedLLM(CustomLLM):
+    """
+    A stand-in language model that answers each pipeline stage from the reference translations of a corpus,
+    after a delay proportional to the length of the prompt and the answer. Its single-call translation
+    drops every fourth word of the reference, and its improved and agentic translations are the reference.
+    """
+
+    corpus: list = []
+    seconds_per_thousand_characters: float = 0.05
+
+    @property
+    def metadata(self) -> LLMMetadata:
+        return LLMMetadata(model_name="scripted")
+
+    def _answer(self, prompt: str) -> str:
+        # The translator sets the language pair in the system prompt.
+        segment = max(
+            (
+                segment
+                for segment in self.corpus
+                if segment["source"] in prompt
+                and f"to {segment['target_language']}." in (self.system_prompt or "")
+            ),
+            key=lambda segment: len(segment["source"]),
+            default=None,
+        )
+        reference = segment["reference"] if segment else constants.EMPTY_STRING
+        if prompt.startswith("Some source text is provided below"):
+            return "1. [text]->[has]->[meaning]"
+        if "Assess the quality of the translation" in prompt:
+            return (
+                f"{constants.ASSESSMENT_VERDICT__INCOMPLETE}\nSome words are missing."
+            )
+        if "Using the improvement suggestions" in prompt:
+            return reference
+        if "In the process of translating" in prompt:
+            return f"Thought: I can answer without using any more tools.\nAnswer: {reference}"
+        words = reference.split()
+        if len(words) < 4:
+            # A text written without spaces between words loses every fourth character instead.
+            return "".join(
+                character for index, character in enumerate(reference) if index % 4 != 3
+            )
+        return " ".join(word for index, word in enumerate(words) if index % 4 != 3)
+
+    @llm_completion_callback()
+    def complete(
+        self, prompt: str, formatted: bool = False, **kwargs
+    ) -> CompletionResponse:
+        answer = self._answer(prompt)
+        time.sleep(
+            self.seconds_per_thousand_characters * (len(prompt) + len(answer)) / 1000
+        )
+        return CompletionResponse(text=answer)
+
+    @llm_completion_callback()
+    def stream_complete(self, prompt: str, formatted: bool = False, **kwargs):
+        yield self.complete(prompt, formatted=formatted, **kwargs)
+
+
+def system_factory(spec: str, corpus: list, record_path: str, replay_speed: float):
+    """Get the function that builds the language model of a system from its specification."""
+    if spec.startswith("replay:"):
+        return lambda: ReplayLLM(log_path=spec[len("replay:") :], speed=replay_speed)
+    if spec == "scripted":
+
+        def build():
+            return ScriptedLLM(corpus=corpus)
+    else:
+
+        def build():
+            return build_llm_from_environment(spec)
+
+    if record_path is None:
+        return build
+    return lambda: RecordingLLM(llm=build(), log_path=record_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n\n")[0])
+    parser.add_argument(
+        "--corpus", default=DEFAULT_CORPUS, help="The JSON Lines parallel corpus."
+    )
+    parser.add_argument(
+        "--system",
+        action="append",
+        help=f"A system to evaluate, as name=provider, name=replay:<log> or name=scripted. Defaults to replaying {os.path.relpath(DEFAULT_LOG)}.",
+    )
+    parser.add_argument(
+        "--modes",
+        default=",".join(
+            [
+                constants.TRANSLATION_MODE__SIMPLE,
+                constants.TRANSLATION_MODE__REFLECTIVE,
+                constants.TRANSLATION_MODE__AGENTIC,
+            ]
+        ),
+        help="The comma-separated translation modes.",
+    )
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--cache", help="The JSON Lines file of cached results.")
+    parser.add_argument(
+        "--record", help="The log in which to record the calls of the systems."
+    )
+    parser.add_argument(
+        "--replay-speed",
+        type=float,
+        default=1.0,
+        help="The factor by which replayed latencies are sped up, where 0 answers at once.",
+    )
+    parser.add_argument("--json", help="The file in which to write the report as JSON.")
+    args = parser.parse_args()
+
+    ic.disable()
+    corpus = load_parallel_corpus(args.corpus)
+    systems = {}
+    for system in args.system or [f"recorded=replay:{DEFAULT_LOG}"]:
+        name, _, spec = system.partition("=")
+        systems[name] = system_factory(
+            spec or name, corpus, args.record, args.replay_speed
+        )
+    modes = args.modes.split(",")
+
+    started_at = time.perf_counter()
+    translated = []
+    results = run_evaluation(
+        corpus,
+        systems,
+        modes,
+        max_workers=args.workers,
+        cache_path=args.cache,
+        on_result=translated.append,
+    )
+    rows = evaluation_report(results, corpus)
+    print(format_report(rows))
+    print(
+        f"\n{len(translated)} of {len(results)} translations made in {time.perf_counter() - started_at:.1f}s, the others were cached."
+    )
+    for result in translated:
+        if "error" in result:
+            print(
+                f"{result['system']} {result['mode']} #{result['index']}: {result['error']}"
+            )
+    if args.json:
+        with open(
+            args.json, "w", encoding=constants.CHAR_ENCODING__UTF8
+        ) as report_file:
+            json.dump(rows, report_file, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
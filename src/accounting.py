@@ -0,0 +1,502 @@
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from threading import Lock, local
+from typing import Dict, Iterator, Sequence, Tuple
+from llama_index.core.base.llms.types import (
+    ChatMessage,
+    ChatResponse,
+    CompletionResponse,
+)
+from llama_index.core.instrumentation import get_dispatcher
+from llama_index.core.instrumentation.event_handlers import BaseEventHandler
+from llama_index.core.instrumentation.events import BaseEvent
+from llama_index.core.instrumentation.events.llm import (
+    LLMChatEndEvent,
+    LLMChatStartEvent,
+)
+from llama_index.core.llms.llm import LLM
+from llama_index.core.utils import get_tokenizer
+
+import constants
+import os
+import time
+
+from metrics import METRICS
+from recording import token_usage
+
+# The usage account of the translation running in the current thread, which reaches the language model calls
+# made by the tools of the agent without passing it through the agent.
+_current_account: ContextVar["UsageAccount | None"] = ContextVar(
+    "usage_account", default=None
+)
+# The pipeline stage and the model of the agent step running in the current thread, whose chat calls are
+# accounted for from the instrumentation events of the language model, as the agent makes them itself.
+_agent_call: ContextVar[Tuple[str, str] | None] = ContextVar("agent_call", default=None)
+# The depth of the chat calls in flight in each thread, so that a call to a wrapped language model is
+# accounted for once.
+_chat_calls = local()
+
+
+def parse_llm_prices(value: str) -> Dict[str, Tuple[float, float]]:
+    """
+    Parse the prices of language models, each given as the model, the price of a million prompt tokens and
+    the price of a million completion tokens.
+
+    Args:
+        value (str): Comma-separated prices, such as "gpt-4o-mini:0.15:0.6,command-r:0.15:0.6".
+
+    Returns:
+        Dict[str, Tuple[float, float]]: The prices of a million prompt and completion tokens of each model.
+    """
+    prices = {}
+    for price in value.split(","):
+        if not price.strip():
+            continue
+        # Model names can contain colons, e.g., Ollama tags, so the prices are split off from the right.
+        model, prompt_price, completion_price = (
+            part.strip() for part in price.rsplit(":", 2)
+        )
+        prices[model] = (float(prompt_price), float(completion_price))
+    return prices
+
+
+def count_tokens(text: str) -> int:
+    """
+    Count the tokens of a text with the local tokenizer, for providers that do not report their usage.
+
+    Args:
+        text (str): The text.
+
+    Returns:
+        int: The number of tokens.
+    """
+    return len(get_tokenizer()(text))
+
+
+def model_of(llm: LLM) -> str:
+    """
+    Get the name of the model of a language model without asking its provider, looking through wrappers.
+
+    Args:
+        llm (LLM): The language model.
+
+    Returns:
+        str: The name of the model, or of the class of the language model if it has none.
+    """
+    while getattr(llm, "llm", None) is not None:
+        llm = llm.llm
+    return (
+        getattr(llm, "model", None)
+        or getattr(llm, "model_name", None)
+        or type(llm).__name__
+    )
+
+
+class UsageBudget:
+    """
+    The limits of the tokens and the cost of a request or of a tenant, where 0 means no limit. The budget is
+    checked between language model calls, so the call that crosses it completes.
+    """
+
+    def __init__(self, max_tokens: int = 0, max_cost: float = 0.0):
+        """
+        Initialise the budget.
+
+        Args:
+            max_tokens (int): The maximum number of prompt and completion tokens. Defaults to 0.
+            max_cost (float): The maximum cost. Defaults to 0.
+        """
+        self.max_tokens = max_tokens
+        self.max_cost = max_cost
+
+    def exceeded(self, tokens: int, cost: float) -> bool:
+        """Check whether a usage is over the budget."""
+        return (self.max_tokens > 0 and tokens >= self.max_tokens) or (
+            self.max_cost > 0 and cost >= self.max_cost
+        )
+
+
+class UsageAccount:
+    """
+    The tokens and the cost of the language model calls of a request, or of all the requests of a tenant.
+    Each call is also accounted for in the account of the tenant of the request.
+    """
+
+    def __init__(
+        self,
+        budget: UsageBudget = None,
+        parent: "UsageAccount" = None,
+        prices: Dict[str, Tuple[float, float]] = None,
+    ):
+        """
+        Initialise the account.
+
+        Args:
+            budget (UsageBudget): The budget of the account. Defaults to no limits.
+            parent (UsageAccount): The account of the tenant, if this is the account of a request. Defaults to None.
+            prices (Dict[str, Tuple[float, float]]): The prices of a million prompt and completion tokens of each model. Defaults to none, for no cost.
+        """
+        self.budget = budget or UsageBudget()
+        self._parent = parent
+        self._prices = prices or {}
+        self._lock = Lock()
+        self._calls = 0
+        self._estimated_calls = 0
+        self._prompt_tokens = 0
+        self._completion_tokens = 0
+        self._cost = 0.0
+        self.started_at = time.monotonic()
+        # Whether the translation fell back to a cheaper mode, so that it is not cached as a translation in its mode.
+        self.downgraded = False
+
+    def cost_of(self, model: str, prompt_tokens: int, completion_tokens: int) -> float:
+        """Get the cost of a call to a model, which is 0 if the model has no price."""
+        prompt_price, completion_price = self._prices.get(model, (0.0, 0.0))
+        return (
+            prompt_tokens * prompt_price + completion_tokens * completion_price
+        ) / 1e6
+
+    def record(
+        self,
+        prompt_tokens: int,
+        completion_tokens: int,
+        cost: float,
+        estimated: bool = False,
+    ):
+        """
+        Account for a language model call, in this account and that of the tenant.
+
+        Args:
+            prompt_tokens (int): The number of prompt tokens.
+            completion_tokens (int): The number of completion tokens.
+            cost (float): The cost of the call.
+            estimated (bool): Whether the tokens were counted locally, as the provider reported none. Defaults to False.
+        """
+        with self._lock:
+            self._calls += 1
+            self._estimated_calls += estimated
+            self._prompt_tokens += prompt_tokens
+            self._completion_tokens += completion_tokens
+            self._cost += cost
+        if self._parent is not None:
+            self._parent.record(prompt_tokens, completion_tokens, cost, estimated)
+
+    @property
+    def total_tokens(self) -> int:
+        """The number of prompt and completion tokens."""
+        with self._lock:
+            return self._prompt_tokens + self._completion_tokens
+
+    @property
+    def cost(self) -> float:
+        """The cost of the calls."""
+        with self._lock:
+            return self._cost
+
+    @property
+    def exceeded(self) -> bool:
+        """Whether this account, or that of the tenant, is over its budget."""
+        with self._lock:
+            exceeded = self.budget.exceeded(
+                self._prompt_tokens + self._completion_tokens, self._cost
+            )
+        return exceeded or (self._parent is not None and self._parent.exceeded)
+
+    def describe(self) -> str:
+        """Describe the usage, for a status message."""
+        cost = self.cost
+        return f"{self.total_tokens:,} tokens" + (
+            f" costing {cost:.4f}" if cost else ""
+        )
+
+    def summary(self) -> dict:
+        """
+        Summarise the usage.
+
+        Returns:
+            dict: The number of calls, of which those with locally counted tokens, the prompt, completion and total tokens, and the cost.
+        """
+        with self._lock:
+            return {
+                "calls": self._calls,
+                "estimated_calls": self._estimated_calls,
+                "prompt_tokens": self._prompt_tokens,
+                "completion_tokens": self._completion_tokens,
+                "total_tokens": self._prompt_tokens + self._completion_tokens,
+                "cost": self._cost,
+            }
+
+
+class UsageLedger:
+    """
+    The usage accounts of the tenants, e.g., the sessions of the apps, which are started afresh after a
+    period, and from which the accounts of their requests are started.
+    """
+
+    _shared: "UsageLedger | None" = None
+    _shared_lock = Lock()
+
+    def __init__(
+        self, prices: Dict[str, Tuple[float, float]] = None, max_tenants: int = 4096
+    ):
+        """
+        Initialise the ledger.
+
+        Args:
+            prices (Dict[str, Tuple[float, float]]): The prices of a million prompt and completion tokens of each model. Defaults to none, for no cost.
+            max_tenants (int): The maximum number of tenants whose accounts are kept, beyond which those used least recently are forgotten. Defaults to 4096.
+        """
+        self._prices = prices or {}
+        self._max_tenants = max_tenants
+        self._lock = Lock()
+        self._tenants: OrderedDict[str, UsageAccount] = OrderedDict()
+
+    @classmethod
+    def shared(cls) -> "UsageLedger":
+        """
+        Get the process-level ledger, with the prices of the language models in the environment variables.
+
+        Returns:
+            UsageLedger: The shared ledger.
+        """
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls(
+                    parse_llm_prices(
+                        os.getenv(
+                            constants.ENV_KEY__LLM_PRICES,
+                            constants.DEFAULT_VALUE__LLM_PRICES,
+                        )
+                    )
+                )
+            return cls._shared
+
+    def tenant_account(
+        self, tenant: str, budget: UsageBudget = None, period: float = 0.0
+    ) -> UsageAccount:
+        """
+        Get the account of a tenant, starting a new one if its period is over.
+
+        Args:
+            tenant (str): The tenant.
+            budget (UsageBudget): The budget of the tenant for each period. Defaults to no limits.
+            period (float): The time in seconds after which the account of the tenant starts afresh, where 0 means never. Defaults to 0.
+
+        Returns:
+            UsageAccount: The account of the tenant.
+        """
+        with self._lock:
+            account = self._tenants.get(tenant)
+            if account is None or (
+                period > 0 and time.monotonic() - account.started_at >= period
+            ):
+                account = UsageAccount(budget, prices=self._prices)
+                self._tenants[tenant] = account
+            else:
+                # The budget settings may have changed since the account was started.
+                account.budget = budget or UsageBudget()
+            self._tenants.move_to_end(tenant)
+            while len(self._tenants) > self._max_tenants:
+                self._tenants.popitem(last=False)
+            return account
+
+    def start(
+        self,
+        tenant: str,
+        budget: UsageBudget = None,
+        tenant_budget: UsageBudget = None,
+        period: float = 0.0,
+    ) -> UsageAccount:
+        """
+        Open the account of a new request of a tenant.
+
+        Args:
+            tenant (str): The tenant.
+            budget (UsageBudget): The budget of the request. Defaults to no limits.
+            tenant_budget (UsageBudget): The budget of the tenant for each period. Defaults to no limits.
+            period (float): The time in seconds after which the account of the tenant starts afresh, where 0 means never. Defaults to 0.
+
+        Returns:
+            UsageAccount: The account of the request.
+        """
+        return UsageAccount(
+            budget,
+            parent=self.tenant_account(tenant, tenant_budget, period),
+            prices=self._prices,
+        )
+
+    def finish(self, account: UsageAccount):
+        """
+        Record the usage of a finished request.
+
+        Args:
+            account (UsageAccount): The account of the request.
+        """
+        METRICS.observe(constants.METRIC__USAGE_REQUEST_TOKENS, account.total_tokens)
+        METRICS.observe(constants.METRIC__USAGE_REQUEST_COST, account.cost)
+
+
+def current_usage_account() -> UsageAccount | None:
+    """Get the usage account of the translation running in the current thread, if any."""
+    return _current_account.get()
+
+
+@contextmanager
+def usage_scope(account: UsageAccount | None) -> Iterator[None]:
+    """
+    Make a usage account that of the translation running in the current thread. Without an account, the
+    account of an enclosing scope, if any, is kept.
+
+    Args:
+        account (UsageAccount | None): The usage account.
+    """
+    if account is None:
+        yield
+        return
+    reset_account = _current_account.set(account)
+    try:
+        yield
+    finally:
+        _current_account.reset(reset_account)
+
+
+def usage_budget_exceeded() -> bool:
+    """Check whether the translation running in the current thread is over its budget, or its tenant is."""
+    account = _current_account.get()
+    return account is not None and account.exceeded
+
+
+def record_budget_downgrade():
+    """Record that the translation running in the current thread fell back to a cheaper mode, as its budget is spent."""
+    METRICS.increment(constants.METRIC__USAGE_BUDGET_DOWNGRADES)
+    account = _current_account.get()
+    if account is not None:
+        account.downgraded = True
+
+
+def record_tokens(
+    stage: str,
+    model: str,
+    prompt_tokens: int,
+    completion_tokens: int,
+    estimated: bool = False,
+):
+    """
+    Account for a language model call of a pipeline stage, in the metrics and in the account of the
+    translation running in the current thread, if any.
+
+    Args:
+        stage (str): The pipeline stage.
+        model (str): The model that was called.
+        prompt_tokens (int): The number of prompt tokens.
+        completion_tokens (int): The number of completion tokens.
+        estimated (bool): Whether the tokens were counted locally, as the provider reported none. Defaults to False.
+    """
+    METRICS.observe(
+        constants.METRIC__USAGE_PROMPT_TOKENS.format(stage=stage), prompt_tokens
+    )
+    METRICS.observe(
+        constants.METRIC__USAGE_COMPLETION_TOKENS.format(stage=stage),
+        completion_tokens,
+    )
+    if estimated:
+        METRICS.increment(constants.METRIC__USAGE_ESTIMATED_CALLS)
+    account = _current_account.get()
+    if account is None:
+        return
+    cost = account.cost_of(model, prompt_tokens, completion_tokens)
+    METRICS.observe(constants.METRIC__USAGE_COST.format(stage=stage), cost)
+    account.record(prompt_tokens, completion_tokens, cost, estimated)
+
+
+def response_usage(
+    prompt: str, response: CompletionResponse | ChatResponse
+) -> Tuple[int, int, bool]:
+    """
+    Get the token usage of a language model call, as reported by the provider, or counted locally.
+
+    Args:
+        prompt (str): The prompt, or the text of the messages, that was sent.
+        response (CompletionResponse | ChatResponse): The response, with its raw provider payload.
+
+    Returns:
+        Tuple[int, int, bool]: The prompt and completion tokens, and whether they were counted locally.
+    """
+    usage = token_usage(response)
+    if usage is not None:
+        return usage[0], usage[1], False
+    text = (
+        response.message.content
+        if isinstance(response, ChatResponse)
+        else response.text
+    )
+    return count_tokens(prompt), count_tokens(text or ""), True
+
+
+def record_usage(
+    stage: str,
+    model: str,
+    prompt: str,
+    response: CompletionResponse | ChatResponse,
+):
+    """
+    Account for a language model call of a pipeline stage, with the usage reported by the provider, or
+    with the tokens of the prompt and of the response counted locally.
+
+    Args:
+        stage (str): The pipeline stage.
+        model (str): The model that was called.
+        prompt (str): The prompt, or the text of the messages, that was sent.
+        response (CompletionResponse | ChatResponse): The response, with its raw provider payload.
+    """
+    prompt_tokens, completion_tokens, estimated = response_usage(prompt, response)
+    record_tokens(stage, model, prompt_tokens, completion_tokens, estimated=estimated)
+
+
+@contextmanager
+def agent_usage_scope(stage: str | None, model: str = None) -> Iterator[None]:
+    """
+    Account for the chat calls made in the current thread by an agent step, or, without a stage, for none,
+    e.g., while a tool of the agent accounts for its own calls.
+
+    Args:
+        stage (str | None): The pipeline stage of the agent.
+        model (str): The model of the agent. Defaults to None.
+    """
+    reset_call = _agent_call.set((stage, model) if stage is not None else None)
+    try:
+        yield
+    finally:
+        _agent_call.reset(reset_call)
+
+
+def _messages_text(messages: Sequence[ChatMessage]) -> str:
+    """Get the text of chat messages, to count their tokens."""
+    return "\n".join(message.content or "" for message in messages)
+
+
+class _AgentUsageHandler(BaseEventHandler):
+    """Accounts for the chat calls of agent steps, from the instrumentation events of the language models."""
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "AgentUsageHandler"
+
+    def handle(self, event: BaseEvent, **kwargs):
+        agent_call = _agent_call.get()
+        if agent_call is None:
+            return
+        depth = getattr(_chat_calls, "depth", 0)
+        if isinstance(event, LLMChatStartEvent):
+            _chat_calls.depth = depth + 1
+        elif isinstance(event, LLMChatEndEvent):
+            _chat_calls.depth = max(0, depth - 1)
+            # Only the outermost call is accounted for, when a language model wraps another one.
+            if depth <= 1 and event.response is not None:
+                record_usage(
+                    *agent_call, _messages_text(event.messages), event.response
+                )
+
+
+get_dispatcher().add_event_handler(_AgentUsageHandler())
@@ -0,0 +1,560 @@
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+from icecream import ic
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import Request
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+from typing import List, Tuple
+
+import asyncio
+import constants
+import json
+import os
+import providers
+
+from accounting import UsageAccount, UsageBudget, UsageLedger
+from cache import TranslationCache
+from cancellation import (
+    CancellationToken,
+    DeadlineExceededError,
+    TranslationCancelledError,
+)
+from endpoints import endpoint_statistics
+from language_detection import group_by_language
+from metrics import METRICS
+from pool import TranslatorPool
+from preprocessing import SegmentBatch
+from precompute import record_request, start_precompute_from_environment
+
+# A lean HTTP/JSON service for translations, without the session and component state of the web apps.
+# Run it with `uvicorn --app-dir src api:app`, or with the script `api.sh`.
+
+load_dotenv()
+
+translation_cache = TranslationCache.shared(
+    max_entries=int(
+        os.getenv(
+            constants.ENV_KEY__TRANSLATION_CACHE_SIZE,
+            constants.DEFAULT_VALUE__TRANSLATION_CACHE_SIZE,
+        )
+    )
+)
+translator_pool = TranslatorPool(
+    providers.build_translator_from_environment,
+    max_translators_per_pair=int(
+        os.getenv(
+            constants.ENV_KEY__API_TRANSLATORS_PER_PAIR,
+            constants.DEFAULT_VALUE__API_TRANSLATORS_PER_PAIR,
+        )
+    ),
+)
+max_batch_segments = int(
+    os.getenv(
+        constants.ENV_KEY__API_MAX_BATCH_SEGMENTS,
+        constants.DEFAULT_VALUE__API_MAX_BATCH_SEGMENTS,
+    )
+)
+batch_concurrency = int(
+    os.getenv(
+        constants.ENV_KEY__API_BATCH_CONCURRENCY,
+        constants.DEFAULT_VALUE__API_BATCH_CONCURRENCY,
+    )
+)
+default_translation_mode = os.getenv(
+    constants.ENV_KEY__TRANSLATION_MODE, constants.DEFAULT_VALUE__TRANSLATION_MODE
+)
+auto_mode_short_text_length = int(
+    os.getenv(
+        constants.ENV_KEY__AUTO_MODE_SHORT_TEXT_LENGTH,
+        constants.DEFAULT_VALUE__AUTO_MODE_SHORT_TEXT_LENGTH,
+    )
+)
+auto_mode_max_queue_depth = int(
+    os.getenv(
+        constants.ENV_KEY__AUTO_MODE_MAX_QUEUE_DEPTH,
+        constants.DEFAULT_VALUE__AUTO_MODE_MAX_QUEUE_DEPTH,
+    )
+)
+translation_deadline = float(
+    os.getenv(
+        constants.ENV_KEY__TRANSLATION_DEADLINE,
+        constants.DEFAULT_VALUE__TRANSLATION_DEADLINE,
+    )
+)
+segment_texts = (
+    os.getenv(
+        constants.ENV_KEY__SEGMENT_TEXTS, constants.DEFAULT_VALUE__SEGMENT_TEXTS
+    ).lower()
+    in constants.BOOLEAN_TRUE_VALUES
+)
+
+request_budget = UsageBudget(
+    int(
+        os.getenv(
+            constants.ENV_KEY__REQUEST_TOKEN_BUDGET,
+            constants.DEFAULT_VALUE__REQUEST_TOKEN_BUDGET,
+        )
+    ),
+    float(
+        os.getenv(
+            constants.ENV_KEY__REQUEST_COST_BUDGET,
+            constants.DEFAULT_VALUE__REQUEST_COST_BUDGET,
+        )
+    ),
+)
+tenant_budget = UsageBudget(
+    int(
+        os.getenv(
+            constants.ENV_KEY__TENANT_TOKEN_BUDGET,
+            constants.DEFAULT_VALUE__TENANT_TOKEN_BUDGET,
+        )
+    ),
+    float(
+        os.getenv(
+            constants.ENV_KEY__TENANT_COST_BUDGET,
+            constants.DEFAULT_VALUE__TENANT_COST_BUDGET,
+        )
+    ),
+)
+tenant_budget_period = float(
+    os.getenv(
+        constants.ENV_KEY__TENANT_BUDGET_PERIOD,
+        constants.DEFAULT_VALUE__TENANT_BUDGET_PERIOD,
+    )
+)
+
+# Translate likely requests into the cache in the background, if enabled.
+start_precompute_from_environment()
+
+
+def parse_translation_request(
+    body: dict, batch: bool = None
+) -> Tuple[str, str, List[str], str]:
+    """
+    Validate the body of a translation request.
+
+    Args:
+        body (dict): The decoded JSON body, with the target language, optionally the source language (which is detected for each text if it is missing), the text (or, for a batch, the texts) and, optionally, the translation mode.
+        batch (bool): Whether the request is for a batch of texts. Defaults to None, which accepts either.
+
+    Returns:
+        Tuple[str, str, List[str], str]: The source language, or the option to detect it, the target language, the texts and the translation mode.
+    """
+    if not isinstance(body, dict):
+        raise ValueError("The request body must be a JSON object.")
+    source_language = body.get("source_language", constants.LANGUAGE__DETECT)
+    target_language = body.get("target_language")
+    if source_language not in constants.LANGUAGES__SUPPORTED + [
+        constants.LANGUAGE__DETECT
+    ]:
+        raise ValueError(f"Unsupported language: {source_language}")
+    if target_language not in constants.LANGUAGES__SUPPORTED:
+        raise ValueError(f"Unsupported language: {target_language}")
+    if source_language == target_language:
+        raise ValueError("The source and the target languages must be different.")
+    mode = body.get("mode", default_translation_mode)
+    if mode not in constants.TRANSLATION_MODES__SUPPORTED:
+        raise ValueError(f"Unsupported translation mode: {mode}")
+    if batch is None:
+        batch = "texts" in body
+    texts = body.get("texts") if batch else [body.get("text")]
+    if (
+        not isinstance(texts, list)
+        or not texts
+        or not all(isinstance(text, str) and text.strip() for text in texts)
+    ):
+        raise ValueError("Every text to translate must be a non-empty string.")
+    if len(texts) > max_batch_segments:
+        raise ValueError(
+            f"A batch can have at most {max_batch_segments} texts, not {len(texts)}."
+        )
+    return source_language, target_language, texts, mode
+
+
+def translate_segment(
+    source_text: str,
+    source_language: str,
+    target_language: str,
+    mode: str,
+    usage_account: UsageAccount = None,
+    cancellation_token: CancellationToken = None,
+) -> Tuple[str, bool]:
+    """
+    Translate a text with a pooled translator, unless its translation is already cached.
+
+    Args:
+        source_text (str): The text to translate.
+        source_language (str): The source language of the text.
+        target_language (str): The target language to translate the text to.
+        mode (str): The translation mode.
+        usage_account (UsageAccount): The account of the token usage of the request. Defaults to None.
+        cancellation_token (CancellationToken): The token of the request, which stops the translation when it is cancelled or past its deadline. Defaults to None.
+
+    Returns:
+        Tuple[str, bool]: The translation, and whether it came from the cache.
+    """
+    if source_language == target_language:
+        # The detected language of the text is the target language, so there is nothing to translate.
+        return source_text, False
+    record_request(source_text, source_language, target_language, mode)
+    translation = translation_cache.get(
+        source_text, source_language, target_language, mode
+    )
+    if translation is not None:
+        return translation, True
+    with translator_pool.translator(source_language, target_language) as translator:
+        translation = translator.translate_in_mode(
+            source_text,
+            mode=mode,
+            short_text_length=auto_mode_short_text_length,
+            max_queue_depth=auto_mode_max_queue_depth,
+            cancellation_token=cancellation_token,
+            usage_account=usage_account,
+        )
+    if usage_account is None or not usage_account.downgraded:
+        translation_cache.put(
+            source_text, source_language, target_language, mode, translation
+        )
+    return translation, False
+
+
+def translate_segments(
+    source_texts: List[str],
+    source_languages: List[str],
+    target_language: str,
+    mode: str,
+    usage_account: UsageAccount = None,
+    cancellation_token: CancellationToken = None,
+) -> List[Tuple[str, bool]]:
+    """
+    Translate texts concurrently, translating repeated texts only once. The texts are submitted grouped by
+    their source language, so that those of the same language pair reuse pooled translators and are batched
+    together. If texts are segmented, each distinct sentence of the texts is translated once instead, and a
+    translation is cached if those of all its sentences are.
+    """
+    if segment_texts:
+        batch = SegmentBatch(source_texts, source_languages)
+        segment_translations = translate_segments_once(
+            batch.segments,
+            batch.segment_languages,
+            target_language,
+            mode,
+            usage_account,
+            cancellation_token,
+        )
+        translations = batch.expand(
+            [translation for translation, _ in segment_translations], target_language
+        )
+        return [
+            (
+                translation,
+                all(segment_translations[i][1] for i in batch.segment_indices(index)),
+            )
+            for index, translation in enumerate(translations)
+        ]
+    return translate_segments_once(
+        source_texts,
+        source_languages,
+        target_language,
+        mode,
+        usage_account,
+        cancellation_token,
+    )
+
+
+def translate_segments_once(
+    source_texts: List[str],
+    source_languages: List[str],
+    target_language: str,
+    mode: str,
+    usage_account: UsageAccount = None,
+    cancellation_token: CancellationToken = None,
+) -> List[Tuple[str, bool]]:
+    """Translate texts concurrently, grouped by their source language, translating repeated texts only once."""
+    unique_segments = list(dict.fromkeys(zip(source_texts, source_languages)))
+    unique_segments.sort(key=lambda segment: segment[1])
+    with ThreadPoolExecutor(max_workers=batch_concurrency) as executor:
+        translations = dict(
+            zip(
+                unique_segments,
+                executor.map(
+                    lambda segment: translate_segment(
+                        segment[0],
+                        segment[1],
+                        target_language,
+                        mode,
+                        usage_account,
+                        cancellation_token,
+                    ),
+                    unique_segments,
+                ),
+            )
+        )
+    return [translations[segment] for segment in zip(source_texts, source_languages)]
+
+
+def source_languages_of(source_texts: List[str], source_language: str) -> List[str]:
+    """Get the source language of each text, detecting it if it was not given."""
+    source_languages = [None] * len(source_texts)
+    for language, indices in group_by_language(source_texts, source_language).items():
+        for index in indices:
+            source_languages[index] = language
+    return source_languages
+
+
+async def read_translation_request(
+    request: Request, batch: bool = None
+) -> Tuple[str, str, List[str], str]:
+    """Read and validate the JSON body of a translation request."""
+    try:
+        body = await request.json()
+    except ValueError:
+        raise ValueError("The request body must be valid JSON.")
+    return parse_translation_request(body, batch)
+
+
+def start_usage_account(request: Request) -> UsageAccount:
+    """Start the usage account of a request, for the tenant given in its header, if any."""
+    return UsageLedger.shared().start(
+        request.headers.get(
+            constants.API_HEADER__TENANT, constants.USAGE_TENANT__DEFAULT
+        ),
+        budget=request_budget,
+        tenant_budget=tenant_budget,
+        period=tenant_budget_period,
+    )
+
+
+def start_cancellation_token() -> CancellationToken:
+    """Start the cancellation token of a request, with the deadline of a translation, if any."""
+    return CancellationToken(translation_deadline)
+
+
+async def cancel_on_disconnect(request: Request, cancellation_token: CancellationToken):
+    """Cancel the translations of a request when its client disconnects, until this task is cancelled."""
+    while not await request.is_disconnected():
+        await asyncio.sleep(constants.CANCELLATION__POLL_INTERVAL)
+    ic("The client disconnected, so its translations are cancelled.")
+    cancellation_token.cancel(constants.CANCELLATION_REASON__DISCONNECTED)
+
+
+async def run_translation(
+    request: Request, cancellation_token: CancellationToken, *args
+) -> List[Tuple[str, bool]]:
+    """
+    Translate texts in the thread pool, cancelling the translation if the client of the request disconnects
+    before it completes.
+
+    Args:
+        request (Request): The request.
+        cancellation_token (CancellationToken): The token of the request.
+        *args: The arguments of `translate_segments`, apart from the cancellation token.
+
+    Returns:
+        List[Tuple[str, bool]]: The translation of each text, and whether it came from the cache.
+    """
+    watcher = asyncio.ensure_future(cancel_on_disconnect(request, cancellation_token))
+    try:
+        return await run_in_threadpool(translate_segments, *args, cancellation_token)
+    except asyncio.CancelledError:
+        # The server gave up on the request, but the thread that translates would carry on.
+        cancellation_token.cancel(constants.CANCELLATION_REASON__DISCONNECTED)
+        raise
+    finally:
+        watcher.cancel()
+
+
+def error_response(message: str, status_code: int) -> JSONResponse:
+    """Build the JSON response for a failed request."""
+    return JSONResponse({"error": message}, status_code=status_code)
+
+
+def cancelled_response(error: TranslationCancelledError) -> JSONResponse:
+    """Build the JSON response for a request whose translation was cancelled or exceeded its deadline."""
+    # 499 is the status of requests closed by their client, which does not receive the response anyway.
+    return error_response(
+        str(error), 504 if isinstance(error, DeadlineExceededError) else 499
+    )
+
+
+async def translate(request: Request) -> JSONResponse:
+    """Translate one text."""
+    try:
+        source_language, target_language, texts, mode = await read_translation_request(
+            request, batch=False
+        )
+        (source_language,) = source_languages_of(texts, source_language)
+    except ValueError as e:
+        return error_response(str(e), 400)
+    usage_account = start_usage_account(request)
+    try:
+        ((translation, cached),) = await run_translation(
+            request,
+            start_cancellation_token(),
+            texts,
+            [source_language],
+            target_language,
+            mode,
+            usage_account,
+        )
+    except TranslationCancelledError as e:
+        return cancelled_response(e)
+    except Exception as e:
+        ic(f"Error while translating. {str(e)}")
+        return error_response(f"An error occurred while translating. {str(e)}", 500)
+    finally:
+        UsageLedger.shared().finish(usage_account)
+    return JSONResponse(
+        {
+            "translation": translation,
+            "source_language": source_language,
+            "mode": mode,
+            "cached": cached,
+            "usage": usage_account.summary(),
+        }
+    )
+
+
+async def translate_batch(request: Request) -> JSONResponse:
+    """Translate a batch of texts, returning the translations in the same order."""
+    try:
+        source_language, target_language, texts, mode = await read_translation_request(
+            request, batch=True
+        )
+        source_languages = source_languages_of(texts, source_language)
+    except ValueError as e:
+        return error_response(str(e), 400)
+    usage_account = start_usage_account(request)
+    try:
+        results = await run_translation(
+            request,
+            start_cancellation_token(),
+            texts,
+            source_languages,
+            target_language,
+            mode,
+            usage_account,
+        )
+    except TranslationCancelledError as e:
+        return cancelled_response(e)
+    except Exception as e:
+        ic(f"Error while translating a batch. {str(e)}")
+        return error_response(f"An error occurred while translating. {str(e)}", 500)
+    finally:
+        UsageLedger.shared().finish(usage_account)
+    return JSONResponse(
+        {
+            "translations": [translation for translation, _ in results],
+            "source_languages": source_languages,
+            "mode": mode,
+            "cached": sum(cached for _, cached in results),
+            "usage": usage_account.summary(),
+        }
+    )
+
+
+def server_sent_event(event: str, data: dict) -> str:
+    """Format a server-sent event."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def translate_stream(request: Request):
+    """
+    Translate one text or a batch of texts, streaming each translation as a server-sent event as soon as it
+    is ready, followed by a final `done` event. The translations still running are cancelled when the
+    client goes away.
+    """
+    try:
+        source_language, target_language, texts, mode = await read_translation_request(
+            request
+        )
+        source_languages = source_languages_of(texts, source_language)
+    except ValueError as e:
+        return error_response(str(e), 400)
+
+    usage_account = start_usage_account(request)
+    cancellation_token = start_cancellation_token()
+
+    async def events():
+        semaphore = asyncio.Semaphore(batch_concurrency)
+
+        async def run(index: int, source_text: str) -> str:
+            async with semaphore:
+                try:
+                    ((translation, cached),) = await run_in_threadpool(
+                        translate_segments,
+                        [source_text],
+                        [source_languages[index]],
+                        target_language,
+                        mode,
+                        usage_account,
+                        cancellation_token,
+                    )
+                except Exception as e:
+                    ic(f"Error while translating. {str(e)}")
+                    return server_sent_event("error", {"index": index, "error": str(e)})
+            return server_sent_event(
+                "translation",
+                {
+                    "index": index,
+                    "translation": translation,
+                    "source_language": source_languages[index],
+                    "cached": cached,
+                },
+            )
+
+        watcher = asyncio.ensure_future(
+            cancel_on_disconnect(request, cancellation_token)
+        )
+        completed = False
+        try:
+            for event in asyncio.as_completed(
+                [run(index, source_text) for index, source_text in enumerate(texts)]
+            ):
+                yield await event
+            completed = True
+        finally:
+            watcher.cancel()
+            if not completed:
+                # The stream was closed early, as its client went away.
+                cancellation_token.cancel(constants.CANCELLATION_REASON__DISCONNECTED)
+            UsageLedger.shared().finish(usage_account)
+        yield server_sent_event(
+            "done",
+            {"count": len(texts), "mode": mode, "usage": usage_account.summary()},
+        )
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache"},
+    )
+
+
+async def health(request: Request) -> JSONResponse:
+    """Report that the service is up."""
+    return JSONResponse({"status": "ok"})
+
+
+async def metrics(request: Request) -> JSONResponse:
+    """Report the metrics of this process, including those of the cache and of the pooled provider servers."""
+    return JSONResponse(
+        {
+            "cache_entries": len(translation_cache),
+            "endpoints": endpoint_statistics(),
+            **METRICS.summary(),
+        }
+    )
+
+
+app = Starlette(
+    routes=[
+        Route("/translate", translate, methods=["POST"]),
+        Route("/translate/batch", translate_batch, methods=["POST"]),
+        Route("/translate/stream", translate_stream, methods=["POST"]),
+        Route("/health", health, methods=["GET"]),
+        Route("/metrics", metrics, methods=["GET"]),
+    ]
+)
@@ -0,0 +1,372 @@
+import re
+import time
+from threading import Event, Lock
+from typing import Callable, Dict, List, Tuple
+
+from llama_index.core.base.llms.types import CompletionResponse
+from llama_index.core.llms.llm import LLM
+
+import constants
+from accounting import response_usage
+from cancellation import TranslationCancelledError, current_cancellation_token
+from metrics import METRICS
+from glossary import format_glossary
+from prompts import format_prompt
+
+# How often a follower waiting for its batch checks whether its own translation was cancelled.
+_FOLLOWER_POLL_SECONDS = 0.1
+
+# A translated segment, with its share of the prompt and completion tokens of the language model call that
+# translated it, and whether those were counted locally.
+BatchedTranslation = Tuple[str, int, int, bool]
+
+
+class _PendingBatch:
+    """The segments of one language pair collected during a batching window."""
+
+    def __init__(self):
+        self.segments: List[str] = []
+        self.enqueued_at: List[float] = []
+        self.characters = 0
+        self.glossary_entries: List[Tuple[str, str]] = []
+        self.results: List[BatchedTranslation] = []
+        self.error: Exception = None
+        self.full = Event()
+        self.done = Event()
+
+
+class TranslationBatcher:
+    """
+    Collects concurrent translation requests for the same language pair over a short window and sends
+    them to the language model as one multi-segment prompt, with numbered outputs that are split back
+    out per caller. This amortises the per-request overhead of the provider over many short texts.
+
+    The first caller of a batch, its leader, makes the call with the completion function of its own
+    translator, so that the call has the system prompt of the language pair of the batch and goes through
+    the resilient caller of the translator. The other callers wait for the leader, for a bounded time and
+    while their own translations are not cancelled, and otherwise translate their texts on their own.
+    """
+
+    _shared: Dict[Tuple, "TranslationBatcher"] = {}
+    _shared_lock = Lock()
+
+    def __init__(
+        self,
+        llm: LLM,
+        window: float = 0.05,
+        max_batch_size: int = 8,
+        max_batch_characters: int = 4000,
+        max_wait: float = 120.0,
+    ):
+        """
+        Initialise the batcher.
+
+        Args:
+            llm (LLM): The language model that the batched prompts are sent to, which identifies the batcher.
+            window (float): The time in seconds to wait for more segments after the first one arrives. Defaults to 0.05.
+            max_batch_size (int): The maximum number of segments in a batch. Defaults to 8.
+            max_batch_characters (int): The maximum number of source characters in a batch. Defaults to 4000.
+            max_wait (float): The time in seconds that a caller waits for the call of the leader of its batch, after the window, before translating its text on its own. Defaults to 120.
+        """
+        self._llm = llm
+        self._window = window
+        self._max_batch_size = max_batch_size
+        self._max_batch_characters = max_batch_characters
+        self._max_wait = max_wait
+        self._lock = Lock()
+        self._open_batches: Dict[Tuple[str, str], _PendingBatch] = {}
+
+    @classmethod
+    def shared(
+        cls,
+        llm: LLM,
+        window: float = 0.05,
+        max_batch_size: int = 8,
+        max_batch_characters: int = 4000,
+        max_wait: float = 120.0,
+    ) -> "TranslationBatcher":
+        """
+        Get a process-level batcher for a language model configuration, so that requests from different
+        sessions using the same provider and model are batched together.
+
+        Args:
+            llm (LLM): The language model that the batched prompts are sent to.
+            window (float): The time in seconds to wait for more segments after the first one arrives. Defaults to 0.05.
+            max_batch_size (int): The maximum number of segments in a batch. Defaults to 8.
+            max_batch_characters (int): The maximum number of source characters in a batch. Defaults to 4000.
+            max_wait (float): The time in seconds that a caller waits for the leader of its batch. Defaults to 120.
+
+        Returns:
+            TranslationBatcher: The shared batcher.
+        """
+        key = (
+            llm.class_name(),
+            llm.metadata.model_name,
+            str(getattr(llm, "base_url", None) or getattr(llm, "url", None)),
+            str(getattr(llm, "api_key", None)),
+            getattr(llm, "temperature", None),
+            window,
+            max_batch_size,
+            max_batch_characters,
+            max_wait,
+        )
+        with cls._shared_lock:
+            if key not in cls._shared:
+                cls._shared[key] = cls(
+                    llm, window, max_batch_size, max_batch_characters, max_wait
+                )
+            return cls._shared[key]
+
+    def translate(
+        self,
+        source_text: str,
+        source_language: str,
+        target_language: str,
+        complete: Callable[[str], CompletionResponse],
+        glossary_entries: List[Tuple[str, str]] = None,
+    ) -> BatchedTranslation:
+        """
+        Translate a text, possibly together with other texts submitted concurrently for the same language pair.
+
+        Args:
+            source_text (str): The text to translate.
+            source_language (str): The source language of the text.
+            target_language (str): The target language to translate the text to.
+            complete (Callable[[str], CompletionResponse]): Completes a prompt with the language model of the translator of the caller, for the language pair, without accounting for its usage.
+            glossary_entries (List[Tuple[str, str]]): The mandated translations of terms in the text. Defaults to None.
+
+        Returns:
+            BatchedTranslation: The translated text, with its share of the token usage of the call that translated it.
+
+        Raises:
+            TranslationCancelledError: If the translation of the caller is cancelled.
+        """
+        key = (source_language, target_language)
+        with self._lock:
+            batch = self._open_batches.get(key)
+            is_leader = batch is None
+            if is_leader:
+                batch = _PendingBatch()
+                self._open_batches[key] = batch
+            index = len(batch.segments)
+            batch.segments.append(source_text)
+            batch.enqueued_at.append(time.perf_counter())
+            batch.characters += len(source_text)
+            batch.glossary_entries.extend(glossary_entries or [])
+            if (
+                len(batch.segments) >= self._max_batch_size
+                or batch.characters >= self._max_batch_characters
+            ):
+                # Seal the batch so that no more segments are added to it.
+                del self._open_batches[key]
+                batch.full.set()
+
+        if is_leader:
+            batch.full.wait(self._window)
+            with self._lock:
+                if self._open_batches.get(key) is batch:
+                    del self._open_batches[key]
+            try:
+                batch.results = self._run_batch(
+                    batch.segments,
+                    source_language,
+                    target_language,
+                    complete,
+                    format_glossary(
+                        list(dict.fromkeys(batch.glossary_entries)),
+                        source_language,
+                        target_language,
+                    ),
+                )
+            except Exception as e:
+                batch.error = e
+            finally:
+                now = time.perf_counter()
+                for enqueued_at in batch.enqueued_at:
+                    METRICS.observe(
+                        constants.METRIC__BATCH_SEGMENT_WAIT, now - enqueued_at
+                    )
+                batch.done.set()
+        elif not self._wait_for(batch) or isinstance(
+            batch.error, TranslationCancelledError
+        ):
+            # The leader is stuck, or its own translation was cancelled, which must not fail this one.
+            METRICS.increment(constants.METRIC__BATCH_FOLLOWER_FALLBACKS)
+            return self._translate_one(
+                source_text,
+                source_language,
+                target_language,
+                complete,
+                format_glossary(
+                    glossary_entries or [], source_language, target_language
+                ),
+            )
+
+        if batch.error is not None:
+            raise batch.error
+        return batch.results[index]
+
+    def _wait_for(self, batch: _PendingBatch) -> bool:
+        """
+        Wait for the leader of a batch to finish it, for at most the window and the maximum wait, and for as
+        long as the translation running in the current thread is not cancelled.
+
+        Returns:
+            bool: Whether the batch is finished.
+
+        Raises:
+            TranslationCancelledError: If the translation running in the current thread is cancelled.
+        """
+        token = current_cancellation_token()
+        wait_until = time.monotonic() + self._window + self._max_wait
+        while True:
+            remaining = wait_until - time.monotonic()
+            if remaining <= 0:
+                return batch.done.is_set()
+            if batch.done.wait(
+                remaining if token is None else min(remaining, _FOLLOWER_POLL_SECONDS)
+            ):
+                return True
+            if token is not None:
+                token.raise_if_cancelled(constants.STAGE__TRANSLATE)
+
+    def _run_batch(
+        self,
+        segments: List[str],
+        source_language: str,
+        target_language: str,
+        complete: Callable[[str], CompletionResponse],
+        glossary: str = constants.EMPTY_STRING,
+    ) -> List[BatchedTranslation]:
+        """
+        Translate a sealed batch of segments with one language model call, if possible. The token usage of
+        the call is shared out between the segments in proportion to their lengths.
+
+        Args:
+            segments (List[str]): The texts to translate.
+            source_language (str): The source language of the texts.
+            target_language (str): The target language to translate the texts to.
+            complete (Callable[[str], CompletionResponse]): Completes a prompt with the language model of the leader of the batch.
+            glossary (str): The glossary section of the prompt for the terms in the segments. Defaults to an empty string.
+
+        Returns:
+            List[BatchedTranslation]: The translated texts, with their shares of the token usage, in the same order as the segments.
+        """
+        started_at = time.perf_counter()
+        METRICS.observe(constants.METRIC__BATCH_SIZE, len(segments))
+        if len(segments) == 1:
+            results = [
+                self._translate_one(
+                    segments[0], source_language, target_language, complete, glossary
+                )
+            ]
+        else:
+            batch_prompt = format_prompt(
+                constants.PROMPT__TRANSLATE_BATCH_PREFIX,
+                constants.PROMPT__TRANSLATE_BATCH_SUFFIX,
+                source_language,
+                target_language,
+                glossary=glossary,
+                segment_count=len(segments),
+                source_segments="\n".join(
+                    f"{constants.BATCH_SEGMENT_MARKER.format(index=i + 1)} {segment}"
+                    for i, segment in enumerate(segments)
+                ),
+            )
+            response = complete(batch_prompt)
+            translations = self._split_batch_response(response.text, len(segments))
+            if translations is None:
+                # The model did not respect the numbered output format, so translate each segment on its own.
+                METRICS.increment(constants.METRIC__BATCH_FALLBACKS)
+                results = [
+                    self._translate_one(
+                        segment, source_language, target_language, complete, glossary
+                    )
+                    for segment in segments
+                ]
+            else:
+                prompt_tokens, completion_tokens, estimated = response_usage(
+                    batch_prompt, response
+                )
+                characters = sum(len(segment) for segment in segments) or 1
+                results = [
+                    (
+                        translation,
+                        round(prompt_tokens * len(segment) / characters),
+                        round(completion_tokens * len(segment) / characters),
+                        estimated,
+                    )
+                    for segment, translation in zip(segments, translations)
+                ]
+        METRICS.observe(
+            constants.METRIC__BATCH_LATENCY, time.perf_counter() - started_at
+        )
+        return results
+
+    def _translate_one(
+        self,
+        source_text: str,
+        source_language: str,
+        target_language: str,
+        complete: Callable[[str], CompletionResponse],
+        glossary: str = constants.EMPTY_STRING,
+    ) -> BatchedTranslation:
+        """Translate a single segment with its own language model call."""
+        simple_translation_prompt = format_prompt(
+            constants.PROMPT__TRANSLATE_SIMPLE_PREFIX,
+            constants.PROMPT__TRANSLATE_SIMPLE_SUFFIX,
+            source_language,
+            target_language,
+            glossary=glossary,
+            source_text=source_text,
+        )
+        response = complete(simple_translation_prompt)
+        return (response.text, *response_usage(simple_translation_prompt, response))
+
+    @staticmethod
+    def _split_batch_response(response_text: str, segment_count: int) -> List[str]:
+        """
+        Split a multi-segment response into its numbered translations.
+
+        Args:
+            response_text (str): The text of the language model response.
+            segment_count (int): The number of segments that were sent.
+
+        Returns:
+            List[str]: The translations in order, or None if the response does not contain every numbered segment exactly once.
+        """
+        parts = re.split(
+            constants.BATCH_SEGMENT_MARKER_PATTERN, response_text, flags=re.MULTILINE
+        )
+        # re.split yields the text before the first marker followed by alternating (number, text) pairs.
+        translations = {}
+        for number, text in zip(parts[1::2], parts[2::2]):
+            if number in translations:
+                return None
+            translations[number] = text.strip()
+        expected = [str(i + 1) for i in range(segment_count)]
+        if sorted(translations.keys()) != sorted(expected):
+            return None
+        return [translations[number] for number in expected]
+
+    def statistics(self) -> dict:
+        """
+        Summarise the batch-size and latency trade-off observed so far.
+
+        Returns:
+            dict: The summaries of batch sizes, batch latencies, per-segment waiting times, and the numbers of fallbacks of batches and of their followers.
+        """
+        summary = METRICS.summary()
+        return {
+            "batch_size": summary["observations"].get(constants.METRIC__BATCH_SIZE),
+            "batch_latency": summary["observations"].get(
+                constants.METRIC__BATCH_LATENCY
+            ),
+            "segment_wait": summary["observations"].get(
+                constants.METRIC__BATCH_SEGMENT_WAIT
+            ),
+            "fallbacks": summary["counters"].get(constants.METRIC__BATCH_FALLBACKS, 0),
+            "follower_fallbacks": summary["counters"].get(
+                constants.METRIC__BATCH_FOLLOWER_FALLBACKS, 0
+            ),
+        }
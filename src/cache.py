@@ -0,0 +1,117 @@
+from collections import OrderedDict
+from threading import Lock
+from typing import Dict, Tuple
+
+import constants
+from metrics import METRICS
+
+
+class TranslationCache:
+    """
+    A thread-safe, in-process cache of finished translations, keyed by the language pair, the translation
+    mode and the source text, which evicts the least recently used translation when it is full.
+    """
+
+    _shared: Dict[int, "TranslationCache"] = {}
+    _shared_lock = Lock()
+
+    def __init__(self, max_entries: int = 1024):
+        """
+        Initialise the cache.
+
+        Args:
+            max_entries (int): The maximum number of translations to keep. Defaults to 1024, and 0 disables the cache.
+        """
+        self._max_entries = max_entries
+        self._lock = Lock()
+        self._entries: OrderedDict[Tuple[str, str, str, str], str] = OrderedDict()
+
+    @classmethod
+    def shared(cls, max_entries: int = 1024) -> "TranslationCache":
+        """
+        Get a process-level cache for a size, so that the translations are shared by every request.
+
+        Args:
+            max_entries (int): The maximum number of translations to keep. Defaults to 1024.
+
+        Returns:
+            TranslationCache: The shared cache.
+        """
+        with cls._shared_lock:
+            if max_entries not in cls._shared:
+                cls._shared[max_entries] = cls(max_entries)
+            return cls._shared[max_entries]
+
+    @staticmethod
+    def key(
+        source_text: str, source_language: str, target_language: str, mode: str
+    ) -> Tuple[str, str, str, str]:
+        """Get the cache key of a translation request, ignoring surrounding whitespace in the source text."""
+        return (source_language, target_language, mode, source_text.strip())
+
+    def get(
+        self, source_text: str, source_language: str, target_language: str, mode: str
+    ) -> str | None:
+        """
+        Get a cached translation.
+
+        Args:
+            source_text (str): The text to translate.
+            source_language (str): The source language of the text.
+            target_language (str): The target language to translate the text to.
+            mode (str): The translation mode.
+
+        Returns:
+            str | None: The cached translation, or None if the translation is not cached.
+        """
+        key = self.key(source_text, source_language, target_language, mode)
+        with self._lock:
+            translation = self._entries.get(key)
+            if translation is not None:
+                self._entries.move_to_end(key)
+        METRICS.increment(
+            constants.METRIC__CACHE_HITS
+            if translation is not None
+            else constants.METRIC__CACHE_MISSES
+        )
+        return translation
+
+    def contains(
+        self, source_text: str, source_language: str, target_language: str, mode: str
+    ) -> bool:
+        """Check whether a translation is cached, without counting a hit or a miss."""
+        key = self.key(source_text, source_language, target_language, mode)
+        with self._lock:
+            return key in self._entries
+
+    def put(
+        self,
+        source_text: str,
+        source_language: str,
+        target_language: str,
+        mode: str,
+        translation: str,
+    ):
+        """
+        Cache a translation.
+
+        Args:
+            source_text (str): The translated text.
+            source_language (str): The source language of the text.
+            target_language (str): The target language of the translation.
+            mode (str): The translation mode.
+            translation (str): The translation.
+        """
+        if self._max_entries <= 0:
+            return
+        key = self.key(source_text, source_language, target_language, mode)
+        with self._lock:
+            self._entries[key] = translation
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+                METRICS.increment(constants.METRIC__CACHE_EVICTIONS)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
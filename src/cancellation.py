@@ -0,0 +1,256 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from threading import Event, Lock
+from typing import Dict, Iterator, List
+
+import constants
+import time
+
+from metrics import METRICS
+
+# The cancellation token of the translation running in the current thread, which reaches the language
+# model calls made by the tools of the agent without passing it through the agent.
+_current_token: ContextVar["CancellationToken | None"] = ContextVar(
+    "cancellation_token", default=None
+)
+
+
+class TranslationCancelledError(Exception):
+    """Raised when a translation is cancelled, instead of making its remaining language model calls."""
+
+
+class DeadlineExceededError(TranslationCancelledError):
+    """Raised when a translation exceeds its deadline, instead of making its remaining language model calls."""
+
+
+class CancellationToken:
+    """
+    A cooperative cancellation of a translation, by a request to stop it or by its deadline. The translation
+    checks the token before each language model call, and the resilient caller abandons a call in flight
+    when the token is cancelled, so that abandoned work stops within one pipeline stage.
+    """
+
+    def __init__(self, deadline: float = 0.0, parent: "CancellationToken" = None):
+        """
+        Initialise the token.
+
+        Args:
+            deadline (float): The time in seconds allowed for the translation, where 0 means no deadline. Defaults to 0.
+            parent (CancellationToken): The token of an enclosing translation, whose cancellation and deadline also apply to this one, e.g., to race it with others. Defaults to None.
+        """
+        self._event = Event()
+        self._lock = Lock()
+        self._deadline = time.monotonic() + deadline if deadline > 0 else None
+        self._reason: str | None = None
+        self._recorded = False
+        self._children: List[CancellationToken] = []
+        self._parent = parent
+        if parent is not None:
+            if parent._deadline is not None:
+                self._deadline = min(
+                    self._deadline or parent._deadline, parent._deadline
+                )
+            parent._adopt(self)
+
+    def _adopt(self, child: "CancellationToken"):
+        """Cancel a child token with this one, or at once if this one is already cancelled."""
+        with self._lock:
+            if not self._event.is_set():
+                self._children.append(child)
+                return
+        child.cancel(self._reason)
+
+    def cancel(self, reason: str = constants.CANCELLATION_REASON__STOPPED):
+        """
+        Cancel the translation, and those of the child tokens.
+
+        Args:
+            reason (str): Why the translation is cancelled. Defaults to a request to stop it.
+        """
+        with self._lock:
+            if self._event.is_set():
+                return
+            self._reason = reason
+            self._event.set()
+            children = self._children
+            self._children = []
+        for child in children:
+            child.cancel(reason)
+
+    @property
+    def cancelled(self) -> bool:
+        """Whether the translation is cancelled, or past its deadline."""
+        return self._event.is_set() or (
+            self._deadline is not None and time.monotonic() >= self._deadline
+        )
+
+    @property
+    def reason(self) -> str | None:
+        """Why the translation is cancelled, or None if it is not."""
+        if self._event.is_set():
+            return self._reason
+        return constants.CANCELLATION_REASON__DEADLINE if self.cancelled else None
+
+    def remaining(self) -> float | None:
+        """Get the time in seconds left before the deadline, or None if there is no deadline."""
+        if self._deadline is None:
+            return None
+        return max(0.0, self._deadline - time.monotonic())
+
+    def wait(self, timeout: float) -> bool:
+        """
+        Wait until the translation is cancelled, at most for a time.
+
+        Args:
+            timeout (float): The longest time in seconds to wait.
+
+        Returns:
+            bool: Whether the translation is cancelled.
+        """
+        remaining = self.remaining()
+        self._event.wait(timeout if remaining is None else min(timeout, remaining))
+        return self.cancelled
+
+    def raise_if_cancelled(self, stage: str):
+        """
+        Stop the translation before a pipeline stage if it is cancelled. The first time, the cancellation is
+        recorded with the stage that did not run and its median latency, a lower bound of the time saved,
+        unless the parent token is cancelled too, which records it instead.
+
+        Args:
+            stage (str): The pipeline stage about to run.
+
+        Raises:
+            TranslationCancelledError: If the translation is cancelled.
+            DeadlineExceededError: If the translation is past its deadline.
+        """
+        if not self.cancelled:
+            return
+        reason = self.reason
+        if not self._recorded and (self._parent is None or not self._parent.cancelled):
+            self._recorded = True
+            METRICS.increment(constants.METRIC__CANCELLATIONS.format(reason=reason))
+            METRICS.increment(constants.METRIC__CANCELLED_STAGES.format(stage=stage))
+            saved_seconds = METRICS.percentile(
+                constants.METRIC__STAGE_LATENCY.format(stage=stage), 50
+            )
+            if saved_seconds is not None:
+                METRICS.observe(
+                    constants.METRIC__CANCELLATION_SAVED_SECONDS, saved_seconds
+                )
+        if reason == constants.CANCELLATION_REASON__DEADLINE:
+            raise DeadlineExceededError("The translation exceeded its deadline.")
+        raise TranslationCancelledError(f"The translation was cancelled: {reason}.")
+
+
+def current_cancellation_token() -> CancellationToken | None:
+    """Get the cancellation token of the translation running in the current thread, if any."""
+    return _current_token.get()
+
+
+@contextmanager
+def cancellation_scope(token: CancellationToken | None) -> Iterator[None]:
+    """
+    Make a cancellation token that of the translation running in the current thread. Without a token, the
+    token of an enclosing scope, if any, is kept.
+
+    Args:
+        token (CancellationToken | None): The cancellation token.
+    """
+    if token is None:
+        yield
+        return
+    reset_token = _current_token.set(token)
+    try:
+        yield
+    finally:
+        _current_token.reset(reset_token)
+
+
+def raise_if_cancelled(stage: str):
+    """
+    Stop the translation running in the current thread before a pipeline stage if it is cancelled.
+
+    Args:
+        stage (str): The pipeline stage about to run.
+
+    Raises:
+        TranslationCancelledError: If the translation is cancelled.
+    """
+    token = _current_token.get()
+    if token is not None:
+        token.raise_if_cancelled(stage)
+
+
+class CancellationRegistry:
+    """
+    The cancellation tokens of the translations of each session, so that a translation is cancelled when
+    another one of its session supersedes it, or when its session is closed.
+    """
+
+    _shared: "CancellationRegistry | None" = None
+    _shared_lock = Lock()
+
+    def __init__(self):
+        """Initialise the registry."""
+        self._lock = Lock()
+        self._tokens: Dict[str, CancellationToken] = {}
+
+    @classmethod
+    def shared(cls) -> "CancellationRegistry":
+        """
+        Get the process-level registry.
+
+        Returns:
+            CancellationRegistry: The shared registry.
+        """
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls()
+            return cls._shared
+
+    def start(self, session: str, deadline: float = 0.0) -> CancellationToken:
+        """
+        Get the token of a new translation of a session, cancelling the running one, if any.
+
+        Args:
+            session (str): The session.
+            deadline (float): The time in seconds allowed for the translation, where 0 means no deadline. Defaults to 0.
+
+        Returns:
+            CancellationToken: The token of the translation.
+        """
+        token = CancellationToken(deadline)
+        with self._lock:
+            superseded_token = self._tokens.get(session)
+            self._tokens[session] = token
+        if superseded_token is not None:
+            superseded_token.cancel(constants.CANCELLATION_REASON__SUPERSEDED)
+        return token
+
+    def finish(self, session: str, token: CancellationToken):
+        """
+        Forget the token of a finished translation of a session.
+
+        Args:
+            session (str): The session.
+            token (CancellationToken): The token of the translation.
+        """
+        with self._lock:
+            if self._tokens.get(session) is token:
+                del self._tokens[session]
+
+    def cancel(
+        self, session: str, reason: str = constants.CANCELLATION_REASON__STOPPED
+    ):
+        """
+        Cancel the running translation of a session, if any.
+
+        Args:
+            session (str): The session.
+            reason (str): Why the translation is cancelled. Defaults to a request to stop it.
+        """
+        with self._lock:
+            token = self._tokens.pop(session, None)
+        if token is not None:
+            token.cancel(reason)
@@ -6,6 +6,9 @@ COLOUR__INFO = "info"
 COLOUR__ERROR = "error"
 COLOUR__WARNING = "warning"
 
+# The maximum number of status messages of a session waiting to be shown.
+STATUS_MESSAGES__MAX_QUEUED = 8
+
 CHAR_ENCODING__UTF8 = "utf-8"
 CHAR_ENCODING__UTF16 = "utf-16"
 CHAR_ENCODING__UTF32 = "utf-32"
@@ -14,6 +17,8 @@ CHAR_ENCODING__LATIN1 = "latin1"
 
 HTML_HREF__BLANK = "_blank"
 
+BOOLEAN_TRUE_VALUES = ["true", "yes", "t", "y", "on"]
+
 PROJECT__NAME = "lexinetz"
 PROJECT__HEADLINE = "knowledge based language translation"
 PROJECT__GIT_URL = "https://github.com/anirbanbasu/lexinetz"
@@ -37,6 +42,61 @@ LANGUAGES__SUPPORTED = [
     "한국어",  # Korean
 ]
 
+# The option to detect the source language of each text instead of selecting it.
+LANGUAGE__DETECT = "Detect language"
+
+# Languages written in scripts other than the Latin script, for which translations from or to Latin-script
+# languages tend to benefit from the multi-call translation pipelines.
+LANGUAGES__NON_LATIN_SCRIPT = [
+    "বাংলা",
+    "日本語",
+    "中文",
+    "한국어",
+]
+
+# Languages that put no spaces between sentences.
+LANGUAGES__UNSPACED = [
+    "日本語",
+    "中文",
+]
+
+TRANSLATION_MODE__AUTO = "Auto"
+TRANSLATION_MODE__SIMPLE = "Simple"
+TRANSLATION_MODE__REFLECTIVE = "Reflective"
+TRANSLATION_MODE__AGENTIC = "Agentic"
+TRANSLATION_MODES__SUPPORTED = [
+    TRANSLATION_MODE__AUTO,
+    TRANSLATION_MODE__SIMPLE,
+    TRANSLATION_MODE__REFLECTIVE,
+    TRANSLATION_MODE__AGENTIC,
+]
+
+# The stages of the translation pipelines, each of which can be assigned its own language model.
+STAGE__EXTRACT = "extract"
+STAGE__TRANSLATE = "translate"
+STAGE__ASSESS = "assess"
+STAGE__IMPROVE = "improve"
+STAGE__AGENT = "agent"
+STAGES__SUPPORTED = [
+    STAGE__EXTRACT,
+    STAGE__TRANSLATE,
+    STAGE__ASSESS,
+    STAGE__IMPROVE,
+    STAGE__AGENT,
+]
+
+# The wait of a translation request for admission to its lane, which is cancelled like a pipeline stage.
+STAGE__ADMISSION = "admission"
+
+# The titles of the outputs of the pipeline stages, as shown while a translation progresses.
+STAGE_TITLES = {
+    STAGE__EXTRACT: "Knowledge triplets",
+    STAGE__TRANSLATE: "Draft translation",
+    STAGE__ASSESS: "Assessment",
+    STAGE__IMPROVE: "Improved translation",
+}
+STAGE_TITLE__FINAL = "Translation"
+
 LLM_PROVIDER__COHERE = "Cohere"
 LLM_PROVIDER__LLAMAFILE = "Llamafile"
 LLM_PROVIDER__OLLAMA = "Ollama"
@@ -50,28 +110,36 @@ LLM_PROVIDERS__SUPPORTED = [
 
 
 PROMPT__SYSTEM_SIMPLE = "You are an expert linguist, who specialises in translation from {source_language} to {target_language}."
-PROMPT__TRANSLATE_SIMPLE = (
+# Each prompt is assembled from a prefix, which only depends on the language pair, followed by a suffix with the
+# variable content. Keeping the prefix byte-identical for a language pair lets providers reuse the prompt (KV) cache.
+PROMPT__TRANSLATE_SIMPLE_PREFIX = (
     "This is a {source_language} to {target_language} translation task.\n"
     "The text in the {source_language} may contain idiomatic expressions. You must output idiomatic equivalents for such expressions in the {target_language}.\n"
     "Please provide the {target_language} translation for the following text. Do not provide any explanations or any other text apart from the translation.\n"
-    "{source_language}: {source_text}\n"
-    "{target_language}:"
+)
+PROMPT__TRANSLATE_SIMPLE_SUFFIX = (
+    "{glossary}{source_language}: {source_text}\n{target_language}:"
+)
+PROMPT__TRANSLATE_SIMPLE = (
+    PROMPT__TRANSLATE_SIMPLE_PREFIX + PROMPT__TRANSLATE_SIMPLE_SUFFIX
 )
 
-PROMPT__TRANSLATE_REACT = (
+PROMPT__TRANSLATE_REACT_PREFIX = (
     "This is a {source_language} to {target_language} translation task.\n"
     "The text in the {source_language} may contain idiomatic expressions. You must output idiomatic equivalents for such expressions in the {target_language}.\n"
     "Please provide the {target_language} translation for the following text. Do not provide any explanations or any other text apart from the translation.\n"
     "In the process of translating the original text, extract knowledge graph triplets to generate a representation of concepts in the text.\n"
     "Then, assess the quality of the translation by comparing it with the knowledge graph triplets extracted from the original text to see if the concepts have been exhaustively represented.\n"
     "Finally, improve the translation using the improvement suggestions from the assessment. Output this final translation.\n"
-    "{source_language}: {source_text}\n"
-    "{target_language}:"
+)
+PROMPT__TRANSLATE_REACT_SUFFIX = "{source_language}: {source_text}\n{target_language}:"
+PROMPT__TRANSLATE_REACT = (
+    PROMPT__TRANSLATE_REACT_PREFIX + PROMPT__TRANSLATE_REACT_SUFFIX
 )
 
 # Prompt template from https://github.com/run-llama/llama_index/blob/f17513961505c43391851b364fba0494ee329496/llama-index-core/llama_index/core/prompts/default_prompts.py#L314
-PROMPT__KG_EXTRACT = (
-    "Some source text is provided below. Given that text, extract up to {max_knowledge_triplets} "
+PROMPT__KG_EXTRACT_PREFIX = (
+    "Some source text is provided below. Given that text, extract "
     "knowledge triplets in the form of [subject]->[predicate]->[object]. Avoid stopwords and idiomatic expressions.\n"
     "---------------------\n"
     "Examples:"
@@ -89,13 +157,23 @@ PROMPT__KG_EXTRACT = (
     "3. [Mt. Fuji]->[is]->[the highest mountain]\n"
     "4. [The height of Mt. Fuji]->[is]->[3776m]\n"
     "---------------------\n"
+)
+PROMPT__KG_EXTRACT_SUFFIX = (
+    "Extract up to {max_knowledge_triplets} knowledge triplets.\n"
     "Text: {source_text}\n"
     "Triplets:\n"
 )
+PROMPT__KG_EXTRACT = PROMPT__KG_EXTRACT_PREFIX + PROMPT__KG_EXTRACT_SUFFIX
 
-PROMPT__KG_ASSESS = (
+PROMPT__KG_ASSESS_PREFIX = (
     "Some text is provided below in {source_language}, and its translation in {target_language}."
     "Knowledge triplets representing concepts from the text in {source_language} are also given below.\n"
+    "Assess the quality of the translation to see if the translated text captures the concepts in the knowledge triplets. Avoid stopwords and idiomatic expressions.\n"
+    "Start your response with the verdict COMPLETE if all the concepts are captured, or INCOMPLETE if any concept has been missed.\n"
+    "Please provide suggestions in {source_language} to improve the translation by generating equivalent knowledge triplets in {target_language} if such triplets have been missed in the translated text.\n"
+    "Please explain why you suggest those improvements.\n"
+)
+PROMPT__KG_ASSESS_SUFFIX = (
     "---------------------\n"
     "Source text in {source_language}\n"
     "{source_text}\n"
@@ -106,14 +184,55 @@ PROMPT__KG_ASSESS = (
     "Knowledge triplets from source text in {source_language}\n"
     "{knowledge_triplets}\n"
     "---------------------\n"
-    "Assess the quality of the translation to see if the translated text captures the concepts in the knowledge triplets. Avoid stopwords and idiomatic expressions.\n"
-    "Please provide suggestions in {source_language} to improve the translation by generating equivalent knowledge triplets in {target_language} if such triplets have been missed in the translated text provided above.\n"
-    "Please explain why you suggest those improvements.\n"
 )
+PROMPT__KG_ASSESS = PROMPT__KG_ASSESS_PREFIX + PROMPT__KG_ASSESS_SUFFIX
 
-PROMPT__TRANSLATE_IMPROVE = (
+# The prompts of the structured-output mode, in which the extract and assess stages answer with JSON.
+PROMPT__KG_EXTRACT_JSON_PREFIX = (
+    "Some source text is provided below. Given that text, extract knowledge triplets, each of a subject, a predicate "
+    "and an object. Avoid stopwords and idiomatic expressions.\n"
+    'Respond with only a JSON object of the form {"triplets": [{"subject": "...", "predicate": "...", "object": "..."}]}.\n'
+    "---------------------\n"
+    "Example:\n"
+    "Text: Philz is a coffee shop founded in Berkeley in 1982.\n"
+    'Output: {"triplets": [{"subject": "Philz", "predicate": "is", "object": "coffee shop"}, '
+    '{"subject": "Philz", "predicate": "founded in", "object": "Berkeley"}, '
+    '{"subject": "Philz", "predicate": "founded in", "object": "1982"}]}\n'
+    "---------------------\n"
+)
+PROMPT__KG_EXTRACT_JSON_SUFFIX = (
+    "Extract up to {max_knowledge_triplets} knowledge triplets.\n"
+    "Text: {source_text}\n"
+    "Output:\n"
+)
+
+PROMPT__KG_ASSESS_JSON_PREFIX = (
+    "Some text is provided below in {source_language}, and its translation in {target_language}. "
+    "Knowledge triplets representing concepts from the text in {source_language} are also given below, as JSON.\n"
+    "Assess the quality of the translation to see if the translated text captures the concepts in the knowledge triplets. "
+    "Avoid stopwords and idiomatic expressions.\n"
+    'Respond with only a JSON object of the form {"verdict": "COMPLETE", "missed_triplets": [], "suggestions": ""}. '
+    "The verdict is COMPLETE if all the concepts are captured, or INCOMPLETE if any concept has been missed. "
+    "The missed triplets are equivalent knowledge triplets in {target_language} for the concepts missed in the translated "
+    "text, each with a subject, a predicate and an object. The suggestions briefly explain in {source_language} how to "
+    "improve the translation.\n"
+)
+
+# The key of the parsed output in the `additional_kwargs` of a structured response.
+STRUCTURED_OUTPUT__PARSED = "parsed"
+
+ASSESSMENT_VERDICT__COMPLETE = "COMPLETE"
+ASSESSMENT_VERDICT__INCOMPLETE = "INCOMPLETE"
+
+PROMPT__TRANSLATE_IMPROVE_PREFIX = (
     "Some text is provided below in {source_language}. A translation of that text is also given below in {target_language}."
     "In addition, some suggestion is given in {source_language} below to improve the translated text.\n"
+    "Using the improvement suggestions if present, provide the {target_language} translation for the text in {source_language}.\n"
+    "If there are no improvement suggestions, please output the translated text provided below, as is.\n"
+    "Do not provide any explanations or any other text apart from the translation.\n"
+)
+PROMPT__TRANSLATE_IMPROVE_SUFFIX = (
+    "{glossary}"
     "---------------------\n"
     "Source text in {source_language}\n"
     "Text: {source_text}\n"
@@ -124,10 +243,33 @@ PROMPT__TRANSLATE_IMPROVE = (
     "Improvement suggestions in {source_language} of the translation in {target_language}\n"
     "Text: {improvement_suggestions}\n"
     "---------------------\n"
-    "Using the improvement suggestions if present, provide the {target_language} translation for the text in {source_language}.\n"
-    "If there are no improvement suggestions, please output the translated text provided above, as is.\n"
-    "Do not provide any explanations or any other text apart from the translation."
+    "{target_language}:"
+)
+PROMPT__TRANSLATE_IMPROVE = (
+    PROMPT__TRANSLATE_IMPROVE_PREFIX + PROMPT__TRANSLATE_IMPROVE_SUFFIX
+)
+
+PROMPT__TRANSLATE_BATCH_PREFIX = (
+    "This is a {source_language} to {target_language} translation task.\n"
+    "The text in the {source_language} may contain idiomatic expressions. You must output idiomatic equivalents for such expressions in the {target_language}.\n"
+    "Below are numbered segments in {source_language}, each starting with a marker such as [[1]]. Translate each segment independently.\n"
+    "Output one {target_language} translation per segment, each starting with the same marker as its source segment, in the same order.\n"
+    "Do not provide any explanations or any other text apart from the markers and the translations.\n"
+)
+PROMPT__TRANSLATE_BATCH_SUFFIX = "{glossary}There are {segment_count} segments.\n{source_segments}\n{target_language}:"
+PROMPT__TRANSLATE_BATCH = (
+    PROMPT__TRANSLATE_BATCH_PREFIX + PROMPT__TRANSLATE_BATCH_SUFFIX
 )
+# The mandated translations of the terms found in a text, which go in the {glossary} slot of the prompts
+# above. The slot is empty when no terms are found, so that it does not change the prompts otherwise.
+PROMPT__GLOSSARY = (
+    "You must translate the following terms from {source_language} into {target_language} exactly as given:\n"
+    "{glossary_entries}\n"
+)
+PROMPT__GLOSSARY_ENTRY = "- {source_term} => {target_term}"
+
+BATCH_SEGMENT_MARKER = "[[{index}]]"
+BATCH_SEGMENT_MARKER_PATTERN = r"^\s*\[\[(\d+)\]\]\s*"
 
 ENV_KEY__LLM_PROVIDER = "LLM_PROVIDER"
 DEFAULT_VALUE__LLM_PROVIDER = "Ollama"
@@ -148,12 +290,373 @@ DEFAULT_VALUE__COHERE_MODEL = "command-r-plus"
 ENV_KEY__OLLAMA_MODEL = "OLLAMA_MODEL"
 DEFAULT_VALUE__OLLAMA_MODEL = "llama3"
 
+# How long Ollama keeps the model (and its prompt cache) loaded after a request, e.g., "5m", "1h" or "-1m" to keep it loaded.
+ENV_KEY__OLLAMA_KEEP_ALIVE = "OLLAMA_KEEP_ALIVE"
+DEFAULT_VALUE__OLLAMA_KEEP_ALIVE = "5m"
+
+# Pools of Ollama or Llamafile servers, given as comma-separated URLs. Each call goes to the healthy server with
+# the fewest calls in flight, and then the lowest moving average latency, smoothed by a factor between 0 and 1.
+# A server that fails this many calls or health checks in a row is ejected from its pool for a time in seconds.
+# The servers are checked at an interval in seconds, where 0 disables the health checks.
+ENV_KEY__ENDPOINT_HEALTH_CHECK_INTERVAL = "ENDPOINT_HEALTH_CHECK_INTERVAL"
+DEFAULT_VALUE__ENDPOINT_HEALTH_CHECK_INTERVAL = "10"
+ENV_KEY__ENDPOINT_MAX_FAILURES = "ENDPOINT_MAX_FAILURES"
+DEFAULT_VALUE__ENDPOINT_MAX_FAILURES = "3"
+ENV_KEY__ENDPOINT_EJECTION_SECONDS = "ENDPOINT_EJECTION_SECONDS"
+DEFAULT_VALUE__ENDPOINT_EJECTION_SECONDS = "30"
+ENV_KEY__ENDPOINT_LATENCY_SMOOTHING = "ENDPOINT_LATENCY_SMOOTHING"
+DEFAULT_VALUE__ENDPOINT_LATENCY_SMOOTHING = "0.3"
+
+# The path on a server of each self-hosted provider that answers health checks.
+ENDPOINT_HEALTH_PATHS = {
+    LLM_PROVIDER__LLAMAFILE: "/health",
+    LLM_PROVIDER__OLLAMA: "/api/tags",
+}
+
 ENV_KEY__OPENAI_MODEL = "OPENAI_MODEL"
 DEFAULT_VALUE__OPENAI_MODEL = "gpt-3.5-turbo-0125"
 
 ENV_KEY__LLM_TEMPERATURE = "LLM_TEMPERATURE"
 DEFAULT_VALUE__LLM_TEMPERATURE = "0.4"
 
+# Warm up the app on start-up by importing the configured provider and loading the tokenizer and the glossary,
+# and optionally pre-connect to the provider with a short completion.
+ENV_KEY__WARM_UP = "WARM_UP"
+DEFAULT_VALUE__WARM_UP = "False"
+
+ENV_KEY__WARM_UP_CONNECT = "WARM_UP_CONNECT"
+DEFAULT_VALUE__WARM_UP_CONNECT = "False"
+
+# A batch window of 0 seconds disables batching of concurrent translations.
+ENV_KEY__BATCH_WINDOW = "TRANSLATION_BATCH_WINDOW"
+DEFAULT_VALUE__BATCH_WINDOW = "0"
+
+ENV_KEY__BATCH_MAX_SIZE = "TRANSLATION_BATCH_MAX_SIZE"
+DEFAULT_VALUE__BATCH_MAX_SIZE = "8"
+
+ENV_KEY__BATCH_MAX_CHARACTERS = "TRANSLATION_BATCH_MAX_CHARACTERS"
+DEFAULT_VALUE__BATCH_MAX_CHARACTERS = "4000"
+
+# Language model providers for individual pipeline stages, e.g., "extract:Ollama,translate:Ollama". Stages that
+# are not listed use the selected language model provider.
+ENV_KEY__STAGE_LLM_PROVIDERS = "STAGE_LLM_PROVIDERS"
+DEFAULT_VALUE__STAGE_LLM_PROVIDERS = ""
+
+# The language model provider to escalate the improvement of a translation to, when its assessment reports
+# missed concepts. Leave empty to disable the cascade.
+ENV_KEY__ESCALATION_LLM_PROVIDER = "ESCALATION_LLM_PROVIDER"
+DEFAULT_VALUE__ESCALATION_LLM_PROVIDER = ""
+
+# Normalise texts and translate them sentence by sentence, translating each distinct sentence of a text, or of
+# a batch of texts in the API, once. This suits long and repetitive documents, whose sentences are translated
+# concurrently, and together if batching is enabled.
+ENV_KEY__SEGMENT_TEXTS = "SEGMENT_TEXTS"
+DEFAULT_VALUE__SEGMENT_TEXTS = "False"
+
+# Race the same translation on several language model providers, e.g., "Ollama,Open AI", and keep the first
+# translation to arrive ("latency"), or the one with the best assessment ("quality"), cancelling the others.
+# Leave empty to disable racing.
+ENV_KEY__RACE_LLM_PROVIDERS = "RACE_LLM_PROVIDERS"
+DEFAULT_VALUE__RACE_LLM_PROVIDERS = ""
+
+ENV_KEY__RACE_STRATEGY = "RACE_STRATEGY"
+DEFAULT_VALUE__RACE_STRATEGY = "latency"
+
+# Ask the extract and assess stages for JSON, using the JSON mode of the provider where it has one, and parse
+# it strictly, so that triplets and verdicts are typed and later stages are sent compact JSON.
+ENV_KEY__STRUCTURED_OUTPUTS = "STRUCTURED_OUTPUTS"
+DEFAULT_VALUE__STRUCTURED_OUTPUTS = "False"
+
+# Iterative reflection in the reflective mode: the maximum number of assessment and improvement rounds, the
+# estimated number of tokens and the time in seconds allowed for them (0 means no limit), and the fraction of a
+# translation an improvement must change for the translation not to have converged.
+ENV_KEY__REFLECTION_MAX_ROUNDS = "REFLECTION_MAX_ROUNDS"
+DEFAULT_VALUE__REFLECTION_MAX_ROUNDS = "1"
+
+ENV_KEY__REFLECTION_TOKEN_BUDGET = "REFLECTION_TOKEN_BUDGET"
+DEFAULT_VALUE__REFLECTION_TOKEN_BUDGET = "0"
+
+ENV_KEY__REFLECTION_TIME_BUDGET = "REFLECTION_TIME_BUDGET"
+DEFAULT_VALUE__REFLECTION_TIME_BUDGET = "0"
+
+ENV_KEY__REFLECTION_MIN_CHANGE = "REFLECTION_MIN_CHANGE"
+DEFAULT_VALUE__REFLECTION_MIN_CHANGE = "0.01"
+
+# The time in seconds allowed for a pipeline stage, including retries, optionally per stage, e.g., "improve:180".
+ENV_KEY__LLM_CALL_DEADLINE = "LLM_CALL_DEADLINE"
+DEFAULT_VALUE__LLM_CALL_DEADLINE = "120"
+
+ENV_KEY__LLM_STAGE_DEADLINES = "LLM_STAGE_DEADLINES"
+DEFAULT_VALUE__LLM_STAGE_DEADLINES = ""
+
+# The time in seconds allowed for a whole translation, after which its remaining stages are skipped and its
+# language model call in flight is abandoned, where 0 means no deadline.
+ENV_KEY__TRANSLATION_DEADLINE = "TRANSLATION_DEADLINE"
+DEFAULT_VALUE__TRANSLATION_DEADLINE = "0"
+
+# The prices of a million prompt and completion tokens of each model, e.g., "gpt-4o-mini:0.15:0.6", to account
+# for the cost of translations. Models without a price cost nothing.
+ENV_KEY__LLM_PRICES = "LLM_PRICES"
+DEFAULT_VALUE__LLM_PRICES = ""
+
+# The tokens and the cost allowed for a request, and for all the requests of a tenant, i.e., a session of the
+# apps, in each period of seconds, where 0 means no limit. Once a budget is spent, the reflective and agentic
+# modes stop at their next step with the translation they have, and further requests use the single-call mode.
+ENV_KEY__REQUEST_TOKEN_BUDGET = "REQUEST_TOKEN_BUDGET"
+DEFAULT_VALUE__REQUEST_TOKEN_BUDGET = "0"
+
+ENV_KEY__REQUEST_COST_BUDGET = "REQUEST_COST_BUDGET"
+DEFAULT_VALUE__REQUEST_COST_BUDGET = "0"
+
+ENV_KEY__TENANT_TOKEN_BUDGET = "TENANT_TOKEN_BUDGET"
+DEFAULT_VALUE__TENANT_TOKEN_BUDGET = "0"
+
+ENV_KEY__TENANT_COST_BUDGET = "TENANT_COST_BUDGET"
+DEFAULT_VALUE__TENANT_COST_BUDGET = "0"
+
+ENV_KEY__TENANT_BUDGET_PERIOD = "TENANT_BUDGET_PERIOD"
+DEFAULT_VALUE__TENANT_BUDGET_PERIOD = "86400"
+
+ENV_KEY__LLM_CALL_RETRIES = "LLM_CALL_RETRIES"
+DEFAULT_VALUE__LLM_CALL_RETRIES = "2"
+
+# Send a duplicate request when a call takes longer than the 95th percentile of its stage.
+ENV_KEY__LLM_HEDGING = "LLM_HEDGING"
+DEFAULT_VALUE__LLM_HEDGING = "False"
+
+# The language model provider to fail over to when a stage fails. Leave empty to disable failover.
+ENV_KEY__FAILOVER_LLM_PROVIDER = "FAILOVER_LLM_PROVIDER"
+DEFAULT_VALUE__FAILOVER_LLM_PROVIDER = ""
+
+# Queueing of translation requests in the Gradio app: the maximum number of queued requests, and priority lanes
+# for short and long texts, each with its own concurrency limit and limit on waiting requests.
+ENV_KEY__TRANSLATE_QUEUE_MAX_SIZE = "TRANSLATE_QUEUE_MAX_SIZE"
+DEFAULT_VALUE__TRANSLATE_QUEUE_MAX_SIZE = "64"
+
+ENV_KEY__SHORT_LANE_TEXT_LENGTH = "SHORT_LANE_TEXT_LENGTH"
+DEFAULT_VALUE__SHORT_LANE_TEXT_LENGTH = "280"
+
+ENV_KEY__SHORT_LANE_CONCURRENCY = "SHORT_LANE_CONCURRENCY"
+DEFAULT_VALUE__SHORT_LANE_CONCURRENCY = "4"
+
+ENV_KEY__LONG_LANE_CONCURRENCY = "LONG_LANE_CONCURRENCY"
+DEFAULT_VALUE__LONG_LANE_CONCURRENCY = "2"
+
+ENV_KEY__LANE_MAX_WAITING = "LANE_MAX_WAITING"
+DEFAULT_VALUE__LANE_MAX_WAITING = "32"
+
+# The longest time in seconds that a request waits for a slot in its lane before it is rejected, where 0 means
+# that it waits until its translation deadline, if any.
+ENV_KEY__LANE_MAX_WAIT_SECONDS = "LANE_MAX_WAIT_SECONDS"
+DEFAULT_VALUE__LANE_MAX_WAIT_SECONDS = "120"
+
+ENV_KEY__TRANSLATION_MODE = "TRANSLATION_MODE"
+DEFAULT_VALUE__TRANSLATION_MODE = "Agentic"
+
+# Texts up to this many characters are translated with a single call in the automatic mode.
+ENV_KEY__AUTO_MODE_SHORT_TEXT_LENGTH = "AUTO_MODE_SHORT_TEXT_LENGTH"
+DEFAULT_VALUE__AUTO_MODE_SHORT_TEXT_LENGTH = "280"
+
+# With this many translations in progress, the automatic mode only uses single-call translations.
+ENV_KEY__AUTO_MODE_MAX_QUEUE_DEPTH = "AUTO_MODE_MAX_QUEUE_DEPTH"
+DEFAULT_VALUE__AUTO_MODE_MAX_QUEUE_DEPTH = "4"
+
+# Memory bounds for each session: the maximum length of a text to translate, and the length beyond which
+# uploaded texts and translations are kept in temporary files, with only a preview in memory. A length of 0
+# means no limit and never spilling to temporary files, respectively.
+ENV_KEY__MAX_INPUT_CHARACTERS = "MAX_INPUT_CHARACTERS"
+DEFAULT_VALUE__MAX_INPUT_CHARACTERS = "1000000"
+
+ENV_KEY__SPILL_CHARACTERS = "SPILL_CHARACTERS"
+DEFAULT_VALUE__SPILL_CHARACTERS = "0"
+
+# The maximum number of finished translations cached in each process, where 0 disables the cache.
+ENV_KEY__TRANSLATION_CACHE_SIZE = "TRANSLATION_CACHE_SIZE"
+DEFAULT_VALUE__TRANSLATION_CACHE_SIZE = "1024"
+
+# A cache of translations and knowledge graph triplets that also serves near-duplicate source texts, whose
+# similarity to a cached source text is at least the threshold.
+ENV_KEY__SEMANTIC_CACHE = "SEMANTIC_CACHE"
+DEFAULT_VALUE__SEMANTIC_CACHE = "False"
+
+ENV_KEY__SEMANTIC_CACHE_THRESHOLD = "SEMANTIC_CACHE_THRESHOLD"
+DEFAULT_VALUE__SEMANTIC_CACHE_THRESHOLD = "0.95"
+
+ENV_KEY__SEMANTIC_CACHE_MAX_ENTRIES = "SEMANTIC_CACHE_MAX_ENTRIES"
+DEFAULT_VALUE__SEMANTIC_CACHE_MAX_ENTRIES = "4096"
+
+# Precompute the translations of likely requests in the background while no other translation is in progress:
+# the texts requested at least a number of times recently, the default text of the apps, and the texts in a
+# JSON Lines file, with a "text" and optionally a "source_language", for the configured language pairs, such
+# as "English:Français,English:Deutsch", and the most requested ones. The providers are considered idle
+# after a time in seconds without requests, and checked at an interval.
+ENV_KEY__PRECOMPUTE = "PRECOMPUTE"
+DEFAULT_VALUE__PRECOMPUTE = "False"
+
+ENV_KEY__PRECOMPUTE_TEXTS_PATH = "PRECOMPUTE_TEXTS_PATH"
+DEFAULT_VALUE__PRECOMPUTE_TEXTS_PATH = ""
+
+ENV_KEY__PRECOMPUTE_PAIRS = "PRECOMPUTE_PAIRS"
+DEFAULT_VALUE__PRECOMPUTE_PAIRS = ""
+
+ENV_KEY__PRECOMPUTE_MIN_REQUESTS = "PRECOMPUTE_MIN_REQUESTS"
+DEFAULT_VALUE__PRECOMPUTE_MIN_REQUESTS = "2"
+
+ENV_KEY__PRECOMPUTE_IDLE_SECONDS = "PRECOMPUTE_IDLE_SECONDS"
+DEFAULT_VALUE__PRECOMPUTE_IDLE_SECONDS = "10"
+
+ENV_KEY__PRECOMPUTE_INTERVAL = "PRECOMPUTE_INTERVAL"
+DEFAULT_VALUE__PRECOMPUTE_INTERVAL = "30"
+
+# A CSV file with the mandated translations of terms, in the columns source_language, target_language,
+# source_term and target_term. The terms found in a text are added to the translation prompts.
+ENV_KEY__GLOSSARY_PATH = "GLOSSARY_PATH"
+DEFAULT_VALUE__GLOSSARY_PATH = ""
+
+# A log in which every language model call is recorded, with its prompts, response, token counts and latency,
+# or a recorded log to serve instead of calling the providers, with the recorded latencies sped up by a factor,
+# where 1 keeps the original timing and 0 answers at once. A log whose name ends with .gz is compressed.
+ENV_KEY__LLM_RECORD_PATH = "LLM_RECORD_PATH"
+DEFAULT_VALUE__LLM_RECORD_PATH = ""
+
+ENV_KEY__LLM_REPLAY_PATH = "LLM_REPLAY_PATH"
+DEFAULT_VALUE__LLM_REPLAY_PATH = ""
+
+ENV_KEY__LLM_REPLAY_SPEED = "LLM_REPLAY_SPEED"
+DEFAULT_VALUE__LLM_REPLAY_SPEED = "1"
+
+# The HTTP API: the number of pooled translators for each language pair, the maximum number of segments in
+# a batch request and the number of segments of a batch request translated at the same time.
+ENV_KEY__API_TRANSLATORS_PER_PAIR = "API_TRANSLATORS_PER_PAIR"
+DEFAULT_VALUE__API_TRANSLATORS_PER_PAIR = "4"
+
+ENV_KEY__API_MAX_BATCH_SEGMENTS = "API_MAX_BATCH_SEGMENTS"
+DEFAULT_VALUE__API_MAX_BATCH_SEGMENTS = "256"
+
+ENV_KEY__API_BATCH_CONCURRENCY = "API_BATCH_CONCURRENCY"
+DEFAULT_VALUE__API_BATCH_CONCURRENCY = "4"
+
+METRIC__BATCH_SIZE = "batch.size"
+METRIC__BATCH_LATENCY = "batch.latency_seconds"
+METRIC__BATCH_SEGMENT_WAIT = "batch.segment_wait_seconds"
+METRIC__BATCH_FALLBACKS = "batch.fallbacks"
+METRIC__BATCH_FOLLOWER_FALLBACKS = "batch.follower_fallbacks"
+
+METRIC__STAGE_LATENCY = "stage.{stage}.latency_seconds"
+METRIC__CASCADE_REQUESTS = "cascade.requests"
+METRIC__CASCADE_ESCALATIONS = "cascade.escalations"
+METRIC__CASCADE_TIER_LATENCY = "cascade.tier.{tier}.latency_seconds"
+CASCADE_TIER__PRIMARY = "primary"
+CASCADE_TIER__ESCALATION = "escalation"
+
+METRIC__RACE_ENTRIES = "race.{provider}.entries"
+METRIC__RACE_WINS = "race.{provider}.wins"
+METRIC__RACE_FAILURES = "race.{provider}.failures"
+METRIC__RACE_LATENCY = "race.{provider}.latency_seconds"
+METRIC__RACE_SCORE = "race.{provider}.score"
+RACE_STRATEGY__LATENCY = "latency"
+RACE_STRATEGY__QUALITY = "quality"
+RACE_STRATEGIES__SUPPORTED = [RACE_STRATEGY__LATENCY, RACE_STRATEGY__QUALITY]
+
+METRIC__ENDPOINT_REQUESTS = "endpoint.{endpoint}.requests"
+METRIC__ENDPOINT_FAILURES = "endpoint.{endpoint}.failures"
+METRIC__ENDPOINT_LATENCY = "endpoint.{endpoint}.latency_seconds"
+METRIC__ENDPOINT_EJECTIONS = "endpoint.{endpoint}.ejections"
+METRIC__ENDPOINT_HEALTH_CHECK_FAILURES = "endpoint.{endpoint}.health_check_failures"
+
+METRIC__RESILIENCE_CALL_LATENCY = "resilience.{stage}.call_latency_seconds"
+METRIC__RESILIENCE_TIMEOUTS = "resilience.timeouts"
+METRIC__RESILIENCE_RETRIES = "resilience.retries"
+METRIC__RESILIENCE_NON_TRANSIENT_ERRORS = "resilience.non_transient_errors"
+METRIC__RESILIENCE_HEDGES = "resilience.hedges"
+METRIC__RESILIENCE_HEDGE_WINS = "resilience.hedge_wins"
+METRIC__RESILIENCE_FAILOVERS = "resilience.failovers"
+METRIC__RESILIENCE_FAILURES = "resilience.failures"
+
+QUEUE_LANE__SHORT = "short"
+QUEUE_LANE__LONG = "long"
+METRIC__QUEUE_DEPTH = "queue.{lane}.depth"
+METRIC__QUEUE_WAIT = "queue.{lane}.wait_seconds"
+METRIC__QUEUE_REJECTIONS = "queue.{lane}.rejections"
+METRIC__QUEUE_TIMEOUTS = "queue.{lane}.timeouts"
+
+METRIC__CACHE_HITS = "cache.hits"
+METRIC__CACHE_MISSES = "cache.misses"
+METRIC__CACHE_EVICTIONS = "cache.evictions"
+
+METRIC__SEMANTIC_CACHE_HITS = "semantic_cache.hits"
+METRIC__SEMANTIC_CACHE_MISSES = "semantic_cache.misses"
+METRIC__SEMANTIC_CACHE_ADAPTATIONS = "semantic_cache.adaptations"
+METRIC__SEMANTIC_CACHE_TOKEN_MISMATCHES = "semantic_cache.token_mismatches"
+METRIC__SEMANTIC_CACHE_LOOKUP_LATENCY = "semantic_cache.lookup_latency_seconds"
+
+METRIC__GLOSSARY_LOAD_LATENCY = "glossary.load_latency_seconds"
+METRIC__GLOSSARY_MATCH_LATENCY = "glossary.match_latency_seconds"
+METRIC__GLOSSARY_MATCHED_TERMS = "glossary.matched_terms"
+
+METRIC__LANGUAGE_DETECTION_LATENCY = "language_detection.latency_seconds"
+METRIC__LANGUAGE_DETECTION_FAILURES = "language_detection.failures"
+
+METRIC__CANCELLATIONS = "cancellation.{reason}"
+METRIC__CANCELLED_STAGES = "cancellation.skipped_stage.{stage}"
+METRIC__CANCELLATION_SAVED_SECONDS = "cancellation.saved_seconds"
+METRIC__CANCELLATION_ABANDONED_CALLS = "cancellation.abandoned_calls"
+CANCELLATION_REASON__STOPPED = "stopped"
+CANCELLATION_REASON__SUPERSEDED = "superseded"
+CANCELLATION_REASON__CLOSED = "closed"
+CANCELLATION_REASON__DEADLINE = "deadline"
+CANCELLATION_REASON__PREEMPTED = "preempted"
+CANCELLATION_REASON__LOST = "lost"
+CANCELLATION_REASON__DISCONNECTED = "disconnected"
+# How often in seconds a language model call in flight checks whether its translation is cancelled.
+CANCELLATION__POLL_INTERVAL = 0.25
+
+METRIC__PRECOMPUTE_TRANSLATIONS = "precompute.translations"
+METRIC__PRECOMPUTE_FAILURES = "precompute.failures"
+METRIC__PRECOMPUTE_LATENCY = "precompute.latency_seconds"
+
+METRIC__PREPROCESS_SEGMENTS = "preprocess.segments"
+METRIC__PREPROCESS_UNIQUE_SEGMENTS = "preprocess.unique_segments"
+METRIC__PREPROCESS_LATENCY = "preprocess.latency_seconds"
+
+METRIC__USAGE_PROMPT_TOKENS = "usage.{stage}.prompt_tokens"
+METRIC__USAGE_COMPLETION_TOKENS = "usage.{stage}.completion_tokens"
+METRIC__USAGE_COST = "usage.{stage}.cost"
+METRIC__USAGE_ESTIMATED_CALLS = "usage.estimated_calls"
+METRIC__USAGE_REQUEST_TOKENS = "usage.request.tokens"
+METRIC__USAGE_REQUEST_COST = "usage.request.cost"
+METRIC__USAGE_BUDGET_DOWNGRADES = "usage.budget_downgrades"
+# The tenant of the API requests without a tenant header.
+USAGE_TENANT__DEFAULT = "default"
+API_HEADER__TENANT = "X-Tenant"
+
+METRIC__REPLAY_HITS = "replay.hits"
+METRIC__REPLAY_MISSES = "replay.misses"
+
+METRIC__STRUCTURED_OUTPUT_SUCCESSES = "structured_output.{stage}.successes"
+METRIC__STRUCTURED_OUTPUT_FAILURES = "structured_output.{stage}.failures"
+
+METRIC__REFLECTION_ROUNDS = "reflection.rounds"
+METRIC__REFLECTION_STOPS = "reflection.stop.{reason}"
+METRIC__REFLECTION_CHANGE = "reflection.change"
+REFLECTION_STOP__COMPLETE = "complete"
+REFLECTION_STOP__CONVERGED = "converged"
+REFLECTION_STOP__MAX_ROUNDS = "max_rounds"
+REFLECTION_STOP__TOKEN_BUDGET = "token_budget"
+REFLECTION_STOP__TIME_BUDGET = "time_budget"
+REFLECTION_STOP__USAGE_BUDGET = "usage_budget"
+REFLECTION_STOPS = [
+    REFLECTION_STOP__COMPLETE,
+    REFLECTION_STOP__CONVERGED,
+    REFLECTION_STOP__MAX_ROUNDS,
+    REFLECTION_STOP__TOKEN_BUDGET,
+    REFLECTION_STOP__TIME_BUDGET,
+    REFLECTION_STOP__USAGE_BUDGET,
+]
+
+METRIC__TRANSLATIONS_IN_FLIGHT = "translations.in_flight"
+METRIC__TRANSLATION_MODE_SELECTED = "translations.mode.{mode}"
+
 
 SAMPLE_TEXT__ENGLISH_PLACEHOLDER = "The quick brown fox jumps over the lazy dog."
 # News article from the BBC: https://www.bbc.com/news/articles/c9eem1dkx5vo
@@ -0,0 +1,384 @@
+from contextlib import contextmanager
+from threading import Event, Lock, Thread
+from typing import Any, Callable, Dict, Iterator, List, Tuple
+from urllib.parse import urlsplit
+from urllib.request import urlopen
+
+from llama_index.core.llms.llm import LLM
+from pydantic import PrivateAttr
+
+import constants
+import os
+import time
+
+from metrics import METRICS
+from recording import LLMWrapper, with_system_prompt
+from resilience import is_transient_error
+
+
+def parse_endpoint_urls(value: str) -> List[str]:
+    """
+    Parse the comma-separated URLs of the servers of a provider, e.g., "http://a:11434,http://b:11434".
+
+    Args:
+        value (str): The URLs.
+
+    Returns:
+        List[str]: The distinct URLs, without trailing slashes, in the order they were given.
+    """
+    return list(
+        dict.fromkeys(
+            url.strip().rstrip("/") for url in value.split(",") if url.strip()
+        )
+    )
+
+
+class Endpoint:
+    """A server of a pool, with its calls in flight, its moving average latency and its recent failures."""
+
+    def __init__(self, url: str):
+        """
+        Initialise the endpoint.
+
+        Args:
+            url (str): The URL of the server.
+        """
+        self.url = url
+        # The host and port of the server, which names it in the metrics.
+        self.name = urlsplit(url).netloc or url
+        self.in_flight = 0
+        self.latency: float | None = None
+        self.failures = 0
+        self.ejected_until = 0.0
+
+    def is_ejected(self, now: float) -> bool:
+        """Check whether the server is ejected from its pool at a time."""
+        return now < self.ejected_until
+
+    def describe(self, now: float) -> dict:
+        """Describe the state of the server at a time."""
+        return {
+            "url": self.url,
+            "in_flight": self.in_flight,
+            "latency_seconds": self.latency,
+            "failures": self.failures,
+            "ejected": self.is_ejected(now),
+        }
+
+
+class EndpointPool:
+    """
+    A pool of servers of a self-hosted provider, such as several Ollama or Llamafile instances. Each call
+    goes to the server with the fewest calls in flight, breaking ties by the exponentially weighted moving
+    average of their latencies, so that a loaded or restarting server does not slow every request. A server
+    that fails several calls or health checks in a row is ejected for a while; if every server is ejected,
+    the one readmitted soonest is used anyway.
+    """
+
+    _shared: Dict[Tuple, "EndpointPool"] = {}
+    _shared_lock = Lock()
+
+    def __init__(
+        self,
+        urls: List[str],
+        health_path: str = None,
+        health_check_interval: float = 10.0,
+        health_check_timeout: float = 2.0,
+        max_failures: int = 3,
+        ejection_seconds: float = 30.0,
+        latency_smoothing: float = 0.3,
+    ):
+        """
+        Initialise the pool.
+
+        Args:
+            urls (List[str]): The URLs of the servers.
+            health_path (str): The path on each server that answers health checks. Defaults to None, which checks the URLs themselves.
+            health_check_interval (float): The interval in seconds between health checks, where 0 disables them. Defaults to 10.
+            health_check_timeout (float): The time in seconds allowed for a health check. Defaults to 2.
+            max_failures (int): The number of failed calls or health checks in a row after which a server is ejected. Defaults to 3.
+            ejection_seconds (float): How long in seconds a server is ejected for. Defaults to 30.
+            latency_smoothing (float): The weight of the latest latency in the moving average, between 0 and 1. Defaults to 0.3.
+        """
+        if not urls:
+            raise ValueError("An endpoint pool needs at least one URL.")
+        self._endpoints = [Endpoint(url) for url in urls]
+        self._health_path = health_path or constants.EMPTY_STRING
+        self._health_check_interval = health_check_interval
+        self._health_check_timeout = health_check_timeout
+        self._max_failures = max(1, max_failures)
+        self._ejection_seconds = ejection_seconds
+        self._latency_smoothing = min(max(latency_smoothing, 0.0), 1.0)
+        self._lock = Lock()
+        self._stopped = Event()
+        self._thread: Thread | None = None
+
+    @classmethod
+    def shared(cls, urls: List[str], health_path: str = None) -> "EndpointPool":
+        """
+        Get the process-level pool of a set of servers, with the settings in the environment variables, or
+        their defaults, checking the health of its servers in the background.
+
+        Args:
+            urls (List[str]): The URLs of the servers.
+            health_path (str): The path on each server that answers health checks. Defaults to None.
+
+        Returns:
+            EndpointPool: The shared pool.
+        """
+        key = (tuple(urls), health_path)
+        with cls._shared_lock:
+            if key not in cls._shared:
+                pool = cls(
+                    urls,
+                    health_path=health_path,
+                    health_check_interval=float(
+                        os.getenv(
+                            constants.ENV_KEY__ENDPOINT_HEALTH_CHECK_INTERVAL,
+                            constants.DEFAULT_VALUE__ENDPOINT_HEALTH_CHECK_INTERVAL,
+                        )
+                    ),
+                    max_failures=int(
+                        os.getenv(
+                            constants.ENV_KEY__ENDPOINT_MAX_FAILURES,
+                            constants.DEFAULT_VALUE__ENDPOINT_MAX_FAILURES,
+                        )
+                    ),
+                    ejection_seconds=float(
+                        os.getenv(
+                            constants.ENV_KEY__ENDPOINT_EJECTION_SECONDS,
+                            constants.DEFAULT_VALUE__ENDPOINT_EJECTION_SECONDS,
+                        )
+                    ),
+                    latency_smoothing=float(
+                        os.getenv(
+                            constants.ENV_KEY__ENDPOINT_LATENCY_SMOOTHING,
+                            constants.DEFAULT_VALUE__ENDPOINT_LATENCY_SMOOTHING,
+                        )
+                    ),
+                )
+                pool.start()
+                cls._shared[key] = pool
+            return cls._shared[key]
+
+    @property
+    def urls(self) -> List[str]:
+        """The URLs of the servers."""
+        return [endpoint.url for endpoint in self._endpoints]
+
+    def acquire(self) -> Endpoint:
+        """
+        Choose the server for a call and count the call as in flight on it, until it is released.
+
+        Returns:
+            Endpoint: The server.
+        """
+        with self._lock:
+            now = time.monotonic()
+            admitted = [
+                endpoint for endpoint in self._endpoints if not endpoint.is_ejected(now)
+            ]
+            if admitted:
+                # A server without latency samples yet is tried before the others.
+                endpoint = min(
+                    admitted,
+                    key=lambda endpoint: (endpoint.in_flight, endpoint.latency or 0.0),
+                )
+            else:
+                endpoint = min(
+                    self._endpoints, key=lambda endpoint: endpoint.ejected_until
+                )
+            endpoint.in_flight += 1
+        METRICS.increment(
+            constants.METRIC__ENDPOINT_REQUESTS.format(endpoint=endpoint.name)
+        )
+        return endpoint
+
+    def release(self, endpoint: Endpoint, latency: float, succeeded: bool | None):
+        """
+        Release a server after a call, updating its moving average latency or its failures.
+
+        Args:
+            endpoint (Endpoint): The server of the call.
+            latency (float): The latency of the call in seconds.
+            succeeded (bool | None): Whether the call succeeded, or None if its outcome says nothing about the health of the server, such as a rejected request or a cancelled call.
+        """
+        with self._lock:
+            endpoint.in_flight -= 1
+            if succeeded:
+                endpoint.failures = 0
+                endpoint.latency = (
+                    latency
+                    if endpoint.latency is None
+                    else self._latency_smoothing * latency
+                    + (1 - self._latency_smoothing) * endpoint.latency
+                )
+            elif succeeded is not None:
+                self._record_failure(endpoint)
+        if succeeded:
+            METRICS.observe(
+                constants.METRIC__ENDPOINT_LATENCY.format(endpoint=endpoint.name),
+                latency,
+            )
+        elif succeeded is not None:
+            METRICS.increment(
+                constants.METRIC__ENDPOINT_FAILURES.format(endpoint=endpoint.name)
+            )
+
+    def _record_failure(self, endpoint: Endpoint):
+        """Count a failure of a server, ejecting it, or keeping it ejected, after too many in a row."""
+        endpoint.failures += 1
+        if endpoint.failures < self._max_failures:
+            return
+        now = time.monotonic()
+        if not endpoint.is_ejected(now):
+            # icecream is imported on first use, so that importing the providers does not load it.
+            from icecream import ic
+
+            ic(f"Ejecting {endpoint.url} after {endpoint.failures} failures in a row.")
+            METRICS.increment(
+                constants.METRIC__ENDPOINT_EJECTIONS.format(endpoint=endpoint.name)
+            )
+        endpoint.ejected_until = now + self._ejection_seconds
+
+    @contextmanager
+    def endpoint(self) -> Iterator[Endpoint]:
+        """
+        Choose the server for a call, and release it with the outcome and the latency of the call. Only
+        transient errors, such as timeouts, connection errors and server errors, count as failures of the
+        server; a request that the server rejects, or a call that is cancelled or abandoned, does not.
+
+        Yields:
+            Endpoint: The server.
+        """
+        endpoint = self.acquire()
+        started_at = time.perf_counter()
+        succeeded = None
+        try:
+            yield endpoint
+            succeeded = True
+        except BaseException as e:
+            if is_transient_error(e):
+                succeeded = False
+            raise e
+        finally:
+            self.release(endpoint, time.perf_counter() - started_at, succeeded)
+
+    def check_health(self) -> int:
+        """
+        Check the health of every server once. A healthy server has its failures forgiven, whereas an
+        unhealthy one counts a failure, so that a server that stays down stays ejected.
+
+        Returns:
+            int: The number of healthy servers.
+        """
+        healthy = 0
+        for endpoint in self._endpoints:
+            try:
+                with urlopen(
+                    endpoint.url + self._health_path,
+                    timeout=self._health_check_timeout,
+                ):
+                    pass
+            except Exception as e:
+                from icecream import ic
+
+                ic(f"Health check of {endpoint.url} failed. {str(e)}")
+                METRICS.increment(
+                    constants.METRIC__ENDPOINT_HEALTH_CHECK_FAILURES.format(
+                        endpoint=endpoint.name
+                    )
+                )
+                with self._lock:
+                    self._record_failure(endpoint)
+                continue
+            healthy += 1
+            with self._lock:
+                endpoint.failures = 0
+        return healthy
+
+    def statistics(self) -> List[dict]:
+        """
+        Describe the state of each server.
+
+        Returns:
+            List[dict]: The URL, calls in flight, moving average latency, failures in a row and ejection of each server.
+        """
+        with self._lock:
+            now = time.monotonic()
+            return [endpoint.describe(now) for endpoint in self._endpoints]
+
+    def _run(self):
+        """Check the health of the servers at every interval until the pool is stopped."""
+        while not self._stopped.wait(self._health_check_interval):
+            self.check_health()
+
+    def start(self):
+        """Start checking the health of the servers in a background thread, unless health checks are disabled."""
+        if self._thread is None and self._health_check_interval > 0:
+            self._thread = Thread(target=self._run, name="endpoint-health", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Stop checking the health of the servers."""
+        self._stopped.set()
+
+
+class PooledLLM(LLMWrapper):
+    """
+    A language model that sends each call to the language model of the server chosen by an endpoint pool.
+    The wrapped language model is that of the first server, which describes the model.
+    """
+
+    llms: Dict[str, LLM]
+
+    _pool: EndpointPool = PrivateAttr()
+
+    def __init__(self, pool: EndpointPool, **kwargs: Any):
+        super().__init__(**kwargs)
+        self._pool = pool
+
+    @property
+    def pool(self) -> EndpointPool:
+        """The pool of servers."""
+        return self._pool
+
+    def _call(self, key_prompt: str, kwargs: Dict[str, Any], call) -> Any:
+        with self._pool.endpoint() as endpoint:
+            return call(with_system_prompt(self.llms[endpoint.url], self.system_prompt))
+
+
+def build_pooled_llm(
+    urls: List[str], build: Callable[[str], LLM], health_path: str = None
+) -> LLM:
+    """
+    Build a language model for the servers of a self-hosted provider, which is pooled if there are several.
+
+    Args:
+        urls (List[str]): The URLs of the servers.
+        build (Callable[[str], LLM]): Builds the language model of a server, given its URL.
+        health_path (str): The path on each server that answers health checks. Defaults to None.
+
+    Returns:
+        LLM: The language model.
+    """
+    if len(urls) == 1:
+        return build(urls[0])
+    llms = {url: build(url) for url in urls}
+    return PooledLLM(
+        pool=EndpointPool.shared(urls, health_path),
+        llm=llms[urls[0]],
+        llms=llms,
+    )
+
+
+def endpoint_statistics() -> Dict[str, List[dict]]:
+    """
+    Describe the state of the servers of every shared endpoint pool.
+
+    Returns:
+        Dict[str, List[dict]]: The state of each server, by the comma-separated URLs of its pool.
+    """
+    with EndpointPool._shared_lock:
+        pools = list(EndpointPool._shared.values())
+    return {",".join(pool.urls): pool.statistics() for pool in pools}
@@ -0,0 +1,389 @@
+import hashlib
+import json
+import math
+import os
+import re
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from typing import Any, Callable, Dict, Iterable, List, Tuple
+
+from llama_index.core.llms.llm import LLM
+from pydantic import PrivateAttr
+
+import constants
+from recording import LLMWrapper, token_usage
+from reflection import estimate_tokens
+from translator import AgenticTranslator
+
+# Words, single punctuation marks, and single characters of the scripts written without spaces between words.
+_BLEU_TOKEN_PATTERN = re.compile(r"[぀-ヿ㐀-鿿가-힯豈-﫿]|\w+|[^\w\s]")
+
+
+class MeteredLLM(LLMWrapper):
+    """
+    A language model that counts the calls made to another one and their tokens, as reported by the
+    provider, or estimated if it reports none.
+    """
+
+    calls: int = 0
+    tokens: int = 0
+
+    _lock: Lock = PrivateAttr(default_factory=Lock)
+
+    def _call(self, key_prompt: str, kwargs: Dict[str, Any], call) -> Any:
+        response = super()._call(key_prompt, kwargs, call)
+        usage = token_usage(response)
+        tokens = (
+            sum(usage)
+            if usage
+            else estimate_tokens(self.system_prompt or "", key_prompt, str(response))
+        )
+        with self._lock:
+            self.calls += 1
+            self.tokens += tokens
+        return response
+
+
+def load_parallel_corpus(path: str) -> List[dict]:
+    """
+    Load a parallel corpus from a JSON Lines file, with the keys `source_language`, `target_language`,
+    `source` and `reference` on each line.
+
+    Args:
+        path (str): The path to the file.
+
+    Returns:
+        List[dict]: The segments of the corpus.
+    """
+    with open(path, encoding=constants.CHAR_ENCODING__UTF8) as corpus_file:
+        return [json.loads(line) for line in corpus_file if line.strip()]
+
+
+def _ngrams(items: List[str] | str, n: int) -> Counter:
+    """Count the n-grams of a sequence."""
+    return Counter(tuple(items[i : i + n]) for i in range(len(items) - n + 1))
+
+
+def chrf(
+    hypotheses: Iterable[str],
+    references: Iterable[str],
+    max_order: int = 6,
+    beta: float = 2.0,
+) -> float:
+    """
+    Compute the corpus-level chrF score, the F-score of character n-grams, ignoring whitespace, with recall
+    weighted `beta` times as much as precision.
+
+    Args:
+        hypotheses (Iterable[str]): The translations.
+        references (Iterable[str]): The reference translations, in the same order.
+        max_order (int): The maximum length of the character n-grams. Defaults to 6.
+        beta (float): The weight of recall. Defaults to 2.
+
+    Returns:
+        float: The score, between 0 and 100.
+    """
+    matches = [0] * max_order
+    hypothesis_counts = [0] * max_order
+    reference_counts = [0] * max_order
+    for hypothesis, reference in zip(hypotheses, references):
+        hypothesis = "".join(hypothesis.split())
+        reference = "".join(reference.split())
+        for n in range(1, max_order + 1):
+            hypothesis_ngrams = _ngrams(hypothesis, n)
+            reference_ngrams = _ngrams(reference, n)
+            matches[n - 1] += sum((hypothesis_ngrams & reference_ngrams).values())
+            hypothesis_counts[n - 1] += sum(hypothesis_ngrams.values())
+            reference_counts[n - 1] += sum(reference_ngrams.values())
+    orders = [
+        n for n in range(max_order) if hypothesis_counts[n] and reference_counts[n]
+    ]
+    if not orders:
+        return 0.0
+    precision = sum(matches[n] / hypothesis_counts[n] for n in orders) / len(orders)
+    recall = sum(matches[n] / reference_counts[n] for n in orders) / len(orders)
+    if precision + recall == 0:
+        return 0.0
+    return 100 * (1 + beta**2) * precision * recall / (beta**2 * precision + recall)
+
+
+def bleu(
+    hypotheses: Iterable[str], references: Iterable[str], max_order: int = 4
+) -> float:
+    """
+    Compute the corpus-level BLEU score, with add-one smoothing of the higher order n-gram precisions, so
+    that small corpora do not score 0. Characters of the scripts written without spaces count as words.
+
+    Args:
+        hypotheses (Iterable[str]): The translations.
+        references (Iterable[str]): The reference translations, in the same order.
+        max_order (int): The maximum length of the word n-grams. Defaults to 4.
+
+    Returns:
+        float: The score, between 0 and 100.
+    """
+    matches = [0] * max_order
+    totals = [0] * max_order
+    hypothesis_length = reference_length = 0
+    for hypothesis, reference in zip(hypotheses, references):
+        hypothesis_tokens = _BLEU_TOKEN_PATTERN.findall(hypothesis)
+        reference_tokens = _BLEU_TOKEN_PATTERN.findall(reference)
+        hypothesis_length += len(hypothesis_tokens)
+        reference_length += len(reference_tokens)
+        for n in range(1, max_order + 1):
+            hypothesis_ngrams = _ngrams(hypothesis_tokens, n)
+            matches[n - 1] += sum(
+                (hypothesis_ngrams & _ngrams(reference_tokens, n)).values()
+            )
+            totals[n - 1] += sum(hypothesis_ngrams.values())
+    if hypothesis_length == 0 or matches[0] == 0:
+        return 0.0
+    log_precision = (
+        sum(
+            math.log(
+                matches[n] / totals[n] if n == 0 else (matches[n] + 1) / (totals[n] + 1)
+            )
+            for n in range(max_order)
+        )
+        / max_order
+    )
+    brevity_penalty = min(0.0, 1 - reference_length / hypothesis_length)
+    return 100 * math.exp(brevity_penalty + log_precision)
+
+
+def prompts_fingerprint() -> str:
+    """Get a fingerprint of the prompts, so that cached results are not reused after a prompt changes."""
+    prompts = sorted(
+        (name, value)
+        for name, value in vars(constants).items()
+        if name.startswith("PROMPT__")
+    )
+    return hashlib.sha256(json.dumps(prompts).encode()).hexdigest()[:16]
+
+
+def result_key(system: str, mode: str, segment: dict, fingerprint: str) -> str:
+    """Get the key of the result of translating a segment, in the cache of results."""
+    return hashlib.sha256(
+        json.dumps(
+            [
+                system,
+                mode,
+                segment["source_language"],
+                segment["target_language"],
+                segment["source"],
+                fingerprint,
+            ],
+            ensure_ascii=False,
+        ).encode(constants.CHAR_ENCODING__UTF8)
+    ).hexdigest()[:32]
+
+
+def _load_cached_results(cache_path: str | None) -> Dict[str, dict]:
+    """Load the cached results, if any."""
+    if cache_path is None or not os.path.exists(cache_path):
+        return {}
+    with open(cache_path, encoding=constants.CHAR_ENCODING__UTF8) as cache_file:
+        return {
+            result["key"]: result
+            for result in map(json.loads, filter(str.strip, cache_file))
+        }
+
+
+def run_evaluation(
+    corpus: List[dict],
+    systems: Dict[str, Callable[[], LLM]],
+    modes: List[str],
+    max_workers: int = 4,
+    cache_path: str = None,
+    on_result: Callable[[dict], None] = None,
+) -> List[dict]:
+    """
+    Translate every segment of a corpus with every system and translation mode, in parallel. Results are
+    cached, so that a rerun only translates the segments, systems and modes that changed, and so does any
+    result after a prompt changes.
+
+    Args:
+        corpus (List[dict]): The segments, as loaded by `load_parallel_corpus`.
+        systems (Dict[str, Callable[[], LLM]]): The name of each system, such as a provider and model, with a function that builds its language model.
+        modes (List[str]): The translation modes to evaluate.
+        max_workers (int): The number of segments translated at the same time. Defaults to 4.
+        cache_path (str): The JSON Lines file of cached results. Defaults to None, which caches nothing.
+        on_result (Callable[[dict], None]): Called with each new result. Defaults to None.
+
+    Returns:
+        List[dict]: The result for each system, mode and segment, with the translation or the error, the latency, and the number of calls and the estimated tokens.
+    """
+    fingerprint = prompts_fingerprint()
+    cached_results = _load_cached_results(cache_path)
+    jobs: List[Tuple[str, str, int, str]] = []
+    results: Dict[str, dict] = {}
+    for system in systems:
+        for mode in modes:
+            for index, segment in enumerate(corpus):
+                key = result_key(system, mode, segment, fingerprint)
+                if key in cached_results:
+                    results[key] = cached_results[key]
+                else:
+                    jobs.append((system, mode, index, key))
+
+    # One language model for each system and language pair, shared by the segments of the pair, which
+    # have the same system prompt.
+    llms: Dict[Tuple[str, str, str], LLM] = {}
+    llms_lock = Lock()
+    cache_lock = Lock()
+
+    def llm_for(system: str, source_language: str, target_language: str) -> LLM:
+        with llms_lock:
+            key = (system, source_language, target_language)
+            if key not in llms:
+                llms[key] = systems[system]()
+            return llms[key]
+
+    def run(job: Tuple[str, str, int, str]) -> dict:
+        system, mode, index, key = job
+        segment = corpus[index]
+        result = {
+            "key": key,
+            "system": system,
+            "mode": mode,
+            "index": index,
+            "source_language": segment["source_language"],
+            "target_language": segment["target_language"],
+        }
+        llm = MeteredLLM(
+            llm=llm_for(system, segment["source_language"], segment["target_language"])
+        )
+        started_at = time.perf_counter()
+        try:
+            translator = AgenticTranslator(
+                llm=llm,
+                source_language=segment["source_language"],
+                target_language=segment["target_language"],
+            )
+            result["translation"] = translator.translate_in_mode(
+                segment["source"], mode=mode
+            )
+        except Exception as e:
+            result["error"] = str(e)
+        result["latency"] = time.perf_counter() - started_at
+        result["calls"] = llm.calls
+        result["tokens"] = llm.tokens
+        if cache_path is not None and "error" not in result:
+            with (
+                cache_lock,
+                open(
+                    cache_path, "a", encoding=constants.CHAR_ENCODING__UTF8
+                ) as cache_file,
+            ):
+                cache_file.write(json.dumps(result, ensure_ascii=False) + "\n")
+        if on_result is not None:
+            on_result(result)
+        return result
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for result in executor.map(run, jobs):
+            results[result["key"]] = result
+    return [
+        results[result_key(system, mode, segment, fingerprint)]
+        for system in systems
+        for mode in modes
+        for segment in corpus
+    ]
+
+
+def evaluation_report(results: List[dict], corpus: List[dict]) -> List[dict]:
+    """
+    Summarise the results for each system, translation mode and language pair: the quality scores, the
+    latency and the cost, and the quality per second and per thousand tokens.
+
+    Args:
+        results (List[dict]): The results of `run_evaluation`.
+        corpus (List[dict]): The segments of the corpus.
+
+    Returns:
+        List[dict]: A row for each system, mode and language pair.
+    """
+    groups: Dict[Tuple[str, str, str, str], List[dict]] = {}
+    for result in results:
+        groups.setdefault(
+            (
+                result["system"],
+                result["mode"],
+                result["source_language"],
+                result["target_language"],
+            ),
+            [],
+        ).append(result)
+    rows = []
+    for (system, mode, source_language, target_language), group in groups.items():
+        translated = [result for result in group if "error" not in result]
+        hypotheses = [result["translation"] for result in translated]
+        references = [corpus[result["index"]]["reference"] for result in translated]
+        latencies = sorted(result["latency"] for result in translated) or [0.0]
+        chrf_score = chrf(hypotheses, references)
+        mean_latency = sum(latencies) / len(latencies)
+        tokens = sum(result["tokens"] for result in translated) / max(
+            1, len(translated)
+        )
+        rows.append(
+            {
+                "system": system,
+                "mode": mode,
+                "pair": f"{source_language} → {target_language}",
+                "segments": len(group),
+                "errors": len(group) - len(translated),
+                "chrF": chrf_score,
+                "BLEU": bleu(hypotheses, references),
+                "latency_mean": mean_latency,
+                "latency_p95": latencies[int(round(0.95 * (len(latencies) - 1)))],
+                "calls": sum(result["calls"] for result in translated)
+                / max(1, len(translated)),
+                "tokens": tokens,
+                "chrF_per_second": chrf_score / mean_latency if mean_latency else None,
+                "chrF_per_1k_tokens": 1000 * chrf_score / tokens if tokens else None,
+            }
+        )
+    return rows
+
+
+def format_report(rows: List[dict]) -> str:
+    """
+    Format the rows of an evaluation report as a Markdown table.
+
+    Args:
+        rows (List[dict]): The rows of `evaluation_report`.
+
+    Returns:
+        str: The table.
+    """
+    columns = [
+        ("System", "system", "{}"),
+        ("Mode", "mode", "{}"),
+        ("Pair", "pair", "{}"),
+        ("Segments", "segments", "{}"),
+        ("Errors", "errors", "{}"),
+        ("chrF", "chrF", "{:.1f}"),
+        ("BLEU", "BLEU", "{:.1f}"),
+        ("Latency (s)", "latency_mean", "{:.2f}"),
+        ("p95 (s)", "latency_p95", "{:.2f}"),
+        ("Calls", "calls", "{:.1f}"),
+        ("Tokens", "tokens", "{:.0f}"),
+        ("chrF/s", "chrF_per_second", "{:.1f}"),
+        ("chrF/1k tokens", "chrF_per_1k_tokens", "{:.1f}"),
+    ]
+    lines = [
+        "| " + " | ".join(title for title, _, _ in columns) + " |",
+        "|" + "|".join("---" for _ in columns) + "|",
+    ]
+    for row in rows:
+        lines.append(
+            "| "
+            + " | ".join(
+                "-" if row[key] is None else template.format(row[key])
+                for _, key, template in columns
+            )
+            + " |"
+        )
+    return "\n".join(lines)
@@ -0,0 +1,279 @@
+import csv
+import time
+import unicodedata
+from threading import Lock
+from typing import Dict, Iterable, List, Tuple
+
+import constants
+from metrics import METRICS
+
+
+def _is_character_token(character: str) -> bool:
+    """Check whether a character is a token on its own, as in scripts written without spaces between words."""
+    code_point = ord(character)
+    return (
+        0x3040 <= code_point <= 0x30FF  # Hiragana and Katakana
+        or 0x3400 <= code_point <= 0x9FFF  # CJK Unified Ideographs
+        or 0xAC00 <= code_point <= 0xD7AF  # Hangul syllables
+        or 0xF900 <= code_point <= 0xFAFF  # CJK Compatibility Ideographs
+    )
+
+
+def tokenize(text: str) -> List[Tuple[str, int, int]]:
+    """
+    Split a text into case-folded tokens for terminology matching: words, numbers, and single characters
+    of the scripts written without spaces between words.
+
+    Args:
+        text (str): The text.
+
+    Returns:
+        List[Tuple[str, int, int]]: The tokens with their start and end offsets in the text.
+    """
+    tokens = []
+    start = None
+    for i, character in enumerate(text):
+        if _is_character_token(character):
+            if start is not None:
+                tokens.append((text[start:i].casefold(), start, i))
+                start = None
+            tokens.append((character, i, i + 1))
+        elif character.isalnum() or unicodedata.category(character).startswith("M"):
+            if start is None:
+                start = i
+        elif start is not None:
+            tokens.append((text[start:i].casefold(), start, i))
+            start = None
+    if start is not None:
+        tokens.append((text[start:].casefold(), start, len(text)))
+    return tokens
+
+
+class TermMatcher:
+    """
+    An Aho-Corasick automaton over tokens, which finds every occurrence of any of its terms in a text in a
+    single pass, however many terms there are. Terms only match whole tokens, so that a term is not found
+    inside a longer word.
+    """
+
+    def __init__(self, terms: Iterable[str]):
+        """
+        Build the automaton.
+
+        Args:
+            terms (Iterable[str]): The terms to match, in the order of their indices.
+        """
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        # The index and the number of tokens of the term ending at each node, if any.
+        self._terminal: List[Tuple[int, int] | None] = [None]
+        # The nearest node along the failure links at which a term ends.
+        self._output: List[int] = [0]
+        for term_index, term in enumerate(terms):
+            node = 0
+            term_tokens = [token for token, _, _ in tokenize(term)]
+            if not term_tokens:
+                continue
+            for token in term_tokens:
+                next_node = self._goto[node].get(token)
+                if next_node is None:
+                    next_node = len(self._goto)
+                    self._goto[node][token] = next_node
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._terminal.append(None)
+                    self._output.append(0)
+                node = next_node
+            if self._terminal[node] is None:
+                self._terminal[node] = (term_index, len(term_tokens))
+        self._build_failure_links()
+
+    def _build_failure_links(self):
+        """Link each node to the node of its longest proper suffix, in breadth-first order."""
+        queue = list(self._goto[0].values())
+        head = 0
+        while head < len(queue):
+            node = queue[head]
+            head += 1
+            for token, child in self._goto[node].items():
+                queue.append(child)
+                fallback = self._fail[node]
+                while fallback and token not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(token, 0)
+                suffix = self._fail[child]
+                self._output[child] = (
+                    suffix
+                    if self._terminal[suffix] is not None
+                    else self._output[suffix]
+                )
+
+    def __len__(self) -> int:
+        return len(self._goto)
+
+    def find(self, text: str) -> List[Tuple[int, int, int]]:
+        """
+        Find the terms in a text, preferring the leftmost and then the longest of overlapping terms.
+
+        Args:
+            text (str): The text.
+
+        Returns:
+            List[Tuple[int, int, int]]: The index of each matched term with its start and end offsets in the text.
+        """
+        tokens = tokenize(text)
+        matches = []
+        node = 0
+        for position, (token, _, end) in enumerate(tokens):
+            while node and token not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(token, 0)
+            match_node = (
+                node if self._terminal[node] is not None else self._output[node]
+            )
+            while match_node:
+                term_index, length = self._terminal[match_node]
+                matches.append((tokens[position - length + 1][1], end, term_index))
+                match_node = self._output[match_node]
+        matches.sort(key=lambda match: (match[0], match[0] - match[1]))
+        selected = []
+        covered_until = 0
+        for start, end, term_index in matches:
+            if start >= covered_until:
+                selected.append((term_index, start, end))
+                covered_until = end
+        return selected
+
+
+class TerminologyStore:
+    """
+    The mandated translations of terms for each language pair, with a matcher for each pair that is built
+    once, when the store is loaded.
+    """
+
+    _shared: Dict[str, "TerminologyStore"] = {}
+    _shared_lock = Lock()
+
+    def __init__(self, entries: Iterable[Tuple[str, str, str, str]]):
+        """
+        Build the store.
+
+        Args:
+            entries (Iterable[Tuple[str, str, str, str]]): The source language, the target language, the source term and its mandated translation of each entry.
+        """
+        terms: Dict[Tuple[str, str], List[Tuple[str, str]]] = {}
+        for source_language, target_language, source_term, target_term in entries:
+            terms.setdefault((source_language, target_language), []).append(
+                (source_term.strip(), target_term.strip())
+            )
+        self._terms = terms
+        self._matchers = {
+            pair: TermMatcher(source_term for source_term, _ in pair_terms)
+            for pair, pair_terms in terms.items()
+        }
+
+    @classmethod
+    def from_file(cls, path: str) -> "TerminologyStore":
+        """
+        Load a store from a CSV file with the columns `source_language`, `target_language`, `source_term`
+        and `target_term`.
+
+        Args:
+            path (str): The path to the file.
+
+        Returns:
+            TerminologyStore: The store.
+        """
+        with open(path, newline="", encoding=constants.CHAR_ENCODING__UTF8) as file:
+            return cls(
+                (
+                    row["source_language"],
+                    row["target_language"],
+                    row["source_term"],
+                    row["target_term"],
+                )
+                for row in csv.DictReader(file)
+            )
+
+    @classmethod
+    def shared(cls, path: str) -> "TerminologyStore":
+        """
+        Get the process-level store loaded from a file, which is loaded only once.
+
+        Args:
+            path (str): The path to the file.
+
+        Returns:
+            TerminologyStore: The shared store.
+        """
+        with cls._shared_lock:
+            if path not in cls._shared:
+                started_at = time.perf_counter()
+                cls._shared[path] = cls.from_file(path)
+                METRICS.observe(
+                    constants.METRIC__GLOSSARY_LOAD_LATENCY,
+                    time.perf_counter() - started_at,
+                )
+            return cls._shared[path]
+
+    def match(
+        self, source_text: str, source_language: str, target_language: str
+    ) -> List[Tuple[str, str]]:
+        """
+        Find the entries whose source terms occur in a text.
+
+        Args:
+            source_text (str): The text.
+            source_language (str): The source language of the text.
+            target_language (str): The target language.
+
+        Returns:
+            List[Tuple[str, str]]: The distinct matched source terms and their mandated translations, in the order of their first occurrence.
+        """
+        matcher = self._matchers.get((source_language, target_language))
+        if matcher is None:
+            return []
+        started_at = time.perf_counter()
+        pair_terms = self._terms[(source_language, target_language)]
+        matched = list(
+            dict.fromkeys(
+                pair_terms[term_index] for term_index, _, _ in matcher.find(source_text)
+            )
+        )
+        METRICS.observe(
+            constants.METRIC__GLOSSARY_MATCH_LATENCY, time.perf_counter() - started_at
+        )
+        METRICS.observe(constants.METRIC__GLOSSARY_MATCHED_TERMS, len(matched))
+        return matched
+
+
+def format_glossary(
+    entries: List[Tuple[str, str]],
+    source_language: str,
+    target_language: str,
+    max_entries: int = 50,
+) -> str:
+    """
+    Format matched glossary entries for a prompt.
+
+    Args:
+        entries (List[Tuple[str, str]]): The source terms and their mandated translations.
+        source_language (str): The source language.
+        target_language (str): The target language.
+        max_entries (int): The maximum number of entries to include. Defaults to 50.
+
+    Returns:
+        str: The glossary section of a prompt, or an empty string if there are no entries.
+    """
+    if not entries:
+        return constants.EMPTY_STRING
+    return constants.PROMPT__GLOSSARY.format(
+        source_language=source_language,
+        target_language=target_language,
+        glossary_entries="\n".join(
+            constants.PROMPT__GLOSSARY_ENTRY.format(
+                source_term=source_term, target_term=target_term
+            )
+            for source_term, target_term in entries[:max_entries]
+        ),
+    )
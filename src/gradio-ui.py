@@ -1,14 +1,47 @@
 import os
 from icecream import ic
 import constants
+import providers
 
 import gradio as gr
 
 from dotenv import load_dotenv
-from llama_index.llms.cohere import Cohere
-from llama_index.llms.openai import OpenAI
-from llama_index.llms.llamafile import Llamafile
-from llama_index.llms.ollama import Ollama
+from llama_index.core.llms.llm import LLM
+from accounting import UsageAccount, UsageBudget, UsageLedger
+from batching import TranslationBatcher
+from cancellation import (
+    CancellationRegistry,
+    CancellationToken,
+    TranslationCancelledError,
+)
+from glossary import TerminologyStore
+from language_detection import resolve_source_language
+from memory import (
+    InputTooLargeError,
+    SpilledText,
+    check_text_length,
+    keep_text,
+    preview_of,
+    read_text_upload,
+    text_of,
+)
+from metrics import METRICS
+from precompute import (
+    precomputed_cache,
+    record_request,
+    start_precompute_from_environment,
+)
+from queueing import PriorityLanes, QueueFullError
+from recording import build_recorded_llm
+from reflection import ReflectionBudget
+from resilience import ResilientCaller
+from racing import ProviderRace
+from routing import (
+    parse_llm_providers,
+    parse_stage_assignments,
+    parse_stage_llm_providers,
+)
+from semantic_cache import SemanticCache
 from translator import AgenticTranslator
 
 
@@ -24,13 +57,64 @@ rc_settings__cohere_model: gr.State = gr.State(constants.EMPTY_STRING)
 rc_settings__llamafile_url: gr.State = gr.State(constants.EMPTY_STRING)
 rc_settings__ollama_url: gr.State = gr.State(constants.EMPTY_STRING)
 rc_settings__ollama_model: gr.State = gr.State(constants.EMPTY_STRING)
+rc_settings__ollama_keep_alive: gr.State = gr.State(constants.EMPTY_STRING)
 rc_settings__openai_api_key: gr.State = gr.State(constants.EMPTY_STRING)
 rc_settings__openai_model: gr.State = gr.State(constants.EMPTY_STRING)
 rc_settings__llm_temperature: gr.State = gr.State(0.0)
+rc_settings__stage_llm_providers: gr.State = gr.State(constants.EMPTY_STRING)
+rc_settings__escalation_llm_provider: gr.State = gr.State(constants.EMPTY_STRING)
+rc_settings__race_llm_providers: gr.State = gr.State(constants.EMPTY_STRING)
+rc_settings__race_strategy: gr.State = gr.State(constants.EMPTY_STRING)
+rc_settings__segment_texts: gr.State = gr.State(False)
+rc_settings__structured_outputs: gr.State = gr.State(False)
+rc_settings__reflection_max_rounds: gr.State = gr.State(1)
+rc_settings__reflection_token_budget: gr.State = gr.State(0)
+rc_settings__reflection_time_budget: gr.State = gr.State(0.0)
+rc_settings__reflection_min_change: gr.State = gr.State(0.0)
+rc_settings__llm_call_deadline: gr.State = gr.State(0.0)
+rc_settings__llm_stage_deadlines: gr.State = gr.State(constants.EMPTY_STRING)
+rc_settings__translation_deadline: gr.State = gr.State(0.0)
+rc_settings__request_token_budget: gr.State = gr.State(0)
+rc_settings__request_cost_budget: gr.State = gr.State(0.0)
+rc_settings__tenant_token_budget: gr.State = gr.State(0)
+rc_settings__tenant_cost_budget: gr.State = gr.State(0.0)
+rc_settings__tenant_budget_period: gr.State = gr.State(0.0)
+rc_settings__llm_call_retries: gr.State = gr.State(0)
+rc_settings__llm_hedging: gr.State = gr.State(False)
+rc_settings__failover_llm_provider: gr.State = gr.State(constants.EMPTY_STRING)
+rc_settings__translate_queue_max_size: gr.State = gr.State(0)
+rc_settings__short_lane_text_length: gr.State = gr.State(0)
+rc_settings__short_lane_concurrency: gr.State = gr.State(0)
+rc_settings__long_lane_concurrency: gr.State = gr.State(0)
+rc_settings__lane_max_waiting: gr.State = gr.State(0)
+rc_settings__lane_max_wait_seconds: gr.State = gr.State(0.0)
+rc_settings__max_input_characters: gr.State = gr.State(0)
+rc_settings__spill_characters: gr.State = gr.State(0)
+rc_settings__translation_mode: gr.State = gr.State(constants.EMPTY_STRING)
+rc_settings__auto_mode_short_text_length: gr.State = gr.State(0)
+rc_settings__auto_mode_max_queue_depth: gr.State = gr.State(0)
+rc_settings__semantic_cache: gr.State = gr.State(False)
+rc_settings__semantic_cache_threshold: gr.State = gr.State(0.0)
+rc_settings__semantic_cache_max_entries: gr.State = gr.State(0)
+rc_settings__glossary_path: gr.State = gr.State(constants.EMPTY_STRING)
+rc_settings__llm_record_path: gr.State = gr.State(constants.EMPTY_STRING)
+rc_settings__llm_replay_path: gr.State = gr.State(constants.EMPTY_STRING)
+rc_settings__llm_replay_speed: gr.State = gr.State(1.0)
+rc_settings__batch_window: gr.State = gr.State(0.0)
+rc_settings__batch_max_size: gr.State = gr.State(1)
+rc_settings__batch_max_characters: gr.State = gr.State(0)
+
+rc_settings__warm_up: gr.State = gr.State(False)
+rc_settings__warm_up_connect: gr.State = gr.State(False)
 
 rc_settings__initialised: gr.State = gr.State(False)
 
 rc_global__llm: gr.State = gr.State(None)
+rc_global__stage_llms: gr.State = gr.State({})
+rc_global__escalation_llm: gr.State = gr.State(None)
+rc_global__race_llms: gr.State = gr.State({})
+rc_global__caller: gr.State = gr.State(None)
+rc_global__lanes: gr.State = gr.State(None)
 
 
 class GradioUI:
@@ -56,14 +140,11 @@ class GradioUI:
         """
 
         parsed_value = None
-        if isinstance(type_cast, bool):
-            parsed_value = os.getenv(env_key, default_value).lower() in [
-                "true",
-                "yes",
-                "t",
-                "y",
-                "on",
-            ]
+        if type_cast is bool:
+            parsed_value = (
+                os.getenv(env_key, default_value).lower()
+                in constants.BOOLEAN_TRUE_VALUES
+            )
         else:
             parsed_value = os.getenv(env_key, default_value)
 
@@ -73,32 +154,126 @@ class GradioUI:
             else [type_cast(v) for v in parsed_value.split(list_split_char)]
         )
 
+    def build_llm(self, llm_provider: str) -> LLM:
+        """
+        Build a language model for a provider, using the settings of that provider, whose calls are recorded
+        or replayed if set.
+
+        Args:
+            llm_provider (str): The language model provider.
+
+        Returns:
+            LLM: The language model.
+        """
+        return build_recorded_llm(
+            lambda: providers.build_llm(
+                llm_provider,
+                temperature=rc_settings__llm_temperature.value,
+                cohere_api_key=rc_settings__cohere_api_key.value,
+                cohere_model=rc_settings__cohere_model.value,
+                llamafile_url=rc_settings__llamafile_url.value,
+                ollama_url=rc_settings__ollama_url.value,
+                ollama_model=rc_settings__ollama_model.value,
+                ollama_keep_alive=rc_settings__ollama_keep_alive.value,
+                openai_api_key=rc_settings__openai_api_key.value,
+                openai_model=rc_settings__openai_model.value,
+            ),
+            record_path=rc_settings__llm_record_path.value,
+            replay_path=rc_settings__llm_replay_path.value,
+            replay_speed=rc_settings__llm_replay_speed.value,
+            replay_class_name=providers.llm_class_name(llm_provider),
+        )
+
     def update_llm(self):
-        """Update the language model based on the selected provider."""
-        match rc_settings__llm_provider.value:
-            case constants.LLM_PROVIDER__COHERE:
-                rc_global__llm.value = Cohere(
-                    api_key=rc_settings__cohere_api_key.value,
-                    model=rc_settings__cohere_model.value,
-                    temperature=rc_settings__llm_temperature.value,
-                )
-            case constants.LLM_PROVIDER__OPENAI:
-                rc_global__llm.value = OpenAI(
-                    api_key=rc_settings__openai_api_key.value,
-                    model=rc_settings__openai_model.value,
-                    temperature=rc_settings__llm_temperature.value,
-                )
-            case constants.LLM_PROVIDER__LLAMAFILE:
-                rc_global__llm.value = Llamafile(
-                    url=rc_settings__llamafile_url.value,
-                    temperature=rc_settings__llm_temperature.value,
-                )
-            case constants.LLM_PROVIDER__OLLAMA:
-                rc_global__llm.value = Ollama(
-                    url=rc_settings__ollama_url.value,
-                    model=rc_settings__ollama_model.value,
-                    temperature=rc_settings__llm_temperature.value,
-                )
+        """Update the language models based on the selected provider, the providers of the pipeline stages and those raced."""
+        rc_global__llm.value = self.build_llm(rc_settings__llm_provider.value)
+        rc_global__stage_llms.value = {
+            stage: self.build_llm(llm_provider)
+            for stage, llm_provider in parse_stage_llm_providers(
+                rc_settings__stage_llm_providers.value
+            ).items()
+        }
+        rc_global__escalation_llm.value = (
+            self.build_llm(rc_settings__escalation_llm_provider.value)
+            if rc_settings__escalation_llm_provider.value
+            else None
+        )
+        rc_global__race_llms.value = {
+            llm_provider: self.build_llm(llm_provider)
+            for llm_provider in parse_llm_providers(
+                rc_settings__race_llm_providers.value
+            )
+        }
+        rc_global__caller.value = ResilientCaller(
+            default_deadline=rc_settings__llm_call_deadline.value,
+            stage_deadlines={
+                stage: float(deadline)
+                for stage, deadline in parse_stage_assignments(
+                    rc_settings__llm_stage_deadlines.value
+                ).items()
+            },
+            max_retries=rc_settings__llm_call_retries.value,
+            hedging=rc_settings__llm_hedging.value,
+            failover_llm=(
+                self.build_llm(rc_settings__failover_llm_provider.value)
+                if rc_settings__failover_llm_provider.value
+                else None
+            ),
+        )
+
+    def get_batcher(self) -> TranslationBatcher:
+        """Get the process-level batcher for the selected language model, or None if batching is disabled."""
+        if rc_settings__batch_window.value <= 0:
+            return None
+        return TranslationBatcher.shared(
+            rc_global__stage_llms.value.get(
+                constants.STAGE__TRANSLATE, rc_global__llm.value
+            ),
+            window=rc_settings__batch_window.value,
+            max_batch_size=rc_settings__batch_max_size.value,
+            max_batch_characters=rc_settings__batch_max_characters.value,
+            # The call of the leader of a batch is bounded by the call deadline.
+            max_wait=rc_settings__llm_call_deadline.value,
+        )
+
+    def get_semantic_cache(self) -> SemanticCache:
+        """Get the process-level semantic cache, or None if it is disabled."""
+        if not rc_settings__semantic_cache.value:
+            return None
+        return SemanticCache.shared(
+            threshold=rc_settings__semantic_cache_threshold.value,
+            max_entries_per_pair=rc_settings__semantic_cache_max_entries.value,
+        )
+
+    def get_glossary(self) -> TerminologyStore:
+        """Get the process-level glossary, which is loaded on first use, or None if there is none."""
+        if not rc_settings__glossary_path.value:
+            return None
+        return TerminologyStore.shared(rc_settings__glossary_path.value)
+
+    def start_usage_account(self, session: str) -> UsageAccount:
+        """Start the usage account of a translation of a session, with the budgets of the request and of the session."""
+        return UsageLedger.shared().start(
+            session,
+            budget=UsageBudget(
+                rc_settings__request_token_budget.value,
+                rc_settings__request_cost_budget.value,
+            ),
+            tenant_budget=UsageBudget(
+                rc_settings__tenant_token_budget.value,
+                rc_settings__tenant_cost_budget.value,
+            ),
+            period=rc_settings__tenant_budget_period.value,
+        )
+
+    def get_reflection_budget(self) -> ReflectionBudget:
+        """Get the limits of the assessment and improvement rounds of reflective translations."""
+        return ReflectionBudget(
+            max_rounds=rc_settings__reflection_max_rounds.value,
+            max_tokens=rc_settings__reflection_token_budget.value,
+            max_seconds=rc_settings__reflection_time_budget.value,
+            min_change=rc_settings__reflection_min_change.value,
+        )
 
     def initialise_settings(self):
         """Initialise the settings for the app by reading from the environment variables, if available."""
@@ -133,6 +308,11 @@ class GradioUI:
                 constants.ENV_KEY__OLLAMA_MODEL,
                 constants.DEFAULT_VALUE__OLLAMA_MODEL,
             )
+            self.read_env_setting(
+                rc_settings__ollama_keep_alive,
+                constants.ENV_KEY__OLLAMA_KEEP_ALIVE,
+                constants.DEFAULT_VALUE__OLLAMA_KEEP_ALIVE,
+            )
             self.read_env_setting(
                 rc_settings__openai_api_key,
                 constants.ENV_KEY__OPENAI_API_KEY,
@@ -148,7 +328,268 @@ class GradioUI:
                 constants.DEFAULT_VALUE__LLM_TEMPERATURE,
                 type_cast=float,
             )
+            self.read_env_setting(
+                rc_settings__warm_up,
+                constants.ENV_KEY__WARM_UP,
+                constants.DEFAULT_VALUE__WARM_UP,
+                type_cast=bool,
+            )
+            self.read_env_setting(
+                rc_settings__warm_up_connect,
+                constants.ENV_KEY__WARM_UP_CONNECT,
+                constants.DEFAULT_VALUE__WARM_UP_CONNECT,
+                type_cast=bool,
+            )
+            self.read_env_setting(
+                rc_settings__stage_llm_providers,
+                constants.ENV_KEY__STAGE_LLM_PROVIDERS,
+                constants.DEFAULT_VALUE__STAGE_LLM_PROVIDERS,
+            )
+            self.read_env_setting(
+                rc_settings__escalation_llm_provider,
+                constants.ENV_KEY__ESCALATION_LLM_PROVIDER,
+                constants.DEFAULT_VALUE__ESCALATION_LLM_PROVIDER,
+            )
+            self.read_env_setting(
+                rc_settings__race_llm_providers,
+                constants.ENV_KEY__RACE_LLM_PROVIDERS,
+                constants.DEFAULT_VALUE__RACE_LLM_PROVIDERS,
+            )
+            self.read_env_setting(
+                rc_settings__race_strategy,
+                constants.ENV_KEY__RACE_STRATEGY,
+                constants.DEFAULT_VALUE__RACE_STRATEGY,
+            )
+            self.read_env_setting(
+                rc_settings__segment_texts,
+                constants.ENV_KEY__SEGMENT_TEXTS,
+                constants.DEFAULT_VALUE__SEGMENT_TEXTS,
+                type_cast=bool,
+            )
+            self.read_env_setting(
+                rc_settings__structured_outputs,
+                constants.ENV_KEY__STRUCTURED_OUTPUTS,
+                constants.DEFAULT_VALUE__STRUCTURED_OUTPUTS,
+                type_cast=bool,
+            )
+            self.read_env_setting(
+                rc_settings__reflection_max_rounds,
+                constants.ENV_KEY__REFLECTION_MAX_ROUNDS,
+                constants.DEFAULT_VALUE__REFLECTION_MAX_ROUNDS,
+                type_cast=int,
+            )
+            self.read_env_setting(
+                rc_settings__reflection_token_budget,
+                constants.ENV_KEY__REFLECTION_TOKEN_BUDGET,
+                constants.DEFAULT_VALUE__REFLECTION_TOKEN_BUDGET,
+                type_cast=int,
+            )
+            self.read_env_setting(
+                rc_settings__reflection_time_budget,
+                constants.ENV_KEY__REFLECTION_TIME_BUDGET,
+                constants.DEFAULT_VALUE__REFLECTION_TIME_BUDGET,
+                type_cast=float,
+            )
+            self.read_env_setting(
+                rc_settings__reflection_min_change,
+                constants.ENV_KEY__REFLECTION_MIN_CHANGE,
+                constants.DEFAULT_VALUE__REFLECTION_MIN_CHANGE,
+                type_cast=float,
+            )
+            self.read_env_setting(
+                rc_settings__llm_call_deadline,
+                constants.ENV_KEY__LLM_CALL_DEADLINE,
+                constants.DEFAULT_VALUE__LLM_CALL_DEADLINE,
+                type_cast=float,
+            )
+            self.read_env_setting(
+                rc_settings__llm_stage_deadlines,
+                constants.ENV_KEY__LLM_STAGE_DEADLINES,
+                constants.DEFAULT_VALUE__LLM_STAGE_DEADLINES,
+            )
+            self.read_env_setting(
+                rc_settings__translation_deadline,
+                constants.ENV_KEY__TRANSLATION_DEADLINE,
+                constants.DEFAULT_VALUE__TRANSLATION_DEADLINE,
+                type_cast=float,
+            )
+            self.read_env_setting(
+                rc_settings__request_token_budget,
+                constants.ENV_KEY__REQUEST_TOKEN_BUDGET,
+                constants.DEFAULT_VALUE__REQUEST_TOKEN_BUDGET,
+                type_cast=int,
+            )
+            self.read_env_setting(
+                rc_settings__request_cost_budget,
+                constants.ENV_KEY__REQUEST_COST_BUDGET,
+                constants.DEFAULT_VALUE__REQUEST_COST_BUDGET,
+                type_cast=float,
+            )
+            self.read_env_setting(
+                rc_settings__tenant_token_budget,
+                constants.ENV_KEY__TENANT_TOKEN_BUDGET,
+                constants.DEFAULT_VALUE__TENANT_TOKEN_BUDGET,
+                type_cast=int,
+            )
+            self.read_env_setting(
+                rc_settings__tenant_cost_budget,
+                constants.ENV_KEY__TENANT_COST_BUDGET,
+                constants.DEFAULT_VALUE__TENANT_COST_BUDGET,
+                type_cast=float,
+            )
+            self.read_env_setting(
+                rc_settings__tenant_budget_period,
+                constants.ENV_KEY__TENANT_BUDGET_PERIOD,
+                constants.DEFAULT_VALUE__TENANT_BUDGET_PERIOD,
+                type_cast=float,
+            )
+            self.read_env_setting(
+                rc_settings__llm_call_retries,
+                constants.ENV_KEY__LLM_CALL_RETRIES,
+                constants.DEFAULT_VALUE__LLM_CALL_RETRIES,
+                type_cast=int,
+            )
+            self.read_env_setting(
+                rc_settings__llm_hedging,
+                constants.ENV_KEY__LLM_HEDGING,
+                constants.DEFAULT_VALUE__LLM_HEDGING,
+                type_cast=bool,
+            )
+            self.read_env_setting(
+                rc_settings__failover_llm_provider,
+                constants.ENV_KEY__FAILOVER_LLM_PROVIDER,
+                constants.DEFAULT_VALUE__FAILOVER_LLM_PROVIDER,
+            )
+            self.read_env_setting(
+                rc_settings__translate_queue_max_size,
+                constants.ENV_KEY__TRANSLATE_QUEUE_MAX_SIZE,
+                constants.DEFAULT_VALUE__TRANSLATE_QUEUE_MAX_SIZE,
+                type_cast=int,
+            )
+            self.read_env_setting(
+                rc_settings__short_lane_text_length,
+                constants.ENV_KEY__SHORT_LANE_TEXT_LENGTH,
+                constants.DEFAULT_VALUE__SHORT_LANE_TEXT_LENGTH,
+                type_cast=int,
+            )
+            self.read_env_setting(
+                rc_settings__short_lane_concurrency,
+                constants.ENV_KEY__SHORT_LANE_CONCURRENCY,
+                constants.DEFAULT_VALUE__SHORT_LANE_CONCURRENCY,
+                type_cast=int,
+            )
+            self.read_env_setting(
+                rc_settings__long_lane_concurrency,
+                constants.ENV_KEY__LONG_LANE_CONCURRENCY,
+                constants.DEFAULT_VALUE__LONG_LANE_CONCURRENCY,
+                type_cast=int,
+            )
+            self.read_env_setting(
+                rc_settings__lane_max_waiting,
+                constants.ENV_KEY__LANE_MAX_WAITING,
+                constants.DEFAULT_VALUE__LANE_MAX_WAITING,
+                type_cast=int,
+            )
+            self.read_env_setting(
+                rc_settings__lane_max_wait_seconds,
+                constants.ENV_KEY__LANE_MAX_WAIT_SECONDS,
+                constants.DEFAULT_VALUE__LANE_MAX_WAIT_SECONDS,
+                type_cast=float,
+            )
+            self.read_env_setting(
+                rc_settings__max_input_characters,
+                constants.ENV_KEY__MAX_INPUT_CHARACTERS,
+                constants.DEFAULT_VALUE__MAX_INPUT_CHARACTERS,
+                type_cast=int,
+            )
+            self.read_env_setting(
+                rc_settings__spill_characters,
+                constants.ENV_KEY__SPILL_CHARACTERS,
+                constants.DEFAULT_VALUE__SPILL_CHARACTERS,
+                type_cast=int,
+            )
+            self.read_env_setting(
+                rc_settings__translation_mode,
+                constants.ENV_KEY__TRANSLATION_MODE,
+                constants.DEFAULT_VALUE__TRANSLATION_MODE,
+            )
+            self.read_env_setting(
+                rc_settings__auto_mode_short_text_length,
+                constants.ENV_KEY__AUTO_MODE_SHORT_TEXT_LENGTH,
+                constants.DEFAULT_VALUE__AUTO_MODE_SHORT_TEXT_LENGTH,
+                type_cast=int,
+            )
+            self.read_env_setting(
+                rc_settings__auto_mode_max_queue_depth,
+                constants.ENV_KEY__AUTO_MODE_MAX_QUEUE_DEPTH,
+                constants.DEFAULT_VALUE__AUTO_MODE_MAX_QUEUE_DEPTH,
+                type_cast=int,
+            )
+            self.read_env_setting(
+                rc_settings__semantic_cache,
+                constants.ENV_KEY__SEMANTIC_CACHE,
+                constants.DEFAULT_VALUE__SEMANTIC_CACHE,
+                type_cast=bool,
+            )
+            self.read_env_setting(
+                rc_settings__semantic_cache_threshold,
+                constants.ENV_KEY__SEMANTIC_CACHE_THRESHOLD,
+                constants.DEFAULT_VALUE__SEMANTIC_CACHE_THRESHOLD,
+                type_cast=float,
+            )
+            self.read_env_setting(
+                rc_settings__semantic_cache_max_entries,
+                constants.ENV_KEY__SEMANTIC_CACHE_MAX_ENTRIES,
+                constants.DEFAULT_VALUE__SEMANTIC_CACHE_MAX_ENTRIES,
+                type_cast=int,
+            )
+            self.read_env_setting(
+                rc_settings__glossary_path,
+                constants.ENV_KEY__GLOSSARY_PATH,
+                constants.DEFAULT_VALUE__GLOSSARY_PATH,
+            )
+            self.read_env_setting(
+                rc_settings__llm_record_path,
+                constants.ENV_KEY__LLM_RECORD_PATH,
+                constants.DEFAULT_VALUE__LLM_RECORD_PATH,
+            )
+            self.read_env_setting(
+                rc_settings__llm_replay_path,
+                constants.ENV_KEY__LLM_REPLAY_PATH,
+                constants.DEFAULT_VALUE__LLM_REPLAY_PATH,
+            )
+            self.read_env_setting(
+                rc_settings__llm_replay_speed,
+                constants.ENV_KEY__LLM_REPLAY_SPEED,
+                constants.DEFAULT_VALUE__LLM_REPLAY_SPEED,
+                type_cast=float,
+            )
+            self.read_env_setting(
+                rc_settings__batch_window,
+                constants.ENV_KEY__BATCH_WINDOW,
+                constants.DEFAULT_VALUE__BATCH_WINDOW,
+                type_cast=float,
+            )
+            self.read_env_setting(
+                rc_settings__batch_max_size,
+                constants.ENV_KEY__BATCH_MAX_SIZE,
+                constants.DEFAULT_VALUE__BATCH_MAX_SIZE,
+                type_cast=int,
+            )
+            self.read_env_setting(
+                rc_settings__batch_max_characters,
+                constants.ENV_KEY__BATCH_MAX_CHARACTERS,
+                constants.DEFAULT_VALUE__BATCH_MAX_CHARACTERS,
+                type_cast=int,
+            )
             self.update_llm()
+            rc_global__lanes.value = PriorityLanes(
+                short_text_length=rc_settings__short_lane_text_length.value,
+                short_lane_concurrency=rc_settings__short_lane_concurrency.value,
+                long_lane_concurrency=rc_settings__long_lane_concurrency.value,
+                max_waiting=rc_settings__lane_max_waiting.value,
+                max_wait=rc_settings__lane_max_wait_seconds.value,
+            )
             rc_settings__initialised.value = True
 
     def construct_ui(self):
@@ -215,7 +656,7 @@ class GradioUI:
                             gr.Textbox(
                                 label="Llamafile URL",
                                 value=rc_settings__llamafile_url.value,
-                                info="The URL must point to a running Llamafile (HTTP endpoint).",
+                                info="The URL must point to a running Llamafile (HTTP endpoint), or the comma-separated URLs to several.",
                                 interactive=True,
                                 # on_value=update_llm,
                             )
@@ -231,7 +672,7 @@ class GradioUI:
                             gr.Textbox(
                                 label="Ollama URL",
                                 value=rc_settings__ollama_url.value,
-                                info="The URL must point to a running Ollama server.",
+                                info="The URL must point to a running Ollama server, or the comma-separated URLs to several.",
                                 interactive=True,
                                 # on_value=update_llm,
                             )
@@ -267,30 +708,7 @@ class GradioUI:
                             api_name=False,
                         )
                         def change_llm_provider(llm_provider_value):
-                            match llm_provider_value:
-                                case constants.LLM_PROVIDER__COHERE:
-                                    rc_global__llm.value = Cohere(
-                                        api_key=rc_settings__cohere_api_key.value,
-                                        model=rc_settings__cohere_model.value,
-                                        temperature=rc_settings__llm_temperature.value,
-                                    )
-                                case constants.LLM_PROVIDER__OPENAI:
-                                    rc_global__llm.value = OpenAI(
-                                        api_key=rc_settings__openai_api_key.value,
-                                        model=rc_settings__openai_model.value,
-                                        temperature=rc_settings__llm_temperature.value,
-                                    )
-                                case constants.LLM_PROVIDER__LLAMAFILE:
-                                    rc_global__llm.value = Llamafile(
-                                        url=rc_settings__llamafile_url.value,
-                                        temperature=rc_settings__llm_temperature.value,
-                                    )
-                                case constants.LLM_PROVIDER__OLLAMA:
-                                    rc_global__llm.value = Ollama(
-                                        url=rc_settings__ollama_url.value,
-                                        model=rc_settings__ollama_model.value,
-                                        temperature=rc_settings__llm_temperature.value,
-                                    )
+                            rc_global__llm.value = self.build_llm(llm_provider_value)
                             return (
                                 gr.update(
                                     visible=(
@@ -345,26 +763,50 @@ class GradioUI:
 
                     with gr.Row(equal_height=True):
                         choice_source_lang = gr.Dropdown(
-                            choices=constants.LANGUAGES__SUPPORTED,
+                            choices=[constants.LANGUAGE__DETECT]
+                            + constants.LANGUAGES__SUPPORTED,
                             label="Source language",
                             interactive=True,
                         )
                         choice_target_lang = gr.Dropdown(
+                            # All languages are valid choices until a source language is picked, so
+                            # that API clients can call the translate endpoint directly.
+                            choices=constants.LANGUAGES__SUPPORTED,
                             label="Target language",
                             interactive=True,
                         )
+                    choice_translation_mode = gr.Dropdown(
+                        choices=constants.TRANSLATION_MODES__SUPPORTED,
+                        label="Translation mode",
+                        value=rc_settings__translation_mode.value,
+                        interactive=True,
+                    )
                     text_input = gr.TextArea(
                         label="Source text",
                         lines=5,
                         value=constants.SAMPLE_TEXT__ENGLISH_NEWS_ARTICLE,
                         placeholder="Enter text to translate.",
                     )
+                    file_upload = gr.File(
+                        label="Or upload a UTF-8 text file to translate",
+                        file_types=[".txt"],
+                        type="filepath",
+                    )
                     text_translated = gr.TextArea(
                         label="Translated text",
                         lines=5,
                         interactive=False,
                         placeholder="Translated text will appear here.",
                     )
+                    file_translated = gr.File(
+                        label="Only the start of the translation is shown. Download all of it.",
+                        interactive=False,
+                        visible=False,
+                    )
+                    # Long uploaded texts and translations of this session are kept in temporary files,
+                    # while the text areas show their previews.
+                    state_input_file = gr.State(None)
+                    state_translated_file = gr.State(None)
                     btn_translate = gr.Button(
                         "Translate",
                         size="lg",
@@ -372,13 +814,51 @@ class GradioUI:
                     )
 
                     @btn_translate.click(
-                        inputs=[choice_source_lang, choice_target_lang, text_input],
-                        outputs=[text_translated],
+                        inputs=[
+                            choice_source_lang,
+                            choice_target_lang,
+                            text_input,
+                            choice_translation_mode,
+                            state_input_file,
+                        ],
+                        outputs=[text_translated, state_translated_file],
                         api_name="translate",
+                        # Concurrency is limited by the priority lanes instead, so that short texts
+                        # are not queued behind long ones. Concurrent translations share the language
+                        # models, as each call carries the system prompt of its own language pair.
+                        concurrency_limit=None,
                     )
                     def translate_text(
-                        source_lang_value, target_lang_value, text_input_value
+                        source_lang_value,
+                        target_lang_value,
+                        text_input_value,
+                        translation_mode_value=constants.TRANSLATION_MODE__AUTO,
+                        input_file_value=None,
+                        request: gr.Request = None,
+                        event: gr.EventData = None,
                     ):
+                        session = request.session_hash if request is not None else None
+                        # A new translation from the page of a session supersedes its running one, which is
+                        # cancelled. Calls of the API, which are not triggered by the button, may run
+                        # concurrently in one session of an API client, so they never supersede each other.
+                        superseding_session = (
+                            session
+                            if event is not None and event.target is not None
+                            else None
+                        )
+                        cancellation_token = (
+                            CancellationRegistry.shared().start(
+                                superseding_session,
+                                rc_settings__translation_deadline.value,
+                            )
+                            if superseding_session is not None
+                            else CancellationToken(
+                                rc_settings__translation_deadline.value
+                            )
+                        )
+                        usage_account = self.start_usage_account(
+                            session or constants.USAGE_TENANT__DEFAULT
+                        )
                         try:
                             if source_lang_value == target_lang_value:
                                 raise ValueError(
@@ -391,19 +871,177 @@ class GradioUI:
                             ic(
                                 f"Translating using {rc_settings__llm_provider.value}: {rc_global__llm.value.metadata.model_name}"
                             )
-                            translator = AgenticTranslator(
-                                llm=rc_global__llm.value,
-                                source_language=source_lang_value,
-                                target_language=target_lang_value,
+                            source_text = (
+                                text_of(input_file_value)
+                                if input_file_value is not None
+                                else text_input_value
+                            )
+                            check_text_length(
+                                len(source_text),
+                                rc_settings__max_input_characters.value,
+                            )
+                            source_language = resolve_source_language(
+                                source_text, source_lang_value
+                            )
+                            if source_language == target_lang_value:
+                                raise ValueError(
+                                    f"The text is already in {source_language}."
+                                )
+                            translation_request = (
+                                source_text,
+                                source_language,
+                                target_lang_value,
+                                translation_mode_value,
+                            )
+                            record_request(*translation_request)
+                            # A likely translation may have been precomputed in the background.
+                            translation_cache = precomputed_cache(
+                                source_text,
+                                rc_settings__llm_provider.value,
+                                rc_global__llm.value.metadata.model_name,
                             )
-                            translation_response = translator.agentic_translate(
-                                text_input_value
+                            translation_response = (
+                                translation_cache.get(*translation_request)
+                                if translation_cache is not None
+                                else None
                             )
-                            ic("Translation completed.")
-                            return translation_response
+                            if translation_response is None:
+                                translator = AgenticTranslator(
+                                    llm=rc_global__llm.value,
+                                    source_language=source_language,
+                                    target_language=target_lang_value,
+                                    batcher=self.get_batcher(),
+                                    stage_llms=rc_global__stage_llms.value,
+                                    escalation_llm=rc_global__escalation_llm.value,
+                                    caller=rc_global__caller.value,
+                                    semantic_cache=self.get_semantic_cache(),
+                                    glossary=self.get_glossary(),
+                                    reflection_budget=self.get_reflection_budget(),
+                                    structured_outputs=rc_settings__structured_outputs.value,
+                                )
+                                with rc_global__lanes.value.admit(
+                                    source_text, cancellation_token
+                                ):
+                                    if rc_global__race_llms.value:
+                                        llm_provider, translation_response = (
+                                            ProviderRace(
+                                                {
+                                                    race_llm_provider: AgenticTranslator(
+                                                        llm=race_llm,
+                                                        source_language=source_language,
+                                                        target_language=target_lang_value,
+                                                        caller=rc_global__caller.value,
+                                                        glossary=self.get_glossary(),
+                                                        reflection_budget=self.get_reflection_budget(),
+                                                        structured_outputs=rc_settings__structured_outputs.value,
+                                                    )
+                                                    for race_llm_provider, race_llm in rc_global__race_llms.value.items()
+                                                },
+                                                strategy=rc_settings__race_strategy.value,
+                                                judge=translator,
+                                            ).translate(
+                                                source_text,
+                                                mode=translation_mode_value,
+                                                short_text_length=rc_settings__auto_mode_short_text_length.value,
+                                                max_queue_depth=rc_settings__auto_mode_max_queue_depth.value,
+                                                cancellation_token=cancellation_token,
+                                                usage_account=usage_account,
+                                            )
+                                        )
+                                        ic(f"The race was won by {llm_provider}.")
+                                    elif rc_settings__segment_texts.value:
+                                        translation_response = translator.translate_document(
+                                            source_text,
+                                            mode=translation_mode_value,
+                                            short_text_length=rc_settings__auto_mode_short_text_length.value,
+                                            max_queue_depth=rc_settings__auto_mode_max_queue_depth.value,
+                                            cancellation_token=cancellation_token,
+                                            usage_account=usage_account,
+                                        )
+                                    else:
+                                        translation_response = translator.translate_in_mode(
+                                            source_text,
+                                            mode=translation_mode_value,
+                                            short_text_length=rc_settings__auto_mode_short_text_length.value,
+                                            max_queue_depth=rc_settings__auto_mode_max_queue_depth.value,
+                                            cancellation_token=cancellation_token,
+                                            usage_account=usage_account,
+                                        )
+                                if (
+                                    translation_cache is not None
+                                    and not rc_global__race_llms.value
+                                    and not usage_account.downgraded
+                                ):
+                                    translation_cache.put(
+                                        *translation_request, translation_response
+                                    )
+                            ic(
+                                f"Translation completed, using {usage_account.describe()}."
+                            )
+                            translation = keep_text(
+                                translation_response,
+                                rc_settings__spill_characters.value,
+                            )
+                            return preview_of(translation), (
+                                translation
+                                if isinstance(translation, SpilledText)
+                                else None
+                            )
+                        except (QueueFullError, TranslationCancelledError) as e:
+                            raise gr.Error(str(e))
                         except Exception as e:
                             ic(f"Error while translating. {str(e)}")
-                            return f"An error occurred while translating. {str(e)}"
+                            raise gr.Error(
+                                f"An error occurred while translating. {str(e)}"
+                            )
+                        finally:
+                            if superseding_session is not None:
+                                CancellationRegistry.shared().finish(
+                                    superseding_session, cancellation_token
+                                )
+                            UsageLedger.shared().finish(usage_account)
+
+                    @state_translated_file.change(
+                        inputs=[state_translated_file],
+                        outputs=[file_translated],
+                        api_name=False,
+                    )
+                    def show_translated_file(translated_file_value):
+                        return gr.update(
+                            value=(
+                                translated_file_value.path
+                                if translated_file_value is not None
+                                else None
+                            ),
+                            visible=translated_file_value is not None,
+                        )
+
+                    @file_upload.upload(
+                        inputs=[file_upload],
+                        outputs=[text_input, state_input_file],
+                        api_name=False,
+                    )
+                    def load_text_upload(file_upload_value):
+                        try:
+                            with open(file_upload_value, "rb") as file_obj:
+                                text = read_text_upload(
+                                    file_obj,
+                                    max_characters=rc_settings__max_input_characters.value,
+                                    spill_characters=rc_settings__spill_characters.value,
+                                )
+                        except (InputTooLargeError, UnicodeDecodeError) as e:
+                            raise gr.Error(f"The file cannot be translated. {str(e)}")
+                        return preview_of(text), (
+                            text if isinstance(text, SpilledText) else None
+                        )
+
+                    @text_input.input(
+                        outputs=[state_input_file],
+                        api_name=False,
+                    )
+                    def type_text_to_translate():
+                        # A typed text replaces any uploaded text.
+                        return None
 
                     @choice_source_lang.change(
                         inputs=[choice_source_lang],
@@ -433,11 +1071,39 @@ class GradioUI:
                             ),
                         )
 
+            def translation_metrics() -> dict:
+                """Get the queue depth, waiting time and other metrics of this process."""
+                return METRICS.summary()
+
+            gr.api(translation_metrics, api_name="metrics")
+
+            def cancel_translation(request: gr.Request):
+                """Cancel the running translation of a session, if any, when its page is closed."""
+                CancellationRegistry.shared().cancel(
+                    request.session_hash, constants.CANCELLATION_REASON__CLOSED
+                )
+
+            app.unload(cancel_translation)
+
         return app
 
 
 if __name__ == "__main__":
     gradio_ui = GradioUI()
     gradio_ui.initialise_settings()
+    if rc_settings__warm_up.value:
+        providers.warm_up(
+            rc_global__llm.value, connect=rc_settings__warm_up_connect.value
+        )
+    start_precompute_from_environment()
     app = gradio_ui.construct_ui()
-    app.launch()
+    app.queue(max_size=rc_settings__translate_queue_max_size.value)
+    app.launch(
+        # Enough worker threads for every running and waiting request in both lanes.
+        max_threads=max(
+            40,
+            rc_settings__short_lane_concurrency.value
+            + rc_settings__long_lane_concurrency.value
+            + 2 * rc_settings__lane_max_waiting.value,
+        )
+    )
@@ -0,0 +1,244 @@
+import re
+import time
+from typing import Dict, Iterable, List
+
+import constants
+from metrics import METRICS
+
+# Common function words of each language written in the Latin script. A word shared by several languages
+# counts for each of them in equal parts, so the words that tell close languages apart, such as Danish "af"
+# and Norwegian "av", decide between them.
+_STOPWORDS = {
+    "English": "the and of to is in that it was for with as on be this are by have from not which you "
+    "they we but has were will would there their what been an or me my please before more than",
+    "Español": "el la los las de del que y en un una es por con para se no su al lo como más pero sus le "
+    "ya o fue este ha muy también entre cuando está son hay a me favor",
+    "Français": "le la les de des du et est un une en que qui dans pour pas sur au aux ce il elle avec ne "
+    "se plus par sont mais ont été cette nous vous je très être où l d j m n qu c s merci avant depuis",
+    "Italiano": "il la di che e è un una per non in del della dei delle con sono gli le si al da lo nel "
+    "alla come più ma anche questo questa ha hanno essere stato molto a l dell all nell prima",
+    "Deutsch": "der die das und ist nicht ein eine zu den dem von mit sich des auf für im auch es ich sie "
+    "wir dass werden wird wurde sind bei nach aus oder aber noch wie einen einer über mir",
+    "Português": "o a os as de do da dos das que e em um uma é para com não por no na se mais ao como mas "
+    "foi ele ela são também pelo pela muito está isso já seu sua tem há neste nesta eles elas me",
+    "Suomi": "ja on ei että se hän oli ovat mutta kun tai myös sekä kuin joka jotka ole tämä tässä sen "
+    "niin vain nyt mitä siitä kanssa mukaan hänen minä sinä olla ollut voi jo minulle",
+    "Svenska": "och att det som en är av för på med till den har inte om ett de jag var men sig från vi "
+    "så kan man när också eller efter detta skulle hade blev mycket nu bara sina mig dig här mer än två",
+    "Dansk": "og i at det er en til på af med for den ikke de som har et jeg var om men sig fra vi så kan "
+    "også eller efter når meget nu blev være hvad nogle hun ham havde mig dig skal bliver mere end dette",
+    "Norsk": "og i at det er en til på av med for den ikke de som har et jeg var om men seg fra vi så kan "
+    "også eller etter når mye nå ble være hva noen hun ham hadde meg deg skal blir mer enn vært dette",
+    "Nederlands": "de het een en van is dat in op te zijn niet voor met die er aan ook als bij maar om "
+    "door naar dan nog wordt werd heeft hebben worden was zo wat ik je we zij uit deze me mij al meer",
+    "Polski": "i w na z się nie do to że jest o jak ale po co tak za od przez być jego jej dla są tylko "
+    "już który która które czy może przy oraz także bardzo był była jako ten ta mi",
+}
+
+# Letters and letter sequences typical of some of the languages written in the Latin script, and word
+# endings, which count for the words that are not function words.
+_NGRAMS = {
+    "ñ¿¡": ("Español",),
+    "áíú": ("Español", "Português"),
+    "é": ("Español", "Français", "Italiano", "Português"),
+    "ó": ("Español", "Português", "Polski"),
+    "ç": ("Français", "Português"),
+    "âêô": ("Français", "Português"),
+    "îûëïœ": ("Français",),
+    "èà": ("Français", "Italiano"),
+    "ìò": ("Italiano",),
+    "ãõ": ("Português",),
+    "ß": ("Deutsch",),
+    "ü": ("Deutsch",),
+    "äö": ("Deutsch", "Suomi", "Svenska"),
+    "å": ("Svenska", "Dansk", "Norsk"),
+    "æø": ("Dansk", "Norsk"),
+    "ąćęłńśźż": ("Polski",),
+    ("th", "wh", "sh"): ("English",),
+    ("nh", "lh"): ("Português",),
+    ("gli", "zz", "cch", "gn"): ("Italiano",),
+    ("eau", "oi", "ais"): ("Français",),
+    ("ij", "oe", "aa"): ("Nederlands",),
+    ("sch", "ei"): ("Deutsch", "Nederlands"),
+    ("tsch", "tz"): ("Deutsch",),
+    ("ää", "yy", "uu", "ii"): ("Suomi",),
+    ("sz", "cz", "rz", "dz"): ("Polski",),
+    ("kj", "skj"): ("Norsk",),
+    ("tj", "sj"): ("Svenska", "Norsk"),
+}
+_SUFFIXES = {
+    "English": ("ing", "ly", "ed"),
+    "Español": ("ción", "dad", "ado", "ada", "ando", "iendo"),
+    "Français": ("ment", "eux", "aient", "oir", "eur"),
+    "Italiano": ("zione", "ano", "ato", "ata", "etti", "ere"),
+    "Deutsch": ("ung", "keit", "heit", "lich", "chen"),
+    "Português": ("ção", "ções", "ão", "ões", "mente"),
+    "Suomi": ("ssa", "ssä", "sta", "stä", "lla", "llä", "ksi", "nen"),
+    "Svenska": ("ning", "arna", "orna"),
+    "Dansk": ("hed", "else"),
+    "Norsk": ("het", "else"),
+    "Nederlands": ("heid", "lijk", "tje"),
+    "Polski": ("ości", "ów", "ych", "ego", "ać"),
+}
+
+_WORD_PATTERN = re.compile(r"[^\W\d_]+")
+
+
+def _languages_by_key(
+    keys_of_languages: Dict[str, Iterable[str]], weight: float
+) -> Dict[str, Dict[str, float]]:
+    """Invert a mapping of languages to their typical words or letters into weights for each language."""
+    languages_of: Dict[str, List[str]] = {}
+    for language, keys in keys_of_languages.items():
+        for key in set(keys):
+            languages_of.setdefault(key, []).append(language)
+    return {
+        key: {language: weight / len(languages) for language in languages}
+        for key, languages in languages_of.items()
+    }
+
+
+_WORD_WEIGHTS = _languages_by_key(
+    {language: words.split() for language, words in _STOPWORDS.items()}, 1.0
+)
+_NGRAM_WEIGHTS = {
+    ngram: {language: 0.5 / len(languages) for language in languages}
+    for ngrams, languages in _NGRAMS.items()
+    for ngram in ngrams
+}
+_SUFFIX_WEIGHTS = _languages_by_key(_SUFFIXES, 0.5)
+# The letter sequences and the word endings are each found in one pass over the text, longest first.
+_NGRAM_PATTERN = re.compile(
+    "|".join(map(re.escape, sorted(_NGRAM_WEIGHTS, key=len, reverse=True)))
+)
+_SUFFIX_PATTERN = re.compile(
+    r"\B(?:"
+    + "|".join(map(re.escape, sorted(_SUFFIX_WEIGHTS, key=len, reverse=True)))
+    + r")\b"
+)
+
+
+def detect_script_language(text: str) -> str | None:
+    """
+    Detect the language of a text from its script, for the supported languages not written in the Latin
+    script.
+
+    Args:
+        text (str): The text.
+
+    Returns:
+        str | None: The language, or None if the text is mostly in the Latin script.
+    """
+    bengali = kana = hangul = han = latin = 0
+    for character in text:
+        code_point = ord(character)
+        if code_point < 0x80:
+            latin += character.isalpha()
+        elif 0x0980 <= code_point <= 0x09FF:
+            bengali += 1
+        elif 0x3040 <= code_point <= 0x30FF or 0xFF66 <= code_point <= 0xFF9F:
+            kana += 1
+        elif 0xAC00 <= code_point <= 0xD7AF or 0x1100 <= code_point <= 0x11FF:
+            hangul += 1
+        elif 0x4E00 <= code_point <= 0x9FFF or 0x3400 <= code_point <= 0x4DBF:
+            han += 1
+        elif character.isalpha():
+            latin += 1
+    if bengali + kana + hangul + han <= latin // 2:
+        return None
+    # Japanese mixes kana with Chinese characters, so any kana, beyond a stray one, means Japanese.
+    if kana > max(1, hangul, bengali):
+        return "日本語"
+    return max(
+        (("বাংলা", bengali), ("한국어", hangul), ("中文", han)),
+        key=lambda language_count: language_count[1],
+    )[0]
+
+
+def detect_language(text: str, max_characters: int = 1000) -> str | None:
+    """
+    Detect the language of a text among the supported languages, without a language model: from its script,
+    and for texts in the Latin script, from its function words, specific letters and typical word endings.
+
+    Args:
+        text (str): The text.
+        max_characters (int): The number of characters at the start of the text to look at. Defaults to 1000.
+
+    Returns:
+        str | None: The detected language, or None if the text gives no evidence of any language.
+    """
+    started_at = time.perf_counter()
+    sample = text[:max_characters]
+    language = detect_script_language(sample)
+    if language is None:
+        scores: Dict[str, float] = {}
+        sample = sample.lower()
+        for pattern, weights_of in (
+            (_WORD_PATTERN, _WORD_WEIGHTS),
+            (_NGRAM_PATTERN, _NGRAM_WEIGHTS),
+            (_SUFFIX_PATTERN, _SUFFIX_WEIGHTS),
+        ):
+            for match in pattern.finditer(sample):
+                for match_language, weight in weights_of.get(
+                    match.group(0), {}
+                ).items():
+                    scores[match_language] = scores.get(match_language, 0.0) + weight
+        if scores:
+            language = max(scores, key=scores.get)
+    METRICS.observe(
+        constants.METRIC__LANGUAGE_DETECTION_LATENCY, time.perf_counter() - started_at
+    )
+    if language is None:
+        METRICS.increment(constants.METRIC__LANGUAGE_DETECTION_FAILURES)
+    return language
+
+
+def resolve_source_language(source_text: str, source_language: str) -> str:
+    """
+    Get the source language of a text, detecting it if it was not given.
+
+    Args:
+        source_text (str): The text to translate.
+        source_language (str): The source language, or the option to detect it.
+
+    Returns:
+        str: The source language.
+
+    Raises:
+        ValueError: If the language of the text cannot be detected.
+    """
+    if source_language != constants.LANGUAGE__DETECT:
+        return source_language
+    detected_language = detect_language(source_text)
+    if detected_language is None:
+        raise ValueError(
+            "The language of the text cannot be detected. Please select the source language."
+        )
+    return detected_language
+
+
+def group_by_language(
+    source_texts: Iterable[str], source_language: str
+) -> Dict[str, List[int]]:
+    """
+    Group texts by their source language, detecting the language of each text if it was not given, so that
+    the texts of each language pair can be translated together.
+
+    Args:
+        source_texts (Iterable[str]): The texts to translate.
+        source_language (str): The source language of all texts, or the option to detect it for each text.
+
+    Returns:
+        Dict[str, List[int]]: The indices of the texts in each source language.
+
+    Raises:
+        ValueError: If the language of a text cannot be detected.
+    """
+    groups: Dict[str, List[int]] = {}
+    for index, source_text in enumerate(source_texts):
+        try:
+            language = resolve_source_language(source_text, source_language)
+        except ValueError:
+            raise ValueError(f"The language of text {index} cannot be detected.")
+        groups.setdefault(language, []).append(index)
+    return groups
@@ -0,0 +1,158 @@
+import codecs
+import itertools
+import os
+import tempfile
+import weakref
+from typing import BinaryIO, Iterable, List
+
+import constants
+
+
+class InputTooLargeError(ValueError):
+    """Raised when a text to translate is longer than the per-session limit."""
+
+
+class SpilledText:
+    """
+    A text kept in a temporary file instead of in memory, apart from a short preview. The file is deleted
+    when the object is closed or garbage collected, e.g., when the session holding it ends.
+    """
+
+    def __init__(self, chunks: Iterable[str], preview_characters: int = 2000):
+        """
+        Write a text to a temporary file, one chunk at a time.
+
+        Args:
+            chunks (Iterable[str]): The chunks of the text.
+            preview_characters (int): The number of characters to keep in memory as a preview. Defaults to 2000.
+        """
+        file_descriptor, self.path = tempfile.mkstemp(
+            prefix=f"{constants.PROJECT__NAME}-", suffix=".txt"
+        )
+        self._finalizer = weakref.finalize(self, _remove_file, self.path)
+        self.characters = 0
+        preview: List[str] = []
+        with open(
+            file_descriptor, "w", encoding=constants.CHAR_ENCODING__UTF8
+        ) as spill_file:
+            for chunk in chunks:
+                if self.characters < preview_characters:
+                    preview.append(chunk[: preview_characters - self.characters])
+                self.characters += len(chunk)
+                spill_file.write(chunk)
+        self.preview = constants.EMPTY_STRING.join(preview)
+
+    def read(self) -> str:
+        """Read the whole text back into memory."""
+        with open(self.path, encoding=constants.CHAR_ENCODING__UTF8) as spill_file:
+            return spill_file.read()
+
+    def close(self):
+        """Delete the temporary file."""
+        self._finalizer()
+
+    def __len__(self) -> int:
+        return self.characters
+
+
+def _remove_file(path: str):
+    """Remove a file, if it still exists."""
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def keep_text(text: str, spill_characters: int = 0) -> str | SpilledText:
+    """
+    Keep a text in memory, or in a temporary file if it is long.
+
+    Args:
+        text (str): The text.
+        spill_characters (int): The length beyond which the text is spilled to a temporary file. Defaults to 0, which never spills.
+
+    Returns:
+        str | SpilledText: The text itself, or the spilled text.
+    """
+    if spill_characters <= 0 or len(text) <= spill_characters:
+        return text
+    return SpilledText(
+        (text[i : i + spill_characters] for i in range(0, len(text), spill_characters)),
+        preview_characters=spill_characters,
+    )
+
+
+def text_of(value: str | SpilledText) -> str:
+    """Get the whole text of a text that may have been spilled to a temporary file."""
+    return value.read() if isinstance(value, SpilledText) else value
+
+
+def preview_of(value: str | SpilledText) -> str:
+    """Get the text, or only the preview of a text that has been spilled to a temporary file."""
+    return value.preview if isinstance(value, SpilledText) else value
+
+
+def check_text_length(characters: int, max_characters: int):
+    """
+    Check that the length of a text to translate is within the per-session limit.
+
+    Args:
+        characters (int): The number of characters of the text.
+        max_characters (int): The maximum number of characters, where 0 means no limit.
+
+    Raises:
+        InputTooLargeError: If the text is longer than the limit.
+    """
+    if 0 < max_characters < characters:
+        raise InputTooLargeError(
+            f"The text has {characters} characters or more, beyond the limit of {max_characters}."
+        )
+
+
+def read_text_upload(
+    file_obj: BinaryIO,
+    max_characters: int = 0,
+    spill_characters: int = 0,
+    chunk_size: int = 1 << 16,
+) -> str | SpilledText:
+    """
+    Read an uploaded UTF-8 text file in chunks, without holding the whole file in memory if it is long.
+
+    Args:
+        file_obj (BinaryIO): The uploaded file.
+        max_characters (int): The maximum number of characters, where 0 means no limit. Defaults to 0.
+        spill_characters (int): The length beyond which the text is spilled to a temporary file. Defaults to 0, which never spills.
+        chunk_size (int): The number of bytes to read at a time. Defaults to 64 KiB.
+
+    Returns:
+        str | SpilledText: The text of the file, or the spilled text if it is long.
+
+    Raises:
+        InputTooLargeError: If the text is longer than the limit.
+    """
+    decoder = codecs.getincrementaldecoder(constants.CHAR_ENCODING__UTF8)()
+
+    def chunks():
+        characters = 0
+        while True:
+            data = file_obj.read(chunk_size)
+            chunk = decoder.decode(data, final=not data)
+            characters += len(chunk)
+            check_text_length(characters, max_characters)
+            if chunk:
+                yield chunk
+            if not data:
+                return
+
+    buffered: List[str] = []
+    buffered_characters = 0
+    chunk_iterator = chunks()
+    for chunk in chunk_iterator:
+        buffered.append(chunk)
+        buffered_characters += len(chunk)
+        if 0 < spill_characters < buffered_characters:
+            return SpilledText(
+                itertools.chain(buffered, chunk_iterator),
+                preview_characters=spill_characters,
+            )
+    return constants.EMPTY_STRING.join(buffered)
@@ -0,0 +1,123 @@
+from collections import deque
+from threading import Lock
+from typing import Deque, Dict
+
+
+class Metrics:
+    """
+    A thread-safe, in-process store of counters and observations (e.g., latencies or sizes), which can
+    be summarised on demand to report performance trade-offs.
+    """
+
+    def __init__(self, max_observations: int = 4096):
+        """
+        Initialise the metrics store.
+
+        Args:
+            max_observations (int): The number of most recent observations to keep for each metric. Defaults to 4096.
+        """
+        self._lock = Lock()
+        self._max_observations = max_observations
+        self._counters: Dict[str, float] = {}
+        self._observations: Dict[str, Deque[float]] = {}
+
+    def increment(self, name: str, value: float = 1):
+        """
+        Increment a counter.
+
+        Args:
+            name (str): The name of the counter.
+            value (float): The value to add to the counter. Defaults to 1.
+        """
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def observe(self, name: str, value: float):
+        """
+        Record an observation, such as a latency or a size.
+
+        Args:
+            name (str): The name of the observed metric.
+            value (float): The observed value.
+        """
+        with self._lock:
+            if name not in self._observations:
+                self._observations[name] = deque(maxlen=self._max_observations)
+            self._observations[name].append(value)
+
+    def counter(self, name: str) -> float:
+        """
+        Get the current value of a counter.
+
+        Args:
+            name (str): The name of the counter.
+
+        Returns:
+            float: The value of the counter, or 0 if it has never been incremented.
+        """
+        with self._lock:
+            return self._counters.get(name, 0)
+
+    def count(self, name: str) -> int:
+        """
+        Get the number of recent observations of a metric.
+
+        Args:
+            name (str): The name of the observed metric.
+
+        Returns:
+            int: The number of observations kept for the metric.
+        """
+        with self._lock:
+            return len(self._observations.get(name, ()))
+
+    def percentile(self, name: str, percentile: float) -> float | None:
+        """
+        Get a percentile of the recent observations of a metric.
+
+        Args:
+            name (str): The name of the observed metric.
+            percentile (float): The percentile, between 0 and 100.
+
+        Returns:
+            float | None: The percentile value, or None if there are no observations.
+        """
+        with self._lock:
+            values = sorted(self._observations.get(name, ()))
+        if not values:
+            return None
+        index = min(len(values) - 1, int(round(percentile / 100 * (len(values) - 1))))
+        return values[index]
+
+    def summary(self) -> dict:
+        """
+        Summarise all counters and observations.
+
+        Returns:
+            dict: The counters as they are, and for each observed metric its count, mean, median, 95th percentile and maximum.
+        """
+        with self._lock:
+            counters = dict(self._counters)
+            observations = {k: sorted(v) for k, v in self._observations.items()}
+        summarised = {}
+        for name, values in observations.items():
+            if not values:
+                continue
+            summarised[name] = {
+                "count": len(values),
+                "mean": sum(values) / len(values),
+                "p50": values[int(round(0.5 * (len(values) - 1)))],
+                "p95": values[int(round(0.95 * (len(values) - 1)))],
+                "max": values[-1],
+            }
+        return {"counters": counters, "observations": summarised}
+
+    def reset(self):
+        """Clear all counters and observations."""
+        with self._lock:
+            self._counters.clear()
+            self._observations.clear()
+
+
+# The process-level metrics store shared by the translators and the apps.
+METRICS = Metrics()
@@ -0,0 +1,74 @@
+from contextlib import contextmanager
+from threading import Condition
+from typing import Callable, Dict, List, Tuple
+
+from translator import AgenticTranslator
+
+
+class TranslatorPool:
+    """
+    A pool of translators for each language pair, which are built on first use and reused afterwards, so
+    that requests do not pay for building the agent and its tools every time. Each translator is lent to
+    one request at a time, since translators hold per-pair state and the agent keeps a chat memory. A
+    translator whose request failed or was cancelled may be left with the memory of an unfinished agent
+    run, so it is dropped rather than returned, and another one is built when needed.
+    """
+
+    def __init__(
+        self,
+        build_translator: Callable[[str, str], AgenticTranslator],
+        max_translators_per_pair: int = 4,
+    ):
+        """
+        Initialise the pool.
+
+        Args:
+            build_translator (Callable[[str, str], AgenticTranslator]): Builds a translator for a source and a target language.
+            max_translators_per_pair (int): The maximum number of translators for each language pair. Defaults to 4.
+        """
+        self._build_translator = build_translator
+        self._max_translators_per_pair = max_translators_per_pair
+        self._condition = Condition()
+        self._idle: Dict[Tuple[str, str], List[AgenticTranslator]] = {}
+        self._built: Dict[Tuple[str, str], int] = {}
+
+    @contextmanager
+    def translator(self, source_language: str, target_language: str):
+        """
+        Borrow a translator for a language pair while the context is active, waiting for one to be returned
+        if the pair already has the maximum number of translators in use. The translator is dropped if the
+        context exits with an error.
+
+        Args:
+            source_language (str): The source language.
+            target_language (str): The target language.
+        """
+        key = (source_language, target_language)
+        with self._condition:
+            while True:
+                if self._idle.get(key):
+                    translator = self._idle[key].pop()
+                    break
+                if self._built.get(key, 0) < self._max_translators_per_pair:
+                    self._built[key] = self._built.get(key, 0) + 1
+                    translator = None
+                    break
+                self._condition.wait()
+        if translator is None:
+            try:
+                translator = self._build_translator(source_language, target_language)
+            except Exception as e:
+                with self._condition:
+                    self._built[key] -= 1
+                    self._condition.notify()
+                raise e
+        try:
+            yield translator
+        except BaseException as e:
+            with self._condition:
+                self._built[key] -= 1
+                self._condition.notify()
+            raise e
+        with self._condition:
+            self._idle.setdefault(key, []).append(translator)
+            self._condition.notify()
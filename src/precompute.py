@@ -0,0 +1,508 @@
+import json
+import math
+import os
+import time
+from icecream import ic
+from threading import Event, Lock, Thread
+from typing import Callable, Dict, List, Tuple
+from llama_index.core.llms.llm import LLM
+
+import constants
+import providers
+
+from cache import TranslationCache
+from cancellation import CancellationToken, TranslationCancelledError
+from language_detection import resolve_source_language
+from metrics import METRICS
+from pool import TranslatorPool
+from routing import translations_in_flight
+
+# A request to precompute: the source text, the source and the target languages, and the translation mode.
+Request = Tuple[str, str, str, str]
+
+
+def parse_language_pairs(value: str) -> List[Tuple[str, str]]:
+    """
+    Parse comma-separated language pairs, each given as the source and the target language.
+
+    Args:
+        value (str): The language pairs, such as "English:Français,English:Deutsch".
+
+    Returns:
+        List[Tuple[str, str]]: The source and the target language of each pair.
+    """
+    pairs = []
+    for pair in value.split(","):
+        if not pair.strip():
+            continue
+        source_language, _, target_language = (
+            part.strip() for part in pair.partition(":")
+        )
+        for language in (source_language, target_language):
+            if language not in constants.LANGUAGES__SUPPORTED:
+                raise ValueError(f"Unsupported language: {language}")
+        pairs.append((source_language, target_language))
+    return pairs
+
+
+def load_precompute_texts(path: str) -> List[Tuple[str, str]]:
+    """
+    Load the texts to precompute from a JSON Lines file, with a `text` and optionally a `source_language`,
+    which is detected if it is missing.
+
+    Args:
+        path (str): The file.
+
+    Returns:
+        List[Tuple[str, str]]: Each text and its source language.
+    """
+    texts = []
+    with open(path, encoding=constants.CHAR_ENCODING__UTF8) as texts_file:
+        for line in texts_file:
+            if line.strip():
+                entry = json.loads(line)
+                texts.append(
+                    (
+                        entry["text"],
+                        resolve_source_language(
+                            entry["text"],
+                            entry.get("source_language", constants.LANGUAGE__DETECT),
+                        ),
+                    )
+                )
+    return texts
+
+
+class RequestStatistics:
+    """
+    Counts of the translation requests of this process, by source text and by route, that is, the language
+    pair and the translation mode. The counts decay exponentially, so that recent requests weigh more.
+    """
+
+    _shared: "RequestStatistics | None" = None
+    _shared_lock = Lock()
+
+    def __init__(
+        self,
+        max_texts: int = 256,
+        max_characters: int = 20000,
+        half_life: float = 3600.0,
+    ):
+        """
+        Initialise the statistics.
+
+        Args:
+            max_texts (int): The maximum number of distinct requests counted, beyond which the least requested one is forgotten. Defaults to 256.
+            max_characters (int): The maximum length of a text counted, so that long documents are not kept in memory. Defaults to 20000.
+            half_life (float): The time in seconds after which a count is halved. Defaults to 3600.
+        """
+        self.max_characters = max_characters
+        self._max_texts = max_texts
+        self._half_life = half_life
+        self._lock = Lock()
+        # The decayed count of each request and of each route, and when it was last updated.
+        self._requests: Dict[Request, Tuple[float, float]] = {}
+        self._routes: Dict[Tuple[str, str, str], Tuple[float, float]] = {}
+        self._last_request_at = 0.0
+
+    @classmethod
+    def shared(cls) -> "RequestStatistics":
+        """
+        Get the process-level statistics.
+
+        Returns:
+            RequestStatistics: The shared statistics.
+        """
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls()
+            return cls._shared
+
+    def _decayed(self, count: Tuple[float, float], now: float) -> float:
+        """Get the value of a decayed count at a time."""
+        value, updated_at = count
+        return value * math.pow(0.5, (now - updated_at) / self._half_life)
+
+    def record(
+        self, source_text: str, source_language: str, target_language: str, mode: str
+    ):
+        """
+        Count a translation request.
+
+        Args:
+            source_text (str): The text to translate.
+            source_language (str): The source language of the text.
+            target_language (str): The target language to translate the text to.
+            mode (str): The translation mode.
+        """
+        now = time.monotonic()
+        route = (source_language, target_language, mode)
+        with self._lock:
+            self._last_request_at = now
+            self._routes[route] = (
+                self._decayed(self._routes.get(route, (0.0, now)), now) + 1,
+                now,
+            )
+            source_text = source_text.strip()
+            if not source_text or len(source_text) > self.max_characters:
+                return
+            request = (source_text, *route)
+            self._requests[request] = (
+                self._decayed(self._requests.get(request, (0.0, now)), now) + 1,
+                now,
+            )
+            if len(self._requests) > self._max_texts:
+                del self._requests[
+                    min(
+                        self._requests,
+                        key=lambda known: self._decayed(self._requests[known], now),
+                    )
+                ]
+
+    def seconds_since_last_request(self) -> float:
+        """Get the time in seconds since the last request, which is infinite if there was none."""
+        with self._lock:
+            if not self._last_request_at:
+                return math.inf
+            return time.monotonic() - self._last_request_at
+
+    def popular_requests(self, min_count: float = 2.0) -> List[Request]:
+        """
+        Get the requests made at least a number of times recently, the most requested first. As the earlier
+        requests of a text have decayed when it is requested again, its decayed count needs only exceed the
+        number less one, the weight of the last request when it is made.
+
+        Args:
+            min_count (float): The minimum number of requests. Defaults to 2.
+
+        Returns:
+            List[Request]: The requests.
+        """
+        now = time.monotonic()
+        with self._lock:
+            counts = {
+                request: self._decayed(count, now)
+                for request, count in self._requests.items()
+            }
+        return sorted(
+            (request for request, count in counts.items() if count > min_count - 1),
+            key=counts.get,
+            reverse=True,
+        )
+
+    def popular_routes(
+        self, source_language: str, limit: int = 4
+    ) -> List[Tuple[str, str]]:
+        """
+        Get the most requested target languages and translation modes for a source language.
+
+        Args:
+            source_language (str): The source language.
+            limit (int): The maximum number of routes. Defaults to 4.
+
+        Returns:
+            List[Tuple[str, str]]: The target language and the translation mode of each route, the most requested first.
+        """
+        now = time.monotonic()
+        with self._lock:
+            counts = {
+                (target_language, mode): self._decayed(count, now)
+                for (language, target_language, mode), count in self._routes.items()
+                if language == source_language
+            }
+        return sorted(counts, key=counts.get, reverse=True)[:limit]
+
+
+class _PreemptibleToken(CancellationToken):
+    """
+    The cancellation token of a background translation, which is cancelled as soon as another translation
+    starts. The background translation is itself in flight whenever its token is checked.
+    """
+
+    @property
+    def cancelled(self) -> bool:
+        if translations_in_flight() > 1:
+            self.cancel(constants.CANCELLATION_REASON__PREEMPTED)
+        return super().cancelled
+
+
+class PrecomputeWorker:
+    """
+    Translates likely requests in the background while no other translation is in progress, and caches
+    them, so that they are served at once when they are requested. The likely requests are the texts
+    requested most often, and the configured texts, such as the default text of the apps, for their
+    configured language pairs and the routes most requested for their source language. A background
+    translation is cancelled as soon as another translation starts, and tried again later.
+    """
+
+    _shared: "PrecomputeWorker | None" = None
+    _shared_lock = Lock()
+
+    def __init__(
+        self,
+        translator_pool: TranslatorPool,
+        cache: TranslationCache,
+        statistics: RequestStatistics,
+        llm_provider: str,
+        build_llm: Callable[[], LLM],
+        texts: List[Tuple[str, str]] = None,
+        pairs: List[Tuple[str, str]] = None,
+        mode: str = constants.DEFAULT_VALUE__TRANSLATION_MODE,
+        interval: float = 30.0,
+        idle_seconds: float = 10.0,
+        min_requests: float = 2.0,
+        max_routes: int = 4,
+    ):
+        """
+        Initialise the worker.
+
+        Args:
+            translator_pool (TranslatorPool): The translators to use.
+            cache (TranslationCache): The cache of the translations.
+            statistics (RequestStatistics): The statistics of the requests.
+            llm_provider (str): The language model provider of the translators, whose translations are only served to requests using the same provider and model.
+            build_llm (Callable[[], LLM]): Builds the language model of the translators, to get the name of its model.
+            texts (List[Tuple[str, str]]): The texts to precompute and their source languages. Defaults to None.
+            pairs (List[Tuple[str, str]]): The language pairs for which to precompute the texts. Defaults to None.
+            mode (str): The translation mode for the configured language pairs. Defaults to the default mode.
+            interval (float): The time in seconds between two checks for idle capacity. Defaults to 30.
+            idle_seconds (float): The time in seconds without requests after which the providers are idle. Defaults to 10.
+            min_requests (float): The number of recent requests of a text from which it is precomputed. Defaults to 2.
+            max_routes (int): The maximum number of requested routes for which to precompute each configured text. Defaults to 4.
+        """
+        self.cache = cache
+        self.llm_provider = llm_provider
+        self._build_llm = build_llm
+        self._model_name: str | None = None
+        self._translator_pool = translator_pool
+        self._statistics = statistics
+        self._texts = texts or []
+        self._pairs = pairs or []
+        self._mode = mode
+        self._interval = interval
+        self._idle_seconds = idle_seconds
+        self._min_requests = min_requests
+        self._max_routes = max_routes
+        self._stopped = Event()
+        self._thread: Thread | None = None
+
+    @property
+    def model_name(self) -> str:
+        """The language model of the translators, which is only looked up when needed, as it may need the provider."""
+        if self._model_name is None:
+            self._model_name = self._build_llm().metadata.model_name
+        return self._model_name
+
+    def candidates(self) -> List[Request]:
+        """
+        Get the requests to precompute, in order: the texts requested most often, then the configured texts.
+
+        Returns:
+            List[Request]: The requests that are not cached yet.
+        """
+        requests = self._statistics.popular_requests(self._min_requests)
+        for source_text, source_language in self._texts:
+            routes = [
+                (target_language, self._mode)
+                for language, target_language in self._pairs
+                if language == source_language
+            ] + self._statistics.popular_routes(source_language, self._max_routes)
+            requests.extend(
+                (source_text, source_language, target_language, mode)
+                for target_language, mode in routes
+                if target_language != source_language
+            )
+        return [
+            request
+            for request in dict.fromkeys(requests)
+            if not self.cache.contains(*request)
+        ]
+
+    def is_idle(self) -> bool:
+        """Check whether no translation is in progress and none was requested recently."""
+        return (
+            translations_in_flight() == 0
+            and self._statistics.seconds_since_last_request() >= self._idle_seconds
+        )
+
+    def run_once(self) -> int:
+        """
+        Precompute the candidate requests while the providers are idle.
+
+        Returns:
+            int: The number of translations precomputed.
+        """
+        precomputed = 0
+        for request in self.candidates():
+            if self._stopped.is_set() or not self.is_idle():
+                break
+            if not self._precompute(*request):
+                break
+            precomputed += 1
+        return precomputed
+
+    def _precompute(
+        self, source_text: str, source_language: str, target_language: str, mode: str
+    ) -> bool:
+        """Translate and cache a request, returning whether it was translated."""
+        started_at = time.perf_counter()
+        try:
+            with self._translator_pool.translator(
+                source_language, target_language
+            ) as translator:
+                translation = translator.translate_in_mode(
+                    source_text, mode=mode, cancellation_token=_PreemptibleToken()
+                )
+        except TranslationCancelledError:
+            return False
+        except Exception as e:
+            ic(f"Error while precomputing a translation. {str(e)}")
+            METRICS.increment(constants.METRIC__PRECOMPUTE_FAILURES)
+            return False
+        self.cache.put(source_text, source_language, target_language, mode, translation)
+        METRICS.increment(constants.METRIC__PRECOMPUTE_TRANSLATIONS)
+        METRICS.observe(
+            constants.METRIC__PRECOMPUTE_LATENCY, time.perf_counter() - started_at
+        )
+        return True
+
+    def _run(self):
+        """Check for idle capacity at every interval until the worker is stopped."""
+        while not self._stopped.wait(self._interval):
+            self.run_once()
+
+    def start(self):
+        """Start precomputing in a background thread."""
+        if self._thread is None:
+            self._thread = Thread(target=self._run, name="precompute", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Stop precomputing, after the translation in progress, if any."""
+        self._stopped.set()
+
+
+def start_precompute_from_environment() -> PrecomputeWorker | None:
+    """
+    Start the process-level precompute worker with the settings in the environment variables, or their
+    defaults, unless it is disabled or already started.
+
+    Returns:
+        PrecomputeWorker | None: The worker, or None if precomputing is disabled.
+    """
+    if (
+        os.getenv(
+            constants.ENV_KEY__PRECOMPUTE, constants.DEFAULT_VALUE__PRECOMPUTE
+        ).lower()
+        not in constants.BOOLEAN_TRUE_VALUES
+    ):
+        return None
+    with PrecomputeWorker._shared_lock:
+        if PrecomputeWorker._shared is None:
+            texts_path = os.getenv(
+                constants.ENV_KEY__PRECOMPUTE_TEXTS_PATH,
+                constants.DEFAULT_VALUE__PRECOMPUTE_TEXTS_PATH,
+            )
+            worker = PrecomputeWorker(
+                TranslatorPool(
+                    providers.build_translator_from_environment,
+                    max_translators_per_pair=1,
+                ),
+                TranslationCache.shared(
+                    int(
+                        os.getenv(
+                            constants.ENV_KEY__TRANSLATION_CACHE_SIZE,
+                            constants.DEFAULT_VALUE__TRANSLATION_CACHE_SIZE,
+                        )
+                    )
+                ),
+                RequestStatistics.shared(),
+                llm_provider=os.getenv(
+                    constants.ENV_KEY__LLM_PROVIDER,
+                    constants.DEFAULT_VALUE__LLM_PROVIDER,
+                ),
+                build_llm=providers.build_llm_from_environment,
+                # The default text of the apps is precomputed with the configured texts.
+                texts=[
+                    (
+                        constants.SAMPLE_TEXT__ENGLISH_NEWS_ARTICLE,
+                        constants.LANGUAGES__SUPPORTED[0],
+                    )
+                ]
+                + (load_precompute_texts(texts_path) if texts_path else []),
+                pairs=parse_language_pairs(
+                    os.getenv(
+                        constants.ENV_KEY__PRECOMPUTE_PAIRS,
+                        constants.DEFAULT_VALUE__PRECOMPUTE_PAIRS,
+                    )
+                ),
+                mode=os.getenv(
+                    constants.ENV_KEY__TRANSLATION_MODE,
+                    constants.DEFAULT_VALUE__TRANSLATION_MODE,
+                ),
+                interval=float(
+                    os.getenv(
+                        constants.ENV_KEY__PRECOMPUTE_INTERVAL,
+                        constants.DEFAULT_VALUE__PRECOMPUTE_INTERVAL,
+                    )
+                ),
+                idle_seconds=float(
+                    os.getenv(
+                        constants.ENV_KEY__PRECOMPUTE_IDLE_SECONDS,
+                        constants.DEFAULT_VALUE__PRECOMPUTE_IDLE_SECONDS,
+                    )
+                ),
+                min_requests=float(
+                    os.getenv(
+                        constants.ENV_KEY__PRECOMPUTE_MIN_REQUESTS,
+                        constants.DEFAULT_VALUE__PRECOMPUTE_MIN_REQUESTS,
+                    )
+                ),
+            )
+            worker.start()
+            PrecomputeWorker._shared = worker
+        return PrecomputeWorker._shared
+
+
+def record_request(
+    source_text: str, source_language: str, target_language: str, mode: str
+):
+    """
+    Count a translation request in the statistics of the precompute worker, if it is started.
+
+    Args:
+        source_text (str): The text to translate.
+        source_language (str): The source language of the text.
+        target_language (str): The target language to translate the text to.
+        mode (str): The translation mode.
+    """
+    if PrecomputeWorker._shared is not None:
+        RequestStatistics.shared().record(
+            source_text, source_language, target_language, mode
+        )
+
+
+def precomputed_cache(
+    source_text: str, llm_provider: str, model_name: str
+) -> TranslationCache | None:
+    """
+    Get the cache of the precompute worker for a text, if the worker is started and translates with the
+    same language model, and the text is short enough to be cached.
+
+    Args:
+        source_text (str): The text to translate.
+        llm_provider (str): The language model provider of the request.
+        model_name (str): The language model of the request.
+
+    Returns:
+        TranslationCache | None: The cache, or None if the request cannot use it.
+    """
+    worker = PrecomputeWorker._shared
+    if (
+        worker is None
+        or worker.llm_provider != llm_provider
+        or worker.model_name != model_name
+        or len(source_text) > RequestStatistics.shared().max_characters
+    ):
+        return None
+    return worker.cache
@@ -0,0 +1,294 @@
+import hashlib
+import re
+import time
+import unicodedata
+from typing import Callable, Dict, List, Sequence, Tuple
+
+import constants
+from metrics import METRICS
+
+# Invisible characters that only get in the way of matching and segmenting texts, such as zero-width spaces,
+# soft hyphens and byte order marks. Zero-width joiners are kept, as some scripts, e.g., Bengali, need them.
+_INVISIBLE_CHARACTERS = re.compile("[\u00ad\u200b\u2060\ufeff]")
+# Horizontal whitespace, including the no-break and ideographic spaces.
+_HORIZONTAL_WHITESPACE = re.compile(r"[^\S\n]+")
+_PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+
+# Sentence terminators, each with the closing quotes and brackets that may follow it. Full stops, question and
+# exclamation marks end a sentence before whitespace, whereas the ideographic full stop, its full-width
+# variants and the Bengali dandas end one straight away, as Chinese and Japanese put no spaces between
+# sentences.
+_CLOSING_PUNCTUATION = "\"'’”»)]}」』）】〕"
+_CLOSING = f"[{re.escape(_CLOSING_PUNCTUATION)}]*"
+_SPACED_TERMINATORS = re.compile(rf"[.!?…]+{_CLOSING}(?=\s)")
+_UNSPACED_TERMINATORS = re.compile(rf"[。！？．]+{_CLOSING}|[।॥]+")
+
+# Abbreviations, in lower case, after which a full stop does not end a sentence, for the languages that
+# use them.
+_ABBREVIATIONS = {
+    "English": {
+        "mr",
+        "mrs",
+        "ms",
+        "dr",
+        "prof",
+        "st",
+        "vs",
+        "etc",
+        "e.g",
+        "i.e",
+        "no",
+        "fig",
+        "jr",
+        "sr",
+    },
+    "Español": {"sr", "sra", "srta", "dr", "dra", "ud", "uds", "etc", "pág", "núm"},
+    "Français": {"m", "mme", "mlle", "dr", "etc", "p.ex", "cf", "av", "bd"},
+    "Italiano": {"sig", "sigg", "dott", "prof", "ecc", "pag", "es"},
+    "Deutsch": {
+        "hr",
+        "fr",
+        "dr",
+        "prof",
+        "bzw",
+        "usw",
+        "z.b",
+        "ca",
+        "nr",
+        "vgl",
+        "d.h",
+        "u.a",
+        "s",
+    },
+    "Português": {"sr", "sra", "dr", "dra", "prof", "etc", "pág", "p.ex"},
+    "Suomi": {"esim", "ns", "jne", "mm", "tri", "prof"},
+    "Svenska": {"t.ex", "bl.a", "dvs", "m.m", "osv", "ca", "nr"},
+    "Dansk": {"f.eks", "bl.a", "dvs", "osv", "ca", "nr", "hr", "fru"},
+    "Norsk": {"f.eks", "bl.a", "dvs", "osv", "ca", "nr", "hr", "fru"},
+    "Nederlands": {
+        "dhr",
+        "mevr",
+        "dr",
+        "prof",
+        "bijv",
+        "enz",
+        "o.a",
+        "d.w.z",
+        "nr",
+        "blz",
+    },
+    "Polski": {"np", "itd", "itp", "tzn", "dr", "prof", "mgr", "ul", "nr", "tj"},
+}
+
+
+def normalize_source_text(text: str) -> str:
+    """
+    Normalise a text to translate: compose its Unicode characters, drop invisible characters, and collapse
+    runs of spaces and of blank lines, keeping the line and paragraph breaks. Unlike the normalisation of the
+    semantic cache, case, punctuation and full-width forms are kept, as they matter for the translation.
+
+    Args:
+        text (str): The text.
+
+    Returns:
+        str: The normalised text.
+    """
+    text = unicodedata.normalize("NFC", text).replace("\r\n", "\n").replace("\r", "\n")
+    text = _INVISIBLE_CHARACTERS.sub(constants.EMPTY_STRING, text)
+    lines = [
+        _HORIZONTAL_WHITESPACE.sub(constants.SPACE_STRING, line).strip()
+        for line in text.split("\n")
+    ]
+    return _PARAGRAPH_BREAK.sub("\n\n", "\n".join(lines)).strip()
+
+
+def _ends_with_abbreviation(text: str, language: str) -> bool:
+    """Check whether a text ending with a full stop ends with an abbreviation or an initial of the language."""
+    word = text[:-1].rsplit(maxsplit=1)[-1].lower() if text[:-1].strip() else ""
+    word = word.lstrip(_CLOSING_PUNCTUATION + "([{")
+    return (len(word) == 1 and word.isalpha()) or word in _ABBREVIATIONS.get(
+        language, ()
+    )
+
+
+def segment_sentences(text: str, language: str) -> Tuple[List[str], List[str]]:
+    """
+    Split a normalised text into sentences, keeping what separates them, so that the text can be put back
+    together from the sentences or from their translations. Paragraphs are always split.
+
+    Args:
+        text (str): The normalised text.
+        language (str): The language of the text, one of the supported languages.
+
+    Returns:
+        Tuple[List[str], List[str]]: The sentences, and the separator after each of them, which is empty after the last one.
+    """
+    sentences, separators = [], []
+    paragraphs = text.split("\n\n")
+    for paragraph_index, paragraph in enumerate(paragraphs):
+        start = 0
+        ends = sorted(
+            {match.end() for match in _SPACED_TERMINATORS.finditer(paragraph)}
+            | {match.end() for match in _UNSPACED_TERMINATORS.finditer(paragraph)}
+        )
+        for end in ends:
+            if end <= start or end >= len(paragraph):
+                continue
+            sentence = paragraph[start:end]
+            if sentence.endswith(".") and _ends_with_abbreviation(sentence, language):
+                continue
+            separator_end = end
+            while separator_end < len(paragraph) and paragraph[separator_end].isspace():
+                separator_end += 1
+            sentences.append(sentence)
+            separators.append(paragraph[end:separator_end])
+            start = separator_end
+        if start < len(paragraph):
+            sentences.append(paragraph[start:])
+            separators.append(constants.EMPTY_STRING)
+        if paragraph_index < len(paragraphs) - 1 and sentences:
+            separators[-1] = "\n\n"
+    return sentences, separators
+
+
+def segment_key(segment: str, language: str) -> str:
+    """
+    Get the key of a segment for deduplication, a hash of the segment and its language.
+
+    Args:
+        segment (str): The normalised segment.
+        language (str): The language of the segment.
+
+    Returns:
+        str: The key of the segment.
+    """
+    return hashlib.sha256(f"{language}\n{segment}".encode()).hexdigest()[:16]
+
+
+def join_segments(
+    segments: Sequence[str], separators: Sequence[str], language: str
+) -> str:
+    """
+    Put a text back together from its segments, or their translations, and the separators of the source
+    text. Spaces between sentences are dropped in the languages that do not use them.
+
+    Args:
+        segments (Sequence[str]): The segments.
+        separators (Sequence[str]): The separator after each segment.
+        language (str): The language of the segments.
+
+    Returns:
+        str: The text.
+    """
+    unspaced = language in constants.LANGUAGES__UNSPACED
+    return constants.EMPTY_STRING.join(
+        segment.strip()
+        + (
+            constants.EMPTY_STRING
+            if unspaced and separator == constants.SPACE_STRING
+            else separator
+        )
+        for segment, separator in zip(segments, separators)
+    )
+
+
+class SegmentBatch:
+    """
+    The sentences of a batch of texts, possibly in different languages, without duplicates, so that each
+    distinct sentence is translated once however often it occurs in the batch, and the translations of the
+    texts are put back together from those of the distinct sentences.
+    """
+
+    def __init__(self, source_texts: Sequence[str], source_languages: Sequence[str]):
+        """
+        Normalise and segment a batch of texts.
+
+        Args:
+            source_texts (Sequence[str]): The texts.
+            source_languages (Sequence[str]): The language of each text.
+        """
+        started_at = time.perf_counter()
+        self.segments: List[str] = []
+        self.segment_languages: List[str] = []
+        self._indices: Dict[str, int] = {}
+        # The indices of the distinct segments of each text, and the separators after them.
+        self._layouts: List[Tuple[List[int], List[str]]] = []
+        occurrences = 0
+        for source_text, source_language in zip(source_texts, source_languages):
+            sentences, separators = segment_sentences(
+                normalize_source_text(source_text), source_language
+            )
+            occurrences += len(sentences)
+            self._layouts.append(
+                ([self._index_of(s, source_language) for s in sentences], separators)
+            )
+        METRICS.observe(constants.METRIC__PREPROCESS_SEGMENTS, occurrences)
+        METRICS.observe(
+            constants.METRIC__PREPROCESS_UNIQUE_SEGMENTS, len(self.segments)
+        )
+        METRICS.observe(
+            constants.METRIC__PREPROCESS_LATENCY, time.perf_counter() - started_at
+        )
+
+    def _index_of(self, segment: str, language: str) -> int:
+        """Get the index of a distinct segment, adding it if it is new."""
+        key = segment_key(segment, language)
+        if key not in self._indices:
+            self._indices[key] = len(self.segments)
+            self.segments.append(segment)
+            self.segment_languages.append(language)
+        return self._indices[key]
+
+    def segment_indices(self, index: int) -> List[int]:
+        """
+        Get the indices of the distinct segments of a text of the batch.
+
+        Args:
+            index (int): The index of the text in the batch.
+
+        Returns:
+            List[int]: The indices of its segments in `segments`, in the order they occur in the text.
+        """
+        return self._layouts[index][0]
+
+    def expand(self, translations: Sequence[str], target_language: str) -> List[str]:
+        """
+        Put the translations of the texts back together from those of the distinct segments.
+
+        Args:
+            translations (Sequence[str]): The translation of each distinct segment, in the order of `segments`.
+            target_language (str): The target language of the translations.
+
+        Returns:
+            List[str]: The translation of each text, in the order of the texts.
+        """
+        return [
+            join_segments(
+                [translations[index] for index in indices], separators, target_language
+            )
+            for indices, separators in self._layouts
+        ]
+
+
+def translate_segmented(
+    source_texts: Sequence[str],
+    source_languages: Sequence[str],
+    target_language: str,
+    translate_segments: Callable[[List[str], List[str]], List[str]],
+) -> List[str]:
+    """
+    Translate a batch of texts sentence by sentence, translating each distinct sentence once.
+
+    Args:
+        source_texts (Sequence[str]): The texts.
+        source_languages (Sequence[str]): The language of each text.
+        target_language (str): The target language.
+        translate_segments (Callable[[List[str], List[str]], List[str]]): Translates the distinct sentences, given with their languages, in order.
+
+    Returns:
+        List[str]: The translation of each text, in the order of the texts.
+    """
+    batch = SegmentBatch(source_texts, source_languages)
+    return batch.expand(
+        translate_segments(batch.segments, batch.segment_languages), target_language
+    )
@@ -0,0 +1,55 @@
+from functools import lru_cache
+
+from llama_index.core import PromptTemplate
+
+
+@lru_cache(maxsize=1024)
+def pair_prefix(
+    prefix_template: str, source_language: str, target_language: str
+) -> str:
+    """
+    Format the prefix of a prompt, which only depends on the language pair. The result is cached so that
+    every prompt for a language pair starts with the same string, which providers can serve from their
+    prompt (KV) cache.
+
+    Args:
+        prefix_template (str): The template of the prefix.
+        source_language (str): The source language.
+        target_language (str): The target language.
+
+    Returns:
+        str: The formatted prefix.
+    """
+    return PromptTemplate(template=prefix_template).format(
+        source_language=source_language,
+        target_language=target_language,
+    )
+
+
+def format_prompt(
+    prefix_template: str,
+    suffix_template: str,
+    source_language: str,
+    target_language: str,
+    **variables,
+) -> str:
+    """
+    Assemble a prompt from a stable, per language pair prefix and a suffix with the variable content.
+
+    Args:
+        prefix_template (str): The template of the prefix, which may only use the language names.
+        suffix_template (str): The template of the suffix.
+        source_language (str): The source language.
+        target_language (str): The target language.
+        **variables: The values for the other variables in the suffix template.
+
+    Returns:
+        str: The formatted prompt.
+    """
+    return pair_prefix(
+        prefix_template, source_language, target_language
+    ) + PromptTemplate(template=suffix_template).format(
+        source_language=source_language,
+        target_language=target_language,
+        **variables,
+    )
@@ -0,0 +1,402 @@
+from functools import lru_cache
+from llama_index.core.llms.llm import LLM
+from llama_index.core.utils import get_tokenizer
+
+import constants
+import importlib
+import os
+import time
+
+from batching import TranslationBatcher
+from endpoints import build_pooled_llm, parse_endpoint_urls
+from glossary import TerminologyStore
+from recording import build_recorded_llm
+from reflection import ReflectionBudget
+from resilience import ResilientCaller
+from routing import parse_stage_assignments, parse_stage_llm_providers
+from semantic_cache import SemanticCache
+from translator import AgenticTranslator
+
+# The module and the class of the language model of each provider, which are imported on first use so that
+# an app only loads the SDK of the providers that it actually uses.
+LLM_PROVIDER_CLASSES = {
+    constants.LLM_PROVIDER__COHERE: ("llama_index.llms.cohere", "Cohere"),
+    constants.LLM_PROVIDER__LLAMAFILE: ("llama_index.llms.llamafile", "Llamafile"),
+    constants.LLM_PROVIDER__OLLAMA: ("llama_index.llms.ollama", "Ollama"),
+    constants.LLM_PROVIDER__OPENAI: ("llama_index.llms.openai", "OpenAI"),
+}
+
+
+@lru_cache(maxsize=None)
+def llm_class(llm_provider: str) -> type:
+    """
+    Import the language model class of a provider.
+
+    Args:
+        llm_provider (str): The language model provider.
+
+    Returns:
+        type: The language model class.
+    """
+    if llm_provider not in LLM_PROVIDER_CLASSES:
+        raise ValueError(f"Unsupported language model provider: {llm_provider}")
+    module_name, class_name = LLM_PROVIDER_CLASSES[llm_provider]
+    return getattr(importlib.import_module(module_name), class_name)
+
+
+def llm_class_name(llm_provider: str) -> str | None:
+    """
+    Get the name of the language model class of a provider, without importing it.
+
+    Args:
+        llm_provider (str): The language model provider.
+
+    Returns:
+        str | None: The class name, or None if the provider is not supported.
+    """
+    return LLM_PROVIDER_CLASSES.get(llm_provider, (None, None))[1]
+
+
+def build_llm(
+    llm_provider: str,
+    temperature: float,
+    cohere_api_key: str = None,
+    cohere_model: str = None,
+    llamafile_url: str = None,
+    ollama_url: str = None,
+    ollama_model: str = None,
+    ollama_keep_alive: str = None,
+    openai_api_key: str = None,
+    openai_model: str = None,
+) -> LLM:
+    """
+    Build a language model for a provider.
+
+    Args:
+        llm_provider (str): The language model provider.
+        temperature (float): The temperature of the language model.
+        cohere_api_key (str): The Cohere API key. Defaults to None.
+        cohere_model (str): The Cohere model. Defaults to None.
+        llamafile_url (str): The URL of the Llamafile, or the comma-separated URLs of several, which are pooled. Defaults to None.
+        ollama_url (str): The URL of the Ollama server, or the comma-separated URLs of several, which are pooled. Defaults to None.
+        ollama_model (str): The Ollama model. Defaults to None.
+        ollama_keep_alive (str): How long Ollama keeps the model loaded. Defaults to None.
+        openai_api_key (str): The Open AI API key. Defaults to None.
+        openai_model (str): The Open AI model. Defaults to None.
+
+    Returns:
+        LLM: The language model.
+    """
+    match llm_provider:
+        case constants.LLM_PROVIDER__COHERE:
+            return llm_class(llm_provider)(
+                api_key=cohere_api_key,
+                model=cohere_model,
+                temperature=temperature,
+            )
+        case constants.LLM_PROVIDER__OPENAI:
+            return llm_class(llm_provider)(
+                api_key=openai_api_key,
+                model=openai_model,
+                temperature=temperature,
+            )
+        case constants.LLM_PROVIDER__LLAMAFILE:
+            return build_pooled_llm(
+                parse_endpoint_urls(
+                    llamafile_url or constants.DEFAULT_VALUE__LLAMAFILE_URL
+                ),
+                lambda url: llm_class(llm_provider)(
+                    base_url=url,
+                    temperature=temperature,
+                ),
+                health_path=constants.ENDPOINT_HEALTH_PATHS[llm_provider],
+            )
+        case constants.LLM_PROVIDER__OLLAMA:
+            return build_pooled_llm(
+                parse_endpoint_urls(ollama_url or constants.DEFAULT_VALUE__OLLAMA_URL),
+                lambda url: llm_class(llm_provider)(
+                    base_url=url,
+                    model=ollama_model,
+                    keep_alive=ollama_keep_alive,
+                    temperature=temperature,
+                ),
+                health_path=constants.ENDPOINT_HEALTH_PATHS[llm_provider],
+            )
+        case _:
+            raise ValueError(f"Unsupported language model provider: {llm_provider}")
+
+
+def build_llm_from_environment(llm_provider: str = None) -> LLM:
+    """
+    Build a language model with the settings in the environment variables, or their defaults, whose calls
+    are recorded or replayed if set.
+
+    Args:
+        llm_provider (str): The language model provider. Defaults to None, which uses the configured provider.
+
+    Returns:
+        LLM: The language model.
+    """
+    llm_provider = llm_provider or os.getenv(
+        constants.ENV_KEY__LLM_PROVIDER, constants.DEFAULT_VALUE__LLM_PROVIDER
+    )
+    return build_recorded_llm(
+        lambda: _build_llm_from_environment(llm_provider),
+        record_path=os.getenv(
+            constants.ENV_KEY__LLM_RECORD_PATH, constants.DEFAULT_VALUE__LLM_RECORD_PATH
+        ),
+        replay_path=os.getenv(
+            constants.ENV_KEY__LLM_REPLAY_PATH, constants.DEFAULT_VALUE__LLM_REPLAY_PATH
+        ),
+        replay_speed=float(
+            os.getenv(
+                constants.ENV_KEY__LLM_REPLAY_SPEED,
+                constants.DEFAULT_VALUE__LLM_REPLAY_SPEED,
+            )
+        ),
+        replay_class_name=llm_class_name(llm_provider),
+    )
+
+
+def _build_llm_from_environment(llm_provider: str = None) -> LLM:
+    """Build the language model of a provider with the settings in the environment variables."""
+    return build_llm(
+        llm_provider
+        or os.getenv(
+            constants.ENV_KEY__LLM_PROVIDER, constants.DEFAULT_VALUE__LLM_PROVIDER
+        ),
+        temperature=float(
+            os.getenv(
+                constants.ENV_KEY__LLM_TEMPERATURE,
+                constants.DEFAULT_VALUE__LLM_TEMPERATURE,
+            )
+        ),
+        cohere_api_key=os.getenv(constants.ENV_KEY__COHERE_API_KEY),
+        cohere_model=os.getenv(
+            constants.ENV_KEY__COHERE_MODEL, constants.DEFAULT_VALUE__COHERE_MODEL
+        ),
+        llamafile_url=os.getenv(
+            constants.ENV_KEY__LLAMAFILE_URL, constants.DEFAULT_VALUE__LLAMAFILE_URL
+        ),
+        ollama_url=os.getenv(
+            constants.ENV_KEY__OLLAMA_URL, constants.DEFAULT_VALUE__OLLAMA_URL
+        ),
+        ollama_model=os.getenv(
+            constants.ENV_KEY__OLLAMA_MODEL, constants.DEFAULT_VALUE__OLLAMA_MODEL
+        ),
+        ollama_keep_alive=os.getenv(
+            constants.ENV_KEY__OLLAMA_KEEP_ALIVE,
+            constants.DEFAULT_VALUE__OLLAMA_KEEP_ALIVE,
+        ),
+        openai_api_key=os.getenv(constants.ENV_KEY__OPENAI_API_KEY),
+        openai_model=os.getenv(
+            constants.ENV_KEY__OPENAI_MODEL, constants.DEFAULT_VALUE__OPENAI_MODEL
+        ),
+    )
+
+
+def build_translator_from_environment(
+    source_language: str, target_language: str
+) -> AgenticTranslator:
+    """
+    Build a translator with the language models, the batching and the resilience settings in the environment
+    variables, or their defaults.
+
+    Args:
+        source_language (str): The source language.
+        target_language (str): The target language.
+
+    Returns:
+        AgenticTranslator: The translator.
+    """
+    llm = build_llm_from_environment()
+    stage_llms = {
+        stage: build_llm_from_environment(llm_provider)
+        for stage, llm_provider in parse_stage_llm_providers(
+            os.getenv(
+                constants.ENV_KEY__STAGE_LLM_PROVIDERS,
+                constants.DEFAULT_VALUE__STAGE_LLM_PROVIDERS,
+            )
+        ).items()
+    }
+    escalation_llm_provider = os.getenv(
+        constants.ENV_KEY__ESCALATION_LLM_PROVIDER,
+        constants.DEFAULT_VALUE__ESCALATION_LLM_PROVIDER,
+    )
+    failover_llm_provider = os.getenv(
+        constants.ENV_KEY__FAILOVER_LLM_PROVIDER,
+        constants.DEFAULT_VALUE__FAILOVER_LLM_PROVIDER,
+    )
+    caller = ResilientCaller(
+        default_deadline=float(
+            os.getenv(
+                constants.ENV_KEY__LLM_CALL_DEADLINE,
+                constants.DEFAULT_VALUE__LLM_CALL_DEADLINE,
+            )
+        ),
+        stage_deadlines={
+            stage: float(deadline)
+            for stage, deadline in parse_stage_assignments(
+                os.getenv(
+                    constants.ENV_KEY__LLM_STAGE_DEADLINES,
+                    constants.DEFAULT_VALUE__LLM_STAGE_DEADLINES,
+                )
+            ).items()
+        },
+        max_retries=int(
+            os.getenv(
+                constants.ENV_KEY__LLM_CALL_RETRIES,
+                constants.DEFAULT_VALUE__LLM_CALL_RETRIES,
+            )
+        ),
+        hedging=os.getenv(
+            constants.ENV_KEY__LLM_HEDGING, constants.DEFAULT_VALUE__LLM_HEDGING
+        ).lower()
+        in constants.BOOLEAN_TRUE_VALUES,
+        failover_llm=(
+            build_llm_from_environment(failover_llm_provider)
+            if failover_llm_provider
+            else None
+        ),
+    )
+    batch_window = float(
+        os.getenv(
+            constants.ENV_KEY__BATCH_WINDOW, constants.DEFAULT_VALUE__BATCH_WINDOW
+        )
+    )
+    batcher = (
+        TranslationBatcher.shared(
+            stage_llms.get(constants.STAGE__TRANSLATE, llm),
+            window=batch_window,
+            max_batch_size=int(
+                os.getenv(
+                    constants.ENV_KEY__BATCH_MAX_SIZE,
+                    constants.DEFAULT_VALUE__BATCH_MAX_SIZE,
+                )
+            ),
+            max_batch_characters=int(
+                os.getenv(
+                    constants.ENV_KEY__BATCH_MAX_CHARACTERS,
+                    constants.DEFAULT_VALUE__BATCH_MAX_CHARACTERS,
+                )
+            ),
+            # The call of the leader of a batch is bounded by the call deadline.
+            max_wait=float(
+                os.getenv(
+                    constants.ENV_KEY__LLM_CALL_DEADLINE,
+                    constants.DEFAULT_VALUE__LLM_CALL_DEADLINE,
+                )
+            ),
+        )
+        if batch_window > 0
+        else None
+    )
+    glossary_path = os.getenv(
+        constants.ENV_KEY__GLOSSARY_PATH, constants.DEFAULT_VALUE__GLOSSARY_PATH
+    )
+    return AgenticTranslator(
+        llm=llm,
+        source_language=source_language,
+        target_language=target_language,
+        batcher=batcher,
+        stage_llms=stage_llms,
+        escalation_llm=(
+            build_llm_from_environment(escalation_llm_provider)
+            if escalation_llm_provider
+            else None
+        ),
+        caller=caller,
+        semantic_cache=(
+            SemanticCache.shared(
+                threshold=float(
+                    os.getenv(
+                        constants.ENV_KEY__SEMANTIC_CACHE_THRESHOLD,
+                        constants.DEFAULT_VALUE__SEMANTIC_CACHE_THRESHOLD,
+                    )
+                ),
+                max_entries_per_pair=int(
+                    os.getenv(
+                        constants.ENV_KEY__SEMANTIC_CACHE_MAX_ENTRIES,
+                        constants.DEFAULT_VALUE__SEMANTIC_CACHE_MAX_ENTRIES,
+                    )
+                ),
+            )
+            if os.getenv(
+                constants.ENV_KEY__SEMANTIC_CACHE,
+                constants.DEFAULT_VALUE__SEMANTIC_CACHE,
+            ).lower()
+            in constants.BOOLEAN_TRUE_VALUES
+            else None
+        ),
+        glossary=TerminologyStore.shared(glossary_path) if glossary_path else None,
+        structured_outputs=os.getenv(
+            constants.ENV_KEY__STRUCTURED_OUTPUTS,
+            constants.DEFAULT_VALUE__STRUCTURED_OUTPUTS,
+        ).lower()
+        in constants.BOOLEAN_TRUE_VALUES,
+        reflection_budget=ReflectionBudget(
+            max_rounds=int(
+                os.getenv(
+                    constants.ENV_KEY__REFLECTION_MAX_ROUNDS,
+                    constants.DEFAULT_VALUE__REFLECTION_MAX_ROUNDS,
+                )
+            ),
+            max_tokens=int(
+                os.getenv(
+                    constants.ENV_KEY__REFLECTION_TOKEN_BUDGET,
+                    constants.DEFAULT_VALUE__REFLECTION_TOKEN_BUDGET,
+                )
+            ),
+            max_seconds=float(
+                os.getenv(
+                    constants.ENV_KEY__REFLECTION_TIME_BUDGET,
+                    constants.DEFAULT_VALUE__REFLECTION_TIME_BUDGET,
+                )
+            ),
+            min_change=float(
+                os.getenv(
+                    constants.ENV_KEY__REFLECTION_MIN_CHANGE,
+                    constants.DEFAULT_VALUE__REFLECTION_MIN_CHANGE,
+                )
+            ),
+        ),
+    )
+
+
+def warm_up(llm: LLM = None, connect: bool = False) -> float:
+    """
+    Warm up the process before the first translation: import the SDK of the configured provider, load the
+    tokenizer shared by the chat memories of the agents and the local token counts, load the glossary, if
+    any, and optionally pre-connect to the provider with a short completion, which also makes self-hosted
+    servers load the model. No translator is built, as translators are built for each request, or by the
+    translator pool, with their own language models, and building one takes milliseconds once the
+    tokenizer is loaded.
+
+    Args:
+        llm (LLM): The language model to warm up. Defaults to None, which builds one from the environment variables.
+        connect (bool): Whether to send a short completion to the provider. Defaults to False.
+
+    Returns:
+        float: The time in seconds taken by the warm-up.
+    """
+    # icecream is imported on first use, so that importing the providers does not load it.
+    from icecream import ic
+
+    started_at = time.perf_counter()
+    try:
+        llm = llm or build_llm_from_environment()
+        get_tokenizer()
+        glossary_path = os.getenv(
+            constants.ENV_KEY__GLOSSARY_PATH, constants.DEFAULT_VALUE__GLOSSARY_PATH
+        )
+        if glossary_path:
+            # Build the matchers of the glossary now, rather than in the first translation.
+            TerminologyStore.shared(glossary_path)
+        if connect:
+            llm.complete(prompt=constants.SAMPLE_TEXT__ENGLISH_PLACEHOLDER)
+    except Exception as e:
+        # A failed warm-up must not stop the app; the first translation will report the problem.
+        ic(f"Warm-up failed. {str(e)}")
+    elapsed = time.perf_counter() - started_at
+    ic(f"Warm-up completed in {elapsed:.2f} seconds.")
+    return elapsed
@@ -0,0 +1,136 @@
+from contextlib import contextmanager
+from threading import Lock, Semaphore
+
+import constants
+import time
+
+from cancellation import CancellationToken, current_cancellation_token
+from metrics import METRICS
+
+# The interval in seconds at which a waiting request checks whether its translation is cancelled.
+_ADMISSION_POLL_SECONDS = 0.1
+
+
+class QueueFullError(Exception):
+    """Raised when a request is rejected because its lane has too many waiting requests, or it waited too long."""
+
+
+class PriorityLanes:
+    """
+    Admission control for translation requests with separate lanes for short and long texts. The lanes are
+    independent pools of slots rather than priorities over a shared limit: each lane has its own concurrency
+    limit, so short texts are not stuck behind slow translations of long texts, but neither lane can use the
+    idle slots of the other, and up to the sum of both limits are translated at the same time. Each lane also
+    has its own limit on waiting requests, beyond which requests are rejected straight away instead of piling
+    up, and a request that waits too long for a slot, or whose translation is cancelled, stops waiting.
+    """
+
+    def __init__(
+        self,
+        short_text_length: int = 280,
+        short_lane_concurrency: int = 4,
+        long_lane_concurrency: int = 2,
+        max_waiting: int = 32,
+        max_wait: float = 120.0,
+    ):
+        """
+        Initialise the lanes.
+
+        Args:
+            short_text_length (int): The maximum length of a text in the short lane. Defaults to 280.
+            short_lane_concurrency (int): The number of short texts translated at the same time. Defaults to 4.
+            long_lane_concurrency (int): The number of long texts translated at the same time. Defaults to 2.
+            max_waiting (int): The maximum number of requests waiting in each lane. Defaults to 32.
+            max_wait (float): The longest time in seconds that a request waits for a slot, where 0 means until its translation deadline, if any. Defaults to 120.
+        """
+        self._short_text_length = short_text_length
+        self._max_waiting = max_waiting
+        self._max_wait = max_wait
+        self._lock = Lock()
+        self._semaphores = {
+            constants.QUEUE_LANE__SHORT: Semaphore(short_lane_concurrency),
+            constants.QUEUE_LANE__LONG: Semaphore(long_lane_concurrency),
+        }
+        self._waiting = {lane: 0 for lane in self._semaphores}
+
+    def lane_for(self, text: str) -> str:
+        """Get the lane for a text, based on its length."""
+        return (
+            constants.QUEUE_LANE__SHORT
+            if len(text) <= self._short_text_length
+            else constants.QUEUE_LANE__LONG
+        )
+
+    @contextmanager
+    def admit(self, text: str, cancellation_token: CancellationToken = None):
+        """
+        Wait for a slot in the lane of a text, and hold it while the context is active.
+
+        Args:
+            text (str): The text to translate.
+            cancellation_token (CancellationToken): The cancellation token of the translation, which stops the wait when it is cancelled or past its deadline. Defaults to None, which uses that of the translation running in the current thread, if any.
+
+        Raises:
+            QueueFullError: If the lane already has the maximum number of waiting requests, or no slot is free within the longest wait.
+            TranslationCancelledError: If the translation is cancelled, or its deadline passes, while it waits.
+        """
+        lane = self.lane_for(text)
+        with self._lock:
+            if self._waiting[lane] >= self._max_waiting:
+                METRICS.increment(constants.METRIC__QUEUE_REJECTIONS.format(lane=lane))
+                raise QueueFullError(
+                    f"Too many {lane} translation requests are waiting. Please try again later."
+                )
+            self._waiting[lane] += 1
+            METRICS.observe(
+                constants.METRIC__QUEUE_DEPTH.format(lane=lane), self._waiting[lane]
+            )
+        enqueued_at = time.perf_counter()
+        try:
+            self._acquire(
+                lane, cancellation_token or current_cancellation_token(), enqueued_at
+            )
+        finally:
+            with self._lock:
+                self._waiting[lane] -= 1
+        METRICS.observe(
+            constants.METRIC__QUEUE_WAIT.format(lane=lane),
+            time.perf_counter() - enqueued_at,
+        )
+        try:
+            yield lane
+        finally:
+            self._semaphores[lane].release()
+
+    def _acquire(
+        self,
+        lane: str,
+        cancellation_token: CancellationToken | None,
+        enqueued_at: float,
+    ):
+        """Wait for a slot in a lane until the longest wait, or until the translation is cancelled."""
+        semaphore = self._semaphores[lane]
+        while True:
+            timeout = _ADMISSION_POLL_SECONDS
+            if self._max_wait > 0:
+                left = self._max_wait - (time.perf_counter() - enqueued_at)
+                if left <= 0:
+                    METRICS.increment(
+                        constants.METRIC__QUEUE_TIMEOUTS.format(lane=lane)
+                    )
+                    raise QueueFullError(
+                        f"No {lane} translation slot was free within {self._max_wait:g} seconds. Please try again later."
+                    )
+                timeout = min(timeout, left)
+            if cancellation_token is not None:
+                cancellation_token.raise_if_cancelled(constants.STAGE__ADMISSION)
+                remaining = cancellation_token.remaining()
+                if remaining is not None:
+                    timeout = min(timeout, remaining)
+            if semaphore.acquire(timeout=timeout):
+                return
+
+    def waiting(self) -> dict:
+        """Get the number of requests currently waiting in each lane."""
+        with self._lock:
+            return dict(self._waiting)
@@ -0,0 +1,278 @@
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from icecream import ic
+from typing import Dict, Tuple
+from llama_index.core.base.llms.types import CompletionResponse
+
+import constants
+import time
+
+from accounting import UsageAccount, current_usage_account, usage_scope
+from cancellation import (
+    CancellationToken,
+    TranslationCancelledError,
+    cancellation_scope,
+)
+from metrics import METRICS
+from routing import choose_translation_mode
+from translator import AgenticTranslator, assessment_reports_missing_concepts
+
+_RACE_EXECUTOR = ThreadPoolExecutor(max_workers=16, thread_name_prefix="race")
+
+
+class RaceFailedError(Exception):
+    """Raised when the translations of all the providers in a race fail."""
+
+
+def assessment_score(response: CompletionResponse) -> float:
+    """
+    Score an assessment of a translation, so that translations can be compared.
+
+    Args:
+        response (CompletionResponse): The LLM response containing the assessment.
+
+    Returns:
+        float: 1 if all concepts are captured, less the more triplets are reported as missed in a structured assessment, and 0 if a free-form assessment reports missed concepts.
+    """
+    assessment = response.additional_kwargs.get(constants.STRUCTURED_OUTPUT__PARSED)
+    if assessment is not None:
+        if assessment.verdict == constants.ASSESSMENT_VERDICT__COMPLETE:
+            return 1.0
+        return 1 / (2 + len(assessment.missed_triplets))
+    return 0.0 if assessment_reports_missing_concepts(response.text) else 1.0
+
+
+def race_statistics() -> dict:
+    """
+    Summarise the provider races: how often each provider won and how long its translations took.
+
+    Returns:
+        dict: For each provider, its number of races, wins and failures, its win rate and the summaries of its latency and its scores.
+    """
+    summary = METRICS.summary()
+    statistics = {}
+    for provider in constants.LLM_PROVIDERS__SUPPORTED:
+        entries = summary["counters"].get(
+            constants.METRIC__RACE_ENTRIES.format(provider=provider), 0
+        )
+        if not entries:
+            continue
+        wins = summary["counters"].get(
+            constants.METRIC__RACE_WINS.format(provider=provider), 0
+        )
+        statistics[provider] = {
+            "entries": entries,
+            "wins": wins,
+            "failures": summary["counters"].get(
+                constants.METRIC__RACE_FAILURES.format(provider=provider), 0
+            ),
+            "win_rate": wins / entries,
+            "latency": summary["observations"].get(
+                constants.METRIC__RACE_LATENCY.format(provider=provider)
+            ),
+            "score": summary["observations"].get(
+                constants.METRIC__RACE_SCORE.format(provider=provider)
+            ),
+        }
+    return statistics
+
+
+class ProviderRace:
+    """
+    The same translation run concurrently on several language model providers. With the latency strategy,
+    the first translation to arrive wins; with the quality strategy, each translation is assessed as it
+    arrives, against knowledge triplets extracted while the providers translate, and the first one that
+    captures all concepts wins, or else the best one once all have arrived. The translations still running
+    are cancelled as soon as there is a winner.
+    """
+
+    def __init__(
+        self,
+        translators: Dict[str, AgenticTranslator],
+        strategy: str = constants.RACE_STRATEGY__LATENCY,
+        judge: AgenticTranslator = None,
+    ):
+        """
+        Initialise the race.
+
+        Args:
+            translators (Dict[str, AgenticTranslator]): The translator of each provider in the race, for the same language pair.
+            strategy (str): How the winner is chosen, by latency or by quality. Defaults to latency.
+            judge (AgenticTranslator): The translator that assesses the translations, needed by the quality strategy. Defaults to None.
+        """
+        if strategy not in constants.RACE_STRATEGIES__SUPPORTED:
+            raise ValueError(f"Unsupported race strategy: {strategy}")
+        if strategy == constants.RACE_STRATEGY__QUALITY and judge is None:
+            raise ValueError("The quality strategy needs a judge.")
+        if not translators:
+            raise ValueError("A race needs at least one provider.")
+        self._translators = translators
+        self._strategy = strategy
+        self._judge = judge
+
+    def _run(
+        self,
+        provider: str,
+        source_text: str,
+        mode: str,
+        cancellation_token: CancellationToken,
+        usage_account: UsageAccount,
+    ) -> str:
+        """Translate text with the translator of a provider, recording its latency if it finishes."""
+        started_at = time.perf_counter()
+        translation = self._translators[provider].translate_in_mode(
+            source_text,
+            mode,
+            cancellation_token=cancellation_token,
+            usage_account=usage_account,
+        )
+        METRICS.observe(
+            constants.METRIC__RACE_LATENCY.format(provider=provider),
+            time.perf_counter() - started_at,
+        )
+        return translation
+
+    def _score(
+        self,
+        source_text: str,
+        translation: str,
+        knowledge_triplets: Future,
+        cancellation_token: CancellationToken,
+        usage_account: UsageAccount,
+    ) -> float:
+        """Score a translation with the assessment of the judge, in the cancellation and usage scopes of the race."""
+        with cancellation_scope(cancellation_token), usage_scope(usage_account):
+            return assessment_score(
+                self._judge.assess_translation(
+                    source_text, translation, knowledge_triplets.result().text
+                )
+            )
+
+    def _extract_knowledge_triplets(
+        self,
+        source_text: str,
+        cancellation_token: CancellationToken,
+        usage_account: UsageAccount,
+    ) -> CompletionResponse:
+        """Extract the knowledge triplets to assess the translations with, in the cancellation and usage scopes of the race."""
+        with cancellation_scope(cancellation_token), usage_scope(usage_account):
+            return self._judge.extract_knowledge_triplets(source_text)
+
+    def translate(
+        self,
+        source_text: str,
+        mode: str = constants.TRANSLATION_MODE__AUTO,
+        short_text_length: int = int(
+            constants.DEFAULT_VALUE__AUTO_MODE_SHORT_TEXT_LENGTH
+        ),
+        max_queue_depth: int = int(constants.DEFAULT_VALUE__AUTO_MODE_MAX_QUEUE_DEPTH),
+        cancellation_token: CancellationToken = None,
+        usage_account: UsageAccount = None,
+    ) -> Tuple[str, str]:
+        """
+        Translate text on all the providers at once, and keep the winning translation.
+
+        Args:
+            source_text (str): The text to translate.
+            mode (str): One of the supported translation modes, used by all the providers. Defaults to the automatic mode.
+            short_text_length (int): The maximum length of a short text, used in the automatic mode. Defaults to 280.
+            max_queue_depth (int): The queue depth from which the automatic mode only uses single-call translations. Defaults to 4.
+            cancellation_token (CancellationToken): The token to cancel the whole race with. Defaults to None.
+            usage_account (UsageAccount): The account of the token usage of all the providers and the judge. Defaults to that of the current scope, if any.
+
+        Returns:
+            Tuple[str, str]: The winning provider and its translation.
+
+        Raises:
+            TranslationCancelledError: If the race is cancelled before there is a winner.
+            RaceFailedError: If the translations of all the providers fail.
+        """
+        race_token = cancellation_token or CancellationToken()
+        usage_account = usage_account or current_usage_account()
+        if mode == constants.TRANSLATION_MODE__AUTO:
+            # The mode is chosen once, so that the providers translate in the same mode.
+            any_translator = next(iter(self._translators.values()))
+            mode = choose_translation_mode(
+                source_text,
+                any_translator.source_language,
+                any_translator.target_language,
+                short_text_length=short_text_length,
+                max_queue_depth=max_queue_depth,
+            )
+        tokens = {
+            provider: CancellationToken(parent=race_token)
+            for provider in self._translators
+        }
+        judge_token = CancellationToken(parent=race_token)
+        knowledge_triplets = (
+            _RACE_EXECUTOR.submit(
+                self._extract_knowledge_triplets,
+                source_text,
+                judge_token,
+                usage_account,
+            )
+            if self._strategy == constants.RACE_STRATEGY__QUALITY
+            else None
+        )
+        futures = {}
+        for provider, token in tokens.items():
+            METRICS.increment(constants.METRIC__RACE_ENTRIES.format(provider=provider))
+            futures[
+                _RACE_EXECUTOR.submit(
+                    self._run, provider, source_text, mode, token, usage_account
+                )
+            ] = provider
+        winner, winning_translation, best_score = None, None, -1.0
+        error = None
+        try:
+            for future in as_completed(futures):
+                provider = futures[future]
+                try:
+                    translation = future.result()
+                    if not translation.strip():
+                        raise ValueError("The translation is empty.")
+                except Exception as e:
+                    race_token.raise_if_cancelled(constants.STAGE__TRANSLATE)
+                    METRICS.increment(
+                        constants.METRIC__RACE_FAILURES.format(provider=provider)
+                    )
+                    ic(provider, e)
+                    error = e
+                    continue
+                if self._strategy == constants.RACE_STRATEGY__LATENCY:
+                    winner, winning_translation = provider, translation
+                    break
+                try:
+                    score = self._score(
+                        source_text,
+                        translation,
+                        knowledge_triplets,
+                        judge_token,
+                        usage_account,
+                    )
+                except TranslationCancelledError:
+                    race_token.raise_if_cancelled(constants.STAGE__ASSESS)
+                    raise
+                except Exception as e:
+                    ic(provider, e)
+                    score = 0.0
+                METRICS.observe(
+                    constants.METRIC__RACE_SCORE.format(provider=provider), score
+                )
+                # Ties go to the translation that arrived first.
+                if score > best_score:
+                    winner, winning_translation, best_score = (
+                        provider,
+                        translation,
+                        score,
+                    )
+                if score >= 1.0:
+                    break
+        finally:
+            for token in (*tokens.values(), judge_token):
+                token.cancel(constants.CANCELLATION_REASON__LOST)
+        if winner is None:
+            raise RaceFailedError(
+                f"The translations of all the providers in the race failed: {error}"
+            ) from error
+        METRICS.increment(constants.METRIC__RACE_WINS.format(provider=winner))
+        return winner, winning_translation
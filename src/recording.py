@@ -0,0 +1,322 @@
+import gzip
+import hashlib
+import json
+import os
+import time
+from threading import Lock
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Sequence, Tuple
+
+from llama_index.core.base.llms.types import (
+    ChatMessage,
+    ChatResponse,
+    CompletionResponse,
+    LLMMetadata,
+)
+from llama_index.core.llms import CustomLLM
+from llama_index.core.llms.callbacks import llm_chat_callback, llm_completion_callback
+from llama_index.core.llms.llm import LLM
+from pydantic import PrivateAttr
+
+import constants
+from metrics import METRICS
+
+# The names of the prompt and completion token counts in the usage reported by each provider: Open AI and
+# Llamafile, Ollama, and Cohere.
+_USAGE_FIELDS = (
+    ("prompt_tokens", "completion_tokens"),
+    ("prompt_eval_count", "eval_count"),
+    ("input_tokens", "output_tokens"),
+)
+
+# The lock of each log, shared by the language models that record to the same log.
+_LOG_LOCKS: Dict[str, Lock] = {}
+_LOG_LOCKS_LOCK = Lock()
+
+
+class ReplayMissError(KeyError):
+    """Raised when a replayed language model is asked for a completion that was not recorded."""
+
+
+def open_log(path: str, mode: str):
+    """Open a log of language model calls, which is compressed if its name ends with `.gz`."""
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding=constants.CHAR_ENCODING__UTF8)
+    return open(path, mode, encoding=constants.CHAR_ENCODING__UTF8)
+
+
+def call_key(system_prompt: str | None, prompt: str, kwargs: Dict[str, Any]) -> str:
+    """
+    Get the key of a language model call, which identifies the same call in a recording.
+
+    Args:
+        system_prompt (str | None): The system prompt of the language model.
+        prompt (str): The prompt, or the serialised chat messages.
+        kwargs (Dict[str, Any]): The further completion arguments.
+
+    Returns:
+        str: The key.
+    """
+    return hashlib.sha256(
+        json.dumps([system_prompt, prompt, kwargs], sort_keys=True, default=str).encode(
+            constants.CHAR_ENCODING__UTF8
+        )
+    ).hexdigest()[:32]
+
+
+def _usage_counts(usage: Any) -> Tuple[int, int] | None:
+    """Read the prompt and completion token counts of a usage report, which is a dictionary or an object."""
+    for prompt_field, completion_field in _USAGE_FIELDS:
+        counts = [
+            usage.get(field) if isinstance(usage, dict) else getattr(usage, field, None)
+            for field in (prompt_field, completion_field)
+        ]
+        if all(isinstance(count, (int, float)) for count in counts):
+            return int(counts[0]), int(counts[1])
+    return None
+
+
+def token_usage(response: CompletionResponse | ChatResponse) -> Tuple[int, int] | None:
+    """
+    Get the prompt and completion token counts reported by the provider of a response.
+
+    Args:
+        response (CompletionResponse | ChatResponse): The response.
+
+    Returns:
+        Tuple[int, int] | None: The prompt and completion token counts, or None if the provider reported none.
+    """
+    for usage in (response.additional_kwargs, response.raw):
+        if usage is None:
+            continue
+        counts = _usage_counts(usage)
+        if counts is None:
+            # The usage is nested in the raw response of some providers.
+            nested = (
+                usage.get("usage")
+                if isinstance(usage, dict)
+                else getattr(usage, "usage", None)
+            )
+            if nested is None:
+                meta = (
+                    usage.get("meta")
+                    if isinstance(usage, dict)
+                    else getattr(usage, "meta", None)
+                )
+                nested = (
+                    meta.get("billed_units")
+                    if isinstance(meta, dict)
+                    else getattr(meta, "billed_units", None)
+                )
+            counts = _usage_counts(nested) if nested is not None else None
+        if counts is not None:
+            return counts
+    return None
+
+
+def _chat_prompt(messages: Sequence[ChatMessage]) -> str:
+    """Serialise chat messages for the key of a call."""
+    return json.dumps(
+        [[str(message.role), message.content] for message in messages],
+        ensure_ascii=False,
+    )
+
+
+def with_system_prompt(llm: LLM, system_prompt: str | None) -> LLM:
+    """
+    Get a language model to make a call with a system prompt. Language models are shared by concurrent
+    translations of different language pairs, so the system prompt is set on a shallow copy, which shares
+    the client of the provider, rather than on the shared language model.
+
+    Args:
+        llm (LLM): The language model.
+        system_prompt (str | None): The system prompt, where None keeps that of the language model.
+
+    Returns:
+        LLM: The language model itself if it already has the system prompt, otherwise a copy with it.
+    """
+    if system_prompt is None or llm.system_prompt == system_prompt:
+        return llm
+    return llm.model_copy(update={"system_prompt": system_prompt})
+
+
+class LLMWrapper(CustomLLM):
+    """
+    A language model that delegates to another one, passing its system prompt on with each call, so that
+    calls can be observed or served differently without changing the translators.
+    """
+
+    llm: LLM | None = None
+
+    @property
+    def metadata(self) -> LLMMetadata:
+        return (
+            self.llm.metadata
+            if self.llm is not None
+            else LLMMetadata(model_name=type(self).__name__)
+        )
+
+    def _call(self, key_prompt: str, kwargs: Dict[str, Any], call) -> Any:
+        """Make a call to the wrapped language model. Subclasses observe or replace the call."""
+        return call(with_system_prompt(self.llm, self.system_prompt))
+
+    @llm_completion_callback()
+    def complete(
+        self, prompt: str, formatted: bool = False, **kwargs: Any
+    ) -> CompletionResponse:
+        return self._call(
+            prompt,
+            kwargs,
+            lambda llm: llm.complete(prompt, formatted=formatted, **kwargs),
+        )
+
+    @llm_completion_callback()
+    def stream_complete(self, prompt: str, formatted: bool = False, **kwargs: Any):
+        yield self.complete(prompt, formatted=formatted, **kwargs)
+
+    @llm_chat_callback()
+    def chat(self, messages: Sequence[ChatMessage], **kwargs: Any) -> ChatResponse:
+        return self._call(
+            _chat_prompt(messages), kwargs, lambda llm: llm.chat(messages, **kwargs)
+        )
+
+
+class RecordingLLM(LLMWrapper):
+    """
+    A language model that appends every call to another one to a log: the prompts, the response, the token
+    counts reported by the provider and the latency.
+    """
+
+    log_path: str
+
+    def _call(self, key_prompt: str, kwargs: Dict[str, Any], call) -> Any:
+        started_at = time.perf_counter()
+        response = super()._call(key_prompt, kwargs, call)
+        latency = time.perf_counter() - started_at
+        usage = token_usage(response)
+        entry = {
+            "key": call_key(self.system_prompt, key_prompt, kwargs),
+            "system_prompt": self.system_prompt,
+            "prompt": key_prompt,
+            "chat": isinstance(response, ChatResponse),
+            "text": (
+                response.message.content
+                if isinstance(response, ChatResponse)
+                else response.text
+            ),
+            "prompt_tokens": usage[0] if usage else None,
+            "completion_tokens": usage[1] if usage else None,
+            "latency": round(latency, 4),
+        }
+        with _LOG_LOCKS_LOCK:
+            lock = _LOG_LOCKS.setdefault(os.path.abspath(self.log_path), Lock())
+        with lock, open_log(self.log_path, "a") as log:
+            log.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        return response
+
+
+@lru_cache(maxsize=8)
+def _load_log(path: str, modified_at: float) -> Dict[str, List[dict]]:
+    """Load the entries of a log by the key of their call, once for each version of the log."""
+    entries: Dict[str, List[dict]] = {}
+    with open_log(path, "r") as log:
+        for line in log:
+            if line.strip():
+                entry = json.loads(line)
+                entries.setdefault(entry["key"], []).append(entry)
+    return entries
+
+
+class ReplayLLM(LLMWrapper):
+    """
+    A language model that serves the responses recorded in a log, without any network access. A call
+    recorded more than once is answered with its recorded responses in turn.
+    """
+
+    log_path: str
+    model_name: str = "replay"
+    # The class name of the language model of the recorded provider, which decides the completion arguments
+    # of the calls, such as those of its JSON mode, so that they are made as they were recorded.
+    recorded_class_name: str | None = None
+    # The factor by which the recorded latencies are sped up, where 1 keeps the original timing and 0
+    # answers at once.
+    speed: float = 0.0
+
+    _served: Dict[str, int] = PrivateAttr(default_factory=dict)
+    _lock: Lock = PrivateAttr(default_factory=Lock)
+
+    def __init__(self, **kwargs: Any):
+        super().__init__(**kwargs)
+        # Load the log now, so that a missing log is reported when the language model is built.
+        self._load()
+
+    def _load(self) -> Dict[str, List[dict]]:
+        """Load the entries of the log by the key of their call, again only if the log has changed."""
+        return _load_log(self.log_path, os.path.getmtime(self.log_path))
+
+    @property
+    def metadata(self) -> LLMMetadata:
+        return LLMMetadata(model_name=self.model_name)
+
+    def _call(self, key_prompt: str, kwargs: Dict[str, Any], call) -> Any:
+        key = call_key(self.system_prompt, key_prompt, kwargs)
+        entries = self._load().get(key)
+        if not entries:
+            METRICS.increment(constants.METRIC__REPLAY_MISSES)
+            raise ReplayMissError(f"No recorded response for the call {key}.")
+        with self._lock:
+            served = self._served.get(key, 0)
+            self._served[key] = served + 1
+        entry = entries[served % len(entries)]
+        if self.speed > 0:
+            time.sleep(entry["latency"] / self.speed)
+        METRICS.increment(constants.METRIC__REPLAY_HITS)
+        usage = (
+            {
+                "prompt_tokens": entry["prompt_tokens"],
+                "completion_tokens": entry["completion_tokens"],
+            }
+            if entry.get("prompt_tokens") is not None
+            else {}
+        )
+        if entry["chat"]:
+            return ChatResponse(
+                message=ChatMessage(role="assistant", content=entry["text"]),
+                additional_kwargs=usage,
+            )
+        return CompletionResponse(text=entry["text"], additional_kwargs=usage)
+
+    def __len__(self) -> int:
+        return sum(len(entries) for entries in self._load().values())
+
+
+def build_recorded_llm(
+    build: Callable[[], LLM],
+    record_path: str = None,
+    replay_path: str = None,
+    replay_speed: float = 1.0,
+    replay_class_name: str = None,
+) -> LLM:
+    """
+    Build a language model whose calls are recorded to a log, or which replays a log instead of calling
+    its provider.
+
+    Args:
+        build (Callable[[], LLM]): The function that builds the language model of the provider, which is not called when replaying.
+        record_path (str): The log in which to record the calls. Defaults to None, which records nothing.
+        replay_path (str): The log to replay. Defaults to None, which calls the provider.
+        replay_speed (float): The factor by which the recorded latencies are sped up, where 0 answers at once. Defaults to 1, the original timing.
+        replay_class_name (str): The class name of the language model of the recorded provider. Defaults to None.
+
+    Returns:
+        LLM: The language model.
+    """
+    if replay_path:
+        return ReplayLLM(
+            log_path=replay_path,
+            speed=replay_speed,
+            recorded_class_name=replay_class_name,
+        )
+    if record_path:
+        return RecordingLLM(llm=build(), log_path=record_path)
+    return build()
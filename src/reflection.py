@@ -0,0 +1,137 @@
+from difflib import SequenceMatcher
+
+import constants
+from metrics import METRICS
+
+
+class ReflectionBudget:
+    """
+    The limits of iterative reflection, in which a translation is assessed and improved until it stops
+    changing, its assessment reports no missed concepts, or a limit is reached. Another round is only
+    started if it is expected to fit in the remaining token and time budgets, as estimated from the most
+    expensive round so far.
+    """
+
+    def __init__(
+        self,
+        max_rounds: int = 1,
+        max_tokens: int = 0,
+        max_seconds: float = 0.0,
+        min_change: float = 0.01,
+    ):
+        """
+        Initialise the budget.
+
+        Args:
+            max_rounds (int): The maximum number of assessment and improvement rounds. Defaults to 1.
+            max_tokens (int): The estimated number of prompt and completion tokens allowed for all rounds, where 0 means no limit. Defaults to 0.
+            max_seconds (float): The wall-clock time allowed for the whole reflective translation, where 0 means no limit. Defaults to 0.
+            min_change (float): The fraction of a translation that an improvement must change, below which the translation has converged. Defaults to 0.01.
+        """
+        self.max_rounds = max(1, max_rounds)
+        self.max_tokens = max_tokens
+        self.max_seconds = max_seconds
+        self.min_change = min_change
+
+    @property
+    def iterative(self) -> bool:
+        """Whether more than one round may be run."""
+        return self.max_rounds > 1
+
+    def stop_reason(
+        self,
+        rounds: int,
+        tokens_used: int,
+        seconds_used: float,
+        round_tokens: int,
+        round_seconds: float,
+    ) -> str | None:
+        """
+        Check whether another round may be started.
+
+        Args:
+            rounds (int): The number of rounds run so far.
+            tokens_used (int): The estimated number of tokens used so far.
+            seconds_used (float): The time taken so far.
+            round_tokens (int): The estimated number of tokens of the most expensive round so far.
+            round_seconds (float): The time taken by the slowest round so far.
+
+        Returns:
+            str | None: The reason to stop, or None if another round may be started.
+        """
+        if rounds >= self.max_rounds:
+            return constants.REFLECTION_STOP__MAX_ROUNDS
+        if self.max_tokens > 0 and tokens_used + round_tokens > self.max_tokens:
+            return constants.REFLECTION_STOP__TOKEN_BUDGET
+        if self.max_seconds > 0 and seconds_used + round_seconds > self.max_seconds:
+            return constants.REFLECTION_STOP__TIME_BUDGET
+        return None
+
+
+def estimate_tokens(*texts: str) -> int:
+    """
+    Estimate the number of tokens of some texts without a tokenizer, at about four characters per token.
+
+    Args:
+        *texts (str): The texts.
+
+    Returns:
+        int: The estimated number of tokens.
+    """
+    return sum(len(text) for text in texts) // 4 + len(texts)
+
+
+def translation_change(previous_text: str, text: str, min_change: float) -> float:
+    """
+    Get the fraction of a translation changed by an improvement, as one minus the similarity ratio of the
+    two texts. The cheap upper bounds of the similarity are tried first, so that the full comparison is only
+    made when the change may be below the threshold.
+
+    Args:
+        previous_text (str): The translation before the improvement.
+        text (str): The improved translation.
+        min_change (float): The threshold of the change of interest.
+
+    Returns:
+        float: The changed fraction, between 0 and 1, which is exact only when it is below the threshold.
+    """
+    if previous_text == text:
+        return 0.0
+    matcher = SequenceMatcher(None, previous_text, text)
+    for ratio in (matcher.real_quick_ratio, matcher.quick_ratio):
+        change = 1.0 - ratio()
+        if change >= min_change:
+            return change
+    return 1.0 - matcher.ratio()
+
+
+def record_reflection(rounds: int, stop_reason: str):
+    """
+    Record the number of rounds of a reflective translation and why it stopped.
+
+    Args:
+        rounds (int): The number of assessment and improvement rounds.
+        stop_reason (str): The reason the reflection stopped.
+    """
+    METRICS.observe(constants.METRIC__REFLECTION_ROUNDS, rounds)
+    METRICS.increment(constants.METRIC__REFLECTION_STOPS.format(reason=stop_reason))
+
+
+def reflection_statistics() -> dict:
+    """
+    Summarise iterative reflection: the rounds per request and how often each reason stopped the reflection.
+
+    Returns:
+        dict: The summary of the rounds per request, the number of requests stopped for each reason, and the summary of the change made by each improvement.
+    """
+    summary = METRICS.summary()
+    return {
+        "rounds": summary["observations"].get(constants.METRIC__REFLECTION_ROUNDS),
+        "stops": {
+            reason: summary["counters"].get(
+                constants.METRIC__REFLECTION_STOPS.format(reason=reason), 0
+            )
+            for reason in constants.REFLECTION_STOPS
+        },
+        "change": summary["observations"].get(constants.METRIC__REFLECTION_CHANGE),
+    }
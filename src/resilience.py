@@ -0,0 +1,349 @@
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from llama_index.core.base.llms.types import CompletionResponse
+from llama_index.core.llms.llm import LLM
+from pydantic import PrivateAttr
+from typing import Any, Callable, Dict, List
+
+import constants
+import httpx
+import random
+import time
+
+from cancellation import (
+    CancellationToken,
+    TranslationCancelledError,
+    current_cancellation_token,
+)
+from metrics import METRICS
+from recording import LLMWrapper, with_system_prompt
+
+# Language model calls run on this pool so that they can be abandoned when they exceed their deadline. An
+# abandoned call keeps its thread until the provider client gives up on it.
+_LLM_CALL_EXECUTOR = ThreadPoolExecutor(max_workers=64, thread_name_prefix="llm-call")
+
+# The timeouts and connection errors after which a retry may succeed, including those of the HTTP client of
+# the providers. Provider clients with errors of their own, such as that of Open AI, raise them from these.
+_TRANSIENT_ERRORS = (
+    TimeoutError,
+    ConnectionError,
+    httpx.TimeoutException,
+    httpx.NetworkError,
+    httpx.RemoteProtocolError,
+)
+
+
+def is_transient_error(error: BaseException) -> bool:
+    """
+    Check whether a failed language model call may succeed if it is retried: a timeout, a connection error,
+    or a response of the provider with a status of 429 (too many requests) or 5xx (server error), given by
+    the error or by one it was raised from. Other errors, such as authentication errors, other 4xx statuses
+    and invalid arguments or outputs, fail again.
+
+    Args:
+        error (BaseException): The error of the call.
+
+    Returns:
+        bool: Whether the error is transient.
+    """
+    seen = set()
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+        if isinstance(error, _TRANSIENT_ERRORS):
+            return True
+        status_code = getattr(error, "status_code", None)
+        if status_code is None:
+            status_code = getattr(getattr(error, "response", None), "status_code", None)
+        if isinstance(status_code, int):
+            return status_code == 429 or status_code >= 500
+        error = error.__cause__ or error.__context__
+    return False
+
+
+class ResilientCaller:
+    """
+    Calls language models with per-stage deadlines, retries of timeouts and other transient errors with
+    jittered exponential backoff, optional
+    hedged duplicate requests when a call is slower than usual, and failover to a secondary language model,
+    so that one slow or unavailable provider does not stall a whole translation pipeline.
+    """
+
+    def __init__(
+        self,
+        default_deadline: float = 120.0,
+        stage_deadlines: Dict[str, float] = None,
+        max_retries: int = 2,
+        backoff_base: float = 0.5,
+        backoff_max: float = 8.0,
+        hedging: bool = False,
+        hedge_percentile: float = 95,
+        hedge_min_samples: int = 20,
+        failover_llm: LLM = None,
+    ):
+        """
+        Initialise the caller.
+
+        Args:
+            default_deadline (float): The time in seconds allowed for a stage, including retries. Defaults to 120.
+            stage_deadlines (Dict[str, float]): Deadlines for individual stages. Defaults to None.
+            max_retries (int): The number of retries after a failed or timed out call. Defaults to 2.
+            backoff_base (float): The base of the exponential backoff in seconds. Defaults to 0.5.
+            backoff_max (float): The maximum backoff in seconds. Defaults to 8.
+            hedging (bool): Whether to send a duplicate request when a call takes longer than usual. Defaults to False.
+            hedge_percentile (float): The latency percentile of the stage after which to hedge. Defaults to 95.
+            hedge_min_samples (int): The number of latency samples needed before hedging. Defaults to 20.
+            failover_llm (LLM): The language model to fail over to when the stage fails. Defaults to None.
+        """
+        self._default_deadline = default_deadline
+        self._stage_deadlines = stage_deadlines or {}
+        self._max_retries = max_retries
+        self._backoff_base = backoff_base
+        self._backoff_max = backoff_max
+        self._hedging = hedging
+        self._hedge_percentile = hedge_percentile
+        self._hedge_min_samples = hedge_min_samples
+        self._failover_llm = failover_llm
+
+    @property
+    def failover_llm(self) -> LLM:
+        """The language model to fail over to, if any."""
+        return self._failover_llm
+
+    def complete(
+        self,
+        stage: str,
+        llm: LLM,
+        prompt: str,
+        completion_kwargs: Callable[[LLM], dict] = None,
+        cancellation_token: CancellationToken = None,
+        system_prompt: str = None,
+    ) -> CompletionResponse:
+        """
+        Complete a prompt for a pipeline stage, resiliently. A cancelled translation is neither retried nor
+        failed over, and its call in flight is abandoned.
+
+        Args:
+            stage (str): The pipeline stage.
+            llm (LLM): The language model to use.
+            prompt (str): The prompt to complete.
+            completion_kwargs (Callable[[LLM], dict]): Gets further completion arguments for the language model, including the failover one. Defaults to None.
+            cancellation_token (CancellationToken): The token of the translation, whose deadline also bounds the stage. Defaults to None.
+            system_prompt (str): The system prompt of the call, including the failover one. Defaults to None, which keeps that of the language model.
+
+        Returns:
+            CompletionResponse: The LLM response.
+
+        Raises:
+            TranslationCancelledError: If the translation is cancelled, or its deadline passes, before the call completes.
+        """
+        completion_kwargs = completion_kwargs or (lambda llm: {})
+        return self.call(
+            stage,
+            llm,
+            lambda llm: with_system_prompt(llm, system_prompt).complete(
+                prompt=prompt, **completion_kwargs(llm)
+            ),
+            cancellation_token,
+        )
+
+    def call(
+        self,
+        stage: str,
+        llm: LLM,
+        call: Callable[[LLM], Any],
+        cancellation_token: CancellationToken = None,
+    ) -> Any:
+        """
+        Make a call to a language model for a pipeline stage, such as a completion or a chat, resiliently. A
+        cancelled translation is neither retried nor failed over, and its call in flight is abandoned.
+
+        Args:
+            stage (str): The pipeline stage.
+            llm (LLM): The language model to use.
+            call (Callable[[LLM], Any]): Makes the call to a language model, which is the failover one when failing over.
+            cancellation_token (CancellationToken): The token of the translation, whose deadline also bounds the stage. Defaults to None.
+
+        Returns:
+            Any: The response of the call.
+
+        Raises:
+            TranslationCancelledError: If the translation is cancelled, or its deadline passes, before the call completes.
+        """
+        try:
+            return self._call_with_retries(stage, llm, call, cancellation_token)
+        except TranslationCancelledError as e:
+            raise e
+        except Exception as e:
+            if self._failover_llm is None or self._failover_llm is llm:
+                METRICS.increment(constants.METRIC__RESILIENCE_FAILURES)
+                raise e
+            # icecream is imported on first use, so that importing the translator does not load it.
+            from icecream import ic
+
+            ic(f"Failing over the {stage} stage. {str(e)}")
+            METRICS.increment(constants.METRIC__RESILIENCE_FAILOVERS)
+            try:
+                return self._call_with_retries(
+                    stage, self._failover_llm, call, cancellation_token
+                )
+            except TranslationCancelledError as cancelled_error:
+                raise cancelled_error
+            except Exception as failover_error:
+                METRICS.increment(constants.METRIC__RESILIENCE_FAILURES)
+                raise failover_error
+
+    def _call_with_retries(
+        self,
+        stage: str,
+        llm: LLM,
+        call: Callable[[LLM], Any],
+        cancellation_token: CancellationToken = None,
+    ) -> Any:
+        """Make a call, retrying calls that failed with a transient error or timed out until the stage deadline."""
+        stage_deadline = self._stage_deadlines.get(stage, self._default_deadline)
+        remaining = (
+            cancellation_token.remaining() if cancellation_token is not None else None
+        )
+        deadline = time.monotonic() + (
+            stage_deadline if remaining is None else min(stage_deadline, remaining)
+        )
+        attempt = 0
+        while True:
+            try:
+                return self._call_once(stage, llm, call, deadline, cancellation_token)
+            except TranslationCancelledError as e:
+                raise e
+            except Exception as e:
+                if cancellation_token is not None:
+                    # The stage deadline may be that of the translation.
+                    cancellation_token.raise_if_cancelled(stage)
+                if not is_transient_error(e):
+                    METRICS.increment(constants.METRIC__RESILIENCE_NON_TRANSIENT_ERRORS)
+                    raise e
+                backoff = random.uniform(
+                    0, min(self._backoff_max, self._backoff_base * 2**attempt)
+                )
+                if (
+                    attempt >= self._max_retries
+                    or time.monotonic() + backoff >= deadline
+                ):
+                    raise e
+                from icecream import ic
+
+                ic(f"Retrying the {stage} stage in {backoff:.2f} seconds. {str(e)}")
+                METRICS.increment(constants.METRIC__RESILIENCE_RETRIES)
+                if cancellation_token is None:
+                    time.sleep(backoff)
+                elif cancellation_token.wait(backoff):
+                    cancellation_token.raise_if_cancelled(stage)
+                attempt += 1
+
+    def _call_once(
+        self,
+        stage: str,
+        llm: LLM,
+        call: Callable[[LLM], Any],
+        deadline: float,
+        cancellation_token: CancellationToken = None,
+    ) -> Any:
+        """
+        Make one call, hedged with a duplicate call if it is slower than usual, within the deadline. The call
+        is abandoned when the translation is cancelled, checking its token every fraction of a second.
+        """
+        started_at = time.monotonic()
+        futures: List[Future] = [_LLM_CALL_EXECUTOR.submit(call, llm)]
+        hedged_future = None
+        hedge_delay = self._hedge_delay(stage)
+        if hedge_delay is not None and started_at + hedge_delay < deadline:
+            done, _ = wait(futures, timeout=hedge_delay)
+            if not done:
+                METRICS.increment(constants.METRIC__RESILIENCE_HEDGES)
+                hedged_future = _LLM_CALL_EXECUTOR.submit(call, llm)
+                futures.append(hedged_future)
+        while True:
+            timeout = max(0.0, deadline - time.monotonic())
+            if cancellation_token is not None:
+                timeout = min(timeout, constants.CANCELLATION__POLL_INTERVAL)
+            done, _ = wait(futures, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done and cancellation_token is not None:
+                if cancellation_token.cancelled:
+                    METRICS.increment(constants.METRIC__CANCELLATION_ABANDONED_CALLS)
+                    for future in futures:
+                        future.cancel()
+                    cancellation_token.raise_if_cancelled(stage)
+                if time.monotonic() < deadline:
+                    continue
+            if not done:
+                METRICS.increment(constants.METRIC__RESILIENCE_TIMEOUTS)
+                for future in futures:
+                    future.cancel()
+                raise TimeoutError(f"The {stage} stage exceeded its deadline.")
+            for future in done:
+                futures.remove(future)
+                if future.exception() is None:
+                    if future is hedged_future:
+                        METRICS.increment(constants.METRIC__RESILIENCE_HEDGE_WINS)
+                    METRICS.observe(
+                        constants.METRIC__RESILIENCE_CALL_LATENCY.format(stage=stage),
+                        time.monotonic() - started_at,
+                    )
+                    for other in futures:
+                        other.cancel()
+                    return future.result()
+                if not futures:
+                    # Every call, including any hedged one, has failed.
+                    raise future.exception()
+
+    def _hedge_delay(self, stage: str) -> float | None:
+        """Get the time after which to send a hedged request for a stage, if hedging applies."""
+        if not self._hedging:
+            return None
+        metric = constants.METRIC__RESILIENCE_CALL_LATENCY.format(stage=stage)
+        if METRICS.count(metric) < self._hedge_min_samples:
+            return None
+        return METRICS.percentile(metric, self._hedge_percentile)
+
+
+class ResilientLLM(LLMWrapper):
+    """
+    A language model whose calls are made by a resilient caller for a pipeline stage, for the calls that are
+    made by others, such as the chat calls of an agent. Its system prompt, if any, is passed on with each
+    call, including those that fail over.
+    """
+
+    stage: str
+
+    _caller: ResilientCaller = PrivateAttr()
+
+    def __init__(self, caller: ResilientCaller, **kwargs: Any):
+        super().__init__(**kwargs)
+        self._caller = caller
+
+    def _call(self, key_prompt: str, kwargs: Dict[str, Any], call) -> Any:
+        return self._caller.call(
+            self.stage,
+            self.llm,
+            lambda llm: call(with_system_prompt(llm, self.system_prompt)),
+            cancellation_token=current_cancellation_token(),
+        )
+
+
+def resilience_statistics() -> dict:
+    """
+    Summarise how often each resilience mechanism kicked in.
+
+    Returns:
+        dict: The number of timeouts, retries, non-transient errors, hedged requests, hedged requests that won, failovers and failures.
+    """
+    counters = METRICS.summary()["counters"]
+    return {
+        name: counters.get(metric, 0)
+        for name, metric in (
+            ("timeouts", constants.METRIC__RESILIENCE_TIMEOUTS),
+            ("retries", constants.METRIC__RESILIENCE_RETRIES),
+            ("non_transient_errors", constants.METRIC__RESILIENCE_NON_TRANSIENT_ERRORS),
+            ("hedges", constants.METRIC__RESILIENCE_HEDGES),
+            ("hedge_wins", constants.METRIC__RESILIENCE_HEDGE_WINS),
+            ("failovers", constants.METRIC__RESILIENCE_FAILOVERS),
+            ("failures", constants.METRIC__RESILIENCE_FAILURES),
+        )
+    }
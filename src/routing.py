@@ -0,0 +1,122 @@
+from contextlib import contextmanager
+from typing import Dict, List
+
+import constants
+from metrics import METRICS
+
+
+@contextmanager
+def translation_in_flight():
+    """Count a translation as in progress while the context is active."""
+    METRICS.increment(constants.METRIC__TRANSLATIONS_IN_FLIGHT)
+    try:
+        yield
+    finally:
+        METRICS.increment(constants.METRIC__TRANSLATIONS_IN_FLIGHT, -1)
+
+
+def translations_in_flight() -> int:
+    """Get the number of translations currently in progress in this process."""
+    return int(METRICS.counter(constants.METRIC__TRANSLATIONS_IN_FLIGHT))
+
+
+def choose_translation_mode(
+    source_text: str,
+    source_language: str,
+    target_language: str,
+    queue_depth: int = None,
+    short_text_length: int = int(constants.DEFAULT_VALUE__AUTO_MODE_SHORT_TEXT_LENGTH),
+    max_queue_depth: int = int(constants.DEFAULT_VALUE__AUTO_MODE_MAX_QUEUE_DEPTH),
+    low_priority: bool = False,
+) -> str:
+    """
+    Choose a translation mode for a request in the automatic mode. Short or low priority texts, and all
+    texts while many translations are in progress, take the single-call path. The multi-call pipelines are
+    used for longer texts, with the agentic pipeline reserved for language pairs across writing scripts
+    when there is spare capacity.
+
+    Args:
+        source_text (str): The text to translate.
+        source_language (str): The source language of the text.
+        target_language (str): The target language to translate the text to.
+        queue_depth (int): The number of translations in progress. Defaults to None, which uses the count for this process.
+        short_text_length (int): The maximum length of a text considered to be short. Defaults to 280.
+        max_queue_depth (int): The queue depth from which only single-call translations are used. Defaults to 4.
+        low_priority (bool): Whether the request is of low priority. Defaults to False.
+
+    Returns:
+        str: The chosen translation mode, which is never the automatic mode.
+    """
+    if queue_depth is None:
+        queue_depth = translations_in_flight()
+    if (
+        low_priority
+        or len(source_text) <= short_text_length
+        or queue_depth >= max_queue_depth
+    ):
+        return constants.TRANSLATION_MODE__SIMPLE
+    crosses_scripts = (source_language in constants.LANGUAGES__NON_LATIN_SCRIPT) != (
+        target_language in constants.LANGUAGES__NON_LATIN_SCRIPT
+    )
+    if crosses_scripts and queue_depth == 0:
+        return constants.TRANSLATION_MODE__AGENTIC
+    return constants.TRANSLATION_MODE__REFLECTIVE
+
+
+def parse_stage_assignments(value: str) -> Dict[str, str]:
+    """
+    Parse per-stage settings, given as comma-separated pairs of stage and value.
+
+    Args:
+        value (str): The per-stage settings, such as "extract:Ollama,improve:Open AI".
+
+    Returns:
+        Dict[str, str]: The value for each listed stage.
+    """
+    assignments = {}
+    for assignment in value.split(","):
+        if not assignment.strip():
+            continue
+        stage, _, stage_value = (part.strip() for part in assignment.partition(":"))
+        if stage not in constants.STAGES__SUPPORTED:
+            raise ValueError(f"Unsupported pipeline stage: {stage}")
+        assignments[stage] = stage_value
+    return assignments
+
+
+def parse_stage_llm_providers(value: str) -> Dict[str, str]:
+    """
+    Parse the assignment of language model providers to pipeline stages.
+
+    Args:
+        value (str): Comma-separated pairs of stage and provider, such as "extract:Ollama,improve:Open AI".
+
+    Returns:
+        Dict[str, str]: The provider for each listed stage.
+    """
+    stage_providers = parse_stage_assignments(value)
+    for provider in stage_providers.values():
+        if provider not in constants.LLM_PROVIDERS__SUPPORTED:
+            raise ValueError(f"Unsupported language model provider: {provider}")
+    return stage_providers
+
+
+def parse_llm_providers(value: str) -> List[str]:
+    """
+    Parse a list of language model providers.
+
+    Args:
+        value (str): Comma-separated providers, such as "Ollama,Open AI".
+
+    Returns:
+        List[str]: The distinct providers, in the order given.
+    """
+    llm_providers = []
+    for provider in value.split(","):
+        provider = provider.strip()
+        if not provider or provider in llm_providers:
+            continue
+        if provider not in constants.LLM_PROVIDERS__SUPPORTED:
+            raise ValueError(f"Unsupported language model provider: {provider}")
+        llm_providers.append(provider)
+    return llm_providers
@@ -0,0 +1,359 @@
+import re
+import time
+import unicodedata
+import zlib
+from threading import Lock
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+import constants
+from metrics import METRICS
+
+# Numbers, including those with decimal or thousands separators, which are adapted rather than matched.
+NUMBER_PATTERN = re.compile(r"\d+(?:[.,]\d+)*")
+
+# The minimum length of the words in which a typo is tolerated.
+_TYPO_MIN_WORD_LENGTH = 6
+
+
+def normalize_text(text: str) -> str:
+    """
+    Normalise a text for similarity search: fold Unicode compatibility forms and case, replace every number
+    with a placeholder, and drop punctuation and repeated whitespace.
+
+    Args:
+        text (str): The text.
+
+    Returns:
+        str: The normalised text.
+    """
+    text = unicodedata.normalize("NFKC", text).casefold()
+    text = NUMBER_PATTERN.sub("0", text)
+    text = "".join(
+        character
+        if not unicodedata.category(character).startswith("P")
+        else constants.SPACE_STRING
+        for character in text
+    )
+    return constants.SPACE_STRING.join(text.split())
+
+
+def _within_one_edit(token: str, other_token: str) -> bool:
+    """Check whether two tokens differ by at most one inserted, deleted, substituted or transposed character."""
+    if abs(len(token) - len(other_token)) > 1:
+        return False
+    prefix = 0
+    while (
+        prefix < min(len(token), len(other_token))
+        and token[prefix] == other_token[prefix]
+    ):
+        prefix += 1
+    token, other_token = token[prefix:], other_token[prefix:]
+    return (
+        token[1:] == other_token[1:]
+        or token[1:] == other_token
+        or token == other_token[1:]
+        or (token[2:] == other_token[2:] and token[:2] == other_token[1::-1])
+    )
+
+
+def _is_alphabetic(token: str) -> bool:
+    """Check whether a token is a word of an alphabetic script, whose words are separated by spaces."""
+    return all(
+        character.isalpha()
+        and unicodedata.name(character, constants.EMPTY_STRING).startswith(
+            ("LATIN", "GREEK", "CYRILLIC")
+        )
+        for character in token
+    )
+
+
+def same_meaning_tokens(normalized_text: str, other_normalized_text: str) -> bool:
+    """
+    Check whether two normalised texts have the same words, apart from typos. Words may only differ by
+    one edited character in long words of alphabetic scripts, after their first two characters, so that
+    added or dropped negations, antonyms and prefixed negations, e.g., "enable" and "unable", never match.
+    Texts in scripts written without spaces must have the same normalised text.
+
+    Args:
+        normalized_text (str): A text, normalised with `normalize_text`.
+        other_normalized_text (str): The other text, normalised with `normalize_text`.
+
+    Returns:
+        bool: Whether the texts have the same words.
+    """
+    tokens = normalized_text.split()
+    other_tokens = other_normalized_text.split()
+    if len(tokens) != len(other_tokens):
+        return False
+    for token, other_token in zip(tokens, other_tokens):
+        if token == other_token:
+            continue
+        if not (
+            min(len(token), len(other_token)) >= _TYPO_MIN_WORD_LENGTH
+            and token[:2] == other_token[:2]
+            and _is_alphabetic(token)
+            and _is_alphabetic(other_token)
+            and _within_one_edit(token, other_token)
+        ):
+            return False
+    return True
+
+
+class HashingEmbedder:
+    """
+    Embeds texts as unit vectors of hashed character n-grams (the hashing trick), which needs neither a
+    model nor a vocabulary and works across scripts.
+    """
+
+    def __init__(self, dimensions: int = 1024, ngram_size: int = 3):
+        """
+        Initialise the embedder.
+
+        Args:
+            dimensions (int): The number of dimensions of the vectors. Defaults to 1024.
+            ngram_size (int): The number of characters in each n-gram. Defaults to 3.
+        """
+        self.dimensions = dimensions
+        self._ngram_size = ngram_size
+
+    def embed(self, normalized_text: str) -> np.ndarray:
+        """
+        Embed a normalised text.
+
+        Args:
+            normalized_text (str): The text, normalised with `normalize_text`.
+
+        Returns:
+            np.ndarray: The unit vector of the text.
+        """
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        padded = f" {normalized_text} "
+        for i in range(max(1, len(padded) - self._ngram_size + 1)):
+            # CRC32 is stable across processes, unlike the built-in hash of strings.
+            hashed = zlib.crc32(
+                padded[i : i + self._ngram_size].encode(constants.CHAR_ENCODING__UTF8)
+            )
+            vector[hashed % self.dimensions] += 1.0 if hashed & (1 << 31) else -1.0
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+
+def adapt_numbers(
+    cached_source_text: str, cached_output: str, source_text: str
+) -> str | None:
+    """
+    Adapt a cached output to a source text that differs from the cached source text in its numbers.
+
+    Args:
+        cached_source_text (str): The source text of the cached output.
+        cached_output (str): The cached output.
+        source_text (str): The new source text.
+
+    Returns:
+        str | None: The output with the numbers of the new source text, or None if it cannot be adapted safely.
+    """
+    cached_numbers = NUMBER_PATTERN.findall(cached_source_text)
+    numbers = NUMBER_PATTERN.findall(source_text)
+    if cached_numbers == numbers:
+        return cached_output
+    if len(cached_numbers) != len(numbers):
+        return None
+    replacements: Dict[str, str] = {}
+    for cached_number, number in zip(cached_numbers, numbers):
+        if replacements.setdefault(cached_number, number) != number:
+            # The same number changed in different ways, so its occurrences in the output are ambiguous.
+            return None
+    changed = [n for n, replacement in replacements.items() if n != replacement]
+    if any(not _number_in(n).search(cached_output) for n in changed):
+        # A number is not written the same way in the output, e.g., with other separators or in words.
+        return None
+    return re.compile("|".join(_number_in(n).pattern for n in changed)).sub(
+        lambda match: replacements[match.group(0)], cached_output
+    )
+
+
+def _number_in(number: str) -> re.Pattern:
+    """Get the pattern of a whole number in a text, which is not part of a longer number."""
+    return re.compile(rf"(?<![\d.,]){re.escape(number)}(?!\d|[.,]\d)")
+
+
+class _PairIndex:
+    """The vectors and the entries of one namespace and language pair, searched by brute force."""
+
+    def __init__(self, dimensions: int, max_entries: int):
+        self.vectors = np.zeros((min(64, max_entries), dimensions), dtype=np.float32)
+        self.entries: List[Tuple[str, str]] = []
+        self.exact: Dict[str, int] = {}
+        self.max_entries = max_entries
+        self.next_slot = 0
+
+
+class SemanticCache:
+    """
+    A cache of language model outputs that also serves near-duplicate source texts, such as the same sentence
+    with other whitespace, punctuation or numbers. Source texts are normalised and embedded, and the most
+    similar cached source text of the same language pair is found by a brute-force search of its vectors.
+    Above a similarity threshold, and if the two texts have the same words apart from typos, the cached
+    output is returned, with its numbers adapted to the new text. The similarity alone would serve, e.g.,
+    the translation of a sentence for the same sentence with a negation.
+    """
+
+    _shared: Dict[Tuple, "SemanticCache"] = {}
+    _shared_lock = Lock()
+
+    def __init__(
+        self,
+        threshold: float = 0.95,
+        max_entries_per_pair: int = 4096,
+        embedder: HashingEmbedder = None,
+    ):
+        """
+        Initialise the cache.
+
+        Args:
+            threshold (float): The minimum cosine similarity of a cached source text to use its output. Defaults to 0.95.
+            max_entries_per_pair (int): The maximum number of entries for each language pair, beyond which the oldest are replaced. Defaults to 4096.
+            embedder (HashingEmbedder): The embedder of source texts. Defaults to None, which uses hashed character trigrams.
+        """
+        self._threshold = threshold
+        self._max_entries_per_pair = max_entries_per_pair
+        self._embedder = embedder or HashingEmbedder()
+        self._lock = Lock()
+        self._indexes: Dict[Tuple[str, str, str], _PairIndex] = {}
+
+    @classmethod
+    def shared(
+        cls, threshold: float = 0.95, max_entries_per_pair: int = 4096
+    ) -> "SemanticCache":
+        """
+        Get a process-level cache for a configuration, so that all sessions share their outputs.
+
+        Args:
+            threshold (float): The minimum cosine similarity of a cached source text to use its output. Defaults to 0.95.
+            max_entries_per_pair (int): The maximum number of entries for each language pair. Defaults to 4096.
+
+        Returns:
+            SemanticCache: The shared cache.
+        """
+        key = (threshold, max_entries_per_pair)
+        with cls._shared_lock:
+            if key not in cls._shared:
+                cls._shared[key] = cls(threshold, max_entries_per_pair)
+            return cls._shared[key]
+
+    def lookup(
+        self,
+        namespace: str,
+        source_text: str,
+        source_language: str,
+        target_language: str,
+    ) -> str | None:
+        """
+        Find the output for a source text, or for a near-duplicate of it.
+
+        Args:
+            namespace (str): The kind of output, such as the pipeline stage that produced it, and what else it depends on, such as the language model.
+            source_text (str): The source text.
+            source_language (str): The source language.
+            target_language (str): The target language.
+
+        Returns:
+            str | None: The cached output, adapted to the source text, or None if there is no similar enough entry.
+        """
+        started_at = time.perf_counter()
+        normalized_text = normalize_text(source_text)
+        vector = self._embedder.embed(normalized_text)
+        match = None
+        with self._lock:
+            index = self._indexes.get((namespace, source_language, target_language))
+            if index is not None and index.entries:
+                slot = index.exact.get(normalized_text)
+                if slot is None:
+                    similarities = index.vectors[: len(index.entries)] @ vector
+                    slot = int(np.argmax(similarities))
+                    if similarities[slot] < self._threshold:
+                        slot = None
+                    elif not same_meaning_tokens(
+                        normalize_text(index.entries[slot][0]), normalized_text
+                    ):
+                        METRICS.increment(
+                            constants.METRIC__SEMANTIC_CACHE_TOKEN_MISMATCHES
+                        )
+                        slot = None
+                if slot is not None:
+                    match = index.entries[slot]
+        output = (
+            adapt_numbers(match[0], match[1], source_text)
+            if match is not None
+            else None
+        )
+        METRICS.observe(
+            constants.METRIC__SEMANTIC_CACHE_LOOKUP_LATENCY,
+            time.perf_counter() - started_at,
+        )
+        if output is None:
+            METRICS.increment(constants.METRIC__SEMANTIC_CACHE_MISSES)
+        else:
+            METRICS.increment(constants.METRIC__SEMANTIC_CACHE_HITS)
+            if output != match[1]:
+                METRICS.increment(constants.METRIC__SEMANTIC_CACHE_ADAPTATIONS)
+        return output
+
+    def store(
+        self,
+        namespace: str,
+        source_text: str,
+        source_language: str,
+        target_language: str,
+        output: str,
+    ):
+        """
+        Cache the output for a source text.
+
+        Args:
+            namespace (str): The kind of output, such as the pipeline stage that produced it, and what else it depends on, such as the language model.
+            source_text (str): The source text.
+            source_language (str): The source language.
+            target_language (str): The target language.
+            output (str): The output for the source text.
+        """
+        normalized_text = normalize_text(source_text)
+        vector = self._embedder.embed(normalized_text)
+        key = (namespace, source_language, target_language)
+        with self._lock:
+            index = self._indexes.get(key)
+            if index is None:
+                index = _PairIndex(
+                    self._embedder.dimensions, self._max_entries_per_pair
+                )
+                self._indexes[key] = index
+            slot = index.exact.get(normalized_text)
+            if slot is None:
+                slot = index.next_slot
+                index.next_slot = (slot + 1) % index.max_entries
+                if slot < len(index.entries):
+                    # Replace the oldest entry.
+                    index.exact.pop(normalize_text(index.entries[slot][0]), None)
+                    index.entries[slot] = (source_text, output)
+                else:
+                    if slot >= len(index.vectors):
+                        grown = np.zeros(
+                            (
+                                min(2 * len(index.vectors), index.max_entries),
+                                self._embedder.dimensions,
+                            ),
+                            dtype=np.float32,
+                        )
+                        grown[: len(index.vectors)] = index.vectors
+                        index.vectors = grown
+                    index.entries.append((source_text, output))
+                index.exact[normalized_text] = slot
+            else:
+                index.entries[slot] = (source_text, output)
+            index.vectors[slot] = vector
+
+    def __len__(self) -> int:
+        with self._lock:
+            return sum(len(index.entries) for index in self._indexes.values())
@@ -0,0 +1,129 @@
+import json
+import re
+from typing import List, Literal, Type, TypeVar
+
+from llama_index.core.llms.llm import LLM
+from pydantic import BaseModel, Field, ValidationError
+
+import constants
+from metrics import METRICS
+
+# Language model classes that constrain their output to JSON when asked, mapped to the completion arguments
+# that ask for it. Other providers only get the instructions in the prompt, and their output is parsed strictly.
+_JSON_COMPLETION_KWARGS = {
+    "OpenAI": lambda output_cls: {"response_format": {"type": "json_object"}},
+    "Ollama": lambda output_cls: {"format": output_cls.model_json_schema()},
+}
+
+# A fenced code block around the JSON object, which some models add despite the instructions.
+_CODE_FENCE_PATTERN = re.compile(r"^\s*```(?:json)?\s*(.*?)\s*```\s*$", re.DOTALL)
+
+OutputModel = TypeVar("OutputModel", bound=BaseModel)
+
+
+class StructuredOutputError(ValueError):
+    """Raised when the output of a language model is not valid JSON of the expected form."""
+
+
+class KnowledgeTriplet(BaseModel):
+    """A concept of a text as a subject, a predicate and an object."""
+
+    subject: str
+    predicate: str
+    object: str
+
+
+class KnowledgeTriplets(BaseModel):
+    """The knowledge triplets extracted from a text."""
+
+    triplets: List[KnowledgeTriplet] = Field(default_factory=list)
+
+
+class TranslationAssessment(BaseModel):
+    """The assessment of a translation against the knowledge triplets of its source text."""
+
+    verdict: Literal["COMPLETE", "INCOMPLETE"]
+    missed_triplets: List[KnowledgeTriplet] = Field(default_factory=list)
+    suggestions: str = constants.EMPTY_STRING
+
+
+def json_completion_kwargs(llm: LLM, output_cls: Type[BaseModel]) -> dict:
+    """
+    Get the completion arguments that make a language model answer with JSON, if its provider supports it.
+    Wrappers, such as pooled, recording and resilient language models, pass the arguments on to the language
+    model that they wrap, whose provider decides them, and a replayed language model gets those of the
+    recorded provider, so that its calls match the recorded ones.
+
+    Args:
+        llm (LLM): The language model.
+        output_cls (Type[BaseModel]): The expected form of the output.
+
+    Returns:
+        dict: The completion arguments, which are empty if the provider has no JSON mode.
+    """
+    while getattr(llm, "llm", None) is not None:
+        llm = llm.llm
+    class_names = [cls.__name__ for cls in type(llm).__mro__]
+    recorded_class_name = getattr(llm, "recorded_class_name", None)
+    if recorded_class_name:
+        class_names.insert(0, recorded_class_name)
+    for class_name in class_names:
+        if class_name in _JSON_COMPLETION_KWARGS:
+            return _JSON_COMPLETION_KWARGS[class_name](output_cls)
+    return {}
+
+
+def parse_output(text: str, output_cls: Type[OutputModel]) -> OutputModel:
+    """
+    Parse the output of a language model strictly: it must be a single JSON object, optionally in a fenced
+    code block, that validates against the expected form.
+
+    Args:
+        text (str): The output.
+        output_cls (Type[OutputModel]): The expected form of the output.
+
+    Returns:
+        OutputModel: The parsed output.
+
+    Raises:
+        StructuredOutputError: If the output is not valid JSON of the expected form.
+    """
+    fenced = _CODE_FENCE_PATTERN.match(text)
+    try:
+        return output_cls.model_validate_json(
+            fenced.group(1) if fenced else text.strip()
+        )
+    except ValidationError as e:
+        raise StructuredOutputError(
+            f"The output is not a valid {output_cls.__name__}: {e.error_count()} errors."
+        ) from e
+
+
+def compact_json(output: BaseModel) -> str:
+    """Serialise a parsed output as compact JSON, to send to the next pipeline stage."""
+    return json.dumps(output.model_dump(), ensure_ascii=False, separators=(",", ":"))
+
+
+def parse_stage_output(
+    stage: str, text: str, output_cls: Type[OutputModel]
+) -> OutputModel | None:
+    """
+    Parse the output of a pipeline stage, recording whether it was valid.
+
+    Args:
+        stage (str): The pipeline stage.
+        text (str): The output.
+        output_cls (Type[OutputModel]): The expected form of the output.
+
+    Returns:
+        OutputModel | None: The parsed output, or None if it is not valid.
+    """
+    try:
+        output = parse_output(text, output_cls)
+    except StructuredOutputError:
+        METRICS.increment(
+            constants.METRIC__STRUCTURED_OUTPUT_FAILURES.format(stage=stage)
+        )
+        return None
+    METRICS.increment(constants.METRIC__STRUCTURED_OUTPUT_SUCCESSES.format(stage=stage))
+    return output
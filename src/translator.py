@@ -1,5 +1,9 @@
-from icecream import ic
-from typing import List
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+from threading import Lock
+from typing import Callable, Dict, List, Tuple
+import re
+import time
 from llama_index.core import PromptTemplate
 from llama_index.core.llms.llm import LLM
 from llama_index.core.base.llms.types import CompletionResponse
@@ -8,23 +12,234 @@ from llama_index.core.tools import FunctionTool
 from llama_index.core.chat_engine.types import AgentChatResponse
 
 import constants
+from accounting import (
+    UsageAccount,
+    agent_usage_scope,
+    model_of,
+    record_budget_downgrade,
+    record_tokens,
+    record_usage,
+    usage_budget_exceeded,
+    usage_scope,
+)
+from batching import TranslationBatcher
+from cancellation import (
+    CancellationToken,
+    cancellation_scope,
+    current_cancellation_token,
+    raise_if_cancelled,
+)
+from glossary import TerminologyStore, format_glossary
+from metrics import METRICS
+from preprocessing import translate_segmented
+from prompts import format_prompt
+from recording import LLMWrapper, with_system_prompt
+from reflection import (
+    ReflectionBudget,
+    estimate_tokens,
+    record_reflection,
+    translation_change,
+)
+from resilience import ResilientCaller, ResilientLLM
+from routing import choose_translation_mode, translation_in_flight
+from semantic_cache import SemanticCache
+from structured import (
+    KnowledgeTriplets,
+    StructuredOutputError,
+    TranslationAssessment,
+    compact_json,
+    json_completion_kwargs,
+    parse_output,
+    parse_stage_output,
+)
+
+
+def assessment_reports_missing_concepts(assessment_text: str) -> bool:
+    """
+    Check whether the assessment of a translation reports concepts missed by the translation.
+
+    Args:
+        assessment_text (str): The text of the assessment.
+
+    Returns:
+        bool: False if the assessment, in JSON or as text, starts with the verdict that all concepts are captured, True otherwise.
+    """
+    if assessment_text.lstrip().startswith("{"):
+        try:
+            return (
+                parse_output(assessment_text, TranslationAssessment).verdict
+                != constants.ASSESSMENT_VERDICT__COMPLETE
+            )
+        except StructuredOutputError:
+            return True
+    verdict = re.match(r"\W*(\w+)", assessment_text)
+    return (
+        verdict is None
+        or verdict.group(1).upper() != constants.ASSESSMENT_VERDICT__COMPLETE
+    )
+
+
+def cascade_statistics() -> dict:
+    """
+    Summarise the model cascade: how often translations were escalated and the latency of each tier.
+
+    Returns:
+        dict: The number of cascaded requests and escalations, the escalation rate and the latency summary of each tier.
+    """
+    summary = METRICS.summary()
+    requests = summary["counters"].get(constants.METRIC__CASCADE_REQUESTS, 0)
+    escalations = summary["counters"].get(constants.METRIC__CASCADE_ESCALATIONS, 0)
+    return {
+        "requests": requests,
+        "escalations": escalations,
+        "escalation_rate": escalations / requests if requests else 0.0,
+        "tier_latency": {
+            tier: summary["observations"].get(
+                constants.METRIC__CASCADE_TIER_LATENCY.format(tier=tier)
+            )
+            for tier in (
+                constants.CASCADE_TIER__PRIMARY,
+                constants.CASCADE_TIER__ESCALATION,
+            )
+        },
+    }
 
 
 class BaseTranslator:
-    def __init__(self, llm: LLM, source_language: str, target_language: str):
+    def __init__(
+        self,
+        llm: LLM,
+        source_language: str,
+        target_language: str,
+        batcher: TranslationBatcher = None,
+        stage_llms: Dict[str, LLM] = None,
+        caller: ResilientCaller = None,
+        semantic_cache: SemanticCache = None,
+        glossary: TerminologyStore = None,
+    ):
         self._llm = llm
+        self._batcher = batcher
+        self._caller = caller
+        self._semantic_cache = semantic_cache
+        self._glossary = glossary
+        # Language models assigned to individual pipeline stages, which otherwise use the default language model.
+        self._stage_llms = stage_llms or {}
         self.switch_translation_languages(source_language, target_language)
 
+    @property
+    def source_language(self) -> str:
+        """The language translated from."""
+        return self._source_language
+
+    @property
+    def target_language(self) -> str:
+        """The language translated to."""
+        return self._target_language
+
     def switch_translation_languages(self, source_language: str, target_language: str):
         self._source_language = source_language
         self._target_language = target_language
+        # The system prompt is sent with each call, rather than set on the language models, which are shared
+        # by the translators of other language pairs.
         self._system_prompt = PromptTemplate(
             template=constants.PROMPT__SYSTEM_SIMPLE,
         ).format(
             source_language=self._source_language,
             target_language=self._target_language,
         )
-        self._llm.system_prompt = self._system_prompt
+
+    def _llm_for(self, stage: str) -> LLM:
+        """Get the language model assigned to a pipeline stage."""
+        return self._stage_llms.get(stage, self._llm)
+
+    def _complete(
+        self,
+        stage: str,
+        prompt: str,
+        llm: LLM = None,
+        completion_kwargs: Callable[[LLM], dict] = None,
+    ) -> CompletionResponse:
+        """
+        Complete a prompt for a pipeline stage and record the latency and the token usage of the stage. The stage is skipped if
+        the translation running in the current thread is cancelled, and the resilient caller abandons the call
+        when it is cancelled while waiting for the language model.
+
+        Args:
+            stage (str): The pipeline stage.
+            prompt (str): The prompt to complete.
+            llm (LLM, optional): The language model to use. Defaults to the one assigned to the stage.
+            completion_kwargs (Callable[[LLM], dict], optional): Gets further completion arguments for a language model. Defaults to None.
+
+        Returns:
+            CompletionResponse: The LLM response.
+
+        Raises:
+            TranslationCancelledError: If the translation is cancelled.
+        """
+        llm = llm or self._llm_for(stage)
+        response = self._complete_unaccounted(stage, prompt, llm, completion_kwargs)
+        record_usage(stage, model_of(llm), prompt, response)
+        # Apart from its token usage, nothing uses the raw provider payload, which can be several times the size of the text, so do not
+        # keep it alive for as long as the response is kept.
+        response.raw = None
+        return response
+
+    def _complete_unaccounted(
+        self,
+        stage: str,
+        prompt: str,
+        llm: LLM = None,
+        completion_kwargs: Callable[[LLM], dict] = None,
+    ) -> CompletionResponse:
+        """Complete a prompt for a pipeline stage like `_complete`, leaving the token usage for the caller to account for."""
+        raise_if_cancelled(stage)
+        started_at = time.perf_counter()
+        llm = llm or self._llm_for(stage)
+        response = (
+            self._caller.complete(
+                stage,
+                llm,
+                prompt,
+                completion_kwargs,
+                cancellation_token=current_cancellation_token(),
+                system_prompt=self._system_prompt,
+            )
+            if self._caller is not None
+            else self._complete_directly(llm, prompt, completion_kwargs)
+        )
+        METRICS.observe(
+            constants.METRIC__STAGE_LATENCY.format(stage=stage),
+            time.perf_counter() - started_at,
+        )
+        return response
+
+    def _complete_directly(
+        self,
+        llm: LLM,
+        prompt: str,
+        completion_kwargs: Callable[[LLM], dict] = None,
+    ) -> CompletionResponse:
+        """Complete a prompt without the resilient caller, outside the usage scope of an agent step, as the call is accounted for by its stage."""
+        with agent_usage_scope(None):
+            return with_system_prompt(llm, self._system_prompt).complete(
+                prompt=prompt, **(completion_kwargs(llm) if completion_kwargs else {})
+            )
+
+    def _glossary_entries(self, source_text: str) -> List[Tuple[str, str]]:
+        """Get the mandated translations of the terms in a text, if there is a glossary."""
+        if self._glossary is None:
+            return []
+        return self._glossary.match(
+            source_text, self._source_language, self._target_language
+        )
+
+    def _glossary_prompt(self, source_text: str) -> str:
+        """Get the glossary section of a prompt for the terms in a text, which is empty if there are none."""
+        return format_glossary(
+            self._glossary_entries(source_text),
+            self._source_language,
+            self._target_language,
+        )
 
     def _translate(
         self, source_text: str, source_language: str, target_language: str
@@ -53,19 +268,146 @@ class BaseTranslator:
         Returns:
             CompletionResponse: The LLM response containing the translated text.
         """
-        simple_translation_prompt = PromptTemplate(
-            template=constants.PROMPT__TRANSLATE_SIMPLE,
-        ).format(
-            source_language=self._source_language,
-            target_language=self._target_language,
+        return self._cached(
+            constants.STAGE__TRANSLATE,
+            constants.EMPTY_STRING,
+            source_text,
+            self._translate_uncached,
+        )
+
+    def _translate_uncached(self, source_text: str) -> CompletionResponse:
+        """Translate text with the batcher or a language model call, bypassing the semantic cache."""
+        if self._batcher is not None:
+            raise_if_cancelled(constants.STAGE__TRANSLATE)
+            # A batched call is made with the language model of this translator if it leads the batch, and
+            # each translator accounts for the share of the usage of the call of its text.
+            translated_text, prompt_tokens, completion_tokens, estimated = (
+                self._batcher.translate(
+                    source_text,
+                    self._source_language,
+                    self._target_language,
+                    complete=lambda prompt: self._complete_unaccounted(
+                        constants.STAGE__TRANSLATE, prompt
+                    ),
+                    glossary_entries=self._glossary_entries(source_text),
+                )
+            )
+            record_tokens(
+                constants.STAGE__TRANSLATE,
+                model_of(self._llm_for(constants.STAGE__TRANSLATE)),
+                prompt_tokens,
+                completion_tokens,
+                estimated=estimated,
+            )
+            return CompletionResponse(text=translated_text)
+        simple_translation_prompt = format_prompt(
+            constants.PROMPT__TRANSLATE_SIMPLE_PREFIX,
+            constants.PROMPT__TRANSLATE_SIMPLE_SUFFIX,
+            self._source_language,
+            self._target_language,
+            glossary=self._glossary_prompt(source_text),
             source_text=source_text,
         )
-        return self._llm.complete(prompt=simple_translation_prompt)
+        return self._complete(constants.STAGE__TRANSLATE, simple_translation_prompt)
+
+    def _cache_namespace(self, stage: str, variant: str, source_text: str) -> str:
+        """
+        Get the namespace in the semantic cache of the output of a pipeline stage for a source text. The
+        semantic cache is shared by every translator of the process, so the namespace has everything else
+        that the prompt of the stage depends on: the provider and the model of the stage, and the mandated
+        translations of the terms in the text. The language pair is part of the key of the cache itself.
+
+        Args:
+            stage (str): The pipeline stage.
+            variant (str): The variant of the prompt of the stage, such as its settings, which may be empty.
+            source_text (str): The source text.
+
+        Returns:
+            str: The namespace.
+        """
+        llm = self._llm_for(stage)
+        model = model_of(llm)
+        while getattr(llm, "llm", None) is not None:
+            llm = llm.llm
+        glossary_entries = self._glossary_entries(source_text)
+        glossary_digest = (
+            hashlib.sha256(repr(sorted(glossary_entries)).encode()).hexdigest()[:16]
+            if glossary_entries
+            else constants.EMPTY_STRING
+        )
+        return ":".join((stage, variant, llm.class_name(), str(model), glossary_digest))
+
+    def _cached(
+        self,
+        stage: str,
+        variant: str,
+        source_text: str,
+        produce: Callable[[str], CompletionResponse],
+    ) -> CompletionResponse:
+        """
+        Get an output of a pipeline stage for a source text from the semantic cache, or produce and cache it.
+
+        Args:
+            stage (str): The pipeline stage that produces the output.
+            variant (str): The variant of the prompt of the stage, such as its settings, which may be empty.
+            source_text (str): The source text.
+            produce (Callable[[str], CompletionResponse]): Produces the output when it is not cached.
+
+        Returns:
+            CompletionResponse: The cached or the produced output.
+        """
+        if self._semantic_cache is None:
+            return produce(source_text)
+        namespace = self._cache_namespace(stage, variant, source_text)
+        cached_output = self._semantic_cache.lookup(
+            namespace, source_text, self._source_language, self._target_language
+        )
+        if cached_output is not None:
+            return CompletionResponse(text=cached_output)
+        response = produce(source_text)
+        self._semantic_cache.store(
+            namespace,
+            source_text,
+            self._source_language,
+            self._target_language,
+            response.text,
+        )
+        return response
 
 
 class AgenticTranslator(BaseTranslator):
-    def __init__(self, llm: LLM, source_language: str, target_language: str):
-        super().__init__(llm, source_language, target_language)
+    def __init__(
+        self,
+        llm: LLM,
+        source_language: str,
+        target_language: str,
+        batcher: TranslationBatcher = None,
+        stage_llms: Dict[str, LLM] = None,
+        escalation_llm: LLM = None,
+        caller: ResilientCaller = None,
+        semantic_cache: SemanticCache = None,
+        glossary: TerminologyStore = None,
+        reflection_budget: ReflectionBudget = None,
+        structured_outputs: bool = False,
+    ):
+        # The language model to improve translations with, when their assessment reports missed concepts.
+        self._escalation_llm = escalation_llm
+        # The limits of the assessment and improvement rounds of reflective translations.
+        self._reflection_budget = reflection_budget or ReflectionBudget()
+        # Whether the extract and assess stages answer with JSON, which is parsed into typed objects.
+        self._structured_outputs = structured_outputs
+        # The language model of the agent, which passes the system prompt of this translator on with each call.
+        self._agent_llm: LLMWrapper = None
+        super().__init__(
+            llm,
+            source_language,
+            target_language,
+            batcher,
+            stage_llms,
+            caller,
+            semantic_cache,
+            glossary,
+        )
 
         self._fn_translate = FunctionTool.from_defaults(
             fn=self._translate,
@@ -87,18 +429,39 @@ class AgenticTranslator(BaseTranslator):
             extracted from the original text to see if the concepts have been exhaustively represented.""",
         )
 
+        # The chat calls of the agent are made resiliently too, as they are not made by `_complete`.
+        self._agent_llm = (
+            ResilientLLM(
+                caller=caller,
+                llm=self._llm_for(constants.STAGE__AGENT),
+                stage=constants.STAGE__AGENT,
+                system_prompt=self._system_prompt,
+            )
+            if caller is not None
+            else LLMWrapper(
+                llm=self._llm_for(constants.STAGE__AGENT),
+                system_prompt=self._system_prompt,
+            )
+        )
         self._llm_react_agent = ReActAgent.from_tools(
             tools=[
                 self._fn_translate,
                 self._fn_extract_knowledge_triplets,
                 self._fn_assess_translation,
             ],
-            llm=self._llm,
+            llm=self._agent_llm,
             name="ReAct agentic translator",
             description="""An agentic translator that can translate text from one language to another,
             extract knowledge graph triplets, and assess the quality of a translation.""",
             verbose=True,
         )
+        # The agent keeps a chat memory, so its use is serialised.
+        self._llm_react_agent_lock = Lock()
+
+    def switch_translation_languages(self, source_language: str, target_language: str):
+        super().switch_translation_languages(source_language, target_language)
+        if self._agent_llm is not None:
+            self._agent_llm.system_prompt = self._system_prompt
 
     def _extract_knowledge_triplets(
         self, source_text: str, max_triplets: int = 10
@@ -130,13 +493,40 @@ class AgenticTranslator(BaseTranslator):
         Returns:
             CompletionResponse: The LLM response containing the extracted knowledge graph triplets.
         """
-        kg_extraction_prompt = PromptTemplate(
-            template=constants.PROMPT__KG_EXTRACT,
-        ).format(
-            max_knowledge_triplets=max_triplets,
-            source_text=source_text,
+        if self._structured_outputs:
+            return self._cached(
+                constants.STAGE__EXTRACT,
+                f"json:{max_triplets}",
+                source_text,
+                lambda source_text: self._complete_structured(
+                    constants.STAGE__EXTRACT,
+                    format_prompt(
+                        constants.PROMPT__KG_EXTRACT_JSON_PREFIX,
+                        constants.PROMPT__KG_EXTRACT_JSON_SUFFIX,
+                        self._source_language,
+                        self._target_language,
+                        max_knowledge_triplets=max_triplets,
+                        source_text=source_text,
+                    ),
+                    KnowledgeTriplets,
+                ),
+            )
+        return self._cached(
+            constants.STAGE__EXTRACT,
+            str(max_triplets),
+            source_text,
+            lambda source_text: self._complete(
+                constants.STAGE__EXTRACT,
+                format_prompt(
+                    constants.PROMPT__KG_EXTRACT_PREFIX,
+                    constants.PROMPT__KG_EXTRACT_SUFFIX,
+                    self._source_language,
+                    self._target_language,
+                    max_knowledge_triplets=max_triplets,
+                    source_text=source_text,
+                ),
+            ),
         )
-        return self._llm.complete(prompt=kg_extraction_prompt)
 
     def _assess_translation(
         self,
@@ -180,56 +570,388 @@ class AgenticTranslator(BaseTranslator):
         Returns:
             CompletionResponse: The LLM response containing the assessment of the translation.
         """
-        translation_assessment_prompt = PromptTemplate(
-            template=constants.PROMPT__KG_ASSESS
-        ).format(
-            target_language=self._target_language,
-            source_language=self._source_language,
+        translation_assessment_prompt = format_prompt(
+            constants.PROMPT__KG_ASSESS_JSON_PREFIX
+            if self._structured_outputs
+            else constants.PROMPT__KG_ASSESS_PREFIX,
+            constants.PROMPT__KG_ASSESS_SUFFIX,
+            self._source_language,
+            self._target_language,
             source_text=source_text,
             translated_text=translated_text,
             knowledge_triplets=knowledge_triplets_response,
         )
-        return self._llm.complete(prompt=translation_assessment_prompt)
+        if self._structured_outputs:
+            return self._complete_structured(
+                constants.STAGE__ASSESS,
+                translation_assessment_prompt,
+                TranslationAssessment,
+            )
+        return self._complete(constants.STAGE__ASSESS, translation_assessment_prompt)
+
+    def _complete_structured(
+        self, stage: str, prompt: str, output_cls: type
+    ) -> CompletionResponse:
+        """
+        Complete a prompt that asks for JSON, in the JSON mode of the provider if it has one, and parse it
+        strictly. A valid output is replaced by its compact JSON, to send to the next stage, while an invalid
+        one is kept as it is, as free-form text.
+
+        Args:
+            stage (str): The pipeline stage.
+            prompt (str): The prompt to complete.
+            output_cls (type): The expected form of the output.
+
+        Returns:
+            CompletionResponse: The LLM response, with the parsed output in its `additional_kwargs`, if it is valid.
+        """
+        response = self._complete(
+            stage,
+            prompt,
+            completion_kwargs=lambda llm: json_completion_kwargs(llm, output_cls),
+        )
+        output = parse_stage_output(stage, response.text, output_cls)
+        if output is not None:
+            response.text = compact_json(output)
+            response.additional_kwargs[constants.STRUCTURED_OUTPUT__PARSED] = output
+        return response
 
     def agentic_translate(self, source_text: str) -> AgentChatResponse:
-        react_translation_prompt = PromptTemplate(
-            template=constants.PROMPT__TRANSLATE_REACT,
-        ).format(
-            source_language=self._source_language,
-            target_language=self._target_language,
+        """
+        Translate text with the ReAct agent, which decides when to use the translation, extraction and
+        assessment tools. The agent is run step by step, so that a cancelled translation stops before the
+        next step. A tool call that is cancelled only makes its step fail, as the agent reports the errors of
+        its tools back to the language model. Once the usage budget of the translation is spent, the agent
+        is stopped and the text is translated with a single call instead.
+
+        Args:
+            source_text (str): The text to translate.
+
+        Returns:
+            AgentChatResponse: The response of the agent.
+
+        Raises:
+            TranslationCancelledError: If the translation is cancelled before the last step of the agent.
+        """
+        react_translation_prompt = format_prompt(
+            constants.PROMPT__TRANSLATE_REACT_PREFIX,
+            constants.PROMPT__TRANSLATE_REACT_SUFFIX,
+            self._source_language,
+            self._target_language,
             source_text=source_text,
         )
-        response: AgentChatResponse = self._llm_react_agent.chat(
-            react_translation_prompt
-        )
-        return response.response
+        with self._llm_react_agent_lock:
+            # Start each translation afresh rather than in the context of earlier ones.
+            self._llm_react_agent.reset()
+            task = self._llm_react_agent.create_task(react_translation_prompt)
+            step_output = None
+            while step_output is None or not step_output.is_last:
+                raise_if_cancelled(constants.STAGE__AGENT)
+                if usage_budget_exceeded():
+                    break
+                with agent_usage_scope(constants.STAGE__AGENT, model_of(self._llm)):
+                    step_output = self._llm_react_agent.run_step(task.task_id)
+            else:
+                response: AgentChatResponse = self._llm_react_agent.finalize_response(
+                    task.task_id, step_output
+                )
+                return response.response
+        record_budget_downgrade()
+        return self.translate(source_text).text
+
+    def reflective_translate(
+        self,
+        source_text: str,
+        on_stage: Callable[[str, CompletionResponse], None] = None,
+    ) -> List[CompletionResponse]:
+        """
+        Translate text, then assess the translation against the knowledge graph triplets of the text and
+        improve it. With a reflection budget of more than one round, the assessment and improvement are
+        repeated until the translation converges, its assessment reports no missed concepts, or the budget
+        is spent. The reflection also stops once the usage budget of the translation is spent. The output of
+        each stage can be shown as soon as it is ready, and the translation stops before its next stage when
+        the cancellation token of the current scope is cancelled, e.g., once its draft is good enough.
 
-    def reflective_translate(self, source_text: str) -> List[CompletionResponse]:
+        Args:
+            source_text (str): The text to translate.
+            on_stage (Callable[[str, CompletionResponse], None]): Called with each pipeline stage and its output, as soon as it is ready. Defaults to None.
+
+        Returns:
+            List[CompletionResponse]: The knowledge graph triplets, the initial translation, and the assessment and improved translation of each round, followed by the final translation if it was not improved in the last round.
+
+        Raises:
+            TranslationCancelledError: If the translation is cancelled before its last stage.
+        """
         result = []
+        started_at = time.perf_counter()
+        reflection_started_at = started_at
+        budget = self._reflection_budget
 
+        def stage_completed(stage: str, response: CompletionResponse):
+            # icecream is imported on first use, so that importing the translator does not load it.
+            from icecream import ic
+
+            ic(response.text)
+            result.append(response)
+            if on_stage is not None:
+                on_stage(stage, response)
+
+        raise_if_cancelled(constants.STAGE__EXTRACT)
         kg_response = self.extract_knowledge_triplets(source_text)
-        ic(kg_response.text)
-        result.append(kg_response)
+        stage_completed(constants.STAGE__EXTRACT, kg_response)
+
+        raise_if_cancelled(constants.STAGE__TRANSLATE)
+        translation = self.translate(source_text)
+        stage_completed(constants.STAGE__TRANSLATE, translation)
+
+        if usage_budget_exceeded():
+            # The draft is kept, as assessing and improving it would exceed the usage budget.
+            record_budget_downgrade()
+            result.append(translation)
+            record_reflection(0, constants.REFLECTION_STOP__USAGE_BUDGET)
+            return result
+
+        escalation_llm = None
+        rounds = tokens_used = round_tokens = 0
+        round_seconds = 0.0
+        while True:
+            raise_if_cancelled(constants.STAGE__ASSESS)
+            round_started_at = time.perf_counter()
+            improvement_suggestions = self.assess_translation(
+                source_text, translation.text, kg_response.text
+            )
+            stage_completed(constants.STAGE__ASSESS, improvement_suggestions)
+            rounds += 1
+
+            missing_concepts = assessment_reports_missing_concepts(
+                improvement_suggestions.text
+            )
+            if rounds == 1 and self._escalation_llm is not None:
+                METRICS.increment(constants.METRIC__CASCADE_REQUESTS)
+                METRICS.observe(
+                    constants.METRIC__CASCADE_TIER_LATENCY.format(
+                        tier=constants.CASCADE_TIER__PRIMARY
+                    ),
+                    time.perf_counter() - started_at,
+                )
+                if missing_concepts:
+                    METRICS.increment(constants.METRIC__CASCADE_ESCALATIONS)
+                    escalation_llm = self._escalation_llm
+                    started_at = time.perf_counter()
+            if not missing_concepts and (
+                self._escalation_llm is not None
+                or budget.iterative
+                or self._structured_outputs
+            ):
+                # Every concept got across, so there is nothing to improve or to escalate.
+                result.append(translation)
+                record_reflection(rounds, constants.REFLECTION_STOP__COMPLETE)
+                return result
+
+            kg_improved_translation_prompt = format_prompt(
+                constants.PROMPT__TRANSLATE_IMPROVE_PREFIX,
+                constants.PROMPT__TRANSLATE_IMPROVE_SUFFIX,
+                self._source_language,
+                self._target_language,
+                glossary=self._glossary_prompt(source_text),
+                source_text=source_text,
+                translated_text=translation.text,
+                improvement_suggestions=improvement_suggestions.text,
+            )
+            raise_if_cancelled(constants.STAGE__IMPROVE)
+            improved_translation = self._complete(
+                constants.STAGE__IMPROVE, kg_improved_translation_prompt, escalation_llm
+            )
+            stage_completed(constants.STAGE__IMPROVE, improved_translation)
+
+            # The assessment prompt holds the source text, the triplets and the translation, and the
+            # improvement prompt holds the source text, the translation and the assessment.
+            this_round_tokens = estimate_tokens(
+                source_text,
+                kg_response.text,
+                translation.text,
+                improvement_suggestions.text,
+            ) + estimate_tokens(
+                source_text,
+                translation.text,
+                improvement_suggestions.text,
+                improved_translation.text,
+            )
+            tokens_used += this_round_tokens
+            round_tokens = max(round_tokens, this_round_tokens)
+            round_seconds = max(round_seconds, time.perf_counter() - round_started_at)
+            change = translation_change(
+                translation.text, improved_translation.text, budget.min_change
+            )
+            METRICS.observe(constants.METRIC__REFLECTION_CHANGE, change)
+            translation = improved_translation
+
+            if budget.iterative and change < budget.min_change:
+                stop_reason = constants.REFLECTION_STOP__CONVERGED
+            elif usage_budget_exceeded():
+                stop_reason = constants.REFLECTION_STOP__USAGE_BUDGET
+            else:
+                stop_reason = budget.stop_reason(
+                    rounds,
+                    tokens_used,
+                    time.perf_counter() - reflection_started_at,
+                    round_tokens,
+                    round_seconds,
+                )
+            if stop_reason is not None:
+                break
+
+        if escalation_llm is not None:
+            METRICS.observe(
+                constants.METRIC__CASCADE_TIER_LATENCY.format(
+                    tier=constants.CASCADE_TIER__ESCALATION
+                ),
+                time.perf_counter() - started_at,
+            )
+        record_reflection(rounds, stop_reason)
+        return result
 
-        initial_translation = self.translate(source_text)
-        ic(initial_translation.text)
-        result.append(initial_translation)
+    def translate_in_mode(
+        self,
+        source_text: str,
+        mode: str = constants.TRANSLATION_MODE__AUTO,
+        short_text_length: int = int(
+            constants.DEFAULT_VALUE__AUTO_MODE_SHORT_TEXT_LENGTH
+        ),
+        max_queue_depth: int = int(constants.DEFAULT_VALUE__AUTO_MODE_MAX_QUEUE_DEPTH),
+        low_priority: bool = False,
+        on_stage: Callable[[str, CompletionResponse], None] = None,
+        cancellation_token: CancellationToken = None,
+        usage_account: UsageAccount = None,
+    ) -> str:
+        """
+        Translate text using a translation mode, trading off quality against latency. A cancellation token
+        stops the translation at the next pipeline stage, or the next step of the agent, and abandons the
+        language model call in flight, when it is cancelled or its deadline passes. A usage account gets
+        the tokens and the cost of the language model calls, and once its budget is spent, the translation
+        falls back to a cheaper mode.
 
-        improvement_suggestions = self.assess_translation(
-            source_text, initial_translation.text, kg_response.text
-        )
-        ic(improvement_suggestions.text)
-        result.append(improvement_suggestions)
-        kg_improved_translation_prompt = PromptTemplate(
-            template=constants.PROMPT__TRANSLATE_IMPROVE
-        ).format(
-            target_language=self._target_language,
-            source_language=self._source_language,
-            source_text=source_text,
-            translated_text=initial_translation.text,
-            improvement_suggestions=improvement_suggestions.text,
+        Args:
+            source_text (str): The text to translate.
+            mode (str): One of the supported translation modes. Defaults to the automatic mode.
+            short_text_length (int): The maximum length of a short text, used in the automatic mode. Defaults to 280.
+            max_queue_depth (int): The queue depth from which the automatic mode only uses single-call translations. Defaults to 4.
+            low_priority (bool): Whether the request is of low priority, used in the automatic mode. Defaults to False.
+            on_stage (Callable[[str, CompletionResponse], None]): Called with each pipeline stage and its output, as soon as it is ready, in the single-call and reflective modes. Defaults to None.
+            cancellation_token (CancellationToken): The token to cancel the translation with. Defaults to None.
+            usage_account (UsageAccount): The account of the token usage of the translation. Defaults to None.
+
+        Returns:
+            str: The translated text.
+
+        Raises:
+            TranslationCancelledError: If the translation is cancelled before its last stage.
+        """
+        with cancellation_scope(cancellation_token), usage_scope(usage_account):
+            return self._translate_in_mode(
+                source_text,
+                mode,
+                short_text_length,
+                max_queue_depth,
+                low_priority,
+                on_stage,
+            )
+
+    def _translate_in_mode(
+        self,
+        source_text: str,
+        mode: str,
+        short_text_length: int,
+        max_queue_depth: int,
+        low_priority: bool,
+        on_stage: Callable[[str, CompletionResponse], None],
+    ) -> str:
+        """Translate text using a translation mode, in the cancellation and usage scopes of the translation."""
+        if mode == constants.TRANSLATION_MODE__AUTO:
+            mode = choose_translation_mode(
+                source_text,
+                self._source_language,
+                self._target_language,
+                short_text_length=short_text_length,
+                max_queue_depth=max_queue_depth,
+                low_priority=low_priority,
+            )
+        if mode != constants.TRANSLATION_MODE__SIMPLE and usage_budget_exceeded():
+            record_budget_downgrade()
+            mode = constants.TRANSLATION_MODE__SIMPLE
+        METRICS.increment(constants.METRIC__TRANSLATION_MODE_SELECTED.format(mode=mode))
+        with translation_in_flight():
+            match mode:
+                case constants.TRANSLATION_MODE__SIMPLE:
+                    translation = self.translate(source_text)
+                    if on_stage is not None:
+                        on_stage(constants.STAGE__TRANSLATE, translation)
+                    return translation.text
+                case constants.TRANSLATION_MODE__REFLECTIVE:
+                    return self.reflective_translate(source_text, on_stage=on_stage)[
+                        -1
+                    ].text
+                case constants.TRANSLATION_MODE__AGENTIC:
+                    return str(self.agentic_translate(source_text))
+                case _:
+                    raise ValueError(f"Unsupported translation mode: {mode}")
+
+    def translate_batch(
+        self,
+        source_texts: List[str],
+        mode: str = constants.TRANSLATION_MODE__AUTO,
+        max_workers: int = 4,
+        **kwargs,
+    ) -> List[str]:
+        """
+        Translate a batch of texts concurrently, each using a translation mode. With a batcher, concurrent
+        single-call translations are sent to the language model together.
+
+        Args:
+            source_texts (List[str]): The texts to translate.
+            mode (str): One of the supported translation modes. Defaults to the automatic mode.
+            max_workers (int): The maximum number of texts translated at the same time. Defaults to 4.
+            **kwargs: Further arguments for `translate_in_mode`.
+
+        Returns:
+            List[str]: The translated texts, in the same order as the source texts.
+        """
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return list(
+                executor.map(
+                    lambda source_text: self.translate_in_mode(
+                        source_text, mode, **kwargs
+                    ),
+                    source_texts,
+                )
+            )
+
+    def translate_document(
+        self,
+        source_text: str,
+        mode: str = constants.TRANSLATION_MODE__AUTO,
+        max_workers: int = 4,
+        **kwargs,
+    ) -> str:
+        """
+        Translate a text sentence by sentence, after normalising it. Each distinct sentence is translated once,
+        concurrently with the others, and the translation is put back together from those of the sentences.
+
+        Args:
+            source_text (str): The text to translate.
+            mode (str): One of the supported translation modes. Defaults to the automatic mode.
+            max_workers (int): The maximum number of sentences translated at the same time. Defaults to 4.
+            **kwargs: Further arguments for `translate_in_mode`.
+
+        Returns:
+            str: The translated text.
+        """
+        (translation,) = translate_segmented(
+            [source_text],
+            [self._source_language],
+            self._target_language,
+            lambda segments, _: self.translate_batch(
+                segments, mode, max_workers, **kwargs
+            ),
         )
-        final_translation = self._llm.complete(prompt=kg_improved_translation_prompt)
-        result.append(final_translation)
-        ic(final_translation.text)
-        return result
+        return translation
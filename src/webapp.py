@@ -1,22 +1,61 @@
 from dotenv import load_dotenv
+from functools import lru_cache
 from icecream import ic
-from llama_index.llms.cohere import Cohere
-from llama_index.llms.openai import OpenAI
-from llama_index.llms.llamafile import Llamafile
-from llama_index.llms.ollama import Ollama
+from llama_index.core.base.llms.types import CompletionResponse
 from llama_index.core.llms.llm import LLM
 from pathlib import Path
-from solara.lab import task  # , Task, use_task
+from solara.lab import computed, task  # , Task, use_task
 from solara.alias import rv
-from typing import Any, List
+from solara.components.file_drop import FileInfo
+from typing import Any, Dict, List
 
 import constants
+import itertools
 import os
+import providers
 import solara
-import time
+import solara.server.kernel_context
+import solara.server.settings
+import threading
 
+from accounting import UsageAccount, UsageBudget, UsageLedger
+from batching import TranslationBatcher
+from cancellation import (
+    CancellationRegistry,
+    DeadlineExceededError,
+    TranslationCancelledError,
+)
+from glossary import TerminologyStore
+from language_detection import resolve_source_language
+from memory import (
+    InputTooLargeError,
+    SpilledText,
+    check_text_length,
+    keep_text,
+    preview_of,
+    read_text_upload,
+    text_of,
+)
+from precompute import (
+    precomputed_cache,
+    record_request,
+    start_precompute_from_environment,
+)
+from recording import build_recorded_llm
+from reflection import ReflectionBudget
+from resilience import ResilientCaller
+from racing import ProviderRace
+from routing import (
+    parse_llm_providers,
+    parse_stage_assignments,
+    parse_stage_llm_providers,
+)
+from semantic_cache import SemanticCache
 from translator import AgenticTranslator
 
+# The global styles of the page.
+STYLESHEET_PATH = Path(__file__).parent / "css/styles.css"
+
 
 # Declare reactive variables at the top level. Components using these variables
 # will be re-executed when their values change.
@@ -26,6 +65,16 @@ rc_text__translate_input: solara.Reactive[str] = solara.reactive(
 rc_text__translated: solara.Reactive[List[str]] = solara.reactive(
     [constants.EMPTY_STRING]
 )
+# The titles of the translated texts, which are the outputs of the pipeline stages as they complete, followed
+# by the final translation.
+rc_text__translated_titles: solara.Reactive[List[str]] = solara.reactive(
+    [constants.EMPTY_STRING]
+)
+# Whether there is a text to translate, which only changes when the text is emptied or filled, rather than on
+# every keystroke.
+rc_text__translate_input_empty = computed(
+    lambda: rc_text__translate_input.value == constants.EMPTY_STRING
+)
 rc_language__translate_from: solara.Reactive[str] = solara.reactive(
     constants.EMPTY_STRING
 )
@@ -33,12 +82,13 @@ rc_language__translate_to: solara.Reactive[str] = solara.reactive(
     constants.EMPTY_STRING
 )
 rc_text__translated_label: solara.Reactive[str] = solara.reactive("Translated text")
+# Long uploaded texts and translations are kept in temporary files, while the reactives above hold their previews.
+rc_text__translate_input_file: solara.Reactive[SpilledText] = solara.reactive(None)
+rc_text__translated_file: solara.Reactive[SpilledText] = solara.reactive(None)
 
-rc_status_message: solara.Reactive[str] = solara.reactive(constants.EMPTY_STRING)
-rc_status_message__colour: solara.Reactive[str] = solara.reactive(
-    constants.EMPTY_STRING
-)
-rc_status_message__show: solara.Reactive[bool] = solara.reactive(False)
+# The status messages of the session waiting to be shown, the first of which is shown as a toast until the
+# browser hides it after its timeout, or a later message replaces it if it has none.
+rc_status_messages: solara.Reactive[List[dict]] = solara.reactive([])
 
 rc_settings__initialised: solara.Reactive[bool] = solara.reactive(False)
 # Settings that can be configured through environment variables and the app UI.
@@ -58,6 +108,9 @@ rc_settings__ollama_url: solara.Reactive[str] = solara.reactive(constants.EMPTY_
 rc_settings__ollama_model: solara.Reactive[str] = solara.reactive(
     constants.EMPTY_STRING
 )
+rc_settings__ollama_keep_alive: solara.Reactive[str] = solara.reactive(
+    constants.EMPTY_STRING
+)
 rc_settings__openai_api_key: solara.Reactive[str] = solara.reactive(
     constants.EMPTY_STRING
 )
@@ -65,8 +118,68 @@ rc_settings__openai_model: solara.Reactive[str] = solara.reactive(
     constants.EMPTY_STRING
 )
 rc_settings__llm_temperature: solara.Reactive[float] = solara.reactive(0.0)
+rc_settings__stage_llm_providers: solara.Reactive[str] = solara.reactive(
+    constants.EMPTY_STRING
+)
+rc_settings__escalation_llm_provider: solara.Reactive[str] = solara.reactive(
+    constants.EMPTY_STRING
+)
+rc_settings__segment_texts: solara.Reactive[bool] = solara.reactive(False)
+rc_settings__race_llm_providers: solara.Reactive[str] = solara.reactive(
+    constants.EMPTY_STRING
+)
+rc_settings__race_strategy: solara.Reactive[str] = solara.reactive(
+    constants.EMPTY_STRING
+)
+rc_settings__structured_outputs: solara.Reactive[bool] = solara.reactive(False)
+rc_settings__reflection_max_rounds: solara.Reactive[int] = solara.reactive(1)
+rc_settings__reflection_token_budget: solara.Reactive[int] = solara.reactive(0)
+rc_settings__reflection_time_budget: solara.Reactive[float] = solara.reactive(0.0)
+rc_settings__reflection_min_change: solara.Reactive[float] = solara.reactive(0.0)
+rc_settings__llm_call_deadline: solara.Reactive[float] = solara.reactive(0.0)
+rc_settings__llm_stage_deadlines: solara.Reactive[str] = solara.reactive(
+    constants.EMPTY_STRING
+)
+rc_settings__translation_deadline: solara.Reactive[float] = solara.reactive(0.0)
+rc_settings__request_token_budget: solara.Reactive[int] = solara.reactive(0)
+rc_settings__request_cost_budget: solara.Reactive[float] = solara.reactive(0.0)
+rc_settings__tenant_token_budget: solara.Reactive[int] = solara.reactive(0)
+rc_settings__tenant_cost_budget: solara.Reactive[float] = solara.reactive(0.0)
+rc_settings__tenant_budget_period: solara.Reactive[float] = solara.reactive(0.0)
+rc_settings__llm_call_retries: solara.Reactive[int] = solara.reactive(0)
+rc_settings__llm_hedging: solara.Reactive[bool] = solara.reactive(False)
+rc_settings__failover_llm_provider: solara.Reactive[str] = solara.reactive(
+    constants.EMPTY_STRING
+)
+rc_settings__translation_mode: solara.Reactive[str] = solara.reactive(
+    constants.EMPTY_STRING
+)
+rc_settings__auto_mode_short_text_length: solara.Reactive[int] = solara.reactive(0)
+rc_settings__auto_mode_max_queue_depth: solara.Reactive[int] = solara.reactive(0)
+rc_settings__max_input_characters: solara.Reactive[int] = solara.reactive(0)
+rc_settings__spill_characters: solara.Reactive[int] = solara.reactive(0)
+rc_settings__semantic_cache: solara.Reactive[bool] = solara.reactive(False)
+rc_settings__semantic_cache_threshold: solara.Reactive[float] = solara.reactive(0.0)
+rc_settings__semantic_cache_max_entries: solara.Reactive[int] = solara.reactive(0)
+rc_settings__glossary_path: solara.Reactive[str] = solara.reactive(
+    constants.EMPTY_STRING
+)
+rc_settings__llm_record_path: solara.Reactive[str] = solara.reactive(
+    constants.EMPTY_STRING
+)
+rc_settings__llm_replay_path: solara.Reactive[str] = solara.reactive(
+    constants.EMPTY_STRING
+)
+rc_settings__llm_replay_speed: solara.Reactive[float] = solara.reactive(1.0)
+rc_settings__batch_window: solara.Reactive[float] = solara.reactive(0.0)
+rc_settings__batch_max_size: solara.Reactive[int] = solara.reactive(1)
+rc_settings__batch_max_characters: solara.Reactive[int] = solara.reactive(0)
 
 rc_global__llm: solara.Reactive[LLM] = solara.reactive(None)
+rc_global__stage_llms: solara.Reactive[Dict[str, LLM]] = solara.reactive({})
+rc_global__escalation_llm: solara.Reactive[LLM] = solara.reactive(None)
+rc_global__race_llms: solara.Reactive[Dict[str, LLM]] = solara.reactive({})
+rc_global__caller: solara.Reactive[ResilientCaller] = solara.reactive(None)
 
 
 def read_env_setting(
@@ -90,14 +203,10 @@ def read_env_setting(
     """
 
     parsed_value = None
-    if isinstance(type_cast, bool):
-        parsed_value = os.getenv(env_key, default_value).lower() in [
-            "true",
-            "yes",
-            "t",
-            "y",
-            "on",
-        ]
+    if type_cast is bool:
+        parsed_value = (
+            os.getenv(env_key, default_value).lower() in constants.BOOLEAN_TRUE_VALUES
+        )
     else:
         parsed_value = os.getenv(env_key, default_value)
 
@@ -108,59 +217,192 @@ def read_env_setting(
     )
 
 
-@task(prefer_threaded=True)
+# Status messages are queued by the threads of the translation tasks as well as by the UI.
+status_messages_lock = threading.Lock()
+status_message_ids = itertools.count()
+
+
 def show_status_message(
     message: str, colour: str = constants.COLOUR__INFO, timeout: int = 4
 ):
     """
-    Update the Solara reactive variables, which can be used to display a status message on this page. The
-    message will be displayed in the form of a toast with a configurable timeout.
+    Queue a status message to display on this page, in the form of a toast with a configurable timeout.
+    The toast is hidden by the browser, so that showing a message never holds a thread. A message without
+    a timeout is shown until the next message replaces it.
 
     Args:
         message (str): The message to be displayed.
         colour (str): The colour of the message. Defaults to "info".
-        timeout (int): The time in seconds to display the message. Defaults to 4 seconds.
+        timeout (int): The time in seconds to display the message, where 0 means until the next message. Defaults to 4 seconds.
     """
-    rc_status_message.value = message
-    rc_status_message__colour.value = colour
-    rc_status_message__show.value = True
-    if timeout > 0:
-        time.sleep(timeout)
-        rc_status_message__show.value = False
+    with status_messages_lock:
+        queued_messages = [
+            queued_message
+            for queued_message in rc_status_messages.value
+            if queued_message["timeout"] > 0
+        ]
+        queued_messages.append(
+            {
+                "id": next(status_message_ids),
+                "message": message,
+                "colour": colour,
+                "timeout": timeout,
+            }
+        )
+        # Only the latest messages are kept, should they come faster than they are shown.
+        rc_status_messages.value = queued_messages[
+            -constants.STATUS_MESSAGES__MAX_QUEUED :
+        ]
+
+
+def hide_status_message(message_id: int):
+    """
+    Remove a status message once it is hidden, to show the next one, if any.
+
+    Args:
+        message_id (int): The identifier of the hidden message.
+    """
+    with status_messages_lock:
+        rc_status_messages.value = [
+            queued_message
+            for queued_message in rc_status_messages.value
+            if queued_message["id"] != message_id
+        ]
+
+
+def build_llm(llm_provider: str) -> LLM:
+    """
+    Build a language model for a provider, using the settings of that provider, whose calls are recorded
+    or replayed if set.
+
+    Args:
+        llm_provider (str): The language model provider.
+
+    Returns:
+        LLM: The language model.
+    """
+    return build_recorded_llm(
+        lambda: providers.build_llm(
+            llm_provider,
+            temperature=rc_settings__llm_temperature.value,
+            cohere_api_key=rc_settings__cohere_api_key.value,
+            cohere_model=rc_settings__cohere_model.value,
+            llamafile_url=rc_settings__llamafile_url.value,
+            ollama_url=rc_settings__ollama_url.value,
+            ollama_model=rc_settings__ollama_model.value,
+            ollama_keep_alive=rc_settings__ollama_keep_alive.value,
+            openai_api_key=rc_settings__openai_api_key.value,
+            openai_model=rc_settings__openai_model.value,
+        ),
+        record_path=rc_settings__llm_record_path.value,
+        replay_path=rc_settings__llm_replay_path.value,
+        replay_speed=rc_settings__llm_replay_speed.value,
+        replay_class_name=providers.llm_class_name(llm_provider),
+    )
 
 
 def update_llm(callback_args: Any = None):
-    """Update the language model based on the selected provider."""
-    match rc_settings__llm_provider.value:
-        case constants.LLM_PROVIDER__COHERE:
-            rc_global__llm.value = Cohere(
-                api_key=rc_settings__cohere_api_key.value,
-                model=rc_settings__cohere_model.value,
-                temperature=rc_settings__llm_temperature.value,
-            )
-        case constants.LLM_PROVIDER__OPENAI:
-            rc_global__llm.value = OpenAI(
-                api_key=rc_settings__openai_api_key.value,
-                model=rc_settings__openai_model.value,
-                temperature=rc_settings__llm_temperature.value,
-            )
-        case constants.LLM_PROVIDER__LLAMAFILE:
-            rc_global__llm.value = Llamafile(
-                url=rc_settings__llamafile_url.value,
-                temperature=rc_settings__llm_temperature.value,
-            )
-        case constants.LLM_PROVIDER__OLLAMA:
-            rc_global__llm.value = Ollama(
-                url=rc_settings__ollama_url.value,
-                model=rc_settings__ollama_model.value,
-                temperature=rc_settings__llm_temperature.value,
-            )
+    """Update the language models based on the selected provider, the providers of the pipeline stages and those raced."""
+    rc_global__llm.value = build_llm(rc_settings__llm_provider.value)
+    rc_global__stage_llms.value = {
+        stage: build_llm(llm_provider)
+        for stage, llm_provider in parse_stage_llm_providers(
+            rc_settings__stage_llm_providers.value
+        ).items()
+    }
+    rc_global__escalation_llm.value = (
+        build_llm(rc_settings__escalation_llm_provider.value)
+        if rc_settings__escalation_llm_provider.value
+        else None
+    )
+    rc_global__race_llms.value = {
+        llm_provider: build_llm(llm_provider)
+        for llm_provider in parse_llm_providers(rc_settings__race_llm_providers.value)
+    }
+    rc_global__caller.value = ResilientCaller(
+        default_deadline=rc_settings__llm_call_deadline.value,
+        stage_deadlines={
+            stage: float(deadline)
+            for stage, deadline in parse_stage_assignments(
+                rc_settings__llm_stage_deadlines.value
+            ).items()
+        },
+        max_retries=rc_settings__llm_call_retries.value,
+        hedging=rc_settings__llm_hedging.value,
+        failover_llm=(
+            build_llm(rc_settings__failover_llm_provider.value)
+            if rc_settings__failover_llm_provider.value
+            else None
+        ),
+    )
+
+
+def get_batcher() -> TranslationBatcher:
+    """Get the process-level batcher for the selected language model, or None if batching is disabled."""
+    if rc_settings__batch_window.value <= 0:
+        return None
+    return TranslationBatcher.shared(
+        rc_global__stage_llms.value.get(
+            constants.STAGE__TRANSLATE, rc_global__llm.value
+        ),
+        window=rc_settings__batch_window.value,
+        max_batch_size=rc_settings__batch_max_size.value,
+        max_batch_characters=rc_settings__batch_max_characters.value,
+        # The call of the leader of a batch is bounded by the call deadline.
+        max_wait=rc_settings__llm_call_deadline.value,
+    )
+
+
+def get_semantic_cache() -> SemanticCache:
+    """Get the process-level semantic cache, or None if it is disabled."""
+    if not rc_settings__semantic_cache.value:
+        return None
+    return SemanticCache.shared(
+        threshold=rc_settings__semantic_cache_threshold.value,
+        max_entries_per_pair=rc_settings__semantic_cache_max_entries.value,
+    )
+
+
+def get_glossary() -> TerminologyStore:
+    """Get the process-level glossary, which is loaded on first use, or None if there is none."""
+    if not rc_settings__glossary_path.value:
+        return None
+    return TerminologyStore.shared(rc_settings__glossary_path.value)
+
+
+def get_reflection_budget() -> ReflectionBudget:
+    """Get the limits of the assessment and improvement rounds of reflective translations."""
+    return ReflectionBudget(
+        max_rounds=rc_settings__reflection_max_rounds.value,
+        max_tokens=rc_settings__reflection_token_budget.value,
+        max_seconds=rc_settings__reflection_time_budget.value,
+        min_change=rc_settings__reflection_min_change.value,
+    )
+
+
+def start_usage_account(session: str) -> UsageAccount:
+    """Start the usage account of a translation of a session, with the budgets of the request and of the session."""
+    return UsageLedger.shared().start(
+        session,
+        budget=UsageBudget(
+            rc_settings__request_token_budget.value,
+            rc_settings__request_cost_budget.value,
+        ),
+        tenant_budget=UsageBudget(
+            rc_settings__tenant_token_budget.value,
+            rc_settings__tenant_cost_budget.value,
+        ),
+        period=rc_settings__tenant_budget_period.value,
+    )
 
 
 def initialise_settings():
-    """Initialise the settings for the app by reading from the environment variables, if available."""
-    if not rc_settings__initialised.value:
-        ic(load_dotenv())
+    """
+    Initialise the settings of a session by reading from the environment variables, if available, which
+    are loaded from the .env file once, when the app is loaded.
+    """
+    # Peek, so that the calling component does not re-render when the settings are initialised.
+    if not rc_settings__initialised.peek():
         read_env_setting(
             rc_settings__llm_provider,
             constants.ENV_KEY__LLM_PROVIDER,
@@ -190,6 +432,11 @@ def initialise_settings():
             constants.ENV_KEY__OLLAMA_MODEL,
             constants.DEFAULT_VALUE__OLLAMA_MODEL,
         )
+        read_env_setting(
+            rc_settings__ollama_keep_alive,
+            constants.ENV_KEY__OLLAMA_KEEP_ALIVE,
+            constants.DEFAULT_VALUE__OLLAMA_KEEP_ALIVE,
+        )
         read_env_setting(
             rc_settings__openai_api_key,
             constants.ENV_KEY__OPENAI_API_KEY,
@@ -205,11 +452,295 @@ def initialise_settings():
             constants.DEFAULT_VALUE__LLM_TEMPERATURE,
             type_cast=float,
         )
+        read_env_setting(
+            rc_settings__stage_llm_providers,
+            constants.ENV_KEY__STAGE_LLM_PROVIDERS,
+            constants.DEFAULT_VALUE__STAGE_LLM_PROVIDERS,
+        )
+        read_env_setting(
+            rc_settings__escalation_llm_provider,
+            constants.ENV_KEY__ESCALATION_LLM_PROVIDER,
+            constants.DEFAULT_VALUE__ESCALATION_LLM_PROVIDER,
+        )
+        read_env_setting(
+            rc_settings__segment_texts,
+            constants.ENV_KEY__SEGMENT_TEXTS,
+            constants.DEFAULT_VALUE__SEGMENT_TEXTS,
+            type_cast=bool,
+        )
+        read_env_setting(
+            rc_settings__race_llm_providers,
+            constants.ENV_KEY__RACE_LLM_PROVIDERS,
+            constants.DEFAULT_VALUE__RACE_LLM_PROVIDERS,
+        )
+        read_env_setting(
+            rc_settings__race_strategy,
+            constants.ENV_KEY__RACE_STRATEGY,
+            constants.DEFAULT_VALUE__RACE_STRATEGY,
+        )
+        read_env_setting(
+            rc_settings__structured_outputs,
+            constants.ENV_KEY__STRUCTURED_OUTPUTS,
+            constants.DEFAULT_VALUE__STRUCTURED_OUTPUTS,
+            type_cast=bool,
+        )
+        read_env_setting(
+            rc_settings__reflection_max_rounds,
+            constants.ENV_KEY__REFLECTION_MAX_ROUNDS,
+            constants.DEFAULT_VALUE__REFLECTION_MAX_ROUNDS,
+            type_cast=int,
+        )
+        read_env_setting(
+            rc_settings__reflection_token_budget,
+            constants.ENV_KEY__REFLECTION_TOKEN_BUDGET,
+            constants.DEFAULT_VALUE__REFLECTION_TOKEN_BUDGET,
+            type_cast=int,
+        )
+        read_env_setting(
+            rc_settings__reflection_time_budget,
+            constants.ENV_KEY__REFLECTION_TIME_BUDGET,
+            constants.DEFAULT_VALUE__REFLECTION_TIME_BUDGET,
+            type_cast=float,
+        )
+        read_env_setting(
+            rc_settings__reflection_min_change,
+            constants.ENV_KEY__REFLECTION_MIN_CHANGE,
+            constants.DEFAULT_VALUE__REFLECTION_MIN_CHANGE,
+            type_cast=float,
+        )
+        read_env_setting(
+            rc_settings__llm_call_deadline,
+            constants.ENV_KEY__LLM_CALL_DEADLINE,
+            constants.DEFAULT_VALUE__LLM_CALL_DEADLINE,
+            type_cast=float,
+        )
+        read_env_setting(
+            rc_settings__llm_stage_deadlines,
+            constants.ENV_KEY__LLM_STAGE_DEADLINES,
+            constants.DEFAULT_VALUE__LLM_STAGE_DEADLINES,
+        )
+        read_env_setting(
+            rc_settings__translation_deadline,
+            constants.ENV_KEY__TRANSLATION_DEADLINE,
+            constants.DEFAULT_VALUE__TRANSLATION_DEADLINE,
+            type_cast=float,
+        )
+        read_env_setting(
+            rc_settings__request_token_budget,
+            constants.ENV_KEY__REQUEST_TOKEN_BUDGET,
+            constants.DEFAULT_VALUE__REQUEST_TOKEN_BUDGET,
+            type_cast=int,
+        )
+        read_env_setting(
+            rc_settings__request_cost_budget,
+            constants.ENV_KEY__REQUEST_COST_BUDGET,
+            constants.DEFAULT_VALUE__REQUEST_COST_BUDGET,
+            type_cast=float,
+        )
+        read_env_setting(
+            rc_settings__tenant_token_budget,
+            constants.ENV_KEY__TENANT_TOKEN_BUDGET,
+            constants.DEFAULT_VALUE__TENANT_TOKEN_BUDGET,
+            type_cast=int,
+        )
+        read_env_setting(
+            rc_settings__tenant_cost_budget,
+            constants.ENV_KEY__TENANT_COST_BUDGET,
+            constants.DEFAULT_VALUE__TENANT_COST_BUDGET,
+            type_cast=float,
+        )
+        read_env_setting(
+            rc_settings__tenant_budget_period,
+            constants.ENV_KEY__TENANT_BUDGET_PERIOD,
+            constants.DEFAULT_VALUE__TENANT_BUDGET_PERIOD,
+            type_cast=float,
+        )
+        read_env_setting(
+            rc_settings__llm_call_retries,
+            constants.ENV_KEY__LLM_CALL_RETRIES,
+            constants.DEFAULT_VALUE__LLM_CALL_RETRIES,
+            type_cast=int,
+        )
+        read_env_setting(
+            rc_settings__llm_hedging,
+            constants.ENV_KEY__LLM_HEDGING,
+            constants.DEFAULT_VALUE__LLM_HEDGING,
+            type_cast=bool,
+        )
+        read_env_setting(
+            rc_settings__failover_llm_provider,
+            constants.ENV_KEY__FAILOVER_LLM_PROVIDER,
+            constants.DEFAULT_VALUE__FAILOVER_LLM_PROVIDER,
+        )
+        read_env_setting(
+            rc_settings__translation_mode,
+            constants.ENV_KEY__TRANSLATION_MODE,
+            constants.DEFAULT_VALUE__TRANSLATION_MODE,
+        )
+        read_env_setting(
+            rc_settings__auto_mode_short_text_length,
+            constants.ENV_KEY__AUTO_MODE_SHORT_TEXT_LENGTH,
+            constants.DEFAULT_VALUE__AUTO_MODE_SHORT_TEXT_LENGTH,
+            type_cast=int,
+        )
+        read_env_setting(
+            rc_settings__auto_mode_max_queue_depth,
+            constants.ENV_KEY__AUTO_MODE_MAX_QUEUE_DEPTH,
+            constants.DEFAULT_VALUE__AUTO_MODE_MAX_QUEUE_DEPTH,
+            type_cast=int,
+        )
+        read_env_setting(
+            rc_settings__max_input_characters,
+            constants.ENV_KEY__MAX_INPUT_CHARACTERS,
+            constants.DEFAULT_VALUE__MAX_INPUT_CHARACTERS,
+            type_cast=int,
+        )
+        read_env_setting(
+            rc_settings__spill_characters,
+            constants.ENV_KEY__SPILL_CHARACTERS,
+            constants.DEFAULT_VALUE__SPILL_CHARACTERS,
+            type_cast=int,
+        )
+        read_env_setting(
+            rc_settings__semantic_cache,
+            constants.ENV_KEY__SEMANTIC_CACHE,
+            constants.DEFAULT_VALUE__SEMANTIC_CACHE,
+            type_cast=bool,
+        )
+        read_env_setting(
+            rc_settings__semantic_cache_threshold,
+            constants.ENV_KEY__SEMANTIC_CACHE_THRESHOLD,
+            constants.DEFAULT_VALUE__SEMANTIC_CACHE_THRESHOLD,
+            type_cast=float,
+        )
+        read_env_setting(
+            rc_settings__semantic_cache_max_entries,
+            constants.ENV_KEY__SEMANTIC_CACHE_MAX_ENTRIES,
+            constants.DEFAULT_VALUE__SEMANTIC_CACHE_MAX_ENTRIES,
+            type_cast=int,
+        )
+        read_env_setting(
+            rc_settings__glossary_path,
+            constants.ENV_KEY__GLOSSARY_PATH,
+            constants.DEFAULT_VALUE__GLOSSARY_PATH,
+        )
+        read_env_setting(
+            rc_settings__llm_record_path,
+            constants.ENV_KEY__LLM_RECORD_PATH,
+            constants.DEFAULT_VALUE__LLM_RECORD_PATH,
+        )
+        read_env_setting(
+            rc_settings__llm_replay_path,
+            constants.ENV_KEY__LLM_REPLAY_PATH,
+            constants.DEFAULT_VALUE__LLM_REPLAY_PATH,
+        )
+        read_env_setting(
+            rc_settings__llm_replay_speed,
+            constants.ENV_KEY__LLM_REPLAY_SPEED,
+            constants.DEFAULT_VALUE__LLM_REPLAY_SPEED,
+            type_cast=float,
+        )
+        read_env_setting(
+            rc_settings__batch_window,
+            constants.ENV_KEY__BATCH_WINDOW,
+            constants.DEFAULT_VALUE__BATCH_WINDOW,
+            type_cast=float,
+        )
+        read_env_setting(
+            rc_settings__batch_max_size,
+            constants.ENV_KEY__BATCH_MAX_SIZE,
+            constants.DEFAULT_VALUE__BATCH_MAX_SIZE,
+            type_cast=int,
+        )
+        read_env_setting(
+            rc_settings__batch_max_characters,
+            constants.ENV_KEY__BATCH_MAX_CHARACTERS,
+            constants.DEFAULT_VALUE__BATCH_MAX_CHARACTERS,
+            type_cast=int,
+        )
 
         update_llm()
         rc_settings__initialised.value = True
 
 
+def set_text_to_translate(text: str):
+    """Set the text to translate as typed, which replaces any uploaded text."""
+    rc_text__translate_input_file.value = None
+    rc_text__translate_input.value = text
+
+
+def load_text_upload(file_info: FileInfo):
+    """
+    Load the text to translate from an uploaded file, which is read in chunks and kept in a temporary file
+    if it is long.
+
+    Args:
+        file_info (FileInfo): The uploaded file.
+    """
+    try:
+        text = read_text_upload(
+            file_info["file_obj"],
+            max_characters=rc_settings__max_input_characters.value,
+            spill_characters=rc_settings__spill_characters.value,
+        )
+    except (InputTooLargeError, UnicodeDecodeError) as e:
+        show_status_message(
+            message=f"The file {file_info['name']} cannot be translated. {str(e)}",
+            colour=constants.COLOUR__ERROR,
+        )
+        return
+    rc_text__translate_input.value = preview_of(text)
+    rc_text__translate_input_file.value = (
+        text if isinstance(text, SpilledText) else None
+    )
+
+
+def clear_translation():
+    """Clear the translated texts."""
+    rc_text__translated_titles.value = [constants.EMPTY_STRING]
+    rc_text__translated.value = [constants.EMPTY_STRING]
+    rc_text__translated_file.value = None
+
+
+def show_stage_output(stage: str, response: CompletionResponse):
+    """
+    Show the output of a pipeline stage as soon as it completes, so that a draft can be read, and the
+    translation stopped, before the later stages.
+
+    Args:
+        stage (str): The pipeline stage.
+        response (CompletionResponse): Its output.
+    """
+    rc_text__translated_titles.value = rc_text__translated_titles.value + [
+        constants.STAGE_TITLES[stage]
+    ]
+    rc_text__translated.value = rc_text__translated.value + [
+        response.text[: rc_settings__spill_characters.value or None]
+    ]
+
+
+def translation_session() -> str:
+    """Get the key of the translations of the current browser tab, which is its virtual kernel."""
+    return solara.server.kernel_context.get_current_context().id
+
+
+def cancel_translations_on_close():
+    """Cancel the translation of a browser tab, if any, when the tab is closed and its virtual kernel shuts down."""
+    session = translation_session()
+    return lambda: CancellationRegistry.shared().cancel(
+        session, constants.CANCELLATION_REASON__CLOSED
+    )
+
+
+solara.lab.on_kernel_start(cancel_translations_on_close)
+
+
+def stop_translation(callback_args: Any = None):
+    """Cancel the current translation, keeping the outputs of its completed stages."""
+    CancellationRegistry.shared().cancel(translation_session())
+    show_status_message(message="Stopping the translation.", timeout=0)
+
+
 @task(prefer_threaded=True)
 def translate(callback_args: Any = None):
     """
@@ -218,24 +749,158 @@ def translate(callback_args: Any = None):
     Args:
         callback_args (Any): The arguments passed to the callback function.
     """
+    session = translation_session()
+    cancellation_token = CancellationRegistry.shared().start(
+        session, rc_settings__translation_deadline.value
+    )
+    usage_account = start_usage_account(session)
     try:
+        llm_provider = rc_settings__llm_provider.value
+        model_name = rc_global__llm.value.metadata.model_name
         show_status_message(
-            message=f"Translating using {rc_settings__llm_provider.value}: {rc_global__llm.value.metadata.model_name}.",
+            message=(
+                f"Racing the translation on {', '.join(rc_global__race_llms.value)}."
+                if rc_global__race_llms.value
+                else f"Translating using {llm_provider}: {model_name}."
+            ),
             timeout=0,
         )
-        translator = AgenticTranslator(
-            llm=rc_global__llm.value,
-            source_language=rc_language__translate_from.value,
-            target_language=rc_language__translate_to.value,
+        rc_text__translated_titles.value = []
+        rc_text__translated.value = []
+        rc_text__translated_file.value = None
+        source_text = (
+            text_of(rc_text__translate_input_file.value)
+            if rc_text__translate_input_file.value is not None
+            else rc_text__translate_input.value
+        )
+        check_text_length(len(source_text), rc_settings__max_input_characters.value)
+        source_language = resolve_source_language(
+            source_text, rc_language__translate_from.value
+        )
+        if source_language == rc_language__translate_to.value:
+            raise ValueError(f"The text is already in {source_language}.")
+        translation_request = (
+            source_text,
+            source_language,
+            rc_language__translate_to.value,
+            rc_settings__translation_mode.value,
+        )
+        record_request(*translation_request)
+        # A likely translation may have been precomputed in the background.
+        translation_cache = precomputed_cache(
+            source_text,
+            llm_provider,
+            model_name,
+        )
+        translation_response = (
+            translation_cache.get(*translation_request)
+            if translation_cache is not None
+            else None
         )
-        # translation_response = translator.translate(rc_text__translate_input.value)
-        translation_response = translator.agentic_translate(
-            rc_text__translate_input.value
+        if translation_response is None:
+            translator = AgenticTranslator(
+                llm=rc_global__llm.value,
+                source_language=source_language,
+                target_language=rc_language__translate_to.value,
+                batcher=get_batcher(),
+                stage_llms=rc_global__stage_llms.value,
+                escalation_llm=rc_global__escalation_llm.value,
+                caller=rc_global__caller.value,
+                semantic_cache=get_semantic_cache(),
+                glossary=get_glossary(),
+                reflection_budget=get_reflection_budget(),
+                structured_outputs=rc_settings__structured_outputs.value,
+            )
+            if rc_global__race_llms.value:
+                # The translators in the race share the settings of the selected one, which judges them, except
+                # for the batcher and the caches, which are tied to the selected language model.
+                llm_provider, translation_response = ProviderRace(
+                    {
+                        race_llm_provider: AgenticTranslator(
+                            llm=race_llm,
+                            source_language=source_language,
+                            target_language=rc_language__translate_to.value,
+                            caller=rc_global__caller.value,
+                            glossary=get_glossary(),
+                            reflection_budget=get_reflection_budget(),
+                            structured_outputs=rc_settings__structured_outputs.value,
+                        )
+                        for race_llm_provider, race_llm in rc_global__race_llms.value.items()
+                    },
+                    strategy=rc_settings__race_strategy.value,
+                    judge=translator,
+                ).translate(
+                    source_text,
+                    mode=rc_settings__translation_mode.value,
+                    short_text_length=rc_settings__auto_mode_short_text_length.value,
+                    max_queue_depth=rc_settings__auto_mode_max_queue_depth.value,
+                    cancellation_token=cancellation_token,
+                    usage_account=usage_account,
+                )
+                model_name = rc_global__race_llms.value[
+                    llm_provider
+                ].metadata.model_name
+            elif rc_settings__segment_texts.value:
+                # The outputs of the stages of each sentence are not shown, only the final translation.
+                translation_response = translator.translate_document(
+                    source_text,
+                    mode=rc_settings__translation_mode.value,
+                    short_text_length=rc_settings__auto_mode_short_text_length.value,
+                    max_queue_depth=rc_settings__auto_mode_max_queue_depth.value,
+                    cancellation_token=cancellation_token,
+                    usage_account=usage_account,
+                )
+                if translation_cache is not None and not usage_account.downgraded:
+                    translation_cache.put(*translation_request, translation_response)
+            else:
+                translation_response = translator.translate_in_mode(
+                    source_text,
+                    mode=rc_settings__translation_mode.value,
+                    short_text_length=rc_settings__auto_mode_short_text_length.value,
+                    max_queue_depth=rc_settings__auto_mode_max_queue_depth.value,
+                    on_stage=show_stage_output,
+                    cancellation_token=cancellation_token,
+                    usage_account=usage_account,
+                )
+                if translation_cache is not None and not usage_account.downgraded:
+                    translation_cache.put(*translation_request, translation_response)
+        translation = keep_text(
+            translation_response, rc_settings__spill_characters.value
         )
-        rc_text__translated.value = [translation_response]
-        rc_text__translated_label.value = f"Translation using {rc_settings__llm_provider.value}: {rc_global__llm.value.metadata.model_name}"
+        del source_text, translation_response, translation_request
+        # The final translation replaces the output of the stage that produced it.
+        titles = rc_text__translated_titles.value
+        stage_outputs = rc_text__translated.value
+        if titles and titles[-1] in (
+            constants.STAGE_TITLES[constants.STAGE__TRANSLATE],
+            constants.STAGE_TITLES[constants.STAGE__IMPROVE],
+        ):
+            titles, stage_outputs = titles[:-1], stage_outputs[:-1]
+        rc_text__translated_titles.value = titles + [constants.STAGE_TITLE__FINAL]
+        rc_text__translated.value = stage_outputs + [preview_of(translation)]
+        rc_text__translated_file.value = (
+            translation if isinstance(translation, SpilledText) else None
+        )
+        rc_text__translated_label.value = (
+            f"Translation using {llm_provider}: {model_name}"
+        )
+        show_status_message(
+            message=(
+                f"Translation from {source_language} completed, using {usage_account.describe()}."
+                if rc_language__translate_from.value == constants.LANGUAGE__DETECT
+                else f"Translation completed, using {usage_account.describe()}."
+            ),
+            colour=constants.COLOUR__SUCCESS,
+        )
+    except DeadlineExceededError:
+        show_status_message(
+            message=f"The translation exceeded its deadline of {rc_settings__translation_deadline.value:g} seconds. The completed steps are shown.",
+            colour=constants.COLOUR__WARNING,
+        )
+    except TranslationCancelledError:
         show_status_message(
-            message="Translation completed.", colour=constants.COLOUR__SUCCESS
+            message="The translation was stopped. The completed steps are shown.",
+            colour=constants.COLOUR__WARNING,
         )
     except Exception as e:
         ic(str(e))
@@ -244,6 +909,9 @@ def translate(callback_args: Any = None):
             colour=constants.COLOUR__ERROR,
         )
         raise e
+    finally:
+        CancellationRegistry.shared().finish(session, cancellation_token)
+        UsageLedger.shared().finish(usage_account)
 
 
 @solara.component
@@ -325,7 +993,7 @@ def SettingsSidebar():
                 solara.InputText(
                     label="Llamafile URL",
                     value=rc_settings__llamafile_url,
-                    message="The URL must point to a running Llamafile (HTTP endpoint).",
+                    message="The URL must point to a running Llamafile (HTTP endpoint), or the comma-separated URLs to several.",
                     on_value=update_llm,
                 )
                 solara.Markdown("_The model is based on the loaded Llamafile._")
@@ -333,7 +1001,7 @@ def SettingsSidebar():
                 solara.InputText(
                     label="Ollama URL",
                     value=rc_settings__ollama_url,
-                    message="The URL must point to a running Ollama server.",
+                    message="The URL must point to a running Ollama server, or the comma-separated URLs to several.",
                     on_value=update_llm,
                 )
                 solara.InputText(
@@ -356,30 +1024,54 @@ def SettingsSidebar():
         )
 
 
-@solara.component
-def Page():
-    """The main page of the app."""
-    initialise_settings()
-    # CWD = Current Working Directory
-    CWD = Path(__file__).parent
-    # Load the external CSS file to be used as global styles for the page.
-    extern_style = (CWD / "css/styles.css").read_text(
-        encoding=constants.CHAR_ENCODING__UTF8
+@lru_cache(maxsize=1)
+def _read_stylesheet(modified_at: float | None) -> str:
+    """Read the global styles of the page, once for each version of the file."""
+    return STYLESHEET_PATH.read_text(encoding=constants.CHAR_ENCODING__UTF8)
+
+
+def stylesheet() -> str:
+    """
+    Get the global styles of the page, which are read once for each process, or again whenever the file
+    changes when Solara runs in development mode.
+
+    Returns:
+        str: The styles.
+    """
+    return _read_stylesheet(
+        STYLESHEET_PATH.stat().st_mtime
+        if solara.server.settings.main.mode == "development"
+        else None
     )
-    solara.Style(extern_style)
 
-    with solara.Sidebar():
-        SettingsSidebar()
 
-    # Display the status message as a toast, when avaiilable.
+# Each component of the page only reads the reactive variables that it shows, so that it re-renders only
+# when they change: typing in the text to translate does not re-render the translation or the languages.
+@solara.component
+def StatusMessage():
+    """The status message, displayed as a toast, when available."""
+    if not rc_status_messages.value:
+        return
+    status_message = rc_status_messages.value[0]
+    # A new toast for each message restarts the timeout in the browser.
     with rv.Snackbar(
-        timeout=0,
+        # Vuetify keeps a toast with a timeout of -1 open.
+        timeout=(
+            1000 * status_message["timeout"] if status_message["timeout"] > 0 else -1
+        ),
         multi_line=True,
-        color=rc_status_message__colour.value,
-        v_model=rc_status_message__show.value,
-    ):
-        solara.Markdown(f"{rc_status_message.value}")
+        color=status_message["colour"],
+        v_model=True,
+        on_v_model=lambda show: (
+            None if show else hide_status_message(status_message["id"])
+        ),
+    ).key(f"status-message-{status_message['id']}"):
+        solara.Markdown(f"{status_message['message']}")
+
 
+@solara.component
+def LanguageSelects():
+    """The selects of the languages to translate from and to."""
     with solara.ColumnsResponsive(
         xlarge=[6, 6], medium=[6, 6], small=[12], default=[6, 6], wrap=True
     ):
@@ -387,7 +1079,7 @@ def Page():
             solara.Select(
                 label="Select the language to translate from",
                 value=rc_language__translate_from,
-                values=constants.LANGUAGES__SUPPORTED,
+                values=[constants.LANGUAGE__DETECT] + constants.LANGUAGES__SUPPORTED,
             )
         with solara.Column():
             solara.Select(
@@ -399,14 +1091,28 @@ def Page():
                     for lang in constants.LANGUAGES__SUPPORTED
                     if lang != rc_language__translate_from.value
                 ],
-                on_value=lambda _: rc_text__translated.set([constants.EMPTY_STRING]),
+                on_value=lambda _: clear_translation(),
             )
 
+
+@solara.component
+def TranslationModeSelect():
+    """The select of the translation mode."""
+    solara.Select(
+        label="Translation mode",
+        value=rc_settings__translation_mode,
+        values=constants.TRANSLATION_MODES__SUPPORTED,
+    )
+
+
+@solara.component
+def TranslateButton():
+    """The button to translate, which is enabled when there is a text and a language pair to translate."""
     solara.Button(
         "Translate!",
         color="primary",
         disabled=(
-            rc_text__translate_input.value == constants.EMPTY_STRING
+            rc_text__translate_input_empty.value
             or rc_language__translate_from.value == constants.EMPTY_STRING
             or rc_language__translate_to.value == constants.EMPTY_STRING
             or rc_language__translate_from.value == rc_language__translate_to.value
@@ -414,40 +1120,121 @@ def Page():
         ),
         on_click=translate,
     )
+    if translate.pending:
+        solara.Button("Stop", color="secondary", on_click=stop_translation)
+
+
+@solara.component
+def SourceTextInput():
+    """The text to translate, typed or uploaded."""
+    rv.Textarea(
+        label="Text to translate",
+        v_model=rc_text__translate_input.value,
+        on_v_model=set_text_to_translate,
+        outlined=True,
+        auto_grow=True,
+        rows=1,
+        counter=True,
+        disabled=translate.pending,
+        hint=(
+            f"Showing the start of the uploaded text of {len(rc_text__translate_input_file.value)} characters."
+            if rc_text__translate_input_file.value is not None
+            else None
+        ),
+        persistent_hint=rc_text__translate_input_file.value is not None,
+    )
+    solara.FileDrop(
+        label="Or drop a UTF-8 text file to translate here.",
+        on_file=load_text_upload,
+        lazy=True,
+    )
+
+
+@solara.component
+def TranslatedOutput():
+    """
+    The outputs of the pipeline stages and the final translation, with a download of the whole translation
+    if only its start is shown. The latest output is shown as it arrives.
+    """
+    with rv.Carousel(
+        v_model=len(rc_text__translated.value) - 1,
+        dark=False,
+        hide_delimiter_background=True,
+        hide_delimiters=False,
+        cycle=False,
+        light=True,
+        show_arrows_on_hover=True,
+        # show_arrows=False,
+    ):
+        for title, translation_metadata in zip(
+            rc_text__translated_titles.value, rc_text__translated.value
+        ):
+            # Only the final translation may have been spilled to a temporary file.
+            characters = (
+                len(rc_text__translated_file.value)
+                if title == constants.STAGE_TITLE__FINAL
+                and rc_text__translated_file.value is not None
+                else len(translation_metadata)
+            )
+            with rv.CarouselItem(
+                style_="height: 100%; width: 70%; margin-left: auto; margin-right: auto;",
+            ):
+                with solara.Card(
+                    title=title,
+                    subtitle=f"{characters} characters",
+                    elevation=1,
+                ):
+                    solara.Markdown(translation_metadata, style="scroll: auto;")
+    if rc_text__translated_file.value is not None:
+        solara.FileDownload(
+            # Open the temporary file only when the download is requested.
+            data=lambda: open(rc_text__translated_file.value.path, "rb"),
+            filename="translation.txt",
+            label="Only the start of the translation is shown. Download all of it.",
+            mime_type="text/plain",
+        )
+
+
+@solara.component
+def Page():
+    """The main page of the app."""
+    solara.use_memo(initialise_settings, dependencies=[])
+    solara.Style(stylesheet())
+
+    with solara.Sidebar():
+        SettingsSidebar()
+
+    StatusMessage()
+    LanguageSelects()
+    TranslationModeSelect()
+    TranslateButton()
 
     with solara.ColumnsResponsive(xlarge=[6, 6], medium=[12], default=[12], wrap=True):
         with solara.Column():
-            rv.Textarea(
-                label="Text to translate",
-                v_model=rc_text__translate_input.value,
-                on_v_model=rc_text__translate_input.set,
-                outlined=True,
-                auto_grow=True,
-                rows=1,
-                counter=True,
-                disabled=translate.pending,
-            )
+            SourceTextInput()
         with solara.Column():
-            with rv.Carousel(
-                dark=False,
-                hide_delimiter_background=True,
-                hide_delimiters=False,
-                cycle=False,
-                light=True,
-                show_arrows_on_hover=True,
-                # show_arrows=False,
-            ):
-                for translation_metadata in rc_text__translated.value:
-                    with rv.CarouselItem(
-                        style_="height: 100%; width: 70%; margin-left: auto; margin-right: auto;",
-                    ):
-                        with solara.Card(
-                            subtitle=f"{len(translation_metadata)} characters",
-                            elevation=1,
-                        ):
-                            solara.Markdown(translation_metadata, style="scroll: auto;")
+            TranslatedOutput()
 
 
+# Warm up each worker process once, in the background, so that it is not delayed in serving its first page.
+load_dotenv()
+if (
+    os.getenv(constants.ENV_KEY__WARM_UP, constants.DEFAULT_VALUE__WARM_UP).lower()
+    in constants.BOOLEAN_TRUE_VALUES
+):
+    threading.Thread(
+        target=providers.warm_up,
+        kwargs={
+            "connect": os.getenv(
+                constants.ENV_KEY__WARM_UP_CONNECT,
+                constants.DEFAULT_VALUE__WARM_UP_CONNECT,
+            ).lower()
+            in constants.BOOLEAN_TRUE_VALUES
+        },
+        daemon=True,
+    ).start()
+start_precompute_from_environment()
+
 routes = [
     # Define the main route for the app with the custom layout.
     solara.Route(
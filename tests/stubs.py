@@ -0,0 +1,43 @@
+import threading
+import time
+from typing import Any, Callable, List, Tuple
+
+from llama_index.core.llms import CompletionResponse, CustomLLM, LLMMetadata
+from llama_index.core.llms.callbacks import llm_completion_callback
+from pydantic import PrivateAttr
+
+
+class ScriptedLLM(CustomLLM):
+    """A language model whose responses are computed from its system prompt and the prompt, recording every call."""
+
+    respond: Callable[[str, str], str] = lambda system_prompt, prompt: prompt
+    delay: float = 0.0
+    model_name: str = "scripted"
+
+    _calls: List[Tuple[str, str]] = PrivateAttr(default_factory=list)
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+
+    @property
+    def metadata(self) -> LLMMetadata:
+        return LLMMetadata(model_name=self.model_name)
+
+    @property
+    def calls(self) -> List[Tuple[str, str]]:
+        """The system prompt and the prompt of each call."""
+        with self._lock:
+            return list(self._calls)
+
+    @llm_completion_callback()
+    def complete(
+        self, prompt: str, formatted: bool = False, **kwargs: Any
+    ) -> CompletionResponse:
+        system_prompt = self.system_prompt
+        with self._lock:
+            self._calls.append((system_prompt, prompt))
+        if self.delay:
+            time.sleep(self.delay)
+        return CompletionResponse(text=self.respond(system_prompt, prompt))
+
+    @llm_completion_callback()
+    def stream_complete(self, prompt: str, formatted: bool = False, **kwargs: Any):
+        yield self.complete(prompt, formatted=formatted, **kwargs)
@@ -0,0 +1,58 @@
+from accounting import UsageAccount, UsageBudget, parse_llm_prices
+
+
+def test_budget_without_limits_is_never_exceeded():
+    assert not UsageBudget().exceeded(10**9, 10**6)
+
+
+def test_budget_is_exceeded_at_its_token_or_cost_limit():
+    budget = UsageBudget(max_tokens=100, max_cost=0.5)
+    assert not budget.exceeded(99, 0.49)
+    assert budget.exceeded(100, 0.0)
+    assert budget.exceeded(0, 0.5)
+
+
+def test_account_costs_calls_at_the_prices_of_their_models():
+    account = UsageAccount(prices={"large": (2.0, 8.0)})
+    assert account.cost_of("large", 1_000_000, 500_000) == 6.0
+    assert account.cost_of("unpriced", 1_000_000, 500_000) == 0.0
+
+
+def test_request_usage_is_accounted_in_the_account_of_its_tenant():
+    tenant = UsageAccount(budget=UsageBudget(max_tokens=100))
+    first = UsageAccount(parent=tenant)
+    second = UsageAccount(parent=tenant)
+    first.record(40, 20, 0.1)
+    second.record(30, 5, 0.2, estimated=True)
+    assert first.summary() == {
+        "calls": 1,
+        "estimated_calls": 0,
+        "prompt_tokens": 40,
+        "completion_tokens": 20,
+        "total_tokens": 60,
+        "cost": 0.1,
+    }
+    assert tenant.summary()["calls"] == 2
+    assert tenant.summary()["estimated_calls"] == 1
+    assert tenant.total_tokens == 95
+    assert not first.exceeded
+    second.record(5, 0, 0.0)
+    # The budget of the tenant applies to each of its requests.
+    assert tenant.exceeded
+    assert first.exceeded
+
+
+def test_describe_mentions_the_cost_only_when_there_is_one():
+    account = UsageAccount()
+    account.record(1000, 234, 0.0)
+    assert account.describe() == "1,234 tokens"
+    account.record(0, 0, 0.01234)
+    assert account.describe() == "1,234 tokens costing 0.0123"
+
+
+def test_parse_llm_prices_splits_model_names_with_colons_from_the_right():
+    assert parse_llm_prices(" gpt-4o-mini:0.15:0.6, llama3.1:8b:0:0 ,") == {
+        "gpt-4o-mini": (0.15, 0.6),
+        "llama3.1:8b": (0.0, 0.0),
+    }
+    assert parse_llm_prices("") == {}
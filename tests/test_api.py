@@ -0,0 +1,72 @@
+import asyncio
+import json
+import time
+
+import pytest
+from starlette.requests import Request
+from starlette.testclient import TestClient
+
+import api
+from pool import TranslatorPool
+from resilience import ResilientCaller
+from translator import AgenticTranslator
+
+from tests.stubs import ScriptedLLM
+
+_BODY = {
+    "source_language": "English",
+    "target_language": "Deutsch",
+    "text": "Hello.",
+    "mode": "Simple",
+}
+
+
+@pytest.fixture
+def llm(monkeypatch):
+    """The slow language model of the translators of the service, whose calls in flight can be abandoned."""
+    llm = ScriptedLLM(delay=2.0)
+    monkeypatch.setattr(
+        api,
+        "translator_pool",
+        TranslatorPool(
+            lambda source_language, target_language: AgenticTranslator(
+                llm=llm,
+                source_language=source_language,
+                target_language=target_language,
+                caller=ResilientCaller(default_deadline=5.0),
+            )
+        ),
+    )
+    monkeypatch.setattr(api, "translation_cache", api.TranslationCache())
+    return llm
+
+
+def test_translation_stops_at_its_deadline(llm, monkeypatch):
+    monkeypatch.setattr(api, "translation_deadline", 0.3)
+    started_at = time.perf_counter()
+    response = TestClient(api.app).post("/translate", json=_BODY)
+    assert response.status_code == 504
+    assert time.perf_counter() - started_at < 1.5
+
+
+def test_translation_stops_when_the_client_disconnects(llm):
+    messages = [{"type": "http.request", "body": json.dumps(_BODY).encode()}]
+    disconnect_at = time.monotonic() + 0.3
+
+    async def receive():
+        if messages:
+            return messages.pop()
+        if time.monotonic() >= disconnect_at:
+            return {"type": "http.disconnect"}
+        await asyncio.sleep(1)
+        return {"type": "http.request", "body": b""}
+
+    request = Request(
+        {"type": "http", "method": "POST", "path": "/translate", "headers": []},
+        receive,
+    )
+    started_at = time.perf_counter()
+    response = asyncio.run(api.translate(request))
+    assert response.status_code == 499
+    assert time.perf_counter() - started_at < 1.5
+    assert len(llm.calls) == 1
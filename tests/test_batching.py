@@ -0,0 +1,125 @@
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from batching import TranslationBatcher
+from cancellation import CancellationToken, TranslationCancelledError
+from translator import AgenticTranslator
+
+from tests.stubs import ScriptedLLM
+
+_SYSTEM_PAIR = re.compile(r"from (\S+) to (\S+)\.$")
+_SEGMENT = re.compile(r"^\[\[(\d+)\]\] (.*)$", re.MULTILINE)
+
+
+def _pair_of(system_prompt: str) -> str:
+    source_language, target_language = _SYSTEM_PAIR.search(system_prompt).groups()
+    return f"{source_language}>{target_language}"
+
+
+def _respond(system_prompt: str, prompt: str) -> str:
+    """Tag each segment of the prompt with the language pair of the system prompt."""
+    pair = _pair_of(system_prompt)
+    segments = _SEGMENT.findall(prompt)
+    if segments:
+        return "\n".join(f"[[{number}]] {pair} {text}" for number, text in segments)
+    source_text = prompt.rsplit("\n", 2)[-2].split(": ", 1)[1]
+    return f"{pair} {source_text}"
+
+
+def _translator(batcher, source_language, target_language, **kwargs):
+    return AgenticTranslator(
+        llm=ScriptedLLM(respond=_respond, **kwargs),
+        source_language=source_language,
+        target_language=target_language,
+        batcher=batcher,
+    )
+
+
+def test_concurrent_language_pairs_keep_their_system_prompts():
+    batcher = TranslationBatcher(ScriptedLLM(), window=0.3, max_batch_size=2)
+    english_german = _translator(batcher, "English", "Deutsch")
+    japanese_french = _translator(batcher, "日本語", "Français")
+    jobs = [
+        (english_german, "Good morning."),
+        (japanese_french, "おはよう。"),
+        (english_german, "Good night."),
+        (japanese_french, "おやすみ。"),
+    ]
+    with ThreadPoolExecutor(max_workers=len(jobs)) as executor:
+        translations = list(
+            executor.map(lambda job: job[0].translate(job[1]).text, jobs)
+        )
+
+    assert translations == [
+        "English>Deutsch Good morning.",
+        "日本語>Français おはよう。",
+        "English>Deutsch Good night.",
+        "日本語>Français おやすみ。",
+    ]
+    # Each pair was translated in one batched call, with the language model of its own translator.
+    for translator, pair in (
+        (english_german, "English>Deutsch"),
+        (japanese_french, "日本語>Français"),
+    ):
+        calls = translator._llm.calls
+        assert len(calls) == 1
+        assert _pair_of(calls[0][0]) == pair
+        assert "There are 2 segments." in calls[0][1]
+
+
+def test_follower_translates_alone_when_the_leader_is_cancelled():
+    batcher = TranslationBatcher(ScriptedLLM(), window=0.3, max_batch_size=8)
+    leader = _translator(batcher, "English", "Deutsch")
+    follower = _translator(batcher, "English", "Deutsch")
+    leader_token = CancellationToken()
+    # The leader is cancelled while it collects the batch, before it makes the call.
+    threading.Timer(0.15, leader_token.cancel).start()
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        leader_result = executor.submit(
+            leader.translate_in_mode,
+            "Hello.",
+            mode="Simple",
+            cancellation_token=leader_token,
+        )
+        time.sleep(0.05)
+        follower_result = executor.submit(follower.translate, "Goodbye.")
+        with pytest.raises(TranslationCancelledError):
+            leader_result.result()
+        assert follower_result.result().text == "English>Deutsch Goodbye."
+    assert leader._llm.calls == []
+    assert len(follower._llm.calls) == 1
+
+
+def test_follower_stops_waiting_for_a_stuck_leader():
+    batcher = TranslationBatcher(
+        ScriptedLLM(), window=0.05, max_batch_size=8, max_wait=0.2
+    )
+    leader = _translator(batcher, "English", "Deutsch", delay=2.0)
+    follower = _translator(batcher, "English", "Deutsch")
+    threading.Thread(target=leader.translate, args=("Hello.",), daemon=True).start()
+    time.sleep(0.01)
+    started_at = time.perf_counter()
+    assert follower.translate("Goodbye.").text == "English>Deutsch Goodbye."
+    assert time.perf_counter() - started_at < 1.0
+
+
+def test_cancelled_follower_stops_waiting():
+    batcher = TranslationBatcher(
+        ScriptedLLM(), window=0.05, max_batch_size=8, max_wait=5.0
+    )
+    leader = _translator(batcher, "English", "Deutsch", delay=2.0)
+    follower = _translator(batcher, "English", "Deutsch")
+    threading.Thread(target=leader.translate, args=("Hello.",), daemon=True).start()
+    time.sleep(0.01)
+    follower_token = CancellationToken(deadline=0.3)
+    started_at = time.perf_counter()
+    with pytest.raises(TranslationCancelledError):
+        follower.translate_in_mode(
+            "Goodbye.", mode="Simple", cancellation_token=follower_token
+        )
+    assert time.perf_counter() - started_at < 1.0
+    assert follower._llm.calls == []
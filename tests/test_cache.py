@@ -0,0 +1,42 @@
+from cache import TranslationCache
+
+
+def _put(cache, source_text, translation, mode="Simple"):
+    cache.put(source_text, "English", "Deutsch", mode, translation)
+
+
+def _get(cache, source_text, mode="Simple"):
+    return cache.get(source_text, "English", "Deutsch", mode)
+
+
+def test_translations_are_cached_by_language_pair_mode_and_stripped_text():
+    cache = TranslationCache()
+    _put(cache, " Hello. ", "Hallo.")
+    assert _get(cache, "Hello.\n") == "Hallo."
+    assert _get(cache, "Hello.", mode="Agentic") is None
+    assert cache.get("Hello.", "English", "Français", "Simple") is None
+    assert cache.contains("Hello.", "English", "Deutsch", "Simple")
+
+
+def test_least_recently_used_translation_is_evicted():
+    cache = TranslationCache(max_entries=2)
+    _put(cache, "One.", "Eins.")
+    _put(cache, "Two.", "Zwei.")
+    assert _get(cache, "One.") == "Eins."
+    _put(cache, "Three.", "Drei.")
+    assert len(cache) == 2
+    assert _get(cache, "Two.") is None
+    assert _get(cache, "One.") == "Eins."
+    assert _get(cache, "Three.") == "Drei."
+
+
+def test_cache_without_entries_is_disabled():
+    cache = TranslationCache(max_entries=0)
+    _put(cache, "One.", "Eins.")
+    assert len(cache) == 0
+    assert _get(cache, "One.") is None
+
+
+def test_shared_cache_is_shared_by_size():
+    assert TranslationCache.shared(7) is TranslationCache.shared(7)
+    assert TranslationCache.shared(7) is not TranslationCache.shared(8)
@@ -0,0 +1,92 @@
+import threading
+import time
+
+import pytest
+
+import constants
+from cancellation import (
+    CancellationRegistry,
+    CancellationToken,
+    DeadlineExceededError,
+    TranslationCancelledError,
+    cancellation_scope,
+    current_cancellation_token,
+    raise_if_cancelled,
+)
+
+
+def test_cancelled_token_raises_with_its_reason():
+    token = CancellationToken()
+    token.raise_if_cancelled(constants.STAGE__TRANSLATE)
+    token.cancel(constants.CANCELLATION_REASON__SUPERSEDED)
+    # Only the first reason is kept.
+    token.cancel(constants.CANCELLATION_REASON__CLOSED)
+    assert token.reason == constants.CANCELLATION_REASON__SUPERSEDED
+    with pytest.raises(TranslationCancelledError, match="superseded"):
+        token.raise_if_cancelled(constants.STAGE__TRANSLATE)
+
+
+def test_token_past_its_deadline_is_cancelled():
+    token = CancellationToken(deadline=0.05)
+    assert not token.cancelled
+    assert 0 < token.remaining() <= 0.05
+    time.sleep(0.1)
+    assert token.cancelled
+    assert token.reason == constants.CANCELLATION_REASON__DEADLINE
+    assert token.remaining() == 0
+    with pytest.raises(DeadlineExceededError):
+        token.raise_if_cancelled(constants.STAGE__TRANSLATE)
+
+
+def test_child_token_is_cancelled_with_its_parent_and_keeps_its_deadline():
+    parent = CancellationToken(deadline=10)
+    child = CancellationToken(deadline=60, parent=parent)
+    assert child.remaining() <= 10
+    other_child = CancellationToken(parent=parent)
+    other_child.cancel()
+    assert not parent.cancelled
+    parent.cancel(constants.CANCELLATION_REASON__CLOSED)
+    assert child.reason == constants.CANCELLATION_REASON__CLOSED
+    # A child of a cancelled token is cancelled at once.
+    assert CancellationToken(parent=parent).cancelled
+
+
+def test_wait_returns_when_the_token_is_cancelled():
+    token = CancellationToken()
+    assert not token.wait(0.01)
+    threading.Timer(0.05, token.cancel).start()
+    started_at = time.perf_counter()
+    assert token.wait(5)
+    assert time.perf_counter() - started_at < 1
+
+
+def test_scope_sets_the_token_of_the_current_thread():
+    token = CancellationToken()
+    assert current_cancellation_token() is None
+    with cancellation_scope(token):
+        assert current_cancellation_token() is token
+        # Without a token, that of the enclosing scope is kept.
+        with cancellation_scope(None):
+            assert current_cancellation_token() is token
+        token.cancel()
+        with pytest.raises(TranslationCancelledError):
+            raise_if_cancelled(constants.STAGE__TRANSLATE)
+    assert current_cancellation_token() is None
+    raise_if_cancelled(constants.STAGE__TRANSLATE)
+
+
+def test_registry_supersedes_and_cancels_the_translations_of_a_session():
+    registry = CancellationRegistry()
+    first = registry.start("session")
+    second = registry.start("session")
+    assert first.reason == constants.CANCELLATION_REASON__SUPERSEDED
+    assert not second.cancelled
+    # A superseded translation that finishes late does not forget the running one.
+    registry.finish("session", first)
+    registry.cancel("session", constants.CANCELLATION_REASON__CLOSED)
+    assert second.reason == constants.CANCELLATION_REASON__CLOSED
+    registry.finish("session", second)
+    third = registry.start("session")
+    registry.finish("session", third)
+    registry.cancel("session")
+    assert not third.cancelled
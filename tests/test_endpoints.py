@@ -0,0 +1,227 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+
+import httpx
+import pytest
+from llama_index.core.llms import CompletionResponse, CustomLLM, LLMMetadata
+from llama_index.core.llms.callbacks import llm_completion_callback
+
+from cancellation import TranslationCancelledError
+from endpoints import EndpointPool, PooledLLM, parse_endpoint_urls
+
+
+class _StubServer:
+    """
+    A stand-in server of a provider, which answers completions after a delay, or fails while it is down. It
+    rejects completions with a status of its own, if set, while it stays healthy.
+    """
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.healthy = True
+        self.rejection_status: int | None = None
+        self.completions = 0
+        self.health_checks = 0
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                with stub._lock:
+                    if self.path == "/health":
+                        stub.health_checks += 1
+                    else:
+                        stub.completions += 1
+                if self.path != "/health":
+                    time.sleep(stub.delay)
+                body = stub.name.encode()
+                status = 200 if stub.healthy else 503
+                if self.path != "/health" and stub.rejection_status is not None:
+                    status = stub.rejection_status
+                self.send_response(status)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self._server.server_address[1]}"
+        self.name = self.url
+        threading.Thread(
+            target=self._server.serve_forever, args=(0.05,), daemon=True
+        ).start()
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+class _HttpLLM(CustomLLM):
+    """A language model whose completions are the answers of a stub server."""
+
+    base_url: str
+
+    @property
+    def metadata(self) -> LLMMetadata:
+        return LLMMetadata(model_name="stub")
+
+    @llm_completion_callback()
+    def complete(
+        self, prompt: str, formatted: bool = False, **kwargs: Any
+    ) -> CompletionResponse:
+        response = httpx.get(f"{self.base_url}/complete", timeout=5)
+        response.raise_for_status()
+        return CompletionResponse(text=response.text)
+
+    @llm_completion_callback()
+    def stream_complete(self, prompt: str, formatted: bool = False, **kwargs: Any):
+        yield self.complete(prompt, formatted=formatted, **kwargs)
+
+
+@pytest.fixture
+def servers():
+    started = []
+
+    def start(*delays):
+        started.extend(_StubServer(delay) for delay in delays)
+        return started
+
+    yield start
+    for server in started:
+        server.close()
+
+
+def _pooled_llm(servers, **kwargs) -> PooledLLM:
+    kwargs.setdefault("health_check_interval", 0)
+    pool = EndpointPool([server.url for server in servers], **kwargs)
+    llms = {server.url: _HttpLLM(base_url=server.url) for server in servers}
+    return PooledLLM(pool=pool, llm=llms[servers[0].url], llms=llms)
+
+
+def _state(llm: PooledLLM, server: _StubServer) -> dict:
+    return next(
+        endpoint for endpoint in llm.pool.statistics() if endpoint["url"] == server.url
+    )
+
+
+def test_parse_endpoint_urls():
+    assert parse_endpoint_urls(" http://a:1/, http://b:2,,http://a:1 ") == [
+        "http://a:1",
+        "http://b:2",
+    ]
+
+
+def test_calls_go_to_the_server_with_the_fewest_calls_in_flight(servers):
+    slow, fast = servers(0.5, 0.0)
+    llm = _pooled_llm([slow, fast])
+    in_flight = threading.Thread(target=llm.complete, args=("Hello.",))
+    in_flight.start()
+    time.sleep(0.1)
+    # The slow server is busy with the first call, so the others go to the idle one.
+    assert [llm.complete("Hello.").text for _ in range(3)] == [fast.url] * 3
+    in_flight.join()
+    assert (slow.completions, fast.completions) == (1, 3)
+
+
+def test_calls_go_to_the_server_with_the_lowest_latency(servers):
+    slow, fast = servers(0.2, 0.0)
+    llm = _pooled_llm([slow, fast])
+    # Each server is tried once, as servers without latency samples are tried first.
+    answers = [llm.complete("Hello.").text for _ in range(5)]
+    assert answers[:2] == [slow.url, fast.url]
+    assert answers[2:] == [fast.url] * 3
+    assert _state(llm, slow)["latency_seconds"] > _state(llm, fast)["latency_seconds"]
+
+
+def test_failing_server_is_ejected_and_readmitted(servers):
+    healthy, failing = servers(0.0, 0.0)
+    failing.healthy = False
+    llm = _pooled_llm([healthy, failing], max_failures=2, ejection_seconds=0.5)
+    # Once the healthy server has a latency sample, the failing one, without any, is tried until it is ejected.
+    assert llm.complete("Hello.").text == healthy.url
+    for _ in range(2):
+        with pytest.raises(httpx.HTTPStatusError):
+            llm.complete("Hello.")
+    assert _state(llm, failing)["ejected"]
+    assert [llm.complete("Hello.").text for _ in range(3)] == [healthy.url] * 3
+    assert failing.completions == 2
+
+    failing.healthy = True
+    time.sleep(0.6)
+    assert not _state(llm, failing)["ejected"]
+    assert llm.complete("Hello.").text == failing.url
+    assert _state(llm, failing)["failures"] == 0
+
+
+def test_rejected_and_cancelled_calls_do_not_eject_a_server(servers):
+    (server,) = servers(0.0)
+    llm = _pooled_llm([server], max_failures=1)
+    # A request that the server rejects, such as one for an unknown model, would fail on any server.
+    server.rejection_status = 404
+    with pytest.raises(httpx.HTTPStatusError):
+        llm.complete("Hello.")
+    with pytest.raises(TranslationCancelledError):
+        with llm.pool.endpoint():
+            raise TranslationCancelledError("The translation was cancelled.")
+    assert _state(llm, server) == {
+        "url": server.url,
+        "in_flight": 0,
+        "latency_seconds": None,
+        "failures": 0,
+        "ejected": False,
+    }
+
+
+def test_every_server_ejected_uses_the_one_readmitted_soonest(servers):
+    first, second = servers(0.0, 0.0)
+    first.healthy = second.healthy = False
+    llm = _pooled_llm([first, second], max_failures=1, ejection_seconds=5)
+    for _ in range(2):
+        with pytest.raises(httpx.HTTPStatusError):
+            llm.complete("Hello.")
+    assert all(endpoint["ejected"] for endpoint in llm.pool.statistics())
+    first.healthy = True
+    assert llm.complete("Hello.").text == first.url
+
+
+def test_health_checks_eject_and_recover_a_server(servers):
+    healthy, flaky = servers(0.0, 0.0)
+    flaky.healthy = False
+    pool = EndpointPool(
+        [healthy.url, flaky.url],
+        health_path="/health",
+        health_check_interval=0.05,
+        health_check_timeout=1.0,
+        max_failures=2,
+        ejection_seconds=0.3,
+    )
+    pool.start()
+    try:
+        deadline = time.monotonic() + 5
+        while not pool.statistics()[1]["ejected"] and time.monotonic() < deadline:
+            time.sleep(0.05)
+        assert pool.statistics()[1]["ejected"]
+        # An unhealthy server stays ejected, while the others take its calls.
+        with pool.endpoint() as endpoint:
+            assert endpoint.url == healthy.url
+
+        flaky.healthy = True
+        deadline = time.monotonic() + 5
+        while pool.statistics()[1]["ejected"] and time.monotonic() < deadline:
+            time.sleep(0.05)
+        time.sleep(0.2)
+        assert pool.statistics()[1] == {
+            "url": flaky.url,
+            "in_flight": 0,
+            "latency_seconds": None,
+            "failures": 0,
+            "ejected": False,
+        }
+        assert flaky.health_checks > 2
+    finally:
+        pool.stop()
+    assert pool.check_health() == 2
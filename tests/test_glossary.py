@@ -0,0 +1,65 @@
+from glossary import TermMatcher, TerminologyStore, format_glossary, tokenize
+
+
+def _found(matcher: TermMatcher, text: str) -> list:
+    return [
+        (term_index, text[start:end]) for term_index, start, end in matcher.find(text)
+    ]
+
+
+def test_tokenize_splits_words_and_unspaced_characters():
+    assert [token for token, _, _ in tokenize("Café-Bar, 東京 2024!")] == [
+        "café",
+        "bar",
+        "東",
+        "京",
+        "2024",
+    ]
+
+
+def test_terms_match_whole_words_regardless_of_case():
+    matcher = TermMatcher(["cat", "machine learning"])
+    assert _found(matcher, "Machine  Learning for cats and a CAT.") == [
+        (1, "Machine  Learning"),
+        (0, "CAT"),
+    ]
+
+
+def test_overlapping_terms_prefer_the_leftmost_and_then_the_longest():
+    matcher = TermMatcher(["new york", "new york city", "york city hall"])
+    assert _found(matcher, "In New York City Hall.") == [(1, "New York City")]
+    assert _found(matcher, "York City Hall in New York.") == [
+        (2, "York City Hall"),
+        (0, "New York"),
+    ]
+
+
+def test_terms_are_found_through_failure_links():
+    matcher = TermMatcher(["a b c", "b d"])
+    assert _found(matcher, "a b d") == [(1, "b d")]
+
+
+def test_terms_of_unspaced_scripts_match_inside_text():
+    matcher = TermMatcher(["東京都"])
+    assert _found(matcher, "私は東京都に住んでいます。") == [(0, "東京都")]
+
+
+def test_store_matches_distinct_entries_of_the_language_pair():
+    store = TerminologyStore(
+        [
+            ("English", "Deutsch", "invoice", "Rechnung"),
+            ("English", "Deutsch", "due date", "Fälligkeitsdatum"),
+            ("English", "Français", "invoice", "facture"),
+        ]
+    )
+    assert store.match(
+        "The due date of the invoice, and of every invoice.", "English", "Deutsch"
+    ) == [("due date", "Fälligkeitsdatum"), ("invoice", "Rechnung")]
+    assert store.match("The invoice.", "English", "Español") == []
+
+
+def test_format_glossary_is_empty_without_entries():
+    assert format_glossary([], "English", "Deutsch") == ""
+    assert "Rechnung" in format_glossary(
+        [("invoice", "Rechnung")], "English", "Deutsch"
+    )
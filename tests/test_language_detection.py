@@ -0,0 +1,62 @@
+import pytest
+
+import constants
+from language_detection import (
+    detect_language,
+    group_by_language,
+    resolve_source_language,
+)
+
+SENTENCES = {
+    "English": "The train to the airport leaves from the second platform every hour.",
+    "Español": "El tren al aeropuerto sale del segundo andén cada hora.",
+    "Français": "Le train pour l'aéroport part du deuxième quai toutes les heures.",
+    "Italiano": "Il treno per l'aeroporto parte dal secondo binario ogni ora.",
+    "Deutsch": "Der Zug zum Flughafen fährt jede Stunde vom zweiten Bahnsteig ab.",
+    "Português": "O comboio para o aeroporto parte da segunda plataforma de hora a hora.",
+    "Suomi": "Juna lentokentälle lähtee toiselta laiturilta joka tunti.",
+    "Svenska": "Tåget till flygplatsen går från det andra spåret varje timme.",
+    "Dansk": "Toget til lufthavnen afgår fra det andet spor hver time.",
+    "Norsk": "Det har vært mye regn etter at vi kom hjem, og det blir ikke bedre nå.",
+    "Nederlands": "De trein naar het vliegveld vertrekt elk uur van het tweede perron.",
+    "Polski": "Pociąg na lotnisko odjeżdża z drugiego peronu co godzinę.",
+    "বাংলা": "বিমানবন্দরের ট্রেন প্রতি ঘণ্টায় দ্বিতীয় প্ল্যাটফর্ম থেকে ছাড়ে।",
+    "日本語": "空港行きの電車は毎時二番線から出発します。",
+    "中文": "去机场的火车每小时从第二站台出发。",
+    "한국어": "공항으로 가는 기차는 매시간 두 번째 승강장에서 출발합니다.",
+}
+
+
+def test_every_supported_language_has_a_sentence():
+    assert sorted(SENTENCES) == sorted(constants.LANGUAGES__SUPPORTED)
+
+
+@pytest.mark.parametrize("language", constants.LANGUAGES__SUPPORTED)
+def test_each_supported_language_is_detected(language):
+    assert detect_language(SENTENCES[language]) == language
+
+
+def test_text_without_words_is_not_detected():
+    assert detect_language("12:30 - 14:45 (+5%)") is None
+    with pytest.raises(ValueError):
+        resolve_source_language("12:30", constants.LANGUAGE__DETECT)
+
+
+def test_selected_source_language_is_not_detected():
+    assert resolve_source_language(SENTENCES["Deutsch"], "English") == "English"
+
+
+def test_mixed_texts_are_grouped_by_their_language():
+    texts = [
+        SENTENCES["Deutsch"],
+        SENTENCES["日本語"],
+        SENTENCES["Español"],
+        SENTENCES["Deutsch"],
+    ]
+    assert group_by_language(texts, constants.LANGUAGE__DETECT) == {
+        "Deutsch": [0, 3],
+        "日本語": [1],
+        "Español": [2],
+    }
+    # A selected source language applies to every text.
+    assert group_by_language(texts, "English") == {"English": [0, 1, 2, 3]}
@@ -0,0 +1,64 @@
+import threading
+
+import pytest
+
+from pool import TranslatorPool
+
+
+class _Translator:
+    """A stand-in translator, numbered in the order it was built."""
+
+    def __init__(self, number: int):
+        self.number = number
+
+
+def _pool(max_translators_per_pair: int = 1):
+    built = []
+
+    def build(source_language, target_language):
+        built.append(_Translator(len(built)))
+        return built[-1]
+
+    return TranslatorPool(build, max_translators_per_pair), built
+
+
+def test_translators_are_reused_for_their_language_pair():
+    pool, built = _pool()
+    with pool.translator("English", "Deutsch") as first:
+        pass
+    with pool.translator("English", "Deutsch") as second:
+        assert second is first
+    with pool.translator("English", "Français") as other:
+        assert other is not first
+    assert len(built) == 2
+
+
+def test_translator_of_a_failed_request_is_dropped():
+    pool, built = _pool()
+    with pytest.raises(RuntimeError):
+        with pool.translator("English", "Deutsch") as failed:
+            raise RuntimeError("The translation failed.")
+    # The pair may build a new translator in place of the dropped one.
+    with pool.translator("English", "Deutsch") as translator:
+        assert translator is not failed
+    assert len(built) == 2
+
+
+def test_request_waits_for_a_translator_to_be_returned():
+    pool, built = _pool()
+    borrowed = threading.Event()
+    release = threading.Event()
+
+    def borrow():
+        with pool.translator("English", "Deutsch"):
+            borrowed.set()
+            release.wait(5)
+
+    thread = threading.Thread(target=borrow)
+    thread.start()
+    borrowed.wait(5)
+    threading.Timer(0.1, release.set).start()
+    with pool.translator("English", "Deutsch") as translator:
+        assert translator is built[0]
+    thread.join()
+    assert len(built) == 1
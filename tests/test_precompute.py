@@ -0,0 +1,93 @@
+from contextlib import ExitStack
+
+import pytest
+
+import constants
+from cache import TranslationCache
+from metrics import METRICS
+from pool import TranslatorPool
+from precompute import PrecomputeWorker, RequestStatistics
+from routing import translation_in_flight
+from translator import AgenticTranslator
+
+from tests.stubs import ScriptedLLM
+
+_REQUEST = (
+    "Hello, world.",
+    "English",
+    "Deutsch",
+    constants.TRANSLATION_MODE__REFLECTIVE,
+)
+
+
+def _respond(system_prompt: str, prompt: str) -> str:
+    if prompt.startswith("Some source text"):
+        return "1. [Hello]->[greets]->[world]"
+    if prompt.startswith("Some text is provided below in English, and its translation"):
+        return "COMPLETE: nothing is missing."
+    return "Hallo, Welt."
+
+
+@pytest.fixture
+def foreground():
+    """The foreground translations started while the worker translates in the background."""
+    with ExitStack() as stack:
+        yield stack
+
+
+def _worker(llm: ScriptedLLM) -> PrecomputeWorker:
+    """A worker that precomputes the request, which was made twice, as soon as it is idle."""
+    statistics = RequestStatistics()
+    statistics.record(*_REQUEST)
+    statistics.record(*_REQUEST)
+    return PrecomputeWorker(
+        TranslatorPool(
+            lambda source_language, target_language: AgenticTranslator(
+                llm=llm,
+                source_language=source_language,
+                target_language=target_language,
+            )
+        ),
+        TranslationCache(),
+        statistics,
+        llm_provider=constants.LLM_PROVIDER__OLLAMA,
+        build_llm=lambda: llm,
+        idle_seconds=0.0,
+    )
+
+
+def test_requests_made_often_are_precomputed_while_idle():
+    worker = _worker(ScriptedLLM(respond=_respond))
+    assert worker.candidates() == [_REQUEST]
+    assert worker.run_once() == 1
+    assert worker.cache.get(*_REQUEST) == "Hallo, Welt."
+    # A cached request is not precomputed again.
+    assert worker.candidates() == []
+
+
+def test_background_translation_is_preempted_by_a_foreground_translation(foreground):
+    started = []
+
+    def respond(system_prompt: str, prompt: str) -> str:
+        # A foreground translation starts while the background one extracts its knowledge triplets.
+        if not started:
+            started.append(foreground.enter_context(translation_in_flight()))
+        return _respond(system_prompt, prompt)
+
+    llm = ScriptedLLM(respond=respond)
+    worker = _worker(llm)
+    precomputed = METRICS.counter(constants.METRIC__PRECOMPUTE_TRANSLATIONS)
+
+    assert worker.run_once() == 0
+    assert not worker.cache.contains(*_REQUEST)
+    assert METRICS.counter(constants.METRIC__PRECOMPUTE_TRANSLATIONS) == precomputed
+    # The translation stopped at the next stage, after its first call.
+    assert len(llm.calls) == 1
+    # Nothing is precomputed while the foreground translation is in progress.
+    assert not worker.is_idle()
+    assert worker.run_once() == 0
+
+    # The translation is tried again once the foreground translation has finished.
+    foreground.close()
+    assert worker.run_once() == 1
+    assert worker.cache.contains(*_REQUEST)
@@ -0,0 +1,67 @@
+from preprocessing import (
+    SegmentBatch,
+    normalize_source_text,
+    segment_sentences,
+    translate_segmented,
+)
+
+
+def test_normalize_source_text_keeps_line_and_paragraph_breaks():
+    assert (
+        normalize_source_text(
+            "  Hello\u200b   world.\r\nNext line.\n\n\n\nNew\tparagraph. "
+        )
+        == "Hello world.\nNext line.\n\nNew paragraph."
+    )
+
+
+def test_segment_sentences_skips_abbreviations_and_splits_paragraphs():
+    sentences, separators = segment_sentences(
+        "Mr. Smith arrived. He sat down!\n\nThen he left.", "English"
+    )
+    assert sentences == ["Mr. Smith arrived.", "He sat down!", "Then he left."]
+    assert separators == [" ", "\n\n", ""]
+
+
+def test_segment_sentences_of_unspaced_languages():
+    sentences, separators = segment_sentences("今日は晴れ。明日は雨。", "日本語")
+    assert sentences == ["今日は晴れ。", "明日は雨。"]
+    assert separators == ["", ""]
+
+
+def test_batch_translates_each_distinct_sentence_once():
+    batch = SegmentBatch(
+        ["Hello. How are you?", "How are you? Hello.", "Hello."],
+        ["English", "English", "Français"],
+    )
+    assert batch.segments == ["Hello.", "How are you?", "Hello."]
+    assert batch.segment_languages == ["English", "English", "Français"]
+    assert batch.segment_indices(1) == [1, 0]
+    assert batch.expand(["Hallo.", "Wie geht's?", "Bonjour?"], "Deutsch") == [
+        "Hallo. Wie geht's?",
+        "Wie geht's? Hallo.",
+        "Bonjour?",
+    ]
+
+
+def test_expand_drops_spaces_between_sentences_of_unspaced_languages():
+    batch = SegmentBatch(["Hello. Goodbye.\n\nAgain."], ["English"])
+    assert batch.expand(["こんにちは。", "さようなら。", "また。"], "日本語") == [
+        "こんにちは。さようなら。\n\nまた。"
+    ]
+
+
+def test_translate_segmented():
+    calls = []
+
+    def translate_segments(segments, languages):
+        calls.append(list(segments))
+        return [segment.upper() for segment in segments]
+
+    assert translate_segmented(
+        ["One. Two.", "Two. One."],
+        ["English", "English"],
+        "English",
+        translate_segments,
+    ) == ["ONE. TWO.", "TWO. ONE."]
+    assert calls == [["One.", "Two."]]
@@ -0,0 +1,76 @@
+import threading
+import time
+
+import pytest
+
+import constants
+from cancellation import (
+    CancellationToken,
+    DeadlineExceededError,
+    TranslationCancelledError,
+    cancellation_scope,
+)
+from queueing import PriorityLanes, QueueFullError
+
+
+def _lanes(**kwargs) -> PriorityLanes:
+    return PriorityLanes(
+        short_text_length=10,
+        short_lane_concurrency=1,
+        long_lane_concurrency=1,
+        **kwargs,
+    )
+
+
+def test_lanes_are_independent_pools():
+    lanes = _lanes()
+    with lanes.admit("short") as short_lane:
+        # A long text is admitted while the only short slot is taken.
+        with lanes.admit("a much longer text") as long_lane:
+            assert (short_lane, long_lane) == (
+                constants.QUEUE_LANE__SHORT,
+                constants.QUEUE_LANE__LONG,
+            )
+
+
+def test_request_is_rejected_when_too_many_are_waiting():
+    lanes = _lanes(max_waiting=0)
+    with pytest.raises(QueueFullError):
+        with lanes.admit("short"):
+            pass
+
+
+def test_request_stops_waiting_after_the_longest_wait():
+    lanes = _lanes(max_wait=0.2)
+    with lanes.admit("short"):
+        started_at = time.perf_counter()
+        with pytest.raises(QueueFullError):
+            with lanes.admit("short"):
+                pass
+        assert time.perf_counter() - started_at < 1.0
+    assert lanes.waiting()[constants.QUEUE_LANE__SHORT] == 0
+    # The slot is free again once released.
+    with lanes.admit("short"):
+        pass
+
+
+def test_cancelled_request_stops_waiting():
+    lanes = _lanes(max_wait=0)
+    token = CancellationToken()
+    threading.Timer(0.2, token.cancel).start()
+    with lanes.admit("short"):
+        with pytest.raises(TranslationCancelledError):
+            with lanes.admit("short", token):
+                pass
+    assert lanes.waiting()[constants.QUEUE_LANE__SHORT] == 0
+
+
+def test_request_stops_waiting_at_the_deadline_of_its_translation():
+    lanes = _lanes(max_wait=0)
+    with lanes.admit("short"):
+        started_at = time.perf_counter()
+        with cancellation_scope(CancellationToken(deadline=0.2)):
+            with pytest.raises(DeadlineExceededError):
+                with lanes.admit("short"):
+                    pass
+        assert time.perf_counter() - started_at < 1.0
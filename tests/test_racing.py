@@ -0,0 +1,95 @@
+import time
+
+import pytest
+
+import constants
+from metrics import METRICS
+from racing import ProviderRace, RaceFailedError
+from translator import AgenticTranslator
+
+from tests.stubs import ScriptedLLM
+
+_FAST = constants.LLM_PROVIDER__OLLAMA
+_SLOW = constants.LLM_PROVIDER__OPENAI
+
+
+def _translator(respond, delay: float = 0.0) -> AgenticTranslator:
+    return AgenticTranslator(
+        llm=ScriptedLLM(respond=respond, delay=delay),
+        source_language="English",
+        target_language="Deutsch",
+    )
+
+
+def _answer(translation: str):
+    """Answer every prompt of a translation, whatever its stage, with the same text."""
+    return lambda system_prompt, prompt: translation
+
+
+def _judge_respond(system_prompt: str, prompt: str) -> str:
+    """Extract a triplet, and only assess the translation "Richtig." as capturing it."""
+    if prompt.startswith("Some source text"):
+        return "1. [Hello]->[greets]->[world]"
+    if "Richtig." in prompt:
+        return "COMPLETE: nothing is missing."
+    return "INCOMPLETE: the greeting is missing."
+
+
+def _wins(provider: str) -> float:
+    return METRICS.counter(constants.METRIC__RACE_WINS.format(provider=provider))
+
+
+def test_first_translation_wins_and_the_others_are_cancelled():
+    slow = _translator(_answer("Langsam."), delay=0.3)
+    race = ProviderRace({_FAST: _translator(_answer("Schnell.")), _SLOW: slow})
+    wins = _wins(_FAST)
+    assert race.translate("Hello, world.", constants.TRANSLATION_MODE__REFLECTIVE) == (
+        _FAST,
+        "Schnell.",
+    )
+    assert _wins(_FAST) == wins + 1
+    # The slow translation stops after the call in progress, instead of going through its other stages.
+    time.sleep(0.5)
+    assert len(slow._llm.calls) == 1
+
+
+def test_first_translation_capturing_all_concepts_wins_on_quality():
+    race = ProviderRace(
+        {
+            _FAST: _translator(_answer("Falsch.")),
+            _SLOW: _translator(_answer("Richtig."), delay=0.1),
+        },
+        strategy=constants.RACE_STRATEGY__QUALITY,
+        judge=_translator(_judge_respond),
+    )
+    assert race.translate("Hello, world.", constants.TRANSLATION_MODE__SIMPLE) == (
+        _SLOW,
+        "Richtig.",
+    )
+
+
+def test_failed_and_empty_translations_lose():
+    def fail(system_prompt: str, prompt: str) -> str:
+        raise RuntimeError("The provider is unavailable.")
+
+    race = ProviderRace(
+        {_FAST: _translator(_answer(" ")), _SLOW: _translator(_answer("Ja."), 0.1)}
+    )
+    failures = METRICS.counter(constants.METRIC__RACE_FAILURES.format(provider=_FAST))
+    assert race.translate("Yes.", constants.TRANSLATION_MODE__SIMPLE) == (_SLOW, "Ja.")
+    assert (
+        METRICS.counter(constants.METRIC__RACE_FAILURES.format(provider=_FAST))
+        == failures + 1
+    )
+
+    race = ProviderRace({_FAST: _translator(fail), _SLOW: _translator(fail)})
+    with pytest.raises(RaceFailedError):
+        race.translate("Yes.", constants.TRANSLATION_MODE__SIMPLE)
+
+
+def test_quality_strategy_needs_a_judge():
+    with pytest.raises(ValueError):
+        ProviderRace(
+            {_FAST: _translator(_answer("Ja."))},
+            strategy=constants.RACE_STRATEGY__QUALITY,
+        )
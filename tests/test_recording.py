@@ -0,0 +1,59 @@
+import itertools
+
+import pytest
+
+from recording import RecordingLLM, ReplayLLM, ReplayMissError, build_recorded_llm
+
+from tests.stubs import ScriptedLLM
+
+
+@pytest.fixture(params=["calls.jsonl", "calls.jsonl.gz"])
+def log_path(request, tmp_path):
+    """A log of recorded calls, made with a system prompt, once without and twice with extra arguments."""
+    path = str(tmp_path / request.param)
+    # Each response is numbered, so that repeated calls are answered differently.
+    numbers = itertools.count(1)
+    llm = RecordingLLM(
+        llm=ScriptedLLM(
+            respond=lambda system_prompt, prompt: f"{prompt} #{next(numbers)}"
+        ),
+        log_path=path,
+        system_prompt="Translate.",
+    )
+    llm.complete("Hello.")
+    llm.complete("Hello.", temperature=0.5)
+    llm.complete("Hello.", temperature=0.5)
+    return path
+
+
+def test_replay_is_keyed_by_system_prompt_prompt_and_arguments(log_path):
+    llm = ReplayLLM(log_path=log_path, system_prompt="Translate.")
+    assert len(llm) == 3
+    first = llm.complete("Hello.").text
+    repeated = [llm.complete("Hello.", temperature=0.5).text for _ in range(3)]
+    assert first.startswith("Hello. #")
+    # A call recorded more than once is answered with its recorded responses in turn.
+    assert repeated[0] != repeated[1]
+    assert repeated[2] == repeated[0]
+    assert first not in repeated
+
+
+@pytest.mark.parametrize(
+    "system_prompt, prompt, kwargs",
+    [
+        ("Translate.", "Goodbye.", {}),
+        ("Summarise.", "Hello.", {}),
+        ("Translate.", "Hello.", {"temperature": 0.1}),
+    ],
+)
+def test_unrecorded_calls_are_not_replayed(log_path, system_prompt, prompt, kwargs):
+    llm = ReplayLLM(log_path=log_path, system_prompt=system_prompt)
+    with pytest.raises(ReplayMissError):
+        llm.complete(prompt, **kwargs)
+
+
+def test_replay_of_a_missing_log_fails_when_built(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        build_recorded_llm(
+            lambda: ScriptedLLM(), replay_path=str(tmp_path / "missing.jsonl")
+        )
@@ -0,0 +1,90 @@
+import pytest
+
+import constants
+from metrics import METRICS
+from reflection import ReflectionBudget, translation_change
+from translator import AgenticTranslator
+
+from tests.stubs import ScriptedLLM
+
+
+def _translator(improvements, verdict="INCOMPLETE", delay=0.0, **budget):
+    """A translator whose drafts are assessed with a verdict and improved with each improvement in turn."""
+    improvements = iter(improvements)
+
+    def respond(system_prompt: str, prompt: str) -> str:
+        if prompt.startswith("Some source text"):
+            return "1. [Hello]->[greets]->[world]"
+        if prompt.startswith(
+            "Some text is provided below in English, and its translation"
+        ):
+            return f"{verdict}: say hello to the world."
+        if prompt.startswith("Some text is provided below in English. A translation"):
+            return next(improvements)
+        return "Hallo."
+
+    return AgenticTranslator(
+        llm=ScriptedLLM(respond=respond, delay=delay),
+        source_language="English",
+        target_language="Deutsch",
+        reflection_budget=ReflectionBudget(**budget),
+    )
+
+
+def _stops(reason: str) -> float:
+    return METRICS.counter(constants.METRIC__REFLECTION_STOPS.format(reason=reason))
+
+
+@pytest.mark.parametrize(
+    "improvements, budget, reason, texts",
+    [
+        (
+            ["Hallo, Welt.", "Hallo, Welt."],
+            {"max_rounds": 5},
+            constants.REFLECTION_STOP__CONVERGED,
+            ["Hallo, Welt.", "Hallo, Welt."],
+        ),
+        (
+            ["Hallo, Welt.", "Servus, Welt.", "Grüß Gott."],
+            {"max_rounds": 2},
+            constants.REFLECTION_STOP__MAX_ROUNDS,
+            ["Hallo, Welt.", "Servus, Welt."],
+        ),
+        (
+            ["Hallo, Welt.", "Servus, Welt."],
+            {"max_rounds": 5, "max_tokens": 60},
+            constants.REFLECTION_STOP__TOKEN_BUDGET,
+            ["Hallo, Welt."],
+        ),
+        (
+            ["Hallo, Welt.", "Servus, Welt."],
+            {"max_rounds": 5, "max_seconds": 0.05},
+            constants.REFLECTION_STOP__TIME_BUDGET,
+            ["Hallo, Welt."],
+        ),
+    ],
+)
+def test_reflection_stops_for_its_reason(improvements, budget, reason, texts):
+    translator = _translator(improvements, delay=0.01, **budget)
+    stops = _stops(reason)
+    result = translator.reflective_translate("Hello, world.")
+    assert _stops(reason) == stops + 1
+    # The triplets and the draft, then the assessment and the improvement of each round.
+    assert [response.text for response in result[3::2]] == texts
+    assert len(result) == 2 + 2 * len(texts)
+
+
+def test_reflection_stops_when_no_concept_is_missed():
+    translator = _translator([], verdict="COMPLETE", max_rounds=3)
+    stops = _stops(constants.REFLECTION_STOP__COMPLETE)
+    result = translator.reflective_translate("Hello, world.")
+    assert _stops(constants.REFLECTION_STOP__COMPLETE) == stops + 1
+    # The draft is kept as the translation, without an improvement.
+    assert result[-1].text == "Hallo."
+    assert len(translator._llm.calls) == 3
+
+
+def test_translation_change_is_exact_below_the_threshold():
+    assert translation_change("Hallo, Welt.", "Hallo, Welt.", 0.01) == 0.0
+    assert translation_change("abc", "xyz", 0.5) >= 0.5
+    assert 0 < translation_change("Hallo, Welt!", "Hallo, Welt.", 0.5) < 0.5
@@ -0,0 +1,93 @@
+import httpx
+import pytest
+from llama_index.core.base.llms.types import ChatMessage
+
+from resilience import ResilientCaller, ResilientLLM, is_transient_error
+
+from tests.stubs import ScriptedLLM
+
+
+class _StatusError(Exception):
+    """An error of a provider client with the status of the response."""
+
+    def __init__(self, status_code: int):
+        super().__init__(f"Status {status_code}")
+        self.status_code = status_code
+
+
+class _WrappedError(Exception):
+    """An error of a provider client raised from the error of its HTTP client."""
+
+
+def _flaky(errors):
+    """Respond after raising the given errors, one per call."""
+    errors = list(errors)
+
+    def respond(system_prompt, prompt):
+        if errors:
+            raise errors.pop(0)
+        return "Hallo."
+
+    return respond
+
+
+def _caller() -> ResilientCaller:
+    return ResilientCaller(default_deadline=5.0, max_retries=2, backoff_base=0.01)
+
+
+def test_transient_errors():
+    assert is_transient_error(TimeoutError())
+    assert is_transient_error(ConnectionResetError())
+    assert is_transient_error(httpx.ConnectError("refused"))
+    assert is_transient_error(_StatusError(429))
+    assert is_transient_error(_StatusError(503))
+    try:
+        try:
+            raise httpx.ReadTimeout("timed out")
+        except httpx.ReadTimeout as e:
+            raise _WrappedError("Request timed out.") from e
+    except _WrappedError as e:
+        assert is_transient_error(e)
+
+
+def test_non_transient_errors():
+    assert not is_transient_error(_StatusError(401))
+    assert not is_transient_error(_StatusError(400))
+    assert not is_transient_error(ValueError("Invalid output."))
+    assert not is_transient_error(KeyError("model"))
+
+
+def test_transient_errors_are_retried():
+    llm = ScriptedLLM(respond=_flaky([ConnectionError(), _StatusError(503)]))
+    response = _caller().complete("translate", llm, "Hello.")
+    assert response.text == "Hallo."
+    assert len(llm.calls) == 3
+
+
+@pytest.mark.parametrize(
+    "error", [_StatusError(401), _StatusError(404), ValueError("Invalid.")]
+)
+def test_other_errors_are_raised_at_once(error):
+    llm = ScriptedLLM(respond=_flaky([error]))
+    with pytest.raises(type(error)):
+        _caller().complete("translate", llm, "Hello.")
+    assert len(llm.calls) == 1
+
+
+def test_other_errors_still_fail_over():
+    llm = ScriptedLLM(respond=_flaky([_StatusError(401)]))
+    failover_llm = ScriptedLLM(respond=lambda system_prompt, prompt: "Servus.")
+    caller = ResilientCaller(default_deadline=5.0, failover_llm=failover_llm)
+    assert caller.complete("translate", llm, "Hello.").text == "Servus."
+    assert len(llm.calls) == 1
+
+
+def test_chat_calls_of_a_wrapped_language_model_are_retried():
+    llm = ScriptedLLM(respond=_flaky([TimeoutError()]))
+    llm.system_prompt = "Translate."
+    resilient_llm = ResilientLLM(caller=_caller(), llm=llm, stage="agent")
+    response = resilient_llm.chat([ChatMessage(role="user", content="Hello.")])
+    assert response.message.content == "Hallo."
+    assert len(llm.calls) == 2
+    # The system prompt of the wrapped language model is kept.
+    assert llm.system_prompt == "Translate."
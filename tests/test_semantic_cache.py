@@ -0,0 +1,105 @@
+from semantic_cache import (
+    SemanticCache,
+    adapt_numbers,
+    normalize_text,
+    same_meaning_tokens,
+)
+from translator import AgenticTranslator
+
+from tests.stubs import ScriptedLLM
+
+
+def _store(cache, source_text, output, namespace="translate"):
+    cache.store(namespace, source_text, "English", "Deutsch", output)
+
+
+def _lookup(cache, source_text, namespace="translate"):
+    return cache.lookup(namespace, source_text, "English", "Deutsch")
+
+
+def test_normalize_text_ignores_case_punctuation_whitespace_and_numbers():
+    assert normalize_text("  Hello,   WORLD!\n") == "hello world"
+    assert normalize_text("Room 12 costs 1,250.50 €.") == normalize_text(
+        "room 7 costs 3 €"
+    )
+    # Compatibility forms, such as full-width characters, are folded.
+    assert normalize_text("ＡＢＣ１２３") == normalize_text("abc9")
+
+
+def test_adapt_numbers_replaces_the_numbers_in_order():
+    assert (
+        adapt_numbers(
+            "Room 12 costs 80 €.", "Zimmer 12 kostet 80 €.", "Room 14 costs 95 €."
+        )
+        == "Zimmer 14 kostet 95 €."
+    )
+    # Numbers that occur only in the output are left as they are.
+    assert (
+        adapt_numbers("3 apples.", "Um 9 Uhr: 3 Äpfel.", "5 apples.")
+        == "Um 9 Uhr: 5 Äpfel."
+    )
+
+
+def test_adapt_numbers_gives_up_when_the_numbers_do_not_correspond():
+    assert adapt_numbers("2 apples.", "Zwei Äpfel.", "3 apples.") is None
+    assert adapt_numbers("2 and 2.", "2 und 2.", "3 and 4.") is None
+
+
+def test_same_meaning_tokens_tolerates_typos_in_long_words_only():
+    assert same_meaning_tokens("please recieve the parcel", "please receive the parcel")
+    assert not same_meaning_tokens("the system is enabled", "the system is unabled")
+    assert not same_meaning_tokens("the door is open", "the door is opet")
+    assert not same_meaning_tokens("do close the door", "do not close the door")
+    assert not same_meaning_tokens("東京に行く", "東京に行かない")
+
+
+def test_near_duplicates_hit_and_negations_miss():
+    cache = SemanticCache(threshold=0.9)
+    _store(cache, "Please do close the door when you leave the room.", "Bitte schließ")
+    _store(cache, "The train departs from platform 7.", "Der Zug fährt von Gleis 7 ab.")
+
+    assert _lookup(cache, "please do close the door  when you leave the room!") == (
+        "Bitte schließ"
+    )
+    assert (
+        _lookup(cache, "The train departs from platform 9.")
+        == "Der Zug fährt von Gleis 9 ab."
+    )
+    assert (
+        _lookup(cache, "Please do not close the door when you leave the room.") is None
+    )
+    assert _lookup(cache, "Please do close the window when you leave the room.") is None
+
+
+def test_outputs_are_kept_apart_by_namespace_and_language_pair():
+    cache = SemanticCache()
+    _store(cache, "Good morning.", "Guten Morgen.", namespace="translate:a")
+
+    assert _lookup(cache, "Good morning.", namespace="translate:b") is None
+    assert cache.lookup("translate:a", "Good morning.", "English", "Français") is None
+    assert _lookup(cache, "Good morning.", namespace="translate:a") == "Guten Morgen."
+
+
+def test_translators_of_other_models_do_not_share_cached_translations():
+    cache = SemanticCache()
+    translators = [
+        AgenticTranslator(
+            llm=ScriptedLLM(
+                respond=lambda _, prompt, model=model: f"{model}: {prompt[-20:]}",
+                model_name=model,
+            ),
+            source_language="English",
+            target_language="Deutsch",
+            semantic_cache=cache,
+        )
+        for model in ("small", "large")
+    ]
+
+    small, large = (
+        translator.translate("Good morning.").text for translator in translators
+    )
+    assert small.startswith("small: ")
+    assert large.startswith("large: ")
+    # The same model hits its own cached translation.
+    assert translators[0].translate("Good morning.").text == small
+    assert len(translators[0]._llm.calls) == 1
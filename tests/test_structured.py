@@ -0,0 +1,103 @@
+import pytest
+
+import constants
+from endpoints import build_pooled_llm
+from metrics import METRICS
+from providers import llm_class
+from recording import RecordingLLM, ReplayLLM
+from structured import (
+    KnowledgeTriplets,
+    StructuredOutputError,
+    TranslationAssessment,
+    compact_json,
+    json_completion_kwargs,
+    parse_output,
+    parse_stage_output,
+)
+from translator import assessment_reports_missing_concepts
+
+_TRIPLETS = (
+    '{"triplets": [{"subject": "Alice", "predicate": "is friend of", "object": "Bob"}]}'
+)
+
+
+def test_output_is_parsed_as_is_or_from_a_fenced_code_block():
+    for text in (_TRIPLETS, f"```json\n{_TRIPLETS}\n```", f"  ```\n{_TRIPLETS}```  "):
+        triplets = parse_output(text, KnowledgeTriplets)
+        assert triplets.triplets[0].object == "Bob"
+    assert compact_json(triplets) == _TRIPLETS.replace(": ", ":").replace(", ", ",")
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "",
+        "1. [Alice]->[is friend of]->[Bob]",
+        f"Here are the triplets: {_TRIPLETS}",
+        _TRIPLETS + _TRIPLETS,
+        '{"triplets": [{"subject": "Alice", "predicate": "is friend of"}]}',
+        '{"verdict": "MOSTLY", "missed_triplets": []}',
+    ],
+)
+def test_anything_but_a_valid_object_is_rejected(text):
+    output_cls = TranslationAssessment if "verdict" in text else KnowledgeTriplets
+    with pytest.raises(StructuredOutputError):
+        parse_output(text, output_cls)
+
+
+def test_stage_outputs_are_counted_as_valid_or_not():
+    successes = constants.METRIC__STRUCTURED_OUTPUT_SUCCESSES.format(stage="extract")
+    failures = constants.METRIC__STRUCTURED_OUTPUT_FAILURES.format(stage="extract")
+    counts = METRICS.counter(successes), METRICS.counter(failures)
+    assert parse_stage_output("extract", _TRIPLETS, KnowledgeTriplets) is not None
+    assert parse_stage_output("extract", "[]", KnowledgeTriplets) is None
+    assert (METRICS.counter(successes), METRICS.counter(failures)) == (
+        counts[0] + 1,
+        counts[1] + 1,
+    )
+
+
+def test_assessment_verdict_is_read_from_json_or_text():
+    assert not assessment_reports_missing_concepts('{"verdict": "COMPLETE"}')
+    assert assessment_reports_missing_concepts(
+        '{"verdict": "INCOMPLETE", "suggestions": "Mention Bob."}'
+    )
+    # An assessment in JSON that is not valid reports missed concepts, to be safe.
+    assert assessment_reports_missing_concepts('{"verdict": "COMPLETE"')
+    assert not assessment_reports_missing_concepts("COMPLETE: nothing is missing.")
+    assert assessment_reports_missing_concepts("INCOMPLETE: Bob is missing.")
+
+
+def test_json_mode_is_kept_by_wrapped_language_models(tmp_path):
+    ollama = llm_class(constants.LLM_PROVIDER__OLLAMA)
+    pooled_llm = build_pooled_llm(
+        ["http://a:11434", "http://b:11434"],
+        lambda url: ollama(base_url=url, model="m", context_window=4096),
+    )
+    openai = llm_class(constants.LLM_PROVIDER__OPENAI)(api_key="key", model="gpt-4o")
+    log_path = tmp_path / "calls.jsonl"
+    log_path.touch()
+    schema = {"format": KnowledgeTriplets.model_json_schema()}
+
+    assert json_completion_kwargs(pooled_llm, KnowledgeTriplets) == schema
+    assert (
+        json_completion_kwargs(
+            RecordingLLM(llm=pooled_llm, log_path=str(log_path)), KnowledgeTriplets
+        )
+        == schema
+    )
+    assert json_completion_kwargs(
+        RecordingLLM(llm=openai, log_path=str(log_path)), KnowledgeTriplets
+    ) == {"response_format": {"type": "json_object"}}
+    # A replayed language model makes its calls as the recorded provider did.
+    assert (
+        json_completion_kwargs(
+            ReplayLLM(log_path=str(log_path), recorded_class_name="Ollama"),
+            KnowledgeTriplets,
+        )
+        == schema
+    )
+    assert (
+        json_completion_kwargs(ReplayLLM(log_path=str(log_path)), KnowledgeTriplets)
+        == {}
+    )
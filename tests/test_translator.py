@@ -0,0 +1,54 @@
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from endpoints import EndpointPool, PooledLLM
+from resilience import ResilientCaller
+from translator import AgenticTranslator
+
+from tests.stubs import ScriptedLLM
+
+_SYSTEM_PAIR = re.compile(r"from (\S+) to (\S+)\.$")
+
+
+def _respond(system_prompt: str, prompt: str) -> str:
+    """Answer with the language pair of the system prompt."""
+    return "{}>{}".format(*_SYSTEM_PAIR.search(system_prompt).groups())
+
+
+def _pooled(llm: ScriptedLLM) -> PooledLLM:
+    urls = ["http://a:1", "http://b:1"]
+    pool = EndpointPool(urls, health_check_interval=0)
+    return PooledLLM(pool=pool, llm=llm, llms={url: llm for url in urls})
+
+
+@pytest.mark.parametrize(
+    "wrap, caller",
+    [
+        (lambda llm: llm, None),
+        (_pooled, None),
+        (lambda llm: llm, ResilientCaller(default_deadline=5.0)),
+    ],
+)
+def test_concurrent_language_pairs_share_a_language_model(wrap, caller):
+    llm = ScriptedLLM(respond=_respond, delay=0.05)
+    shared_llm = wrap(llm)
+    pairs = [("English", "Deutsch"), ("日本語", "Français")] * 4
+
+    def translate(pair):
+        translator = AgenticTranslator(
+            llm=shared_llm,
+            source_language=pair[0],
+            target_language=pair[1],
+            caller=caller,
+        )
+        return translator.translate("Hello.").text
+
+    with ThreadPoolExecutor(max_workers=len(pairs)) as executor:
+        translations = list(executor.map(translate, pairs))
+
+    assert translations == [f"{source}>{target}" for source, target in pairs]
+    # The system prompt of each call was sent with it, and the shared language model has none of its own.
+    assert len(llm.calls) == len(pairs)
+    assert llm.system_prompt is None